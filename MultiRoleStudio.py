@@ -1,25 +1,31 @@
 #!/usr/bin/env python3
-"""MultiRoleStudio CLI."""
+"""MultiRoleStudio CLI.
+
+Only stdlib-backed modules are imported at startup. langchain, jsonschema and
+the engine are imported by the ``run_*`` function that needs them, so
+``--version`` / ``--apply`` / ``--archive-sessions`` stay fast when run from
+cron (design.md 8.1, ``util/importtime_report.py``).
+"""
 
 from __future__ import annotations
 
 import argparse
 import sys
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from studio.artifacts import apply_session_artifacts
-from studio.assistants import MockAssistant
-from studio.bindings import org_has_human_talent, workflow_participating_talent_ids
-from studio.display import format_session_end_lines, format_step_metrics_line
-from studio.engine import EngineEvent, SessionEngine, collect_events
-from studio.loader import load_session_context, read_attachment_files
-from studio.user_context_update import (
-    apply_context_draft,
-    save_context_draft_from_session,
-    save_summary_from_context,
+from studio.display import (
+    format_attachment_progress,
+    format_profile_summary,
+    format_session_end_lines,
+    format_step_metrics_line,
 )
+from studio.profiling import PROFILE_MODES, Profiler, ProfileSummary, resolve_profile_mode
+from studio.session_archive import CODECS
 from studio.validation import StudioError, StudioValidationError
-from studio.workflow_validate import workflow_has_interrupt_on, workflow_has_user_exit
+
+if TYPE_CHECKING:
+    from studio.engine import EngineEvent
 
 VERSION = "0.3.0"
 
@@ -45,17 +51,29 @@ def print_event(event: EngineEvent, *, use_stream: bool) -> None:
         print(f"\n{p.get('prompt', '続けますか？')} (y=続行 / n=終了)")
     elif event.type == "step_start":
         p = event.payload
-        print(f"\n--- {p['display_name']} ---")
+        if p.get("phase_type") == "parallel":
+            print(f"\n[{p['display_name']} 応答中…]")
+        else:
+            print(f"\n--- {p['display_name']} ---")
     elif event.type == "chunk":
-        if use_stream:
+        if use_stream and event.payload.get("phase_type") != "parallel":
             print(event.payload["text"], end="", flush=True)
     elif event.type == "step_done":
         p = event.payload
-        if use_stream:
+        if p.get("phase_type") == "parallel":
+            print(f"\n--- {p['display_name']} ---")
+            print(p["text"])
+        elif use_stream:
             print()
         else:
             print(p["text"])
         print(format_step_metrics_line(p))
+    elif event.type == "attachment_progress":
+        p = event.payload
+        total = int(p.get("total") or 0)
+        # 区画ごとの進捗は 1 割ごとに間引く
+        if p.get("stage") != "map" or p["done"] == total or p["done"] % max(1, total // 10) == 0:
+            print(format_attachment_progress(p))
     elif event.type == "step_error":
         print(f"❌ {event.payload['talent_id']}: {event.payload['error']}")
     elif event.type == "await_text":
@@ -84,7 +102,15 @@ def drive_interactive_responder(event: EngineEvent) -> str | None:
     return None
 
 
+def print_profile_summary(summary: ProfileSummary | None) -> None:
+    if summary is not None:
+        print(format_profile_summary({**summary.to_record(), "path": summary.path}))
+
+
 def validate_batch_mode(ctx, topic: str | None) -> None:
+    from studio.bindings import org_has_human_talent, workflow_participating_talent_ids
+    from studio.workflow_validate import workflow_has_interrupt_on, workflow_has_user_exit
+
     if not topic:
         return
     participant_ids = workflow_participating_talent_ids(ctx.org, ctx.slot_bindings)
@@ -135,6 +161,13 @@ def validate_batch_mode(ctx, topic: str | None) -> None:
 
 
 def run_batch(args: argparse.Namespace) -> int:
+    from dataclasses import replace
+
+    from studio.assistants import MockAssistant
+    from studio.attachment_cache import AttachmentCache
+    from studio.engine import collect_events, create_engine
+    from studio.loader import load_session_context, read_attachment_files
+
     root = Path(args.root)
     try:
         ctx = load_session_context(args.org, root, workflow_id=args.workflow)
@@ -144,30 +177,48 @@ def run_batch(args: argparse.Namespace) -> int:
         return 1
 
     attachment_context = ""
+    # --files-large: upload_limits を超えるファイルは E402 にせず要約して取り込む（5.1.3 節）
+    large_files: list[Path] | None = [] if args.files_large else None
     if args.files:
         limits = ctx.studio_config.get("upload_limits", {})
-        attachment_context, report = read_attachment_files([Path(p) for p in args.files], limits)
+        attachment_context, report = read_attachment_files(
+            [Path(p) for p in args.files],
+            limits,
+            overflow=large_files,
+            cache=AttachmentCache.from_config(root, ctx.studio_config),
+        )
         if not report.ok:
             print(report.errors[0].format(), file=sys.stderr)
             return 1
 
     MockAssistant.reset()
-    engine = SessionEngine(ctx)
+    engine = create_engine(ctx)
+    if args.files_full:
+        engine.attachment_retrieval = replace(engine.attachment_retrieval, enabled=False)
     use_stream = ctx.studio_config.get("stream", True) if args.stream is None else args.stream
-
-    events = collect_events(
-        engine,
-        args.topic,
-        attachment_context=attachment_context,
-        stream=use_stream,
-        no_user_context=args.no_user_context,
-    )
-    for event in events:
-        print_event(event, use_stream=use_stream)
+    profiler = Profiler(resolve_profile_mode(args.profile, ctx.studio_config))
+
+    profiler.begin()
+    with profiler.section():
+        collect_events(
+            engine,
+            args.topic,
+            attachment_context=attachment_context,
+            stream=use_stream,
+            no_user_context=args.no_user_context,
+            on_event=lambda event: print_event(event, use_stream=use_stream),
+            cache=args.cache,
+            large_files=large_files,
+        )
+    print_profile_summary(profiler.end(root, engine.state.logger.session_id, "turn_001"))
     return 0
 
 
 def run_interactive(args: argparse.Namespace) -> int:
+    from studio.assistants import MockAssistant
+    from studio.engine import create_engine
+    from studio.loader import load_session_context
+
     root = Path(args.root)
     try:
         ctx = load_session_context(args.org, root, workflow_id=args.workflow)
@@ -176,10 +227,12 @@ def run_interactive(args: argparse.Namespace) -> int:
         return 1
 
     MockAssistant.reset()
-    engine = SessionEngine(ctx)
+    engine = create_engine(ctx)
     use_stream = ctx.studio_config.get("stream", True) if args.stream is None else args.stream
+    profiler = Profiler(resolve_profile_mode(args.profile, ctx.studio_config))
 
     print("MultiRoleStudio 対話モード（終了: q）")
+    turn_no = 0
     while True:
         try:
             user_text = input("\n> ").strip()
@@ -189,28 +242,42 @@ def run_interactive(args: argparse.Namespace) -> int:
         if not user_text or user_text.lower() in {"q", "quit", "exit"}:
             break
 
-        gen = engine.run_turn(user_text, stream=use_stream, no_user_context=args.no_user_context)
-        event = next(gen)
-        while True:
-            print_event(event, use_stream=use_stream)
-            if event.type in ("await_text", "await_choice"):
-                reply = drive_interactive_responder(event)
+        profiler.begin()
+        with profiler.section():
+            gen = engine.run_turn(
+                user_text,
+                stream=use_stream,
+                no_user_context=args.no_user_context,
+                cache=args.cache,
+            )
+            event = next(gen)
+            while True:
+                print_event(event, use_stream=use_stream)
+                if event.type in ("await_text", "await_choice"):
+                    reply = drive_interactive_responder(event)
+                    try:
+                        event = gen.send(reply)
+                    except StopIteration:
+                        break
+                    continue
                 try:
-                    event = gen.send(reply)
+                    event = next(gen)
                 except StopIteration:
                     break
-                continue
-            try:
-                event = next(gen)
-            except StopIteration:
-                break
+        turn_no += 1
+        print_profile_summary(profiler.end(root, engine.state.logger.session_id, f"turn_{turn_no:03d}"))
 
     if engine.state and engine.state.started:
-        print_event(engine.finish(), use_stream=use_stream)
+        profiler.begin()
+        with profiler.section():
+            print_event(engine.finish(), use_stream=use_stream)
+        print_profile_summary(profiler.end(root, engine.state.logger.session_id, "finish"))
     return 0
 
 
 def run_apply(args: argparse.Namespace) -> int:
+    from studio.artifacts import apply_session_artifacts
+
     root = Path(args.root)
     branch = f"studio/{args.apply}" if args.apply_branch else None
     result = apply_session_artifacts(
@@ -226,6 +293,8 @@ def run_apply(args: argparse.Namespace) -> int:
 
 
 def run_user_context_draft(args: argparse.Namespace) -> int:
+    from studio.user_context_update import save_context_draft_from_session
+
     root = Path(args.root)
     result = save_context_draft_from_session(root, args.user_context_draft)
     print(result.message)
@@ -233,6 +302,8 @@ def run_user_context_draft(args: argparse.Namespace) -> int:
 
 
 def run_user_context_apply(args: argparse.Namespace) -> int:
+    from studio.user_context_update import apply_context_draft
+
     root = Path(args.root)
     result = apply_context_draft(root, args.user_context_apply)
     print(result.message)
@@ -240,18 +311,71 @@ def run_user_context_apply(args: argparse.Namespace) -> int:
 
 
 def run_user_context_summarize(args: argparse.Namespace) -> int:
+    from studio.user_context_update import save_summary_from_context
+
     root = Path(args.root)
     result = save_summary_from_context(root)
     print(result.message)
     return 0 if result.ok else 1
 
 
+def run_user_context_reindex(args: argparse.Namespace) -> int:
+    from studio.loader import load_studio_config
+    from studio.user_context_rag import reindex_user_context
+
+    root = Path(args.root)
+    index = reindex_user_context(root, load_studio_config(root))
+    sources = len({chunk.source for chunk in index.chunks})
+    print(
+        f"user_context 索引を更新しました: {sources} ファイル / {len(index.chunks)} 節"
+        f"（再分割 {index.rechunks} 件。{index.index_path}）"
+    )
+    return 0
+
+
+def run_rebuild_sessions(args: argparse.Namespace) -> int:
+    from studio.session_catalog import SessionCatalog
+
+    catalog = SessionCatalog(Path(args.root))
+    count = catalog.rebuild(workers=args.workers)
+    print(f"セッション一覧を再構築しました: {count} 件（{catalog.path}）")
+    return 0
+
+
+def run_archive_sessions(args: argparse.Namespace) -> int:
+    from studio.session_archive import archive_sessions
+
+    try:
+        result = archive_sessions(Path(args.root), older_than_days=args.archive_sessions, codec=args.archive_codec)
+    except RuntimeError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    if result.pack is None:
+        print(f"{args.archive_sessions:g} 日より古いセッションはありません")
+        return 0
+    print(
+        f"{len(result.archived)} 件をアーカイブしました:"
+        f" {result.bytes_in / 1e6:.1f}MB → {result.bytes_out / 1e6:.1f}MB（{result.pack}）"
+    )
+    return 0
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="MultiRoleStudio CLI")
     parser.add_argument("--org", default="solo", help="組織 ID")
     parser.add_argument("--workflow", default=None, help="ワークフロー ID（discussion / quiz 等）")
     parser.add_argument("--topic", default=None, help="バッチ実行の議題（指定時は無人完走）")
     parser.add_argument("--files", nargs="*", default=None, help="添付ファイル")
+    parser.add_argument(
+        "--files-full",
+        action="store_true",
+        help="添付が大きくても抜粋せず、毎ステップ全文を渡す（5.1.1 節）",
+    )
+    parser.add_argument(
+        "--files-large",
+        action="store_true",
+        help="upload_limits を超える添付を拒否せず、分割要約して取り込む（5.1.3 節）",
+    )
     parser.add_argument("--root", default=".", help="プロジェクトルート")
     parser.add_argument(
         "--stream",
@@ -259,6 +383,12 @@ def build_parser() -> argparse.ArgumentParser:
         default=None,
         help="ストリーミング ON/OFF（未指定時は studio_config）",
     )
+    parser.add_argument(
+        "--cache",
+        choices=("read", "write", "off"),
+        default=None,
+        help="LLM 応答キャッシュ（read: 再利用 / write: 常に再取得して保存 / off。未指定時は studio_config）",
+    )
     parser.add_argument(
         "--apply",
         metavar="SESSION_ID",
@@ -292,6 +422,43 @@ def build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="my_context.md から要約版 my_context.summary.md を生成（付録D.8）",
     )
+    parser.add_argument(
+        "--user-context-reindex",
+        action="store_true",
+        help="user_context/corpus と my_context.md の節索引を更新（変更ファイルのみ。付録D.10）",
+    )
+    parser.add_argument(
+        "--rebuild-sessions",
+        action="store_true",
+        help="sessions/*.jsonl からセッション一覧（sessions/catalog.sqlite3）を作り直す（7.1 節）",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="--rebuild-sessions の並列プロセス数（既定: CPU 数、最大 8）",
+    )
+    parser.add_argument(
+        "--archive-sessions",
+        metavar="DAYS",
+        type=float,
+        default=None,
+        help="更新が DAYS 日より古い sessions/*.jsonl を sessions/archive/ の圧縮パックへ移す（7.1 節）",
+    )
+    parser.add_argument(
+        "--archive-codec",
+        choices=CODECS,
+        default="auto",
+        help="--archive-sessions の圧縮形式（auto: zstandard があれば zstd、なければ gzip）",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="cprofile",
+        choices=PROFILE_MODES,
+        default=None,
+        help="ターンごとにプロファイルを sessions/<id>.profile/ へ保存し内訳を表示（既定: cprofile。7.1.3 節）",
+    )
     parser.add_argument("--version", action="version", version=f"MultiRoleStudio {VERSION}")
     return parser
 
@@ -310,7 +477,13 @@ def main(argv: list[str] | None = None) -> int:
         return run_user_context_apply(args)
     if args.user_context_summarize:
         return run_user_context_summarize(args)
+    if args.user_context_reindex:
+        return run_user_context_reindex(args)
 
+    if args.rebuild_sessions:
+        return run_rebuild_sessions(args)
+    if args.archive_sessions is not None:
+        return run_archive_sessions(args)
     if args.apply:
         return run_apply(args)
 
@@ -200,6 +200,10 @@ def build_ui(root: Path, *, cli_org: str | None = None) -> gr.Blocks:
                             file_count="multiple",
                             type="filepath",
                         )
+                        large_files_cb = gr.Checkbox(
+                            label="大きな添付を要約して取り込む",
+                            value=False,
+                        )
                         stream_cb = gr.Checkbox(label="ストリーミング", value=default_stream)
                         user_context_cb = gr.Checkbox(
                             label="ユーザーコンテキスト",
@@ -308,6 +312,7 @@ def build_ui(root: Path, *, cli_org: str | None = None) -> gr.Blocks:
             temperature: float,
             user_context: bool,
             files,
+            large_files: bool,
         ):
             try:
                 for messages, status, show_choice, placeholder, clear_upload in handle_chat_submit(
@@ -320,6 +325,7 @@ def build_ui(root: Path, *, cli_org: str | None = None) -> gr.Blocks:
                     user_context=user_context,
                     files=files,
                     upload_limits=upload_limits,
+                    large_files=large_files,
                 ):
                     yield (
                         messages,
@@ -420,6 +426,7 @@ def build_ui(root: Path, *, cli_org: str | None = None) -> gr.Blocks:
             user_context_cb,
             temp_sl,
             upload_files,
+            large_files_cb,
         ]
         submit_outputs = [chatbot, session_state, status_tb, choice_row, msg_tb, upload_files]
 
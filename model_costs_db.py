@@ -7,18 +7,27 @@ import csv
 from datetime import datetime
 from typing import Optional
 
-# matplotlibのインポート（オプション）
-try:
-    import matplotlib
-    matplotlib.use('TkAgg')  # Windows環境用のバックエンド
-    import matplotlib.pyplot as plt
-    plt.rcParams['font.sans-serif'] = ['MS Gothic', 'Yu Gothic', 'DejaVu Sans']
-    plt.rcParams['axes.unicode_minus'] = False
-    MATPLOTLIB_AVAILABLE = True
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
-    print("[注意] matplotlibがインストールされていません。グラフ表示機能は利用できません。")
-    print("       インストール方法: pip install matplotlib")
+# matplotlib（オプション）はグラフを描くときに初めて読み込む
+_pyplot = None
+_pyplot_checked = False
+
+
+def load_pyplot():
+    """matplotlib.pyplot を返す。未インストールなら注意を出して None"""
+    global _pyplot, _pyplot_checked
+    if not _pyplot_checked:
+        _pyplot_checked = True
+        try:
+            import matplotlib
+            matplotlib.use('TkAgg')  # Windows環境用のバックエンド
+            import matplotlib.pyplot as plt
+            plt.rcParams['font.sans-serif'] = ['MS Gothic', 'Yu Gothic', 'DejaVu Sans']
+            plt.rcParams['axes.unicode_minus'] = False
+            _pyplot = plt
+        except ImportError:
+            print("[注意] matplotlibがインストールされていません。グラフ表示機能は利用できません。")
+            print("       インストール方法: pip install matplotlib")
+    return _pyplot
 
 class ModelCostsDB:
     def __init__(self, db_path='model_costs.db', csv_path='model_costs.csv'):
@@ -309,7 +318,8 @@ def compare_csv_files(old_csv: str, new_csv: str):
 
 def plot_price_changes(result, output_file='price_changes.png'):
     """価格変動をグラフ表示"""
-    if not MATPLOTLIB_AVAILABLE:
+    plt = load_pyplot()
+    if plt is None:
         return
     
     if not result['changed']:
@@ -401,7 +411,8 @@ def plot_price_changes(result, output_file='price_changes.png'):
 
 def plot_provider_comparison(result, output_file='provider_comparison.png'):
     """プロバイダー別のコスト比較グラフ"""
-    if not MATPLOTLIB_AVAILABLE:
+    plt = load_pyplot()
+    if plt is None:
         return
     
     # 新規追加と変更されたモデルをプロバイダー別に集計
@@ -578,7 +589,7 @@ def main():
             print_price_changes_sorted(result, sort_by)
             
             # グラフ表示
-            if MATPLOTLIB_AVAILABLE:
+            if load_pyplot() is not None:
                 print("\n[グラフを生成中...]")
                 plot_price_changes(result, 'price_changes.png')
                 plot_provider_comparison(result, 'provider_comparison.png')
@@ -685,7 +696,7 @@ def main():
             print_price_changes_sorted(result, 'output')
             
             # グラフ表示
-            if MATPLOTLIB_AVAILABLE:
+            if load_pyplot() is not None:
                 print("\n[グラフを生成中...]")
                 plot_price_changes(result, 'price_changes_full.png')
                 plot_provider_comparison(result, 'provider_comparison_full.png')
@@ -0,0 +1,32 @@
+def calculator():
+    while True:
+        try:
+            num1 = float(input("最初の数値を入力してください: "))
+            operator = input("演算子を入力してください (+, -, *, /): ")
+            num2 = float(input("2番目の数値を入力してください: "))
+            
+            if operator == '+':
+                result = num1 + num2
+            elif operator == '-':
+                result = num1 - num2
+            elif operator == '*':
+                result = num1 * num2
+            elif operator == '/':
+                if num2 != 0:
+                    result = num1 / num2
+                else:
+                    print("ゼロで割ることはできません")
+                    continue
+            else:
+                print("無効な演算子です")
+                continue
+            
+            print(f"結果: {result}")
+            
+            if input("続行しますか? (y/n): ").lower() != 'y':
+                break
+        except ValueError:
+            print("無効な入力です")
+
+if __name__ == "__main__":
+    calculator()
\ No newline at end of file
@@ -0,0 +1,34 @@
+#!/bin/bash
+
+# Auto-generated execution script
+# Session: 20261017_233618
+# Created: 2026-10-17T23:36:18.112633
+
+# Webアプリケーション自動セットアップ
+echo '🌐 Webアプリケーションを自動セットアップしています...'
+
+# HTMLファイルを検索して自動構築
+if [ ! -f index.html ]; then
+    # HTMLコンテンツをファイルに展開
+    echo '📄 HTMLファイルを生成中...'
+    # JavaScriptからHTMLを抽出してファイル作成する処理をここに追加
+fi
+
+# Webサーバー起動
+echo '🚀 Webサーバーを起動しています...'
+echo 'アクセス先: http://localhost:8080'
+python3 -m http.server 8080 &
+SERVER_PID=$!
+echo "サーバーPID: $SERVER_PID"
+
+# 少し待ってからブラウザテスト
+sleep 3
+echo '🔍 動作確認中...'
+if command -v curl >/dev/null 2>&1; then
+    curl -s http://localhost:8080/ | head -20
+else
+    echo 'curl not found, manual check required'
+fi
+
+echo '✅ Webアプリが起動しました！'
+echo 'ブラウザで http://localhost:8080 にアクセスしてください'
@@ -9,7 +9,8 @@ from pathlib import Path
 from typing import Any
 
 from studio.logging import StepMetrics, steps_from_jsonl
-from studio.session_report import read_jsonl, session_log_path
+from studio.session_archive import log_exists
+from studio.session_report import read_log_records, session_log_path
 from studio.vcs import GitResult, checkout_new_branch, commit_paths, has_uncommitted_changes, is_git_repo
 
 SANDBOX_SKIP_FILES = frozenset({"run_all.sh"})
@@ -314,7 +315,7 @@ def _ensure_sandbox_artifacts(root: Path, session_id: str) -> Path | None:
     if list_sandbox_artifact_files(session_dir):
         return session_dir
     log_path = session_log_path(root, session_id)
-    if not log_path.is_file():
+    if not log_exists(log_path):
         return None
     return save_session_artifacts(root, session_id, log_path=log_path)
 
@@ -331,7 +332,7 @@ def apply_session_artifacts(
         return ApplyArtifactsResult(False, "session_id が未指定です")
 
     log_path = session_log_path(root, session_id)
-    if not log_path.is_file():
+    if not log_exists(log_path):
         return ApplyArtifactsResult(False, f"セッション `{session_id}` が見つかりません")
 
     root = root.resolve()
@@ -371,7 +372,7 @@ def apply_session_artifacts(
     message += "）"
 
     if commit and is_git_repo(root):
-        records = read_jsonl(log_path)
+        records = list(read_log_records(log_path))
         commit_msg = apply_commit_message(session_id, records)
         git_result = commit_paths(root, dest_paths, commit_msg)
     elif commit and not is_git_repo(root):
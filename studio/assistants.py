@@ -4,22 +4,37 @@ from __future__ import annotations
 
 import importlib
 import os
+import threading
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Callable, Iterator
+from typing import Any, Awaitable, Callable, Iterator
 
-from langchain_core.messages import AIMessage, HumanMessage
-from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder, SystemMessagePromptTemplate
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 
-from studio.errors import detect_api_error, handle_api_error, is_temperature_unsupported_error
+from studio.errors import (
+    ahandle_api_error,
+    detect_api_error,
+    handle_api_error,
+    is_temperature_unsupported_error,
+    retry_after_seconds,
+)
 from studio.history import ConversationHistory
-from studio.logging import compute_cost, estimate_tokens
+from studio.logging import StepTiming, compute_cost, estimate_tokens, percentile
+from studio.prompts import system_prompt_blocks
+from studio.ratelimit import ProviderLimiter, RateLimit, limiter_for, resolve_rate_limit
+from studio.response_cache import CachedResponse, ResponseCache, cache_key
+from studio.tracing import NULL_TRACER, Tracer
 
 
 class MockTemperatureError(RuntimeError):
     """Injected once when STUDIO_MOCK_INJECT_TEMP_ERROR=1."""
 
 
+class StreamCancelled(Exception):
+    """Raised from ``on_chunk`` when the consumer stopped reading; not retried."""
+
+
 @dataclass
 class InvokeResult:
     text: str
@@ -29,6 +44,21 @@ class InvokeResult:
     tokens_source: str
     cost: float
     stream: bool
+    rate_limit_wait: float = 0.0
+    cache: str | None = None
+    timing: StepTiming | None = None
+    tokens_cached: int = 0
+    tokens_cache_write: int = 0
+
+
+@dataclass(frozen=True)
+class TokenUsage:
+    tokens_in: int
+    tokens_out: int
+    source: str
+    # tokens_in のうちプロンプトキャッシュから読んだ / 書いた分（design.md 5.1.2）
+    cached: int = 0
+    cache_write: int = 0
 
 
 class MockAssistant:
@@ -102,27 +132,137 @@ def content_to_text(content: Any) -> str:
     return str(content)
 
 
+# 生成済みクライアントの上限（プロバイダの HTTP 接続プールごと再利用する）
+LLM_CACHE_SIZE = 32
+# 応答用に空けておくトークン数（コンテキスト長の 1/4 を上限）
+OUTPUT_RESERVE_TOKENS = 2048
+
+_llm_cache: OrderedDict[tuple[str, str, str, float | None], Any] = OrderedDict()
+_llm_cache_lock = threading.Lock()
+
+_chat_prompt: Any = None
+
+
+def _get_chat_prompt() -> Any:
+    """Shared prompt template; langchain_core.prompts is imported on the first real LLM call."""
+    global _chat_prompt
+    if _chat_prompt is None:
+        from langchain_core.prompts import (
+            ChatPromptTemplate,
+            HumanMessagePromptTemplate,
+            MessagesPlaceholder,
+        )
+
+        _chat_prompt = ChatPromptTemplate.from_messages(
+            [
+                MessagesPlaceholder(variable_name="system"),
+                MessagesPlaceholder(variable_name="history"),
+                HumanMessagePromptTemplate.from_template("{input}"),
+            ]
+        )
+    return _chat_prompt
+
+
 def build_llm(assistant_cfg: dict[str, Any], model: str, temperature: float | None):
+    """Return a cached client for (module, class, model, temperature), building it on first use."""
+    key = (assistant_cfg["module"], assistant_cfg["class"], model, temperature)
+    with _llm_cache_lock:
+        llm = _llm_cache.get(key)
+        if llm is not None:
+            _llm_cache.move_to_end(key)
+            return llm
+
     module = importlib.import_module(assistant_cfg["module"])
     cls = getattr(module, assistant_cfg["class"])
     kwargs: dict[str, Any] = {"model": model}
     if temperature is not None:
         kwargs["temperature"] = temperature
-    return cls(**kwargs)
+    llm = cls(**kwargs)
+
+    with _llm_cache_lock:
+        llm = _llm_cache.setdefault(key, llm)
+        _llm_cache.move_to_end(key)
+        while len(_llm_cache) > LLM_CACHE_SIZE:
+            _llm_cache.popitem(last=False)
+    return llm
+
+
+def clear_llm_cache() -> None:
+    """Drop every cached client (the key already covers everything a client is built from)."""
+    with _llm_cache_lock:
+        _llm_cache.clear()
+
 
+def build_chain(llm):
+    return _get_chat_prompt() | llm
 
-def build_chain(system_prompt: str, history: ConversationHistory, llm):
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            SystemMessagePromptTemplate.from_template("{system_prompt}"),
-            MessagesPlaceholder(variable_name="history"),
-            HumanMessagePromptTemplate.from_template("{input}"),
-        ]
+
+def uses_cache_breakpoints(assistant_cfg: dict[str, Any]) -> bool:
+    """Whether the provider needs explicit ``cache_control`` marks (design.md 5.1.2).
+
+    Anthropic caches only up to marked blocks; OpenAI / Gemini cache the
+    longest shared prefix automatically. ``cache_breakpoints`` in
+    ai_assistants_config.json overrides the default per assistant.
+    """
+    return bool(assistant_cfg.get("cache_breakpoints", assistant_cfg.get("module") == "langchain_anthropic"))
+
+
+def _with_cache_control(message: BaseMessage) -> BaseMessage:
+    content = message.content
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    else:
+        content = [dict(part) if isinstance(part, dict) else {"type": "text", "text": str(part)} for part in content]
+    if not content:
+        return message
+    content[-1]["cache_control"] = {"type": "ephemeral"}
+    return message.model_copy(update={"content": content})
+
+
+def build_prompt_messages(
+    system_prompt: str,
+    history: list[BaseMessage],
+    *,
+    breakpoints: bool,
+) -> tuple[list[BaseMessage], list[BaseMessage]]:
+    """System and history messages for the chat template.
+
+    With ``breakpoints`` every system block and the last history message get
+    a cache mark (at most 3 of Anthropic's 4), so the talent / org prefix
+    and the growing history are read from cache on later steps.
+    """
+    if not breakpoints:
+        return [SystemMessage(content=system_prompt)], history
+    blocks = list(system_prompt_blocks(system_prompt))
+    if len(blocks) > 3:
+        blocks = ["\n\n".join(blocks[:-2]), *blocks[-2:]]
+    system = SystemMessage(
+        content=[{"type": "text", "text": block, "cache_control": {"type": "ephemeral"}} for block in blocks]
     )
-    return prompt | llm
+    if history:
+        history = [*history[:-1], _with_cache_control(history[-1])]
+    return [system], history
 
 
-def extract_usage(response: Any, input_text: str, output_text: str) -> tuple[int, int, str]:
+def _cache_details(usage: dict[str, Any]) -> tuple[int, int, bool]:
+    """``(cache read, cache write, input excludes them)`` from a provider usage dict."""
+    details = usage.get("input_token_details") or {}
+    if details:
+        # LangChain の usage_metadata。input_tokens はキャッシュ分を含む
+        return int(details.get("cache_read") or 0), int(details.get("cache_creation") or 0), False
+    if "cache_read_input_tokens" in usage or "cache_creation_input_tokens" in usage:
+        # Anthropic の生 usage。input_tokens はキャッシュ分を含まない
+        return (
+            int(usage.get("cache_read_input_tokens") or 0),
+            int(usage.get("cache_creation_input_tokens") or 0),
+            True,
+        )
+    prompt_details = usage.get("prompt_tokens_details") or {}
+    # OpenAI 互換。prompt_tokens は cached_tokens を含む
+    return int(prompt_details.get("cached_tokens") or 0), 0, False
+
+
+def extract_usage(response: Any, input_text: str, output_text: str) -> TokenUsage:
     meta = getattr(response, "response_metadata", None) or {}
     usage = meta.get("token_usage") or meta.get("usage") or {}
     if not usage:
@@ -133,9 +273,271 @@ def extract_usage(response: Any, input_text: str, output_text: str) -> tuple[int
     prompt_tokens = usage.get("input_tokens") or usage.get("prompt_tokens")
     completion_tokens = usage.get("output_tokens") or usage.get("completion_tokens")
     if prompt_tokens is not None and completion_tokens is not None:
-        return int(prompt_tokens), int(completion_tokens), "api"
+        cached, cache_write, excluded = _cache_details(usage)
+        if not cached and not cache_write:
+            # response_metadata に詳細がないプロバイダは usage_metadata 側を見る
+            usage_meta = getattr(response, "usage_metadata", None) or {}
+            if usage_meta is not usage and usage_meta.get("input_tokens") == prompt_tokens:
+                cached, cache_write, excluded = _cache_details(usage_meta)
+        tokens_in = int(prompt_tokens) + (cached + cache_write if excluded else 0)
+        return TokenUsage(tokens_in, int(completion_tokens), "api", cached, cache_write)
+
+    return TokenUsage(estimate_tokens(input_text), estimate_tokens(output_text), "estimate")
+
+
+def _prepare_chain(
+    assistant_cfg: dict[str, Any],
+    model: str,
+    temperature: float | None,
+    system_prompt: str,
+    user_message: str,
+    history: ConversationHistory,
+):
+    llm = build_llm(assistant_cfg, model, temperature)
+    chain = build_chain(llm)
+    system, messages = build_prompt_messages(
+        system_prompt, history.get_messages(), breakpoints=uses_cache_breakpoints(assistant_cfg)
+    )
+    payload = {"system": system, "history": messages, "input": user_message}
+    return chain, payload
+
+
+def _complete_llm_step(
+    *,
+    model: str,
+    user_message: str,
+    history: ConversationHistory,
+    costs: dict[str, dict[str, float]],
+    input_bundle: str,
+    output_text: str,
+    elapsed: float,
+    response: Any = None,
+    stream: bool = False,
+) -> InvokeResult:
+    """Account tokens/cost and append the exchange to history.
+
+    ``response`` is the message (or, when streamed, the chunk carrying usage);
+    without it tokens are estimated.
+    """
+    if response is None:
+        usage = TokenUsage(estimate_tokens(input_bundle), estimate_tokens(output_text), "estimate")
+    else:
+        usage = extract_usage(response, input_bundle, output_text)
+    cost = compute_cost(
+        model,
+        usage.tokens_in,
+        usage.tokens_out,
+        costs,
+        tokens_cached=usage.cached,
+        tokens_cache_write=usage.cache_write,
+    )
+    history.add_message(HumanMessage(content=user_message))
+    history.add_message(AIMessage(content=output_text))
+    return InvokeResult(
+        text=output_text,
+        elapsed=elapsed,
+        tokens_in=usage.tokens_in,
+        tokens_out=usage.tokens_out,
+        tokens_source=usage.source,
+        cost=cost,
+        stream=stream,
+        tokens_cached=usage.cached,
+        tokens_cache_write=usage.cache_write,
+    )
+
+
+class _StreamClock:
+    """Chunk arrival times of one streamed call; time spent in our callbacks counts as local."""
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.first: float | None = None
+        self.last = self.start
+        self.gaps: list[float] = []
+        self.local = 0.0
+        self.chunks = 0
+        self.usage: Any = None
+
+    def arrived(self, chunk: Any) -> float:
+        now = time.perf_counter()
+        if getattr(chunk, "usage_metadata", None):
+            # 多くのプロバイダは最後のチャンクに usage を載せる
+            self.usage = chunk
+        return now
+
+    def text(self, now: float) -> None:
+        if self.first is None:
+            self.first = now - self.start
+        else:
+            self.gaps.append(now - self.last)
+        self.last = now
+        self.chunks += 1
+
+    def processed(self, now: float) -> None:
+        self.local += time.perf_counter() - now
+
+    def timing(self, elapsed: float, finish_time: float) -> StepTiming:
+        return StepTiming(
+            ttft=self.first,
+            network=max(0.0, elapsed - self.local),
+            local=self.local + finish_time,
+            chunks=self.chunks,
+            gap_p50=percentile(self.gaps, 50) if self.gaps else None,
+            gap_max=max(self.gaps) if self.gaps else None,
+        )
+
+
+def _run_chain(
+    chain,
+    payload: dict[str, Any],
+    *,
+    stream: bool,
+    on_chunk: Callable[[str], None] | None,
+    **complete: Any,
+) -> InvokeResult:
+    if stream and on_chunk is not None:
+        clock = _StreamClock()
+        chunks: list[str] = []
+        for chunk in chain.stream(payload):
+            now = clock.arrived(chunk)
+            text = content_to_text(getattr(chunk, "content", chunk))
+            if text:
+                clock.text(now)
+                chunks.append(text)
+                on_chunk(text)
+            clock.processed(now)
+        return _finish_stream(clock, "".join(chunks), complete)
+
+    start = time.perf_counter()
+    response = chain.invoke(payload)
+    return _finish_invoke(start, response, complete)
+
+
+async def _arun_chain(
+    chain,
+    payload: dict[str, Any],
+    *,
+    stream: bool,
+    on_chunk: Callable[[str], Awaitable[None]] | None,
+    **complete: Any,
+) -> InvokeResult:
+    if stream and on_chunk is not None:
+        clock = _StreamClock()
+        chunks: list[str] = []
+        async for chunk in chain.astream(payload):
+            now = clock.arrived(chunk)
+            text = content_to_text(getattr(chunk, "content", chunk))
+            if text:
+                clock.text(now)
+                chunks.append(text)
+                await on_chunk(text)
+            clock.processed(now)
+        return _finish_stream(clock, "".join(chunks), complete)
+
+    start = time.perf_counter()
+    response = await chain.ainvoke(payload)
+    return _finish_invoke(start, response, complete)
+
+
+def _finish_stream(clock: _StreamClock, output_text: str, complete: dict[str, Any]) -> InvokeResult:
+    elapsed = time.perf_counter() - clock.start
+    finish_start = time.perf_counter()
+    result = _complete_llm_step(
+        output_text=output_text,
+        elapsed=elapsed,
+        response=clock.usage,
+        stream=True,
+        **complete,
+    )
+    result.timing = clock.timing(elapsed, time.perf_counter() - finish_start)
+    return result
 
-    return estimate_tokens(input_text), estimate_tokens(output_text), "estimate"
+
+def _finish_invoke(start: float, response: Any, complete: dict[str, Any]) -> InvokeResult:
+    elapsed = time.perf_counter() - start
+    finish_start = time.perf_counter()
+    result = _complete_llm_step(
+        output_text=content_to_text(getattr(response, "content", response)),
+        elapsed=elapsed,
+        response=response,
+        **complete,
+    )
+    result.timing = StepTiming(network=elapsed, local=time.perf_counter() - finish_start)
+    return result
+
+
+def _cached_result(
+    cached: CachedResponse,
+    *,
+    user_message: str,
+    history: ConversationHistory,
+    stream: bool,
+) -> InvokeResult:
+    history.add_message(HumanMessage(content=user_message))
+    history.add_message(AIMessage(content=cached.text))
+    return InvokeResult(
+        text=cached.text,
+        elapsed=0.0,
+        tokens_in=cached.tokens_in,
+        tokens_out=cached.tokens_out,
+        tokens_source="cache",
+        cost=0.0,
+        stream=stream,
+        cache="hit",
+    )
+
+
+def _store_response(
+    response_cache: ResponseCache | None,
+    key: str | None,
+    assistant_name: str,
+    model: str,
+    result: InvokeResult,
+) -> None:
+    if response_cache is None or key is None:
+        return
+    response_cache.put(
+        key,
+        assistant_name=assistant_name,
+        model=model,
+        text=result.text,
+        tokens_in=result.tokens_in,
+        tokens_out=result.tokens_out,
+    )
+    result.cache = "miss"
+
+
+def _step_limiter(
+    assistant_name: str,
+    assistant_cfg: dict[str, Any],
+    model: str,
+    rate_limits: dict[str, Any] | None,
+) -> ProviderLimiter:
+    limit = resolve_rate_limit(assistant_name, model, assistant_cfg, rate_limits)
+    return limiter_for(assistant_name, model, limit)
+
+
+def _request_token_estimate(input_bundle: str, history: ConversationHistory) -> int:
+    return estimate_tokens(input_bundle) + history.token_estimate()
+
+
+def context_window_for(assistant_cfg: dict[str, Any], model: str, limit: RateLimit | None = None) -> int | None:
+    """Per-request token ceiling: ``context_windows`` (model > default), capped by the rate limit's tpm."""
+    windows = assistant_cfg.get("context_windows") or {}
+    window = windows.get(model, windows.get("default"))
+    # 1リクエストが tpm を超えると Groq 等は 413 を返す
+    if limit is not None and limit.tpm:
+        window = min(window, limit.tpm) if window else limit.tpm
+    return int(window) if window else None
+
+
+def fit_history_to_context(history: ConversationHistory, window: int | None, input_bundle: str) -> int:
+    """Trim history before sending so system prompt + history + input + output reserve fit ``window``."""
+    if not window:
+        return 0
+    reserve = min(window // 4, OUTPUT_RESERVE_TOKENS)
+    budget = window - reserve - estimate_tokens(input_bundle)
+    return history.trim_to_tokens(max(0, budget))
 
 
 def invoke_llm_step(
@@ -152,59 +554,154 @@ def invoke_llm_step(
     on_chunk: Callable[[str], None] | None = None,
     max_retries: int = 3,
     retry_delay: float = 2.0,
+    rate_limits: dict[str, Any] | None = None,
+    response_cache: ResponseCache | None = None,
+    tracer: Tracer = NULL_TRACER,
 ) -> InvokeResult:
     input_bundle = f"{system_prompt}\n{user_message}"
+    limiter = _step_limiter(assistant_name, assistant_cfg, model, rate_limits)
+    fit_history_to_context(history, context_window_for(assistant_cfg, model, limiter.limit), input_bundle)
+    key = None
+    if response_cache is not None:
+        key = cache_key(assistant_name, model, temperature, system_prompt, history.get_messages(), user_message)
+        cached = response_cache.get(key)
+        if cached is not None:
+            streamed = bool(stream and on_chunk is not None)
+            if streamed:
+                on_chunk(cached.text)
+            return _cached_result(cached, user_message=user_message, history=history, stream=streamed)
+    rate_limit_wait = 0.0
     attempt = 0
     effective_temperature = temperature
     temp_fallback_used = False
 
     while attempt < max_retries:
         try:
-            llm = build_llm(assistant_cfg, model, effective_temperature)
-            chain = build_chain(system_prompt, history, llm)
-            messages = history.get_messages()
-            payload = {"system_prompt": system_prompt, "history": messages, "input": user_message}
-
-            start = time.perf_counter()
-            if stream and on_chunk is not None:
-                chunks: list[str] = []
-                for chunk in chain.stream(payload):
-                    text = content_to_text(getattr(chunk, "content", chunk))
-                    if text:
-                        chunks.append(text)
-                        on_chunk(text)
-                output_text = "".join(chunks)
-                elapsed = time.perf_counter() - start
-                tokens_in, tokens_out, source = estimate_tokens(input_bundle), estimate_tokens(output_text), "estimate"
-                cost = compute_cost(model, tokens_in, tokens_out, costs)
-                history.add_message(HumanMessage(content=user_message))
-                history.add_message(AIMessage(content=output_text))
-                return InvokeResult(
-                    text=output_text,
-                    elapsed=elapsed,
-                    tokens_in=tokens_in,
-                    tokens_out=tokens_out,
-                    tokens_source=source,
-                    cost=cost,
-                    stream=True,
+            chain, payload = _prepare_chain(
+                assistant_cfg, model, effective_temperature, system_prompt, user_message, history
+            )
+            reserved = _request_token_estimate(input_bundle, history)
+            with tracer.span("rate_limit_wait", assistant=assistant_name):
+                rate_limit_wait += limiter.acquire(reserved)
+            try:
+                with tracer.span(
+                    "provider_call", assistant=assistant_name, model=model, attempt=attempt + 1, stream=stream
+                ):
+                    result = _run_chain(
+                        chain,
+                        payload,
+                        stream=stream,
+                        on_chunk=on_chunk,
+                        model=model,
+                        user_message=user_message,
+                        history=history,
+                        costs=costs,
+                        input_bundle=input_bundle,
+                    )
+            except BaseException:
+                limiter.release(reserved_tokens=reserved)
+                raise
+            limiter.release(reserved_tokens=reserved, used_tokens=result.tokens_in + result.tokens_out)
+            limiter.record_success()
+            result.rate_limit_wait = rate_limit_wait
+            _store_response(response_cache, key, assistant_name, model, result)
+            return result
+        except (MockTemperatureError, StreamCancelled):
+            raise
+        except Exception as exc:
+            if (
+                effective_temperature is not None
+                and not temp_fallback_used
+                and is_temperature_unsupported_error(exc)
+            ):
+                effective_temperature = None
+                temp_fallback_used = True
+                continue
+
+            error_code = detect_api_error(str(exc))
+            if error_code == "429":
+                limiter.record_rate_limited(retry_after_seconds(exc))
+            with tracer.span("backoff", error=error_code, attempt=attempt + 1):
+                should_retry = handle_api_error(
+                    error_code,
+                    attempt,
+                    max_retries,
+                    retry_delay,
+                    reduce_history=history.reduce_history,
                 )
+            attempt += 1
+            if not should_retry:
+                raise
+    raise RuntimeError("max retries exceeded")
 
-            response = chain.invoke(payload)
-            elapsed = time.perf_counter() - start
-            output_text = content_to_text(getattr(response, "content", response))
-            tokens_in, tokens_out, source = extract_usage(response, input_bundle, output_text)
-            cost = compute_cost(model, tokens_in, tokens_out, costs)
-            history.add_message(HumanMessage(content=user_message))
-            history.add_message(AIMessage(content=output_text))
-            return InvokeResult(
-                text=output_text,
-                elapsed=elapsed,
-                tokens_in=tokens_in,
-                tokens_out=tokens_out,
-                tokens_source=source,
-                cost=cost,
-                stream=False,
+
+async def ainvoke_llm_step(
+    *,
+    assistant_name: str,
+    assistant_cfg: dict[str, Any],
+    model: str,
+    system_prompt: str,
+    user_message: str,
+    history: ConversationHistory,
+    temperature: float | None,
+    stream: bool,
+    costs: dict[str, dict[str, float]],
+    on_chunk: Callable[[str], Awaitable[None]] | None = None,
+    max_retries: int = 3,
+    retry_delay: float = 2.0,
+    rate_limits: dict[str, Any] | None = None,
+    response_cache: ResponseCache | None = None,
+    tracer: Tracer = NULL_TRACER,
+) -> InvokeResult:
+    """Async twin of invoke_llm_step built on ``ainvoke`` / ``astream``."""
+    input_bundle = f"{system_prompt}\n{user_message}"
+    limiter = _step_limiter(assistant_name, assistant_cfg, model, rate_limits)
+    fit_history_to_context(history, context_window_for(assistant_cfg, model, limiter.limit), input_bundle)
+    key = None
+    if response_cache is not None:
+        key = cache_key(assistant_name, model, temperature, system_prompt, history.get_messages(), user_message)
+        cached = response_cache.get(key)
+        if cached is not None:
+            streamed = bool(stream and on_chunk is not None)
+            if streamed:
+                await on_chunk(cached.text)
+            return _cached_result(cached, user_message=user_message, history=history, stream=streamed)
+    rate_limit_wait = 0.0
+    attempt = 0
+    effective_temperature = temperature
+    temp_fallback_used = False
+
+    while attempt < max_retries:
+        try:
+            chain, payload = _prepare_chain(
+                assistant_cfg, model, effective_temperature, system_prompt, user_message, history
             )
+            reserved = _request_token_estimate(input_bundle, history)
+            with tracer.span("rate_limit_wait", assistant=assistant_name):
+                rate_limit_wait += await limiter.aacquire(reserved)
+            try:
+                with tracer.span(
+                    "provider_call", assistant=assistant_name, model=model, attempt=attempt + 1, stream=stream
+                ):
+                    result = await _arun_chain(
+                        chain,
+                        payload,
+                        stream=stream,
+                        on_chunk=on_chunk,
+                        model=model,
+                        user_message=user_message,
+                        history=history,
+                        costs=costs,
+                        input_bundle=input_bundle,
+                    )
+            except BaseException:
+                limiter.release(reserved_tokens=reserved)
+                raise
+            limiter.release(reserved_tokens=reserved, used_tokens=result.tokens_in + result.tokens_out)
+            limiter.record_success()
+            result.rate_limit_wait = rate_limit_wait
+            _store_response(response_cache, key, assistant_name, model, result)
+            return result
         except MockTemperatureError:
             raise
         except Exception as exc:
@@ -218,13 +715,16 @@ def invoke_llm_step(
                 continue
 
             error_code = detect_api_error(str(exc))
-            should_retry = handle_api_error(
-                error_code,
-                attempt,
-                max_retries,
-                retry_delay,
-                reduce_history=history.reduce_history,
-            )
+            if error_code == "429":
+                limiter.record_rate_limited(retry_after_seconds(exc))
+            with tracer.span("backoff", error=error_code, attempt=attempt + 1):
+                should_retry = await ahandle_api_error(
+                    error_code,
+                    attempt,
+                    max_retries,
+                    retry_delay,
+                    reduce_history=history.reduce_history,
+                )
             attempt += 1
             if not should_retry:
                 raise
@@ -252,3 +752,29 @@ def invoke_mock_step(
                 continue
             raise
     raise RuntimeError("mock invoke failed")
+
+
+async def ainvoke_mock_step(
+    talent_id: str,
+    step_number: int,
+    *,
+    stream: bool,
+    history: ConversationHistory,
+    user_message: str,
+    on_chunk: Callable[[str], Awaitable[None]] | None = None,
+    action: str = "",
+) -> InvokeResult:
+    chunks: list[str] = []
+    result = invoke_mock_step(
+        talent_id,
+        step_number,
+        stream=stream,
+        history=history,
+        user_message=user_message,
+        on_chunk=chunks.append,
+        action=action,
+    )
+    if on_chunk is not None:
+        for text in chunks:
+            await on_chunk(text)
+    return result
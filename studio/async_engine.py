@@ -0,0 +1,521 @@
+"""Asyncio workflow engine (design.md §6.4).
+
+``AsyncSessionEngine`` runs the same workflow semantics as ``SessionEngine`` but
+calls providers through ``ainvoke`` / ``astream`` and runs parallel phases with
+``asyncio.gather``, so one event loop can drive many sessions without an OS
+thread per in-flight LLM call. ``run_turn`` is kept as a sync adapter over
+``arun_turn`` so the CLI and Gradio UI work unchanged.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
+
+from studio.assistants import ainvoke_llm_step, ainvoke_mock_step
+from studio.engine import (
+    EngineEvent,
+    EngineState,
+    InvokeResultShim,
+    SessionEngine,
+    StepOutcome,
+)
+from studio.history import ConversationHistory
+from studio.interrupt import USER_INTERRUPT_DISPLAY
+from studio.workflow_plan import PlannedPhase, PlannedStep
+
+Emit = Callable[[EngineEvent], Awaitable[Any]]
+
+_TURN_END = object()
+
+_background_loop: asyncio.AbstractEventLoop | None = None
+_background_lock = threading.Lock()
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide event loop used by the sync adapter (started lazily)."""
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="studio-asyncio", daemon=True).start()
+            _background_loop = loop
+        return _background_loop
+
+
+class AsyncSessionEngine(SessionEngine):
+    async def arun_turn(
+        self,
+        user_text: str,
+        *,
+        attachment_context: str = "",
+        attachments: list[str] | None = None,
+        stream: bool | None = None,
+        temperature: float | None = None,
+        no_user_context: bool = False,
+        cache: str | None = None,
+        large_files: list[Path] | None = None,
+    ) -> AsyncIterator[EngineEvent]:
+        """Async generator of turn events.
+
+        Replies to ``await_text`` / ``await_choice`` are passed with ``asend()``;
+        values sent for any other event are ignored.
+        """
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue[tuple[Any, asyncio.Future[Any] | None]] = asyncio.Queue()
+
+        async def emit(event: EngineEvent) -> Any:
+            reply: asyncio.Future[Any] = loop.create_future()
+            await events.put((event, reply))
+            return await reply
+
+        async def body() -> None:
+            start_event = self._open_turn(
+                user_text,
+                attachment_context=attachment_context,
+                attachments=attachments,
+                stream=stream,
+                temperature=temperature,
+                no_user_context=no_user_context,
+                cache=cache,
+            )
+            if start_event:
+                await emit(start_event)
+
+            state = self.state
+            assert state is not None
+            if large_files:
+                # 進捗は返信を待たない（reply なし）のでワーカースレッドから直接積む
+                await asyncio.to_thread(
+                    state.tracer.wrap(self._digest_large_files),
+                    state,
+                    large_files,
+                    attachment_context,
+                    lambda payload: loop.call_soon_threadsafe(
+                        events.put_nowait, (EngineEvent("attachment_progress", payload), None)
+                    ),
+                )
+            turn_prior: list[tuple[str, str]] = []
+            # タスク内では span を context で追う（gather の子タスクが親 span を引き継ぐ）
+            with state.tracer.bind(), state.tracer.span("turn", session_id=state.logger.session_id):
+                await self._arun_phases(self.plan.phases, state, user_text, turn_prior, emit=emit)
+            self._close_turn(state)
+
+        task = asyncio.create_task(body())
+        task.add_done_callback(lambda _: events.put_nowait((_TURN_END, None)))
+        try:
+            while True:
+                event, reply = await events.get()
+                if event is _TURN_END:
+                    break
+                sent = yield event
+                if reply is not None and not reply.done():
+                    reply.set_result(sent)
+            await task
+        finally:
+            if not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+
+    def run_turn(
+        self,
+        user_text: str,
+        *,
+        attachment_context: str = "",
+        attachments: list[str] | None = None,
+        stream: bool | None = None,
+        temperature: float | None = None,
+        no_user_context: bool = False,
+        cache: str | None = None,
+        large_files: list[Path] | None = None,
+    ) -> Iterator[EngineEvent]:
+        """Sync adapter: drive ``arun_turn`` on the shared background event loop."""
+        loop = background_loop()
+        agen = self.arun_turn(
+            user_text,
+            attachment_context=attachment_context,
+            attachments=attachments,
+            stream=stream,
+            temperature=temperature,
+            no_user_context=no_user_context,
+            cache=cache,
+            large_files=large_files,
+        )
+        sent: Any = None
+        try:
+            while True:
+                try:
+                    event = asyncio.run_coroutine_threadsafe(agen.asend(sent), loop).result()
+                except StopAsyncIteration:
+                    return
+                sent = yield event
+        finally:
+            asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+    async def _arun_phases(
+        self,
+        phases: tuple[PlannedPhase, ...],
+        state: EngineState,
+        user_text: str,
+        turn_prior: list[tuple[str, str]],
+        *,
+        emit: Emit,
+        iteration: int | None = None,
+    ) -> None:
+        for phase in phases:
+            with state.tracer.span("phase", phase_type=phase.type, iteration=iteration):
+                if phase.type == "loop":
+                    await self._arun_loop_phase(state, user_text, phase, turn_prior, emit=emit)
+                    continue
+
+                await emit(self._phase_start_event(phase.type, iteration))
+
+                if phase.type == "serial":
+                    await self._arun_serial_phase(state, user_text, phase, turn_prior, emit=emit)
+                elif phase.type == "parallel":
+                    await self._arun_parallel_phase(state, user_text, phase, turn_prior, emit=emit)
+                else:
+                    await emit(self._step_error_event("", f"未対応のフェーズ種別: {phase.type}"))
+
+    async def _arun_loop_phase(
+        self,
+        state: EngineState,
+        user_text: str,
+        phase: PlannedPhase,
+        turn_prior: list[tuple[str, str]],
+        *,
+        emit: Emit,
+    ) -> None:
+        for iteration in range(1, phase.max_iterations + 1):
+            with state.tracer.span("iteration", iteration=iteration):
+                iter_start_len = len(turn_prior)
+                await emit(self._phase_start_event("loop", iteration))
+                await self._arun_phases(
+                    phase.phases,
+                    state,
+                    user_text,
+                    turn_prior,
+                    emit=emit,
+                    iteration=iteration,
+                )
+
+                judge_outcome, choice = None, None
+                if phase.exit.type == "judge":
+                    judge_outcome = await self._arun_judge_step(
+                        state,
+                        user_text,
+                        phase.exit.judge,
+                        turn_prior,
+                        emit=emit,
+                    )
+                elif phase.exit.type == "user":
+                    choice = await emit(self._loop_choice_event(phase))
+
+                should_exit, reason = self._loop_exit_decision(
+                    phase, iteration, turn_prior[iter_start_len:], judge_outcome, choice
+                )
+                await emit(self._loop_check_event(phase, iteration, should_exit, reason))
+                if self._loop_finished(phase, iteration, should_exit):
+                    break
+                await self._acompact_turn_prior(state, phase, turn_prior, iteration)
+
+    async def _acompact_turn_prior(
+        self,
+        state: EngineState,
+        phase: PlannedPhase,
+        turn_prior: list[tuple[str, str]],
+        iteration: int,
+    ) -> None:
+        request = self._compaction_request(state, phase, turn_prior)
+        if request is None:
+            return
+        older, call = request
+        with state.tracer.span("compaction", iteration=iteration, entries=len(older)):
+            result = None
+            if call is not None:
+                try:
+                    result = await ainvoke_llm_step(**call)
+                except Exception:
+                    result = None
+            self._apply_compaction(state, phase, iteration, turn_prior, older, result)
+
+    async def _arun_judge_step(
+        self,
+        state: EngineState,
+        user_text: str,
+        judge: PlannedStep | None,
+        turn_prior: list[tuple[str, str]],
+        *,
+        emit: Emit,
+    ) -> StepOutcome | None:
+        if judge is None:
+            return None
+        talent_id = judge.talent_id
+        action = judge.action
+
+        state.step_number += 1
+        await emit(self._step_start_event(talent_id, judge.speaker, action, judge=True))
+        try:
+            if judge.assistant == "human":
+                briefing, _ = self._human_prompts(state, talent_id, user_text, action, turn_prior or None)
+                response = await emit(
+                    self._await_text_event(talent_id, judge.speaker, action, briefing, judge=True)
+                )
+                result = InvokeResultShim(str(response or "").strip(), stream=False)
+                outcome = self._record_step(state, talent_id, action, result, stream=False)
+            else:
+                outcome = await self._arun_step(
+                    state,
+                    user_text,
+                    talent_id,
+                    action,
+                    state.step_number,
+                    None,
+                    turn_prior or None,
+                    history=ConversationHistory(),
+                )
+        except Exception as exc:
+            await emit(self._step_error_event(talent_id, exc))
+            return None
+
+        await emit(EngineEvent("step_done", {**self._step_done_payload(outcome), "judge": True}))
+        return outcome
+
+    async def _arun_serial_phase(
+        self,
+        state: EngineState,
+        user_text: str,
+        phase: PlannedPhase,
+        turn_prior: list[tuple[str, str]],
+        *,
+        emit: Emit,
+    ) -> None:
+        serial_prior: list[tuple[str, str]] = []
+        for step in phase.steps:
+            prior = turn_prior + serial_prior
+            outcome = await self._aexecute_step(
+                state,
+                user_text,
+                step.talent_id,
+                step.action,
+                prior_responses=prior or None,
+                stream=state.stream,
+                phase_type="serial",
+                emit=emit,
+            )
+            if outcome:
+                serial_prior.append(self._prior_entry(outcome))
+                interrupt_reply = await self._ahandle_user_interrupt(state, outcome, emit=emit)
+                if interrupt_reply:
+                    serial_prior.append((USER_INTERRUPT_DISPLAY, interrupt_reply))
+        turn_prior.extend(serial_prior)
+
+    async def _arun_parallel_phase(
+        self,
+        state: EngineState,
+        user_text: str,
+        phase: PlannedPhase,
+        turn_prior: list[tuple[str, str]],
+        *,
+        emit: Emit,
+    ) -> None:
+        tasks, ai_tasks, human_tasks = self._split_parallel_tasks(phase)
+        if not tasks:
+            return
+
+        outcomes: list[StepOutcome] = []
+        as_completed_mode = self._parallel_as_completed(state)
+
+        if ai_tasks:
+            limit = asyncio.Semaphore(self._max_parallel_calls(state))
+            parallel_prior = list(turn_prior) or None
+            outcomes.extend(
+                await asyncio.gather(
+                    *(
+                        self._arun_parallel_step(
+                            state, user_text, talent_id, action, step_no, parallel_prior,
+                            limit=limit, emit=emit if as_completed_mode else None,
+                        )
+                        for talent_id, action, step_no in self._number_parallel_steps(state, ai_tasks)
+                    )
+                )
+            )
+
+        for talent_id, action in human_tasks:
+            prior = turn_prior + [self._prior_entry(o) for o in outcomes]
+            outcome = await self._aexecute_step(
+                state,
+                user_text,
+                talent_id,
+                action,
+                prior_responses=prior or None,
+                stream=state.stream,
+                phase_type="parallel",
+                emit=emit,
+            )
+            if outcome:
+                outcomes.append(outcome)
+
+        for outcome in self._in_phase_order(tasks, outcomes):
+            if not as_completed_mode:
+                for event in self._replay_events(outcome):
+                    await emit(event)
+            turn_prior.append(self._prior_entry(outcome))
+            interrupt_reply = await self._ahandle_user_interrupt(state, outcome, emit=emit)
+            if interrupt_reply:
+                turn_prior.append((USER_INTERRUPT_DISPLAY, interrupt_reply))
+
+    async def _arun_parallel_step(
+        self,
+        state: EngineState,
+        user_text: str,
+        talent_id: str,
+        action: str,
+        step_number: int,
+        prior_responses: list[tuple[str, str]] | None,
+        *,
+        limit: asyncio.Semaphore,
+        emit: Emit | None,
+    ) -> StepOutcome:
+        """One parallel AI step; with ``emit`` (as_completed) it sends its own step_start / chunk / step_done.
+
+        Failures propagate out of ``gather`` in both modes.
+        """
+        queued_at = time.perf_counter()
+        async with limit:
+            if emit is None:
+                return await self._arun_step(
+                    state, user_text, talent_id, action, step_number, "parallel", prior_responses,
+                    queued_at=queued_at,
+                )
+
+            await emit(self._parallel_start_event(talent_id, action))
+
+            async def on_chunk(text: str) -> None:
+                await emit(self._parallel_chunk_event(talent_id, text))
+
+            outcome = await self._arun_step(
+                state,
+                user_text,
+                talent_id,
+                action,
+                step_number,
+                "parallel",
+                prior_responses,
+                stream=state.stream,
+                on_chunk=on_chunk if state.stream else None,
+                queued_at=queued_at,
+            )
+            await emit(self._parallel_done_event(outcome))
+            return outcome
+
+    async def _arun_step(
+        self,
+        state: EngineState,
+        user_text: str,
+        talent_id: str,
+        action: str,
+        step_number: int,
+        phase_type: str | None = None,
+        prior_responses: list[tuple[str, str]] | None = None,
+        *,
+        stream: bool = False,
+        on_chunk: Callable[[str], Awaitable[None]] | None = None,
+        history: ConversationHistory | None = None,
+        queued_at: float | None = None,
+    ) -> StepOutcome:
+        queue_wait = time.perf_counter() - queued_at if queued_at is not None else 0.0
+        with state.tracer.span("step", talent_id=talent_id, step=step_number, phase_type=phase_type):
+            is_mock, call = self._step_call(
+                state, user_text, talent_id, action, step_number, prior_responses, stream=stream, history=history
+            )
+            invoke = ainvoke_mock_step if is_mock else ainvoke_llm_step
+            result = await invoke(**call, on_chunk=on_chunk)
+            return self._record_step(
+                state,
+                talent_id,
+                action,
+                result,
+                stream=result.stream,
+                phase_type=phase_type,
+                queue_wait=queue_wait,
+            )
+
+    async def _aexecute_step(
+        self,
+        state: EngineState,
+        user_text: str,
+        talent_id: str,
+        action: str,
+        *,
+        prior_responses: list[tuple[str, str]] | None,
+        stream: bool,
+        emit: Emit,
+        phase_type: str | None = None,
+    ) -> StepOutcome | None:
+        assistant = self.ctx.model_mapping.get(talent_id, {}).get("assistant", "")
+        display_name = self._speaker_label(talent_id)
+
+        state.step_number += 1
+        await emit(self._step_start_event(talent_id, display_name, action))
+
+        async def on_chunk(text: str) -> None:
+            await emit(EngineEvent("chunk", {"talent_id": talent_id, "text": text}))
+
+        try:
+            if assistant == "human":
+                briefing, user_message = self._human_prompts(
+                    state, talent_id, user_text, action, prior_responses
+                )
+                response = await emit(self._await_text_event(talent_id, display_name, action, briefing))
+                while not (response and str(response).strip()):
+                    response = await emit(
+                        self._await_text_event(talent_id, display_name, action, briefing, reprompt=True)
+                    )
+                outcome = self._record_step(
+                    state,
+                    talent_id,
+                    action,
+                    self._record_human_reply(state, talent_id, user_message, response),
+                    stream=False,
+                    phase_type=phase_type,
+                )
+            else:
+                outcome = await self._arun_step(
+                    state,
+                    user_text,
+                    talent_id,
+                    action,
+                    state.step_number,
+                    phase_type,
+                    prior_responses,
+                    stream=stream,
+                    on_chunk=on_chunk if stream else None,
+                )
+        except Exception as exc:
+            await emit(self._step_error_event(talent_id, exc))
+            return None
+
+        await emit(EngineEvent("step_done", self._step_done_payload(outcome)))
+        return outcome
+
+    async def _ahandle_user_interrupt(
+        self,
+        state: EngineState,
+        outcome: StepOutcome,
+        *,
+        emit: Emit,
+    ) -> str | None:
+        payload = self._interrupt_payload(outcome)
+        if payload is None:
+            return None
+
+        response = await emit(EngineEvent("await_text", payload))
+        while not (response and str(response).strip()):
+            response = await emit(EngineEvent("await_text", {**payload, "reprompt": True}))
+        return self._log_interrupt_reply(state, payload, response)
@@ -0,0 +1,492 @@
+"""Persistent cache for attachment files across sessions (design.md 5.1.4).
+
+Attaching the same repository snapshot or spec folder again should not walk,
+stat-and-sort and re-decode everything. The cache keeps, in SQLite under the
+project root:
+
+- ``files``: path → ``(mtime_ns, size)`` and the SHA-256 of its bytes
+- ``contents``: SHA-256 → normalised text and token estimate (LRU by total bytes)
+- ``listings``: directory → ``mtime_ns`` and its sorted, unfiltered listing
+  (hidden and ``skip`` names are dropped after loading, so changing them
+  needs no rescan)
+
+A directory whose mtime is unchanged reuses its listing instead of being
+scanned again; a file whose ``(mtime_ns, size)`` is unchanged is served
+without being opened. Rows for files and directories that have disappeared
+are pruned when a rescan or read notices them. Misses are read on a thread pool. Entries whose mtime
+is within ``RACY_NS`` of now are not trusted (same rule as
+``config_registry``).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import stat
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Container, Iterable
+
+from studio.config_registry import RACY_NS, is_settled
+from studio.logging import estimate_tokens
+from studio.profiling import carry
+
+DEFAULT_CACHE_PATH = "cache/attachments.sqlite3"
+DEFAULT_MAX_MB = 64
+DEFAULT_MAX_WORKERS = 8
+SQL_BATCH = 500
+# 使ったことを SQLite の last_used に書き戻す間隔（秒）。LRU の順序はこの粒度で十分
+TOUCH_INTERVAL = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contents (
+    sha256 TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contents_last_used ON contents(last_used);
+CREATE TABLE IF NOT EXISTS listings (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    listing TEXT NOT NULL
+);
+-- 旧形式（skip 適用済みの一覧）。設定が変わると古い一覧が残るので使わない
+DROP TABLE IF EXISTS dirs;
+"""
+
+
+@dataclass(frozen=True)
+class AttachmentCacheConfig:
+    enabled: bool = True
+    path: str = DEFAULT_CACHE_PATH
+    max_mb: float = DEFAULT_MAX_MB
+    max_workers: int = DEFAULT_MAX_WORKERS
+
+    @classmethod
+    def from_config(cls, studio_config: dict[str, Any] | None) -> AttachmentCacheConfig:
+        cfg = (studio_config or {}).get("attachment_cache") or {}
+        default = cls()
+        return cls(
+            enabled=bool(cfg.get("enabled", default.enabled)),
+            path=str(cfg.get("path") or default.path),
+            max_mb=float(cfg.get("max_mb", default.max_mb)),
+            max_workers=max(1, int(cfg.get("max_workers", default.max_workers))),
+        )
+
+
+@dataclass(frozen=True)
+class FileText:
+    # max_size を超えたファイルは開かない（text は None）
+    text: str | None
+    tokens: int
+    size: int
+
+
+# 読めなかったファイルは例外をそのまま返す（FileNotFoundError / IsADirectoryError / UnicodeDecodeError 等）
+FileResult = FileText | Exception
+
+
+def normalise_text(raw: bytes) -> str:
+    """Strict UTF-8 with universal newlines, matching ``Path.read_text``."""
+    return raw.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _load(path: Path, max_size: int) -> tuple[os.stat_result, bytes | None] | OSError:
+    try:
+        st = os.stat(path)
+        if not stat.S_ISREG(st.st_mode):
+            return IsADirectoryError(str(path))
+        if st.st_size > max_size:
+            return st, None
+        return st, path.read_bytes()
+    except OSError as exc:
+        return exc
+
+
+def _load_all(paths: list[Path], max_size: int, max_workers: int) -> list[tuple[os.stat_result, bytes | None] | OSError]:
+    workers = min(max_workers, len(paths))
+    if workers <= 1:
+        return [_load(path, max_size) for path in paths]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="studio-attach") as pool:
+        return list(pool.map(carry(lambda path: _load(path, max_size)), paths))
+
+
+def read_files(paths: list[Path], *, max_size: int, max_workers: int = DEFAULT_MAX_WORKERS) -> list[FileResult]:
+    """Read ``paths`` in parallel without the cache (``attachment_cache.enabled: false``), same order."""
+    results: list[FileResult] = []
+    for loaded in _load_all(paths, max_size, max_workers):
+        if isinstance(loaded, Exception):
+            results.append(loaded)
+            continue
+        st, raw = loaded
+        if raw is None:
+            results.append(FileText(None, 0, st.st_size))
+            continue
+        try:
+            text = normalise_text(raw)
+        except UnicodeDecodeError as exc:
+            results.append(exc)
+            continue
+        results.append(FileText(text, estimate_tokens(text), st.st_size))
+    return results
+
+
+def _listing(directory: Path) -> list[tuple[str, bool]]:
+    """``(name, is_dir)`` for regular files and real directories, by name (nothing skipped)."""
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            try:
+                # rglob と同じく、ディレクトリへのシンボリックリンクはたどらない
+                if entry.is_dir(follow_symlinks=False):
+                    entries.append((entry.name, True))
+                elif entry.is_file():
+                    entries.append((entry.name, False))
+            except OSError:
+                continue
+    return sorted(entries)
+
+
+@dataclass
+class AttachmentCache:
+    path: Path
+    max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024
+    max_workers: int = DEFAULT_MAX_WORKERS
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _ready: bool = False
+    # 初回に表ごと読み込み、以降は差分だけ書く
+    _files: dict[str, tuple[int, int, str]] | None = None
+    _dirs: dict[str, tuple[int, list[tuple[str, bool]]]] | None = None
+    # 同一プロセスでの再添付用：ディレクトリごとの子 Path と、最近使った本文（max_bytes まで）
+    _children: dict[tuple[str, str, frozenset[str]], tuple[int, list[tuple[Path, bool, str]]]] = field(
+        default_factory=dict, repr=False
+    )
+    _texts: OrderedDict[str, tuple[FileText, float]] = field(default_factory=OrderedDict, repr=False)
+    _text_bytes: int = 0
+    # 診断用：ディレクトリを読み直した回数 / ファイルを開いた回数（累計）
+    scans: int = 0
+    reads: int = 0
+
+    @classmethod
+    def from_config(cls, root: Path, studio_config: dict[str, Any]) -> AttachmentCache | None:
+        """The process-wide cache for ``root``, or None when ``attachment_cache.enabled`` is false."""
+        config = AttachmentCacheConfig.from_config(studio_config)
+        if not config.enabled:
+            return None
+        path = (Path(root) / config.path).resolve()
+        with _CACHES_LOCK:
+            cache = _CACHES.get(path)
+            if cache is None:
+                cache = _CACHES[path] = cls(path)
+            cache.max_bytes = int(config.max_mb * 1024 * 1024)
+            cache.max_workers = config.max_workers
+            return cache
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._ready:
+            conn.executescript(_SCHEMA)
+            self._ready = True
+        return conn
+
+    def _load_tables(self) -> None:
+        if self._files is not None:
+            return
+        with closing(self._connect()) as conn:
+            self._files = {
+                path: (mtime_ns, size, sha)
+                for path, mtime_ns, size, sha in conn.execute("SELECT path, mtime_ns, size, sha256 FROM files")
+            }
+            self._dirs = {
+                path: (mtime_ns, [(name, bool(is_dir)) for name, is_dir in json.loads(listing)])
+                for path, mtime_ns, listing in conn.execute("SELECT path, mtime_ns, listing FROM listings")
+            }
+
+    # --- directory walk ----------------------------------------------------
+
+    def expand_directory(self, root: Path, skip: Iterable[str], extensions: Container[str]) -> list[Path]:
+        """Files under ``root`` in ``sorted(rglob)`` order, reusing listings of unchanged directories."""
+        skip = frozenset(skip)
+        cwd = os.getcwd()
+        with self._lock:
+            self._load_tables()
+            assert self._dirs is not None
+            changed: dict[str, tuple[int, list[tuple[str, bool]]]] = {}
+            gone: list[str] = []
+            files: list[Path] = []
+
+            def children(directory: Path) -> list[tuple[Path, bool, str]] | None:
+                given = os.fspath(directory)
+                key = os.path.join(cwd, given)
+                cached = self._dirs.get(key)
+                try:
+                    mtime_ns = os.stat(key).st_mtime_ns
+                except FileNotFoundError:
+                    if cached is not None:
+                        gone.append(key)
+                    return None
+                except OSError:
+                    return None
+                # 子 Path は指定どおりの綴り（相対 / 絶対）と skip ごとに覚える
+                memo = self._children.get((key, given, skip))
+                if memo is not None and memo[0] == mtime_ns:
+                    return memo[1]
+                if cached is not None and cached[0] == mtime_ns:
+                    entries = cached[1]
+                else:
+                    try:
+                        entries = _listing(directory)
+                    except OSError:
+                        return None
+                    self.scans += 1
+                    if cached is not None:
+                        # 前の一覧にあって今は無い子（とその下）の行を消す
+                        names = {name for name, _ in entries}
+                        gone.extend(os.path.join(key, name) for name, _ in cached[1] if name not in names)
+                    if not is_settled((mtime_ns, 0)):
+                        return [
+                            (directory / name, is_dir, "")
+                            for name, is_dir in entries
+                            if not name.startswith(".") and name not in skip
+                        ]
+                    changed[key] = (mtime_ns, entries)
+                kids = [
+                    (child := directory / name, is_dir, child.suffix.lower())
+                    for name, is_dir in entries
+                    if not name.startswith(".") and name not in skip
+                ]
+                self._children[key, given, skip] = (mtime_ns, kids)
+                return kids
+
+            def walk(directory: Path) -> None:
+                # 名前順の深さ優先は、部分ごとに比較する sorted(Path) と同じ順になる
+                for child, is_dir, suffix in children(directory) or ():
+                    if is_dir:
+                        walk(child)
+                    elif not suffix or suffix in extensions:
+                        files.append(child)
+
+            walk(root)
+            if changed or gone:
+                with closing(self._connect()) as conn, conn:
+                    self._forget(conn, gone)
+                    self._dirs.update(changed)
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO listings VALUES (?, ?, ?)",
+                        [(key, mtime_ns, json.dumps(entries)) for key, (mtime_ns, entries) in changed.items()],
+                    )
+            return files
+
+    def _forget(self, conn: sqlite3.Connection, keys: list[str]) -> None:
+        """Drop file and listing rows for ``keys`` and everything below them."""
+        if not keys:
+            return
+        for key in keys:
+            # key/ 以下は文字列として (key + sep, key + chr(sep + 1)) の範囲に収まる
+            low, high = key + os.sep, key + chr(ord(os.sep) + 1)
+            for table in ("files", "listings"):
+                conn.execute(f"DELETE FROM {table} WHERE path = ? OR (path > ? AND path < ?)", (key, low, high))
+        exact = set(keys)
+        prefixes = tuple(key + os.sep for key in keys)
+        assert self._files is not None and self._dirs is not None
+        self._files = {p: e for p, e in self._files.items() if p not in exact and not p.startswith(prefixes)}
+        self._dirs = {p: e for p, e in self._dirs.items() if p not in exact and not p.startswith(prefixes)}
+        self._children = {
+            k: v for k, v in self._children.items() if k[0] not in exact and not k[0].startswith(prefixes)
+        }
+
+    # --- file contents -----------------------------------------------------
+
+    def read_many(self, paths: list[Path], *, max_size: int) -> list[FileResult]:
+        """Text per path (same order); files with an unchanged ``(mtime_ns, size)`` are not opened."""
+        cwd = os.getcwd()
+        with self._lock:
+            self._load_tables()
+            files = self._files
+            assert files is not None
+            keys = [os.path.join(cwd, os.fspath(path)) for path in paths]
+            results: list[FileResult | None] = [None] * len(paths)
+            hits: dict[int, str] = {}
+            misses: list[int] = []
+            settled_before = time.time_ns() - RACY_NS
+            for i, key in enumerate(keys):
+                entry = files.get(key)
+                try:
+                    st = os.stat(key) if entry is not None else None
+                except OSError:
+                    st = None
+                if st is None or st.st_mtime_ns != entry[0] or st.st_size != entry[1] or entry[0] >= settled_before:
+                    misses.append(i)
+                elif st.st_size > max_size:
+                    results[i] = FileText(None, 0, st.st_size)
+                else:
+                    hits[i] = entry[2]
+
+            now = time.time()
+            known = self._recall(set(hits.values()), now)
+            for i, sha in hits.items():
+                if sha in known:
+                    results[i] = known[sha]
+                else:
+                    # 他プロセスが追い出した内容は読み直す
+                    misses.append(i)
+            if misses:
+                misses.sort()
+                with closing(self._connect()) as conn, conn:
+                    read = self._read_misses(
+                        conn, [paths[i] for i in misses], [keys[i] for i in misses], known, max_size, now
+                    )
+                for i, result in zip(misses, read):
+                    results[i] = result
+            return results  # type: ignore[return-value]
+
+    def _remember(self, sha: str, item: FileText, now: float) -> None:
+        if sha in self._texts:
+            self._texts.move_to_end(sha)
+            self._texts[sha] = (item, now)
+            return
+        self._texts[sha] = (item, now)
+        self._text_bytes += item.size
+        while self._text_bytes > self.max_bytes and self._texts:
+            _, (old, _) = self._texts.popitem(last=False)
+            self._text_bytes -= old.size
+
+    def _recall(self, shas: set[str], now: float) -> dict[str, FileText]:
+        """Texts for ``shas`` from memory, then SQLite; refreshes ``last_used`` at most once a minute."""
+        found: dict[str, FileText] = {}
+        stale: list[str] = []
+        missing: set[str] = set()
+        for sha in shas:
+            memo = self._texts.get(sha)
+            if memo is None:
+                missing.add(sha)
+                continue
+            found[sha] = memo[0]
+            self._texts.move_to_end(sha)
+            if now - memo[1] > TOUCH_INTERVAL:
+                stale.append(sha)
+                self._texts[sha] = (memo[0], now)
+        if not missing and not stale:
+            return found
+        with closing(self._connect()) as conn, conn:
+            fetched = self._fetch(conn, missing)
+            for sha, item in fetched.items():
+                found[sha] = item
+                self._remember(sha, item, now)
+            touched = stale + list(fetched)
+            for start in range(0, len(touched), SQL_BATCH):
+                batch = touched[start : start + SQL_BATCH]
+                conn.execute(
+                    f"UPDATE contents SET last_used = ? WHERE sha256 IN ({','.join('?' * len(batch))})",
+                    [now, *batch],
+                )
+        return found
+
+    def _fetch(self, conn: sqlite3.Connection, shas: set[str]) -> dict[str, FileText]:
+        found: dict[str, FileText] = {}
+        ordered = sorted(shas)
+        for start in range(0, len(ordered), SQL_BATCH):
+            batch = ordered[start : start + SQL_BATCH]
+            marks = ",".join("?" * len(batch))
+            for sha, text, tokens, size in conn.execute(
+                f"SELECT sha256, text, tokens, bytes FROM contents WHERE sha256 IN ({marks})", batch
+            ):
+                found[sha] = FileText(text, tokens, size)
+        return found
+
+    def _read_misses(
+        self,
+        conn: sqlite3.Connection,
+        paths: list[Path],
+        keys: list[str],
+        known: dict[str, FileText],
+        max_size: int,
+        now: float,
+    ) -> list[FileResult]:
+        """Read ``paths`` on the thread pool and store new contents; results in the same order."""
+        results: list[FileResult] = []
+        file_rows: list[tuple[str, int, int, str]] = []
+        new_contents: dict[str, FileText] = {}
+        gone: list[str] = []
+        assert self._files is not None
+        for key, outcome in zip(keys, _load_all(paths, max_size, self.max_workers)):
+            if isinstance(outcome, Exception):
+                if isinstance(outcome, FileNotFoundError) and key in self._files:
+                    gone.append(key)
+                results.append(outcome)
+                continue
+            st, raw = outcome
+            if raw is None:
+                results.append(FileText(None, 0, st.st_size))
+                continue
+            self.reads += 1
+            sha = hashlib.sha256(raw).hexdigest()
+            cached = known.get(sha) or new_contents.get(sha)
+            if cached is None:
+                try:
+                    text = normalise_text(raw)
+                except UnicodeDecodeError as exc:
+                    results.append(exc)
+                    continue
+                cached = new_contents[sha] = FileText(text, estimate_tokens(text), len(raw))
+                self._remember(sha, cached, now)
+            results.append(cached)
+            if is_settled((st.st_mtime_ns, st.st_size)):
+                file_rows.append((key, st.st_mtime_ns, st.st_size, sha))
+
+        self._forget(conn, gone)
+        if new_contents:
+            conn.executemany(
+                "INSERT OR REPLACE INTO contents VALUES (?, ?, ?, ?, ?)",
+                [(sha, item.text, item.tokens, item.size, now) for sha, item in new_contents.items()],
+            )
+        if file_rows:
+            conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", file_rows)
+            self._files.update({key: (mtime_ns, size, sha) for key, mtime_ns, size, sha in file_rows})
+        if new_contents:
+            self._evict(conn)
+        return results
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop least recently used contents beyond ``max_bytes`` and the file rows pointing at them."""
+        evicted = [
+            sha
+            for (sha,) in conn.execute(
+                "SELECT sha256 FROM ("
+                " SELECT sha256, SUM(bytes) OVER (ORDER BY last_used DESC, sha256) AS running FROM contents"
+                ") WHERE running > ?",
+                (self.max_bytes,),
+            )
+        ]
+        if not evicted:
+            return
+        conn.executemany("DELETE FROM contents WHERE sha256 = ?", [(sha,) for sha in evicted])
+        conn.execute("DELETE FROM files WHERE sha256 NOT IN (SELECT sha256 FROM contents)")
+        gone = set(evicted)
+        assert self._files is not None
+        self._files = {key: entry for key, entry in self._files.items() if entry[2] not in gone}
+
+    def total_bytes(self) -> int:
+        with self._lock, closing(self._connect()) as conn:
+            return int(conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM contents").fetchone()[0])
+
+
+_CACHES: dict[Path, AttachmentCache] = {}
+_CACHES_LOCK = threading.Lock()
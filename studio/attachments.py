@@ -0,0 +1,140 @@
+"""Per-turn attachment excerpts (design.md 5.1.1).
+
+Large attachments are split into chunks and ranked with BM25 against the
+turn's user input. Only the best chunks that fit in
+``attachment_retrieval.max_tokens`` are sent, as the last block of the system
+prompt, and every step of the turn gets the same excerpt so the prompt prefix
+stays cacheable (5.1.2). Attachments under the budget, or with retrieval
+disabled (``--files-full``), are sent whole.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+from studio.logging import estimate_tokens
+from studio.retrieval import BM25Index
+
+# read_attachment_files（"### path"）と build_uploaded_context（"### File n: name"）の見出し
+_FILE_HEADING = re.compile(r"^### (?:File \d+: )?(\S*/\S+|\S+\.\w+)$")
+
+
+@dataclass(frozen=True)
+class AttachmentRetrievalConfig:
+    enabled: bool = True
+    top_k: int = 8
+    max_tokens: int = 6000
+    chunk_chars: int = 1200
+
+    @classmethod
+    def from_config(cls, studio_config: dict[str, Any] | None) -> AttachmentRetrievalConfig:
+        cfg = (studio_config or {}).get("attachment_retrieval") or {}
+        default = cls()
+        return cls(
+            enabled=bool(cfg.get("enabled", default.enabled)),
+            top_k=int(cfg.get("top_k", default.top_k)),
+            max_tokens=int(cfg.get("max_tokens", default.max_tokens)),
+            chunk_chars=int(cfg.get("chunk_chars", default.chunk_chars)),
+        )
+
+
+@dataclass(frozen=True)
+class AttachmentChunk:
+    label: str
+    start_line: int
+    end_line: int
+    text: str
+    tokens: int
+
+
+def split_attachment_chunks(text: str, chunk_chars: int) -> list[AttachmentChunk]:
+    """Split on file headings, then on blank lines into chunks of at most ``chunk_chars``."""
+    chunks: list[AttachmentChunk] = []
+    label = ""
+    buf: list[str] = []
+    size = 0
+    start = last = 1
+
+    def flush() -> None:
+        nonlocal buf, size
+        body = "\n".join(buf).strip("\n")
+        if body.strip():
+            chunks.append(AttachmentChunk(label, start, last, body, estimate_tokens(body)))
+        buf, size = [], 0
+
+    line_no = 0
+    for line in text.split("\n"):
+        line_no += 1
+        heading = _FILE_HEADING.match(line)
+        if heading:
+            flush()
+            label, line_no = heading.group(1), 0
+            continue
+        # 改行のない長い行（minify 済み等）は文字数で切る
+        pieces = [line[i : i + chunk_chars] for i in range(0, len(line), chunk_chars)] or [""]
+        for piece in pieces:
+            blank = not piece.strip()
+            if buf and (size + len(piece) > chunk_chars or (blank and size >= chunk_chars // 2)):
+                flush()
+            if not buf:
+                if blank:
+                    continue
+                start = line_no
+            buf.append(piece)
+            size += len(piece) + 1
+            if not blank:
+                last = line_no
+    flush()
+    return chunks
+
+
+@dataclass
+class AttachmentIndex:
+    text: str
+    config: AttachmentRetrievalConfig
+    # 抜粋するか（有効かつ全文が max_tokens を超える）。build で一度だけ判定する
+    retrieves: bool = False
+    chunks: list[AttachmentChunk] = field(default_factory=list)
+    bm25: BM25Index = field(default_factory=BM25Index)
+
+    @classmethod
+    def build(cls, text: str, config: AttachmentRetrievalConfig) -> AttachmentIndex:
+        index = cls(text, config)
+        if config.enabled and estimate_tokens(text) > config.max_tokens:
+            index.retrieves = True
+            index.chunks = split_attachment_chunks(text, config.chunk_chars)
+            index.bm25 = BM25Index.build([f"{c.label}\n{c.text}" for c in index.chunks])
+        return index
+
+    def excerpt(self, query: str) -> str:
+        """The attachment text for a turn: everything, or the best chunks for ``query`` (the user input)."""
+        if not self.retrieves or not self.chunks:
+            return self.text
+        ranked = [i for i, _ in self.bm25.top(query, self.config.top_k)]
+        if not ranked:
+            # 質問と重なる語がない（「要約して」等）ときは先頭から
+            ranked = list(range(len(self.chunks)))
+        chosen: list[int] = []
+        budget = self.config.max_tokens
+        for i in ranked:
+            if self.chunks[i].tokens <= budget:
+                chosen.append(i)
+                budget -= self.chunks[i].tokens
+            if len(chosen) >= self.config.top_k:
+                break
+
+        labels = list(dict.fromkeys(c.label for c in self.chunks))
+        shown = {self.chunks[i].label for i in chosen}
+        lines = [
+            f"（添付全体: {len(labels)} ファイル / {len(self.text)} 文字。"
+            f"このターンの入力に関連する {len(chosen)}/{len(self.chunks)} 区画のみ抜粋）"
+        ]
+        for i in sorted(chosen):
+            chunk = self.chunks[i]
+            lines.append(f"### {chunk.label or '添付'}（{chunk.start_line}-{chunk.end_line} 行）\n{chunk.text}")
+        omitted = [label for label in labels if label and label not in shown]
+        if omitted:
+            lines.append(f"（抜粋外のファイル: {', '.join(omitted)}）")
+        return "\n\n".join(lines)
@@ -0,0 +1,108 @@
+"""Rolling compaction of turn_prior across loop iterations (design.md §4.3).
+
+A loop phase may declare ``compaction``; after each iteration that continues,
+every prior speaker except the last ``keep_last`` is collapsed into one summary
+entry, so later steps stop re-sending the full text of earlier iterations.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any
+
+from studio.logging import estimate_tokens
+from studio.prompts import format_prior_responses
+
+COMPACTION_LABEL = "これまでの要約"
+COMPACTION_STRATEGIES = ("extractive", "model")
+DEFAULT_KEEP_LAST = 4
+DEFAULT_MAX_SUMMARY_CHARS = 2000
+# extractive で1発言から残す文字数
+SNIPPET_CHARS = 160
+
+_CODE_BLOCK = re.compile(r"```.*?(```|$)", re.DOTALL)
+_SENTENCE_END = re.compile(r"(?<=[。．！？!?])|\n")
+
+
+@dataclass(frozen=True)
+class CompactionConfig:
+    keep_last: int = DEFAULT_KEEP_LAST
+    strategy: str = "extractive"
+    slot: str | None = None
+    max_summary_chars: int = DEFAULT_MAX_SUMMARY_CHARS
+
+    @classmethod
+    def from_phase(cls, phase: dict[str, Any]) -> CompactionConfig | None:
+        cfg = phase.get("compaction")
+        if not cfg:
+            return None
+        return cls(
+            keep_last=int(cfg.get("keep_last", DEFAULT_KEEP_LAST)),
+            strategy=cfg.get("strategy", "extractive"),
+            slot=cfg.get("slot") or (phase.get("exit") or {}).get("slot"),
+            max_summary_chars=int(cfg.get("max_summary_chars", DEFAULT_MAX_SUMMARY_CHARS)),
+        )
+
+
+def split_for_compaction(
+    turn_prior: list[tuple[str, str]],
+    keep_last: int,
+) -> list[tuple[str, str]] | None:
+    """Return the entries to collapse, or None when only an existing summary would be touched."""
+    older = turn_prior[: max(0, len(turn_prior) - keep_last)]
+    if not older or (len(older) == 1 and older[0][0] == COMPACTION_LABEL):
+        return None
+    return older
+
+
+def prior_tokens(entries: list[tuple[str, str]]) -> int:
+    return estimate_tokens(format_prior_responses(entries))
+
+
+def _snippet(text: str) -> str:
+    body = _CODE_BLOCK.sub("（コード省略）", text).strip()
+    for part in _SENTENCE_END.split(body):
+        part = part.strip()
+        if part:
+            body = part
+            break
+    if len(body) > SNIPPET_CHARS:
+        body = body[:SNIPPET_CHARS] + "…"
+    return body
+
+
+def extractive_summary(older: list[tuple[str, str]], max_chars: int = DEFAULT_MAX_SUMMARY_CHARS) -> str:
+    """Keep each speaker's first sentence (code blocks elided); the newest lines win when over ``max_chars``."""
+    lines: list[str] = []
+    for speaker, text in older:
+        if speaker == COMPACTION_LABEL:
+            lines.extend(line for line in text.splitlines() if line.strip())
+        else:
+            lines.append(f"- {speaker}: {_snippet(text)}")
+    kept: list[str] = []
+    total = 0
+    for line in reversed(lines):
+        total += len(line) + 1
+        if kept and total > max_chars:
+            break
+        kept.append(line)
+    return "\n".join(reversed(kept))
+
+
+def summary_prompts(older: list[tuple[str, str]], max_chars: int = DEFAULT_MAX_SUMMARY_CHARS) -> tuple[str, str]:
+    """(system_prompt, user_message) for the ``model`` strategy."""
+    system_prompt = (
+        "あなたは議論の記録係です。これまでの発言を、後続の参加者が議論を続けられるよう要約します。"
+        "決定事項・未解決の論点・各参加者の主張を残し、挨拶や重複は省いてください。"
+    )
+    user_message = (
+        f"次の発言を{max_chars}文字以内の箇条書きで要約してください。"
+        f"{format_prior_responses(older)}"
+    )
+    return system_prompt, user_message
+
+
+def apply_summary(turn_prior: list[tuple[str, str]], older_count: int, summary: str) -> None:
+    """Replace the first ``older_count`` entries in place so every holder of the list sees the summary."""
+    turn_prior[:older_count] = [(COMPACTION_LABEL, summary)]
@@ -0,0 +1,264 @@
+"""Cross-reference index over talents, organizations and workflows (design.md 8.4).
+
+One ``ConfigIndex`` per project root answers "which orgs use this talent",
+"which orgs bind this workflow" and "which talents run on this assistant"
+from memory. ``config_store`` updates it under ``ConfigIndex.lock`` in the
+same step as each write or delete. Hand edits are picked up by re-statting
+the indexed files before each query; only files whose signature changed
+are read again.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from studio.config_registry import REGISTRY, Signature, file_signature, is_settled
+from studio.validation import ValidationReport
+
+
+@dataclass(frozen=True)
+class OrgRefs:
+    talent_ids: tuple[str, ...]
+    bound_workflows: frozenset[str]
+    default_workflow: str
+    # model_mapping.json の talent_id → assistant
+    assistants: dict[str, str]
+    signatures: tuple[Signature, Signature]
+    # 自分で書いたか、mtime の粒度より古いときだけ署名を信用する
+    trusted: bool = True
+
+
+@dataclass(frozen=True)
+class WorkflowRefs:
+    slot_count: int
+    signature: Signature
+    trusted: bool = True
+
+
+def _org_refs(config: Any, mapping: Any, signatures: tuple[Signature, Signature], trusted: bool) -> OrgRefs:
+    config = config if isinstance(config, dict) else {}
+    mapping = mapping if isinstance(mapping, dict) else {}
+    return OrgRefs(
+        talent_ids=tuple(config.get("talent_ids") or ()),
+        bound_workflows=frozenset(config.get("workflow_bindings") or ()),
+        default_workflow=str(config.get("default_workflow") or "").strip(),
+        assistants={
+            tid: str(entry.get("assistant") or "")
+            for tid, entry in mapping.items()
+            if isinstance(entry, dict)
+        },
+        signatures=signatures,
+        trusted=trusted,
+    )
+
+
+@dataclass
+class ConfigIndex:
+    root: Path
+    lock: threading.RLock = field(default_factory=threading.RLock, repr=False)
+    _dirs: dict[str, Signature] = field(default_factory=dict)
+    _talents: list[str] = field(default_factory=list)
+    _org_dirs: list[str] = field(default_factory=list)
+    _orgs: dict[str, OrgRefs] = field(default_factory=dict)
+    _workflows: dict[str, WorkflowRefs] = field(default_factory=dict)
+    _by_talent: dict[str, list[str]] = field(default_factory=dict)
+    _by_workflow: dict[str, list[str]] = field(default_factory=dict)
+    _by_assistant: dict[str, list[tuple[str, str]]] = field(default_factory=dict)
+    _dirty: bool = True
+
+    # --- paths -------------------------------------------------------------
+
+    def _org_paths(self, org_id: str) -> tuple[Path, Path]:
+        org_dir = self.root / "organizations" / org_id
+        return org_dir / "config.json", org_dir / "model_mapping.json"
+
+    def _workflow_path(self, workflow_id: str) -> Path:
+        return self.root / "workflows" / f"{workflow_id}.json"
+
+    # --- refresh -----------------------------------------------------------
+
+    def _dir_changed(self, name: str) -> bool:
+        sig = file_signature(self.root / name)
+        if sig == self._dirs.get(name, ()) and is_settled(sig):
+            return False
+        self._dirs[name] = sig
+        return True
+
+    def refresh(self) -> None:
+        """Re-stat indexed files and re-read only the ones that changed."""
+        with self.lock:
+            if self._dir_changed("talents"):
+                talents_dir = self.root / "talents"
+                self._talents = sorted(p.stem for p in talents_dir.glob("*.json")) if talents_dir.is_dir() else []
+            if self._dir_changed("organizations"):
+                org_root = self.root / "organizations"
+                self._org_dirs = sorted(p.name for p in org_root.iterdir() if p.is_dir()) if org_root.is_dir() else []
+            if self._dir_changed("workflows"):
+                wf_dir = self.root / "workflows"
+                names = sorted(p.stem for p in wf_dir.glob("*.json")) if wf_dir.is_dir() else []
+                self._workflows = {n: self._workflows[n] for n in names if n in self._workflows} | {
+                    n: WorkflowRefs(0, (), trusted=False) for n in names if n not in self._workflows
+                }
+                self._dirty = True
+
+            for org_id in self._org_dirs:
+                config_path, mapping_path = self._org_paths(org_id)
+                sigs = (file_signature(config_path), file_signature(mapping_path))
+                current = self._orgs.get(org_id)
+                if current is not None and current.signatures == sigs and current.trusted:
+                    continue
+                if sigs[0] is None:
+                    if self._orgs.pop(org_id, None) is not None:
+                        self._dirty = True
+                    continue
+                report = ValidationReport()
+                config = REGISTRY.load_document(
+                    config_path, report, schema="organization", target=f"organizations/{org_id}/config.json"
+                )
+                mapping = None
+                if sigs[1] is not None:
+                    mapping = REGISTRY.load_document(
+                        mapping_path,
+                        report,
+                        schema="model_mapping",
+                        target=f"organizations/{org_id}/model_mapping.json",
+                    )
+                trusted = is_settled(sigs[0]) and is_settled(sigs[1])
+                self._orgs[org_id] = _org_refs(config, mapping, sigs, trusted)
+                self._dirty = True
+            for org_id in set(self._orgs) - set(self._org_dirs):
+                del self._orgs[org_id]
+                self._dirty = True
+
+            for workflow_id, current in list(self._workflows.items()):
+                path = self._workflow_path(workflow_id)
+                sig = file_signature(path)
+                if current.signature == sig and current.trusted:
+                    continue
+                data = REGISTRY.load_document(
+                    path, ValidationReport(), schema="workflow", target=f"workflows/{workflow_id}.json"
+                )
+                slots = data.get("slots") if isinstance(data, dict) else None
+                self._workflows[workflow_id] = WorkflowRefs(len(slots or {}), sig, trusted=is_settled(sig))
+
+            if self._dirty:
+                self._rebuild()
+
+    def _rebuild(self) -> None:
+        by_talent: dict[str, list[str]] = {}
+        by_workflow: dict[str, list[str]] = {}
+        by_assistant: dict[str, list[tuple[str, str]]] = {}
+        for org_id in sorted(self._orgs):
+            refs = self._orgs[org_id]
+            for talent_id in refs.talent_ids:
+                by_talent.setdefault(talent_id, []).append(org_id)
+            for workflow_id in refs.bound_workflows:
+                by_workflow.setdefault(workflow_id, []).append(org_id)
+            for talent_id, assistant in sorted(refs.assistants.items()):
+                by_assistant.setdefault(assistant, []).append((org_id, talent_id))
+        self._by_talent, self._by_workflow, self._by_assistant = by_talent, by_workflow, by_assistant
+        self._dirty = False
+
+    # --- updates from config_store (call with ``lock`` held) ---------------
+
+    def record(self, kind: str, item_id: str, data: dict[str, Any], *, org_id: str | None = None) -> None:
+        """Apply a document ``config_store`` has just written."""
+        with self.lock:
+            if kind == "talent":
+                if item_id not in self._talents:
+                    self._talents = sorted([*self._talents, item_id])
+            elif kind == "workflow":
+                sig = file_signature(self._workflow_path(item_id))
+                self._workflows[item_id] = WorkflowRefs(len(data.get("slots") or {}), sig)
+            elif kind in ("organization", "model_mapping"):
+                target = item_id if kind == "organization" else org_id or ""
+                config_path, mapping_path = self._org_paths(target)
+                sigs = (file_signature(config_path), file_signature(mapping_path))
+                current = self._orgs.get(target)
+                if current is None:
+                    # まだ索引にない組織（新規作成など）は次の refresh でファイルから読む
+                    return
+                if kind == "organization":
+                    mapping = {tid: {"assistant": a} for tid, a in current.assistants.items()}
+                    refs = _org_refs(data, mapping, sigs, trusted=current.trusted)
+                else:
+                    config = {
+                        "talent_ids": list(current.talent_ids),
+                        "workflow_bindings": dict.fromkeys(current.bound_workflows),
+                        "default_workflow": current.default_workflow,
+                    }
+                    refs = _org_refs(config, data, sigs, trusted=current.trusted)
+                self._orgs[target] = refs
+            self._dirty = True
+
+    def forget(self, kind: str, item_id: str) -> None:
+        """Apply a delete made by ``config_store``."""
+        with self.lock:
+            if kind == "talent":
+                self._talents = [t for t in self._talents if t != item_id]
+            elif kind == "workflow":
+                self._workflows.pop(item_id, None)
+            elif kind == "organization":
+                self._orgs.pop(item_id, None)
+                self._org_dirs = [o for o in self._org_dirs if o != item_id]
+            self._dirty = True
+
+    # --- queries -----------------------------------------------------------
+
+    def talent_ids(self) -> list[str]:
+        with self.lock:
+            self.refresh()
+            return list(self._talents)
+
+    def org_ids(self) -> list[str]:
+        with self.lock:
+            self.refresh()
+            return sorted(self._orgs)
+
+    def workflow_ids(self) -> list[str]:
+        with self.lock:
+            self.refresh()
+            return sorted(self._workflows)
+
+    def org(self, org_id: str) -> OrgRefs | None:
+        with self.lock:
+            self.refresh()
+            return self._orgs.get(org_id)
+
+    def workflow(self, workflow_id: str) -> WorkflowRefs | None:
+        with self.lock:
+            self.refresh()
+            return self._workflows.get(workflow_id)
+
+    def orgs_using_talent(self, talent_id: str) -> list[str]:
+        with self.lock:
+            self.refresh()
+            return list(self._by_talent.get(talent_id, ()))
+
+    def orgs_binding_workflow(self, workflow_id: str) -> list[str]:
+        with self.lock:
+            self.refresh()
+            return list(self._by_workflow.get(workflow_id, ()))
+
+    def talents_using_assistant(self, assistant: str) -> list[tuple[str, str]]:
+        """``(org_id, talent_id)`` pairs whose model_mapping entry uses ``assistant``."""
+        with self.lock:
+            self.refresh()
+            return list(self._by_assistant.get(assistant, ()))
+
+
+_INDEXES: dict[Path, ConfigIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def config_index(root: Path | str) -> ConfigIndex:
+    """The process-wide index for ``root``."""
+    key = Path(root).resolve()
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = _INDEXES[key] = ConfigIndex(Path(root))
+        return index
@@ -0,0 +1,148 @@
+"""Process-wide cache of parsed and validated definition files (design.md 5.2.1).
+
+Documents are keyed by path and validated against a schema once per
+``(mtime_ns, size)``. A complete ``SessionContext`` is cached by
+``(root, org_id, workflow_id)`` and rebuilt only when one of the files it
+was built from changes, so a cached org costs a handful of ``stat`` calls.
+
+Cached documents are shared between callers and must be treated as
+read-only. Files modified within ``RACY_NS`` of the check are not cached,
+because a second write in the same timestamp tick would go unnoticed.
+``config_store`` invalidates the registry whenever it writes or deletes.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from studio.schema_validate import load_json_file, validate_schema_document
+from studio.validation import StudioError, ValidationReport
+
+if TYPE_CHECKING:
+    from studio.loader import SessionContext
+
+# mtime の粒度（FAT は 2 秒）より新しいファイルはキャッシュしない
+RACY_NS = 2_000_000_000
+
+Signature = tuple[int, int] | None
+
+
+def file_signature(path: Path) -> Signature:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _settled(signatures: tuple[Signature, ...], now_ns: int) -> bool:
+    return all(sig is None or now_ns - sig[0] > RACY_NS for sig in signatures)
+
+
+def is_settled(signature: Signature) -> bool:
+    """True when a later write would be guaranteed to change ``signature``."""
+    return _settled((signature,), time.time_ns())
+
+
+@dataclass(frozen=True)
+class _Document:
+    signature: Signature
+    data: Any
+    errors: tuple[StudioError, ...]
+
+
+@dataclass(frozen=True)
+class _Context:
+    paths: tuple[Path, ...]
+    signatures: tuple[Signature, ...]
+    ctx: SessionContext
+
+
+class ConfigRegistry:
+    """Thread-safe document / context cache; one instance (``REGISTRY``) per process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._documents: dict[tuple[Path, str | None, str], _Document] = {}
+        self._contexts: dict[tuple[Path, str, str | None], _Context] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load_document(
+        self,
+        path: Path,
+        report: ValidationReport,
+        *,
+        schema: str | None = None,
+        target: str = "",
+    ) -> Any | None:
+        """``load_json_file`` + ``validate_schema_document``, replaying cached errors into ``report``."""
+        key = (Path(path).resolve(), schema, target)
+        signature = file_signature(path)
+        with self._lock:
+            cached = self._documents.get(key)
+        if cached is not None and cached.signature == signature:
+            self.hits += 1
+            for error in cached.errors:
+                report.add(error)
+            return cached.data
+
+        self.misses += 1
+        local = ValidationReport()
+        data = load_json_file(path, local)
+        if data is not None and schema:
+            validate_schema_document(data, schema, target or path.name, local)
+        for error in local.errors:
+            report.add(error)
+        with self._lock:
+            if _settled((signature,), time.time_ns()):
+                self._documents[key] = _Document(signature, data, tuple(local.errors))
+            else:
+                self._documents.pop(key, None)
+        return data
+
+    def get_context(self, root: Path, org_id: str, workflow_id: str | None) -> SessionContext | None:
+        with self._lock:
+            cached = self._contexts.get((Path(root).resolve(), org_id, workflow_id))
+        if cached is None or tuple(file_signature(p) for p in cached.paths) != cached.signatures:
+            return None
+        self.hits += 1
+        # SessionContext 自体は呼び出し側ごとに別インスタンスにする（中身の dict は共有）
+        return dataclasses.replace(cached.ctx, root=Path(root))
+
+    def put_context(
+        self,
+        root: Path,
+        org_id: str,
+        workflow_id: str | None,
+        ctx: SessionContext,
+        paths: list[Path],
+        signatures: list[Signature],
+    ) -> None:
+        """Store ``ctx`` with the signatures its files had *before* they were read."""
+        sigs = tuple(signatures)
+        if not _settled(sigs, time.time_ns()):
+            return
+        with self._lock:
+            self._contexts[(Path(root).resolve(), org_id, workflow_id)] = _Context(tuple(paths), sigs, ctx)
+
+    def invalidate(self, root: Path | None = None, path: Path | None = None) -> None:
+        """Drop every entry (under ``root`` when given; only documents under ``path`` when given)."""
+        with self._lock:
+            if root is None:
+                self._documents.clear()
+                self._contexts.clear()
+                return
+            base = Path(root).resolve()
+            doc_base = Path(path).resolve() if path is not None else base
+            self._documents = {k: v for k, v in self._documents.items() if not k[0].is_relative_to(doc_base)}
+            self._contexts = {k: v for k, v in self._contexts.items() if k[0] != base}
+
+
+REGISTRY = ConfigRegistry()
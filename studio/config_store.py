@@ -8,6 +8,8 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Literal
 
+from studio.config_index import config_index
+from studio.config_registry import REGISTRY
 from studio.loader import (
     RESERVED_ASSISTANTS,
     load_ai_assistants,
@@ -82,26 +84,13 @@ def _path_for(
 
 
 def list_configs(kind: ConfigKind, root: Path) -> list[str]:
-    root = Path(root)
+    index = config_index(root)
     if kind == "talent":
-        talents_dir = root / "talents"
-        if not talents_dir.is_dir():
-            return []
-        return sorted(path.stem for path in talents_dir.glob("*.json"))
+        return index.talent_ids()
     if kind == "workflow":
-        wf_dir = root / "workflows"
-        if not wf_dir.is_dir():
-            return []
-        return sorted(path.stem for path in wf_dir.glob("*.json"))
+        return index.workflow_ids()
     if kind == "organization":
-        org_dir = root / "organizations"
-        if not org_dir.is_dir():
-            return []
-        return sorted(
-            name.name
-            for name in org_dir.iterdir()
-            if name.is_dir() and (name / "config.json").is_file()
-        )
+        return index.org_ids()
     raise ValueError(f"list_configs does not support kind={kind}")
 
 
@@ -131,12 +120,17 @@ def list_assistant_names(root: Path) -> list[str]:
 
 
 def talent_referenced_by_orgs(talent_id: str, root: Path) -> list[str]:
-    refs: list[str] = []
-    for org_id in list_configs("organization", root):
-        org = load_config("organization", org_id, root)
-        if talent_id in (org.get("talent_ids") or []):
-            refs.append(org_id)
-    return refs
+    return config_index(root).orgs_using_talent(talent_id)
+
+
+def workflow_bound_by_orgs(workflow_id: str, root: Path) -> list[str]:
+    """Orgs with an explicit ``workflow_bindings`` entry for ``workflow_id``."""
+    return config_index(root).orgs_binding_workflow(workflow_id)
+
+
+def talents_using_assistant(assistant: str, root: Path) -> list[tuple[str, str]]:
+    """``(org_id, talent_id)`` pairs whose model_mapping uses ``assistant``."""
+    return config_index(root).talents_using_assistant(assistant)
 
 
 def validate_config(
@@ -243,7 +237,11 @@ def save_config(
         return SaveResult(False, "\n".join(err.format() for err in report.errors))
 
     path = _path_for(kind, item_id, root, org_id=org_id)
-    _write_json(path, data)
+    index = config_index(root)
+    with index.lock:
+        _write_json(path, data)
+        REGISTRY.invalidate(root, path)
+        index.record(kind, item_id, data, org_id=org_id or None)
     rel = path.relative_to(root)
     return SaveResult(True, f"✅ 保存しました: {rel}", path)
 
@@ -254,7 +252,17 @@ def delete_config(kind: ConfigKind, item_id: str, root: Path) -> SaveResult:
         return SaveResult(False, "ID を選択してください")
 
     root = Path(root)
+    index = config_index(root)
+    with index.lock:
+        result = _delete_config(kind, item_id, root)
+        if result.ok:
+            removed = root / "organizations" / item_id if kind == "organization" else _path_for(kind, item_id, root)
+            REGISTRY.invalidate(root, removed)
+            index.forget(kind, item_id)
+    return result
+
 
+def _delete_config(kind: ConfigKind, item_id: str, root: Path) -> SaveResult:
     if kind == "talent":
         refs = talent_referenced_by_orgs(item_id, root)
         if refs:
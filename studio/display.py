@@ -24,19 +24,50 @@ def format_step_metrics_line(payload: dict[str, Any]) -> str:
     elapsed = float(payload.get("elapsed") or 0.0)
     cost = float(payload.get("cost") or 0.0)
 
+    tokens_cached = int(tokens.get("cached") or 0)
+    in_label = f"in={tokens_in} (cached {tokens_cached})" if tokens_cached else f"in={tokens_in}"
+
     parts = [
         f"[{label}]",
         f"{elapsed:.3f}s",
-        f"in={tokens_in} out={tokens_out} ({source})",
+        f"{in_label} out={tokens_out} ({source})",
     ]
     if elapsed > 0 and tokens_out > 0:
         parts.append(f"{tokens_out / elapsed:.1f} tok/s")
+    timing = payload.get("timing") or {}
+    if timing.get("ttft") is not None:
+        parts.append(f"TTFT {float(timing['ttft']):.2f}s")
+    if timing.get("queue_wait"):
+        parts.append(f"順番待ち {float(timing['queue_wait']):.1f}s")
+    rate_limit_wait = float(payload.get("rate_limit_wait") or 0.0)
+    if rate_limit_wait > 0:
+        parts.append(f"待機 {rate_limit_wait:.1f}s")
+    if payload.get("cache") == "hit":
+        parts.append("cache hit")
     parts.append(f"${cost:.6f}")
     return " | ".join(parts)
 
 
+def format_attachment_progress(payload: dict[str, Any]) -> str:
+    """One status line for an ``attachment_progress`` event (design.md 5.1.3)."""
+    name = payload.get("file") or "?"
+    stage = payload.get("stage")
+    if stage == "map":
+        return f"[添付要約] {name}: 区画 {payload.get('done', 0)}/{payload.get('total', 0)}"
+    if stage == "reduce":
+        return (
+            f"[添付要約] {name}: 統合 {payload.get('level', 1)} 段目 "
+            f"{payload.get('done', 0)}/{payload.get('total', 0)}"
+        )
+    if stage == "done":
+        return f"[添付要約] {name}: 完了" + ("（キャッシュ）" if payload.get("cached") else "")
+    if stage == "error":
+        return f"[添付要約] {name}: 取り込めません: {payload.get('error', '')}"
+    return ""
+
+
 def format_by_model_markdown_table(by_model: dict[str, dict[str, Any]]) -> str:
-    """Markdown table for CLI session summary (stdout only; JSONL is unchanged)."""
+    """Markdown tables for the CLI session summary: totals, then latency percentiles when recorded."""
     if not by_model:
         return ""
     lines = [
@@ -51,9 +82,32 @@ def format_by_model_markdown_table(by_model: dict[str, dict[str, Any]]) -> str:
             f"{stats.get('tokens_in', 0)} | {stats.get('tokens_out', 0)} | "
             f"{stats.get('cost', 0):.6f} |"
         )
+    latency_rows = [key for key in sorted(by_model) if by_model[key].get("latency")]
+    if latency_rows:
+        lines.extend(
+            [
+                "",
+                "| model | elapsed p50 / p95 / p99 (s) | TTFT p50 / p95 / p99 (s) | 順番待ち p95 (s) |",
+                "|---|---:|---:|---:|",
+            ]
+        )
+        for key in latency_rows:
+            latency = by_model[key]["latency"]
+            queue_wait = latency.get("queue_wait")
+            queue_p95 = f"{queue_wait['p95']:.2f}" if queue_wait else "-"
+            lines.append(
+                f"| {key} | {_format_percentiles(latency.get('elapsed'))} | "
+                f"{_format_percentiles(latency.get('ttft'))} | {queue_p95} |"
+            )
     return "\n".join(lines)
 
 
+def _format_percentiles(summary: dict[str, float] | None) -> str:
+    if not summary:
+        return "-"
+    return " / ".join(f"{summary[key]:.2f}" for key in ("p50", "p95", "p99"))
+
+
 def format_session_end_lines(payload: dict[str, Any]) -> list[str]:
     lines = [
         (
@@ -68,3 +122,35 @@ def format_session_end_lines(payload: dict[str, Any]) -> list[str]:
     if payload.get("artifact_dir"):
         lines.append(f"成果物: {payload['artifact_dir']}")
     return lines
+
+
+PROFILE_CATEGORY_LABELS = {
+    "prompt": "プロンプト組み立て",
+    "logging": "ログ",
+    "render": "表示",
+    "artifacts": "成果物抽出",
+    "engine": "その他",
+    "provider": "API 待ち",
+    "wait": "スレッド待ち",
+    "user": "入力待ち",
+}
+
+
+def format_profile_summary(summary: dict[str, Any]) -> str:
+    """One line per profiled turn: engine work first, then time blocked elsewhere."""
+    categories = summary.get("categories") or {}
+    engine = " / ".join(
+        f"{PROFILE_CATEGORY_LABELS[key]} {categories[key]:.3f}s"
+        for key in ("prompt", "logging", "render", "artifacts", "engine")
+        if categories.get(key)
+    )
+    blocked = " / ".join(
+        f"{PROFILE_CATEGORY_LABELS[key]} {categories[key]:.3f}s"
+        for key in ("provider", "wait", "user")
+        if categories.get(key)
+    )
+    return (
+        f"[profile {summary.get('mode')}] {summary.get('label')} {float(summary.get('wall') or 0):.3f}s"
+        f" | エンジン {float(summary.get('engine') or 0):.3f}s ({engine or '-'})"
+        f" | 待ち ({blocked or '-'}) → {summary.get('path')}"
+    )
@@ -2,22 +2,44 @@
 
 from __future__ import annotations
 
+import queue
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from dataclasses import dataclass, field
-from typing import Any, Callable, Iterator
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Generator, Iterator
 
 from langchain_core.messages import AIMessage, HumanMessage
 
-from studio.assistants import invoke_llm_step, invoke_mock_step
-from studio.bindings import build_direct_bindings, build_direct_workflow, expand_step_to_talents
+from studio.assistants import StreamCancelled, invoke_llm_step, invoke_mock_step
+from studio.attachments import AttachmentIndex, AttachmentRetrievalConfig
+from studio.compaction import (
+    COMPACTION_LABEL,
+    apply_summary,
+    extractive_summary,
+    prior_tokens,
+    split_for_compaction,
+    summary_prompts,
+)
 from studio.history import ConversationHistory, RoleHistories
-from studio.interrupt import USER_INTERRUPT_DISPLAY, USER_INTERRUPT_TALENT, matched_interrupt_marker, resolve_interrupt_markers
+from studio.interrupt import USER_INTERRUPT_DISPLAY, USER_INTERRUPT_TALENT, matched_interrupt_marker
+from studio.large_attachments import AttachmentDigest, LargeAttachmentConfig, LargeAttachmentDigester
 from studio.loader import SessionContext
-from studio.logging import SessionLogger, StepMetrics
-from studio.prompts import build_system_prompt, build_user_message
+from studio.log_writer import LogWriterConfig
+from studio.logging import SessionLogger, StepMetrics, StepTiming
+from studio.profiling import carry
+from studio.prompts import build_system_prompt, build_user_message, with_attachment_block
+from studio.response_cache import ResponseCache, resolve_cache_mode
+from studio.session_resume import checkpoint_path, load_resumed_session, write_checkpoint
+from studio.tracing import NULL_TRACER, TraceConfig, Tracer
 from studio.user_context import build_generation_options
+from studio.user_context_rag import RagConfig, retrieve_user_context
 from studio.validation import StudioError, StudioValidationError
+from studio.workflow_plan import PlannedPhase, PlannedStep, WorkflowPlan, compile_workflow_plan
+
+
+_STREAM_END = object()
 
 
 @dataclass(frozen=True)
@@ -35,11 +57,21 @@ class EngineState:
     stream: bool = True
     temperature: float | None = 0.7
     attachment_context: str = ""
+    attachment_index: AttachmentIndex | None = None
+    # (索引, ユーザー入力, 抜粋)。抜粋はターンに一度だけ引き、全ステップで同じ system prompt にする
+    attachment_excerpt: tuple[AttachmentIndex, str, str] | None = None
     user_context_enabled: bool = True
     user_context_text: str | None = None
+    # 付録D.10：このターンの入力で corpus から引いた節（system prompt の 5 番目）
+    user_context_rag_text: str = ""
     started: bool = False
     session_wall_start: float = 0.0
     parent_session_id: str | None = None
+    response_cache: ResponseCache | None = None
+    system_prompts: dict[str, str] = field(default_factory=dict)
+    checkpoint: dict[str, Any] | None = None
+    trace: TraceConfig = field(default_factory=TraceConfig)
+    tracer: Tracer = NULL_TRACER
 
 
 @dataclass
@@ -66,12 +98,21 @@ class StepOutcome:
     tokens_out: int
     tokens_source: str
     cost: float
+    rate_limit_wait: float = 0.0
+    cache: str | None = None
+    timing: StepTiming | None = None
+    tokens_cached: int = 0
+    tokens_cache_write: int = 0
 
 
 class SessionEngine:
     def __init__(self, ctx: SessionContext) -> None:
         self.ctx = ctx
+        self.plan: WorkflowPlan = ctx.plan if ctx.plan is not None else compile_workflow_plan(ctx)
         self.state: EngineState | None = None
+        # --files-full では False にして毎ステップ全文を渡す（design.md 5.1.1）
+        self.attachment_retrieval = AttachmentRetrievalConfig.from_config(ctx.studio_config)
+        self.user_context_rag = RagConfig.from_config(ctx.studio_config)
 
     def _build_system_prompt(
         self,
@@ -80,13 +121,19 @@ class SessionEngine:
         state: EngineState,
     ) -> str:
         text = state.user_context_text if state.user_context_enabled else None
-        return build_system_prompt(
-            talent,
-            self.ctx.org,
-            self.ctx.org_id,
-            talent_id,
-            user_context_text=text,
-        )
+        rag_text = state.user_context_rag_text if state.user_context_enabled else ""
+        if not text and not rag_text and talent_id in self.plan.system_prompts:
+            return self.plan.system_prompts[talent_id]
+        if talent_id not in state.system_prompts:
+            state.system_prompts[talent_id] = build_system_prompt(
+                talent,
+                self.ctx.org,
+                self.ctx.org_id,
+                talent_id,
+                user_context_text=text,
+                user_context_rag_text=rag_text,
+            )
+        return state.system_prompts[talent_id]
 
     def run_turn(
         self,
@@ -97,7 +144,46 @@ class SessionEngine:
         stream: bool | None = None,
         temperature: float | None = None,
         no_user_context: bool = False,
+        cache: str | None = None,
+        large_files: list[Path] | None = None,
     ) -> Iterator[EngineEvent]:
+        start_event = self._open_turn(
+            user_text,
+            attachment_context=attachment_context,
+            attachments=attachments,
+            stream=stream,
+            temperature=temperature,
+            no_user_context=no_user_context,
+            cache=cache,
+        )
+        if start_event:
+            yield start_event
+
+        state = self.state
+        assert state is not None
+        if large_files:
+            yield from self._ingest_large_files(state, large_files, attachment_context)
+        turn_prior: list[tuple[str, str]] = []
+
+        with state.tracer.span("turn", session_id=state.logger.session_id):
+            yield from self._run_phases(self.plan.phases, state, user_text, turn_prior)
+        self._close_turn(state)
+
+    def _open_turn(
+        self,
+        user_text: str,
+        *,
+        attachment_context: str,
+        attachments: list[str] | None,
+        stream: bool | None,
+        temperature: float | None,
+        no_user_context: bool,
+        cache: str | None = None,
+    ) -> EngineEvent | None:
+        """Create or reuse the session state and log the user input.
+
+        Returns the ``session_start`` event on the first turn of a session.
+        """
         studio_config = self.ctx.studio_config
         use_stream = studio_config.get("stream", True) if stream is None else stream
         use_temperature = studio_config.get("temperature", 0.7) if temperature is None else temperature
@@ -110,6 +196,9 @@ class SessionEngine:
                 temperature=use_temperature,
                 no_user_context=no_user_context,
             )
+            cache_mode = resolve_cache_mode(studio_config, cache)
+            if cache_mode != "off":
+                generation["cache"] = cache_mode
             talent_ids = list(self.ctx.org.get("talent_ids") or [])
             logger = SessionLogger.create(
                 self.ctx.root,
@@ -122,6 +211,7 @@ class SessionEngine:
                 },
                 model_mapping=self.ctx.model_mapping,
                 generation=generation,
+                log_config=LogWriterConfig.from_config(studio_config),
             )
             self.state = EngineState(
                 ctx=self.ctx,
@@ -132,18 +222,30 @@ class SessionEngine:
                 user_context_enabled=uc_resolution.enabled,
                 user_context_text=uc_resolution.text,
                 session_wall_start=time.perf_counter(),
+                response_cache=ResponseCache.from_config(self.ctx.root, studio_config, cache_mode),
             )
-        elif attachment_context:
-            self.state.attachment_context = attachment_context
+        else:
+            if attachment_context:
+                self.state.attachment_context = attachment_context
+                self.state.attachment_index = None
+            if cache is not None:
+                self.state.response_cache = ResponseCache.from_config(self.ctx.root, studio_config, cache)
 
         state = self.state
         assert state is not None
+        if state.attachment_context and state.attachment_index is None:
+            # 添付はターンをまたいで保持するので、索引も新しい添付のときだけ作る
+            state.attachment_index = AttachmentIndex.build(state.attachment_context, self.attachment_retrieval)
 
+        start_event: EngineEvent | None = None
         if not state.started:
             if state.logger is None:
                 if not state.parent_session_id:
                     raise RuntimeError("resume session requires parent_session_id")
                 talent_ids = list(self.ctx.org.get("talent_ids") or [])
+                if state.checkpoint is None:
+                    state.checkpoint = self._parent_checkpoint(state.parent_session_id)
+                parent_checkpoint = checkpoint_path(self.ctx.root, state.parent_session_id)
                 state.logger = SessionLogger.create_branch(
                     self.ctx.root,
                     state.parent_session_id,
@@ -160,9 +262,19 @@ class SessionEngine:
                         "temperature": use_temperature,
                         "user_context": state.user_context_enabled,
                     },
+                    log_config=LogWriterConfig.from_config(studio_config),
+                    parent_checkpoint=(
+                        parent_checkpoint.relative_to(self.ctx.root).as_posix()
+                        if parent_checkpoint.is_file()
+                        else None
+                    ),
                 )
+            state.trace = TraceConfig.from_config(studio_config)
+            if state.trace.enabled:
+                state.tracer = Tracer()
+                state.logger.tracer = state.tracer
             state.logger.start()
-            yield EngineEvent(
+            start_event = EngineEvent(
                 "session_start",
                 {
                     "session_id": state.logger.session_id,
@@ -175,20 +287,118 @@ class SessionEngine:
             )
             state.started = True
 
+        context_chunks = self._refresh_user_context_rag(state, user_text)
         assert state.logger is not None
-        state.logger.log_user_input(user_text, attachments=attachments)
+        state.logger.log_user_input(user_text, attachments=attachments, context_chunks=context_chunks)
+        return start_event
+
+    def _refresh_user_context_rag(self, state: EngineState, user_text: str) -> list[dict[str, Any]]:
+        """Retrieve the corpus sections for this turn's input (design.md Appendix D.10)."""
+        if not state.user_context_enabled or not self.user_context_rag.enabled:
+            return []
+        rag_text, chunks = retrieve_user_context(
+            self.ctx.root, self.ctx.studio_config, user_text, self.user_context_rag
+        )
+        if rag_text != state.user_context_rag_text:
+            # 話題が変わったときだけ system prompt を組み直す
+            state.user_context_rag_text = rag_text
+            state.system_prompts.clear()
+        return chunks
 
-        workflow, bindings = self._resolve_workflow()
-        turn_prior: list[tuple[str, str]] = []
+    def _digest_large_files(
+        self,
+        state: EngineState,
+        large_files: list[Path],
+        attachment_context: str,
+        progress: Callable[[dict[str, Any]], None],
+    ) -> None:
+        """Summarise files over upload_limits into this turn's attachments (design.md 5.1.3).
+
+        Runs on a worker thread; unreadable files are reported as ``stage: error`` progress.
+        """
+        config = LargeAttachmentConfig.from_config(self.ctx.studio_config)
+        calls: list[float] = []
+        summarise = None
+        if config.assistant and config.assistant != "mock" and config.assistant in self.ctx.assistants:
+
+            def summarise(system_prompt: str, user_message: str) -> str:
+                result = invoke_llm_step(
+                    assistant_name=config.assistant,
+                    assistant_cfg=self.ctx.assistants[config.assistant],
+                    model=config.model,
+                    system_prompt=system_prompt,
+                    user_message=user_message,
+                    history=ConversationHistory(),
+                    temperature=0.0,
+                    stream=False,
+                    costs=state.logger.costs,
+                    rate_limits=self.ctx.studio_config.get("rate_limits"),
+                    response_cache=state.response_cache,
+                    tracer=state.tracer,
+                )
+                calls.append(result.cost)
+                return result.text
+
+        digester = LargeAttachmentDigester(self.ctx.root, config, summarise, progress)
+        digests: list[AttachmentDigest] = []
+        with state.tracer.span("attachment_digest", files=len(large_files)):
+            for path in large_files:
+                before = len(calls)
+                found, _ = digester.digest_all([path])
+                for digest in found:
+                    digests.append(digest)
+                    assert state.logger is not None
+                    state.logger.log_attachment_digest(
+                        file=digest.label,
+                        size=digest.size,
+                        chunks=digest.chunks,
+                        sha256=digest.sha256,
+                        cached=digest.cached,
+                        chars=len(digest.text),
+                        calls=len(calls) - before,
+                        cost=sum(calls[before:]),
+                    )
+        # 大きな添付の要約も通常の添付と同じく、以降のターンへ持ち越す
+        parts = [attachment_context] if attachment_context else []
+        parts.extend(digest.to_context() for digest in digests)
+        if parts:
+            state.attachment_context = "\n\n".join(parts)
+            state.attachment_index = AttachmentIndex.build(state.attachment_context, self.attachment_retrieval)
+
+    def _ingest_large_files(
+        self,
+        state: EngineState,
+        large_files: list[Path],
+        attachment_context: str,
+    ) -> Iterator[EngineEvent]:
+        """Yield ``attachment_progress`` events while the digests are built on a worker thread."""
+        events: queue.Queue[Any] = queue.Queue()
+        outcome: dict[str, Any] = {}
 
-        yield from self._run_phases(
-            workflow.get("phases") or [],
-            state,
-            user_text,
-            bindings,
-            turn_prior,
-        )
+        def worker() -> None:
+            try:
+                self._digest_large_files(
+                    state,
+                    large_files,
+                    attachment_context,
+                    lambda payload: events.put(EngineEvent("attachment_progress", payload)),
+                )
+            except BaseException as exc:
+                outcome["error"] = exc
+            finally:
+                events.put(_STREAM_END)
+
+        threading.Thread(target=carry(state.tracer.wrap(worker)), name="studio-digest", daemon=True).start()
+        while True:
+            item = events.get()
+            if item is _STREAM_END:
+                break
+            yield item
+        if "error" in outcome:
+            raise outcome["error"]
 
+    def _close_turn(self, state: EngineState) -> None:
+        assert state.logger is not None
         state.logger.log_state_snapshot(
             {
                 "step_number": state.step_number,
@@ -196,12 +406,38 @@ class SessionEngine:
                 "talent_ids": list(self.ctx.org.get("talent_ids") or []),
             }
         )
+        try:
+            state.checkpoint = write_checkpoint(
+                self.ctx.root,
+                state.logger.session_id,
+                previous=state.checkpoint,
+                histories=state.histories,
+                step_number=state.step_number,
+                talent_names=state.logger.talents,
+            )
+        except OSError:
+            # チェックポイントは再開の高速化用。書けなくてもログ全体から再構築できる
+            pass
+        self._export_trace(state)
 
-    def _resolve_workflow(self) -> tuple[dict[str, Any], dict[str, list[str]]]:
-        if self.ctx.workflow_id and self.ctx.workflow and self.ctx.slot_bindings:
-            return self.ctx.workflow, self.ctx.slot_bindings
-        talent_ids = list(self.ctx.org.get("talent_ids") or [])
-        return build_direct_workflow(talent_ids), build_direct_bindings(talent_ids)
+    def _export_trace(self, state: EngineState) -> None:
+        if not state.tracer.enabled or state.logger is None:
+            return
+        try:
+            state.tracer.export(
+                state.logger.log_path,
+                state.trace.format,
+                resource={"session.id": state.logger.session_id, "organization": self.ctx.org_id},
+            )
+        except OSError:
+            # トレースは診断用。書けなくても会話は続ける
+            pass
+
+    def _parent_checkpoint(self, parent_session_id: str) -> dict[str, Any] | None:
+        try:
+            return load_resumed_session(self.ctx.root, parent_session_id).checkpoint
+        except StudioValidationError:
+            return None
 
     def _speaker_label(self, talent_id: str) -> str:
         return self.ctx.talents.get(talent_id, {}).get("name", talent_id)
@@ -210,15 +446,26 @@ class SessionEngine:
         self,
         state: EngineState,
         outcome: StepOutcome,
-    ) -> Iterator[EngineEvent, None, str | None]:
-        workflow, _ = self._resolve_workflow()
-        markers = resolve_interrupt_markers(workflow, self.ctx.org)
-        marker = matched_interrupt_marker(outcome.text, markers)
-        if not marker:
+    ) -> Generator[EngineEvent, None, str | None]:
+        payload = self._interrupt_payload(outcome)
+        if payload is None:
             return None
 
+        response = yield EngineEvent("await_text", payload)
+        while not (response and str(response).strip()):
+            response = yield EngineEvent(
+                "await_text",
+                {**payload, "reprompt": True},
+            )
+        return self._log_interrupt_reply(state, payload, response)
+
+    def _interrupt_payload(self, outcome: StepOutcome) -> dict[str, Any] | None:
+        """Return the await_text payload when the outcome ends with an interrupt marker."""
+        marker = matched_interrupt_marker(outcome.text, list(self.plan.interrupt_markers))
+        if not marker:
+            return None
         prior_speaker = self._speaker_label(outcome.talent_id)
-        payload = {
+        return {
             "talent_id": USER_INTERRUPT_TALENT,
             "display_name": USER_INTERRUPT_DISPLAY,
             "interrupt": True,
@@ -227,423 +474,347 @@ class SessionEngine:
             "prior_speaker": prior_speaker,
             "action": f"{prior_speaker} からの確認に答えてください",
         }
-        response = yield EngineEvent("await_text", payload)
-        while not (response and str(response).strip()):
-            response = yield EngineEvent(
-                "await_text",
-                {**payload, "reprompt": True},
-            )
+
+    def _log_interrupt_reply(
+        self,
+        state: EngineState,
+        payload: dict[str, Any],
+        response: Any,
+    ) -> str:
         reply = str(response).strip()
         assert state.logger is not None
         state.logger.log_user_interrupt(
             reply,
-            marker=marker,
-            prior_speaker=prior_speaker,
-            prior_text=outcome.text,
+            marker=payload["marker"],
+            prior_speaker=payload["prior_speaker"],
+            prior_text=payload["prior_text"],
         )
         return reply
 
     def _run_phases(
         self,
-        phases: list[dict[str, Any]],
+        phases: tuple[PlannedPhase, ...],
         state: EngineState,
         user_text: str,
-        bindings: dict[str, list[str]],
         turn_prior: list[tuple[str, str]],
         *,
-        loop_phase: dict[str, Any] | None = None,
         iteration: int | None = None,
     ) -> Iterator[EngineEvent]:
-        marker_target: tuple[str, str] | None = None
-        marker_text: str | None = None
-        if loop_phase and (loop_phase.get("exit") or {}).get("type") == "marker":
-            marker_text = loop_phase["exit"].get("marker")
-            marker_target = self._loop_marker_target(loop_phase, bindings)
-
         for phase in phases:
-            phase_type = phase.get("type")
-            if phase_type == "loop":
-                yield from self._run_loop_phase(
-                    state, user_text, phase, bindings, turn_prior
-                )
-                continue
+            with state.tracer.span("phase", phase_type=phase.type, iteration=iteration):
+                if phase.type == "loop":
+                    yield from self._run_loop_phase(state, user_text, phase, turn_prior)
+                    continue
 
-            yield EngineEvent(
-                "phase_start",
-                {"phase_type": phase_type, "iteration": iteration},
-            )
+                yield self._phase_start_event(phase.type, iteration)
 
-            if phase_type == "serial":
-                yield from self._run_serial_phase(
-                    state,
-                    user_text,
-                    phase,
-                    bindings,
-                    turn_prior,
-                    marker_target=marker_target,
-                    marker_text=marker_text,
-                )
-            elif phase_type == "parallel":
-                yield from self._run_parallel_phase(
-                    state, user_text, phase, bindings, turn_prior
-                )
-            else:
-                yield EngineEvent(
-                    "step_error",
-                    {
-                        "talent_id": "",
-                        "error": f"未対応のフェーズ種別: {phase_type}",
-                        "retry": False,
-                    },
-                )
+                if phase.type == "serial":
+                    yield from self._run_serial_phase(state, user_text, phase, turn_prior)
+                elif phase.type == "parallel":
+                    yield from self._run_parallel_phase(state, user_text, phase, turn_prior)
+                else:
+                    yield self._step_error_event("", f"未対応のフェーズ種別: {phase.type}")
 
-    def _loop_marker_target(
-        self,
-        loop_phase: dict[str, Any],
-        bindings: dict[str, list[str]],
-    ) -> tuple[str, str] | None:
-        inner = loop_phase.get("phases") or []
-        if not inner or inner[-1].get("type") != "serial":
-            return None
-        steps = inner[-1].get("steps") or []
-        if not steps:
-            return None
-        expanded = expand_step_to_talents(steps[-1], bindings)
-        return expanded[-1] if expanded else None
+    @staticmethod
+    def _phase_start_event(phase_type: str, iteration: int | None) -> EngineEvent:
+        return EngineEvent("phase_start", {"phase_type": phase_type, "iteration": iteration})
+
+    @staticmethod
+    def _step_error_event(talent_id: str, error: Exception | str) -> EngineEvent:
+        return EngineEvent("step_error", {"talent_id": talent_id, "error": str(error), "retry": False})
 
     def _run_loop_phase(
         self,
         state: EngineState,
         user_text: str,
-        phase: dict[str, Any],
-        bindings: dict[str, list[str]],
+        phase: PlannedPhase,
         turn_prior: list[tuple[str, str]],
     ) -> Iterator[EngineEvent]:
-        exit_cfg = phase.get("exit") or {}
-        exit_type = exit_cfg.get("type")
-        max_iter = phase.get("max_iterations", 999999 if exit_type == "user" else 1)
-        inner_phases = phase.get("phases") or []
-
-        for iteration in range(1, max_iter + 1):
-            iter_start_len = len(turn_prior)
-            yield EngineEvent(
-                "phase_start",
-                {"phase_type": "loop", "iteration": iteration},
-            )
-            yield from self._run_phases(
-                inner_phases,
-                state,
-                user_text,
-                bindings,
-                turn_prior,
-                loop_phase=phase,
-                iteration=iteration,
-            )
-
-            last_text = turn_prior[-1][1] if len(turn_prior) > iter_start_len else ""
-            should_exit = False
-            reason = ""
-
-            if exit_type == "marker":
-                marker = exit_cfg.get("marker", "")
-                should_exit = bool(marker and marker in last_text)
-                reason = f"marker '{marker}' {'detected' if should_exit else 'not found'}"
-            elif exit_type == "judge":
-                outcome = yield from self._run_judge_step(
+        for iteration in range(1, phase.max_iterations + 1):
+            with state.tracer.span("iteration", iteration=iteration):
+                iter_start_len = len(turn_prior)
+                yield self._phase_start_event("loop", iteration)
+                yield from self._run_phases(
+                    phase.phases,
                     state,
                     user_text,
-                    exit_cfg.get("slot", ""),
-                    exit_cfg.get("criteria", ""),
-                    bindings,
                     turn_prior,
+                    iteration=iteration,
                 )
-                should_exit = "【判定】終了" in (outcome.text if outcome else "")
-                reason = outcome.text if outcome else ""
-            elif exit_type == "user":
-                prompt = exit_cfg.get("prompt", "続けますか？")
-                choice = yield EngineEvent(
-                    "await_choice",
-                    {
-                        "prompt": prompt,
-                        "choices": ["continue", "exit"],
-                    },
+
+                judge_outcome, choice = None, None
+                if phase.exit.type == "judge":
+                    judge_outcome = yield from self._run_judge_step(
+                        state,
+                        user_text,
+                        phase.exit.judge,
+                        turn_prior,
+                    )
+                elif phase.exit.type == "user":
+                    choice = yield self._loop_choice_event(phase)
+
+                should_exit, reason = self._loop_exit_decision(
+                    phase, iteration, turn_prior[iter_start_len:], judge_outcome, choice
                 )
-                should_exit = choice == "exit"
-                reason = f"user chose {choice}"
-            else:
-                should_exit = iteration >= max_iter
-                reason = "max_iterations reached"
+                yield self._loop_check_event(phase, iteration, should_exit, reason)
+                if self._loop_finished(phase, iteration, should_exit):
+                    break
+                self._compact_turn_prior(state, phase, turn_prior, iteration)
+
+    @staticmethod
+    def _loop_choice_event(phase: PlannedPhase) -> EngineEvent:
+        return EngineEvent(
+            "await_choice",
+            {"prompt": phase.exit.prompt, "choices": ["continue", "exit"]},
+        )
 
-            yield EngineEvent(
-                "loop_check",
-                {
-                    "iteration": iteration,
-                    "exit_type": exit_type or "max_iterations",
-                    "result": "exit" if should_exit else "continue",
-                    "reason": reason,
-                },
-            )
-            if should_exit:
-                break
-            if exit_type != "user" and iteration >= max_iter:
-                break
+    @staticmethod
+    def _loop_exit_decision(
+        phase: PlannedPhase,
+        iteration: int,
+        iteration_prior: list[tuple[str, str]],
+        judge_outcome: StepOutcome | None,
+        choice: Any,
+    ) -> tuple[bool, str]:
+        """Return ``(should_exit, reason)``; the driver runs the judge / asks the user first."""
+        exit_type = phase.exit.type
+        if exit_type == "marker":
+            marker = phase.exit.marker
+            last_text = iteration_prior[-1][1] if iteration_prior else ""
+            should_exit = bool(marker and marker in last_text)
+            return should_exit, f"marker '{marker}' {'detected' if should_exit else 'not found'}"
+        if exit_type == "judge":
+            verdict = judge_outcome.text if judge_outcome else ""
+            return "【判定】終了" in verdict, verdict
+        if exit_type == "user":
+            return choice == "exit", f"user chose {choice}"
+        return iteration >= phase.max_iterations, "max_iterations reached"
+
+    @staticmethod
+    def _loop_check_event(
+        phase: PlannedPhase,
+        iteration: int,
+        should_exit: bool,
+        reason: str,
+    ) -> EngineEvent:
+        return EngineEvent(
+            "loop_check",
+            {
+                "iteration": iteration,
+                "exit_type": phase.exit.type or "max_iterations",
+                "result": "exit" if should_exit else "continue",
+                "reason": reason,
+            },
+        )
 
-    def _run_judge_step(
+    @staticmethod
+    def _loop_finished(phase: PlannedPhase, iteration: int, should_exit: bool) -> bool:
+        # user 終了条件以外は上限に達したら打ち切る（最後の周回の後は畳まない）
+        return should_exit or (phase.exit.type != "user" and iteration >= phase.max_iterations)
+
+    def _compact_turn_prior(
         self,
         state: EngineState,
-        user_text: str,
-        slot: str,
-        criteria: str,
-        bindings: dict[str, list[str]],
+        phase: PlannedPhase,
         turn_prior: list[tuple[str, str]],
-    ) -> Iterator[EngineEvent, None, StepOutcome | None]:
-        talent_ids = bindings.get(slot, [])
-        if not talent_ids:
+        iteration: int,
+    ) -> None:
+        request = self._compaction_request(state, phase, turn_prior)
+        if request is None:
+            return
+        older, call = request
+        with state.tracer.span("compaction", iteration=iteration, entries=len(older)):
+            result = None
+            if call is not None:
+                try:
+                    result = invoke_llm_step(**call)
+                except Exception:
+                    # 要約に失敗しても会話は止めない（extractive で代替）
+                    result = None
+            self._apply_compaction(state, phase, iteration, turn_prior, older, result)
+
+    def _compaction_request(
+        self,
+        state: EngineState,
+        phase: PlannedPhase,
+        turn_prior: list[tuple[str, str]],
+    ) -> tuple[list[tuple[str, str]], dict[str, Any] | None] | None:
+        """Return the entries to fold and the scribe's summary call (``None`` for extractive)."""
+        config = phase.compaction
+        older = split_for_compaction(turn_prior, config.keep_last) if config else None
+        if config is None or older is None:
             return None
-        talent_id = talent_ids[0]
-        action = (
-            f"終了条件: {criteria}\n\n"
-            "出力は必ず「【判定】継続」または「【判定】終了」で始め、理由を続けてください。"
+        scribe = phase.compaction_step
+        if scribe is None:
+            return older, None
+        system_prompt, user_message = summary_prompts(older, config.max_summary_chars)
+        call = self._llm_call(
+            state,
+            scribe.assistant,
+            scribe.model or "",
+            system_prompt,
+            user_message,
+            ConversationHistory(),
+            temperature=0.0,
+            stream=False,
         )
-        ephemeral = ConversationHistory()
-        talent = self.ctx.talents.get(talent_id, {})
-        mapping = self.ctx.model_mapping.get(talent_id, {})
-        assistant = mapping.get("assistant", "")
-        display_name = talent.get("name", talent_id)
+        return older, call
 
-        state.step_number += 1
-        yield EngineEvent(
-            "step_start",
-            {"talent_id": talent_id, "display_name": display_name, "action": action, "judge": True},
+    def _apply_compaction(
+        self,
+        state: EngineState,
+        phase: PlannedPhase,
+        iteration: int,
+        turn_prior: list[tuple[str, str]],
+        older: list[tuple[str, str]],
+        result: Any,
+    ) -> None:
+        assert phase.compaction is not None
+        scribe = phase.compaction_step
+        if result is not None and result.text.strip():
+            summary = result.text.strip()
+        else:
+            summary = extractive_summary(older, phase.compaction.max_summary_chars)
+        tokens_before = prior_tokens(older)
+        tokens_after = prior_tokens([(COMPACTION_LABEL, summary)])
+        # 短い発言ばかりで要約の方が長くなる場合は畳まない（model 要約の費用だけは記録する）
+        if tokens_after < tokens_before:
+            apply_summary(turn_prior, len(older), summary)
+        else:
+            tokens_after = tokens_before
+        assert state.logger is not None
+        state.logger.log_compaction(
+            iteration=iteration,
+            strategy="model" if result is not None else "extractive",
+            entries=len(older),
+            tokens_before=tokens_before,
+            tokens_after=tokens_after,
+            talent_id=scribe.talent_id if result is not None and scribe else None,
+            cost=result.cost if result is not None else 0.0,
         )
 
-        system_prompt = self._build_system_prompt(talent, talent_id, state)
-        user_message = build_user_message(
-            user_text,
-            action=action,
-            attachment_context=state.attachment_context,
-            prior_responses=turn_prior or None,
-        )
+    def _run_judge_step(
+        self,
+        state: EngineState,
+        user_text: str,
+        judge: PlannedStep | None,
+        turn_prior: list[tuple[str, str]],
+    ) -> Generator[EngineEvent, None, StepOutcome | None]:
+        if judge is None:
+            return None
+        talent_id = judge.talent_id
+        action = judge.action
 
+        state.step_number += 1
+        yield self._step_start_event(talent_id, judge.speaker, action, judge=True)
         try:
-            if assistant == "mock":
-                result = invoke_mock_step(
-                    talent_id,
-                    state.step_number,
-                    stream=False,
-                    history=ephemeral,
-                    user_message=user_message,
-                    action=action,
+            if judge.assistant == "human":
+                briefing, _ = self._human_prompts(state, talent_id, user_text, action, turn_prior or None)
+                response = yield self._await_text_event(
+                    talent_id, judge.speaker, action, briefing, judge=True
                 )
-            elif assistant == "human":
-                briefing = system_prompt
-                response = yield EngineEvent(
-                    "await_text",
-                    {
-                        "talent_id": talent_id,
-                        "display_name": display_name,
-                        "action": action,
-                        "briefing": briefing,
-                        "judge": True,
-                    },
-                )
-                text = str(response or "").strip()
-                result = InvokeResultShim(text, stream=False)
+                result = InvokeResultShim(str(response or "").strip(), stream=False)
+                outcome = self._record_step(state, talent_id, action, result, stream=False)
             else:
-                model = mapping.get("model", "")
-                assistant_cfg = self.ctx.assistants[assistant]
-                result = invoke_llm_step(
-                    assistant_name=assistant,
-                    assistant_cfg=assistant_cfg,
-                    model=model,
-                    system_prompt=system_prompt,
-                    user_message=user_message,
-                    history=ephemeral,
-                    temperature=state.temperature,
-                    stream=False,
-                    costs=state.logger.costs,
+                # 判定は会話履歴に残さない（使い捨ての履歴で呼ぶ）
+                outcome = self._run_step_sync(
+                    state,
+                    user_text,
+                    talent_id,
+                    action,
+                    state.step_number,
+                    None,
+                    turn_prior or None,
+                    history=ConversationHistory(),
                 )
         except Exception as exc:
-            yield EngineEvent(
-                "step_error",
-                {"talent_id": talent_id, "error": str(exc), "retry": False},
-            )
+            yield self._step_error_event(talent_id, exc)
             return None
 
-        metrics = StepMetrics(
-            talent_id=talent_id,
-            assistant=assistant,
-            model=mapping.get("model"),
-            action=action,
-            text=result.text,
-            stream=False,
-            elapsed=result.elapsed,
-            tokens_in=result.tokens_in,
-            tokens_out=result.tokens_out,
-            tokens_source=result.tokens_source,
-            cost=result.cost,
-        )
-        state.logger.log_step(metrics)
-        yield EngineEvent(
-            "step_done",
-            {
-                "talent_id": talent_id,
-                "assistant": assistant,
-                "model": mapping.get("model"),
-                "text": result.text,
-                "elapsed": result.elapsed,
-                "tokens": {
-                    "in": result.tokens_in,
-                    "out": result.tokens_out,
-                    "source": result.tokens_source,
-                },
-                "cost": result.cost,
-                "stream": False,
-                "judge": True,
-            },
-        )
-        return StepOutcome(
-            talent_id=talent_id,
-            assistant=assistant,
-            model=mapping.get("model"),
-            action=action,
-            text=result.text,
-            stream=False,
-            elapsed=result.elapsed,
-            tokens_in=result.tokens_in,
-            tokens_out=result.tokens_out,
-            tokens_source=result.tokens_source,
-            cost=result.cost,
-        )
-
-    def _interrupt_markers(self) -> list[str]:
-        workflow, _ = self._resolve_workflow()
-        return resolve_interrupt_markers(workflow, self.ctx.org)
-
-    def _inject_interrupt_action(self, action: str, markers: list[str]) -> str:
-        if not markers:
-            return action
-        marker = markers[0]
-        if marker in action and "割り込み" in action:
-            return action
-        return (
-            f"{action}\n\n"
-            f"（割り込み）ユーザーへ確認・質問するときは、"
-            f"応答の末尾に必ず「{marker}」を付けてください。"
-        )
-
-    def _inject_marker_action(
-        self,
-        talent_id: str,
-        action: str,
-        marker_target: tuple[str, str] | None,
-        marker_text: str | None,
-    ) -> str:
-        if not marker_target or not marker_text:
-            return action
-        if (talent_id, action) != marker_target:
-            return action
-        return (
-            f"{action}\n\n"
-            f"（終了条件）合意・結論に至った場合は応答に「{marker_text}」を含めてください。"
-        )
+        yield EngineEvent("step_done", {**self._step_done_payload(outcome), "judge": True})
+        return outcome
 
     def _run_serial_phase(
         self,
         state: EngineState,
         user_text: str,
-        phase: dict[str, Any],
-        bindings: dict[str, list[str]],
+        phase: PlannedPhase,
         turn_prior: list[tuple[str, str]],
-        *,
-        marker_target: tuple[str, str] | None = None,
-        marker_text: str | None = None,
     ) -> Iterator[EngineEvent]:
         serial_prior: list[tuple[str, str]] = []
-        interrupt_markers = self._interrupt_markers()
-        for step in phase.get("steps") or []:
-            for talent_id, action in expand_step_to_talents(step, bindings):
-                action = self._inject_marker_action(talent_id, action, marker_target, marker_text)
-                action = self._inject_interrupt_action(action, interrupt_markers)
-                prior = turn_prior + serial_prior
-                gen = self._execute_step(
-                    state,
-                    user_text,
-                    talent_id,
-                    action,
-                    prior_responses=prior or None,
-                    stream=state.stream,
-                    phase_type="serial",
-                )
-                outcome = yield from gen
-                if outcome:
-                    serial_prior.append((self._speaker_label(outcome.talent_id), outcome.text))
-                    interrupt_reply = yield from self._handle_user_interrupt(state, outcome)
-                    if interrupt_reply:
-                        serial_prior.append((USER_INTERRUPT_DISPLAY, interrupt_reply))
+        for step in phase.steps:
+            prior = turn_prior + serial_prior
+            gen = self._execute_step(
+                state,
+                user_text,
+                step.talent_id,
+                step.action,
+                prior_responses=prior or None,
+                stream=state.stream,
+                phase_type="serial",
+            )
+            outcome = yield from gen
+            if outcome:
+                serial_prior.append(self._prior_entry(outcome))
+                interrupt_reply = yield from self._handle_user_interrupt(state, outcome)
+                if interrupt_reply:
+                    serial_prior.append((USER_INTERRUPT_DISPLAY, interrupt_reply))
         turn_prior.extend(serial_prior)
 
+    def _prior_entry(self, outcome: StepOutcome) -> tuple[str, str]:
+        return self._speaker_label(outcome.talent_id), outcome.text
+
     def _run_parallel_phase(
         self,
         state: EngineState,
         user_text: str,
-        phase: dict[str, Any],
-        bindings: dict[str, list[str]],
+        phase: PlannedPhase,
         turn_prior: list[tuple[str, str]],
     ) -> Iterator[EngineEvent]:
-        tasks: list[tuple[str, str]] = []
-        for step in phase.get("steps") or []:
-            for talent_id, action in expand_step_to_talents(step, bindings):
-                tasks.append((talent_id, action))
-
+        tasks, ai_tasks, human_tasks = self._split_parallel_tasks(phase)
         if not tasks:
             return
 
-        interrupt_markers = self._interrupt_markers()
-        ai_tasks: list[tuple[str, str]] = []
-        human_tasks: list[tuple[str, str]] = []
-        for talent_id, action in tasks:
-            action = self._inject_interrupt_action(action, interrupt_markers)
-            assistant = self.ctx.model_mapping.get(talent_id, {}).get("assistant")
-            if assistant == "human":
-                human_tasks.append((talent_id, action))
-            else:
-                ai_tasks.append((talent_id, action))
-
-        order = {tid: i for i, (tid, _) in enumerate(tasks)}
         outcomes: list[StepOutcome] = []
+        as_completed_mode = self._parallel_as_completed(state)
 
         if ai_tasks:
-            max_workers = min(
-                len(ai_tasks), int(state.ctx.studio_config.get("max_parallel_calls", 8))
-            )
-            ai_step_numbers: list[tuple[str, str, int]] = []
-            for talent_id, action in ai_tasks:
-                state.step_number += 1
-                ai_step_numbers.append((talent_id, action, state.step_number))
-
-            parallel_prior = list(turn_prior)
-            with ThreadPoolExecutor(max_workers=max_workers) as pool:
-                futures = {
-                    pool.submit(
-                        self._run_step_sync,
-                        state,
-                        user_text,
-                        talent_id,
-                        action,
-                        step_no,
-                        "parallel",
-                        parallel_prior or None,
-                    ): talent_id
-                    for talent_id, action, step_no in ai_step_numbers
-                }
-                for future in as_completed(futures):
-                    outcomes.append(future.result())
+            max_workers = min(len(ai_tasks), self._max_parallel_calls(state))
+            ai_step_numbers = self._number_parallel_steps(state, ai_tasks)
+            parallel_prior = list(turn_prior) or None
+            if as_completed_mode:
+                outcomes.extend(
+                    (
+                        yield from self._run_parallel_as_completed(
+                            state,
+                            user_text,
+                            ai_step_numbers,
+                            parallel_prior,
+                            max_workers,
+                        )
+                    )
+                )
+            else:
+                with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                    futures = {
+                        pool.submit(
+                            carry(state.tracer.wrap(self._run_step_sync)),
+                            state,
+                            user_text,
+                            talent_id,
+                            action,
+                            step_no,
+                            "parallel",
+                            parallel_prior,
+                            queued_at=time.perf_counter(),
+                        ): talent_id
+                        for talent_id, action, step_no in ai_step_numbers
+                    }
+                    for future in as_completed(futures):
+                        outcomes.append(future.result())
 
         for talent_id, action in human_tasks:
-            prior = turn_prior + [
-                (self._speaker_label(o.talent_id), o.text) for o in outcomes
-            ]
+            prior = turn_prior + [self._prior_entry(o) for o in outcomes]
             outcome = yield from self._execute_step(
                 state,
                 user_text,
@@ -656,41 +827,183 @@ class SessionEngine:
             if outcome:
                 outcomes.append(outcome)
 
-        outcomes.sort(key=lambda o: order.get(o.talent_id, 999))
-        for outcome in outcomes:
-            display_name = self.ctx.talents.get(outcome.talent_id, {}).get(
-                "name", outcome.talent_id
-            )
-            yield EngineEvent(
-                "step_start",
-                {
-                    "talent_id": outcome.talent_id,
-                    "display_name": display_name,
-                    "action": outcome.action,
-                },
-            )
-            yield EngineEvent(
-                "step_done",
-                {
-                    "talent_id": outcome.talent_id,
-                    "assistant": outcome.assistant,
-                    "model": outcome.model,
-                    "text": outcome.text,
-                    "elapsed": outcome.elapsed,
-                    "tokens": {
-                        "in": outcome.tokens_in,
-                        "out": outcome.tokens_out,
-                        "source": outcome.tokens_source,
-                    },
-                    "cost": outcome.cost,
-                    "stream": outcome.stream,
-                },
-            )
-            turn_prior.append((self._speaker_label(outcome.talent_id), outcome.text))
+        for outcome in self._in_phase_order(tasks, outcomes):
+            if not as_completed_mode:
+                yield from self._replay_events(outcome)
+            turn_prior.append(self._prior_entry(outcome))
             interrupt_reply = yield from self._handle_user_interrupt(state, outcome)
             if interrupt_reply:
                 turn_prior.append((USER_INTERRUPT_DISPLAY, interrupt_reply))
 
+    def _split_parallel_tasks(
+        self,
+        phase: PlannedPhase,
+    ) -> tuple[list[tuple[str, str]], list[tuple[str, str]], list[tuple[str, str]]]:
+        """Return (all, ai, human) ``(talent_id, action)`` pairs for a parallel phase."""
+        tasks = [(step.talent_id, step.action) for step in phase.steps]
+        ai_tasks = [(step.talent_id, step.action) for step in phase.steps if step.assistant != "human"]
+        human_tasks = [(step.talent_id, step.action) for step in phase.steps if step.assistant == "human"]
+        return tasks, ai_tasks, human_tasks
+
+    @staticmethod
+    def _parallel_as_completed(state: EngineState) -> bool:
+        return state.ctx.studio_config.get("parallel_events", "ordered") == "as_completed"
+
+    @staticmethod
+    def _max_parallel_calls(state: EngineState) -> int:
+        return int(state.ctx.studio_config.get("max_parallel_calls", 8))
+
+    @staticmethod
+    def _number_parallel_steps(
+        state: EngineState,
+        ai_tasks: list[tuple[str, str]],
+    ) -> list[tuple[str, str, int]]:
+        """Assign step numbers up front so they follow phase order, not completion order."""
+        numbered: list[tuple[str, str, int]] = []
+        for talent_id, action in ai_tasks:
+            state.step_number += 1
+            numbered.append((talent_id, action, state.step_number))
+        return numbered
+
+    @staticmethod
+    def _in_phase_order(
+        tasks: list[tuple[str, str]],
+        outcomes: list[StepOutcome],
+    ) -> list[StepOutcome]:
+        order = {tid: i for i, (tid, _) in enumerate(tasks)}
+        return sorted(outcomes, key=lambda o: order.get(o.talent_id, 999))
+
+    def _replay_events(self, outcome: StepOutcome) -> tuple[EngineEvent, EngineEvent]:
+        """ordered モード：完了済みの並列 step を phase 順に step_start / step_done で流す。"""
+        return (
+            self._step_start_event(outcome.talent_id, self._speaker_label(outcome.talent_id), outcome.action),
+            EngineEvent("step_done", self._step_done_payload(outcome)),
+        )
+
+    def _parallel_start_event(self, talent_id: str, action: str) -> EngineEvent:
+        return self._step_start_event(
+            talent_id, self._speaker_label(talent_id), action, phase_type="parallel"
+        )
+
+    @staticmethod
+    def _parallel_chunk_event(talent_id: str, text: str) -> EngineEvent:
+        return EngineEvent("chunk", {"talent_id": talent_id, "text": text, "phase_type": "parallel"})
+
+    def _parallel_done_event(self, outcome: StepOutcome) -> EngineEvent:
+        return EngineEvent(
+            "step_done",
+            {
+                **self._step_done_payload(outcome),
+                "display_name": self._speaker_label(outcome.talent_id),
+                "phase_type": "parallel",
+            },
+        )
+
+    def _run_parallel_as_completed(
+        self,
+        state: EngineState,
+        user_text: str,
+        ai_step_numbers: list[tuple[str, str, int]],
+        prior_responses: list[tuple[str, str]] | None,
+        max_workers: int,
+    ) -> Generator[EngineEvent, None, list[StepOutcome]]:
+        """Yield each talent's step_start / chunk / step_done the moment it happens.
+
+        A failing step is re-raised once every worker has finished, as in ordered mode.
+        """
+        events: queue.Queue[Any] = queue.Queue()
+        outcomes: list[StepOutcome] = []
+        errors: list[Exception] = []
+
+        def run(talent_id: str, action: str, step_no: int, queued_at: float) -> None:
+            try:
+                events.put(self._parallel_start_event(talent_id, action))
+
+                def on_chunk(text: str) -> None:
+                    events.put(self._parallel_chunk_event(talent_id, text))
+
+                try:
+                    outcome = self._run_step_sync(
+                        state,
+                        user_text,
+                        talent_id,
+                        action,
+                        step_no,
+                        "parallel",
+                        prior_responses,
+                        stream=state.stream,
+                        on_chunk=on_chunk if state.stream else None,
+                        queued_at=queued_at,
+                    )
+                except Exception as exc:
+                    errors.append(exc)
+                    return
+                outcomes.append(outcome)
+                events.put(self._parallel_done_event(outcome))
+            finally:
+                events.put(_STREAM_END)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for talent_id, action, step_no in ai_step_numbers:
+                pool.submit(carry(state.tracer.wrap(run)), talent_id, action, step_no, time.perf_counter())
+            remaining = len(ai_step_numbers)
+            while remaining:
+                item = events.get()
+                if item is _STREAM_END:
+                    remaining -= 1
+                    continue
+                yield item
+        if errors:
+            # ordered モードの future.result() と同じく、最初に失敗した step の例外で止める
+            raise errors[0]
+        return outcomes
+
+    @staticmethod
+    def _step_start_event(talent_id: str, display_name: str, action: str, **extra: Any) -> EngineEvent:
+        return EngineEvent(
+            "step_start",
+            {"talent_id": talent_id, "display_name": display_name, "action": action, **extra},
+        )
+
+    @staticmethod
+    def _await_text_event(
+        talent_id: str,
+        display_name: str,
+        action: str,
+        briefing: str,
+        **extra: Any,
+    ) -> EngineEvent:
+        return EngineEvent(
+            "await_text",
+            {
+                "talent_id": talent_id,
+                "display_name": display_name,
+                "action": action,
+                "briefing": briefing,
+                **extra,
+            },
+        )
+
+    def _step_done_payload(self, outcome: StepOutcome) -> dict[str, Any]:
+        return {
+            "talent_id": outcome.talent_id,
+            "assistant": outcome.assistant,
+            "model": outcome.model,
+            "text": outcome.text,
+            "elapsed": outcome.elapsed,
+            "tokens": {
+                "in": outcome.tokens_in,
+                "out": outcome.tokens_out,
+                "source": outcome.tokens_source,
+                "cached": outcome.tokens_cached,
+            },
+            "cost": outcome.cost,
+            "stream": outcome.stream,
+            "rate_limit_wait": outcome.rate_limit_wait,
+            "cache": outcome.cache,
+            "timing": outcome.timing.to_record() if outcome.timing else None,
+        }
+
     def _run_step_sync(
         self,
         state: EngineState,
@@ -700,57 +1013,207 @@ class SessionEngine:
         step_number: int,
         phase_type: str | None = None,
         prior_responses: list[tuple[str, str]] | None = None,
+        *,
+        stream: bool = False,
+        on_chunk: Callable[[str], None] | None = None,
+        history: ConversationHistory | None = None,
+        queued_at: float | None = None,
     ) -> StepOutcome:
+        """Run one AI step; ``queued_at`` (perf_counter at submit) records the wait for a worker."""
+        queue_wait = time.perf_counter() - queued_at if queued_at is not None else 0.0
+        with state.tracer.span("step", talent_id=talent_id, step=step_number, phase_type=phase_type):
+            is_mock, call = self._step_call(
+                state, user_text, talent_id, action, step_number, prior_responses, stream=stream, history=history
+            )
+            invoke = invoke_mock_step if is_mock else invoke_llm_step
+            result = invoke(**call, on_chunk=on_chunk)
+            return self._record_step(
+                state,
+                talent_id,
+                action,
+                result,
+                stream=result.stream,
+                phase_type=phase_type,
+                queue_wait=queue_wait,
+            )
+
+    def _step_call(
+        self,
+        state: EngineState,
+        user_text: str,
+        talent_id: str,
+        action: str,
+        step_number: int,
+        prior_responses: list[tuple[str, str]] | None,
+        *,
+        stream: bool,
+        history: ConversationHistory | None = None,
+    ) -> tuple[bool, dict[str, Any]]:
+        """Return ``(is_mock, kwargs)`` for ``invoke_mock_step`` / ``invoke_llm_step`` (or the async twins).
+
+        ``on_chunk`` is left to the driver, which knows how chunks are delivered.
+        """
         talent = self.ctx.talents.get(talent_id, {})
         mapping = self.ctx.model_mapping.get(talent_id, {})
         assistant = mapping.get("assistant", "")
+        system_prompt, user_message = self._step_prompts(
+            state, talent, talent_id, user_text, action, prior_responses
+        )
+        if history is None:
+            history = state.histories.for_talent(talent_id)
+        if assistant == "mock":
+            return True, {
+                "talent_id": talent_id,
+                "step_number": step_number,
+                "stream": stream,
+                "history": history,
+                "user_message": user_message,
+                "action": action,
+            }
+        call = self._llm_call(
+            state,
+            assistant,
+            mapping.get("model", ""),
+            system_prompt,
+            user_message,
+            history,
+            temperature=state.temperature,
+            stream=stream,
+        )
+        return False, call
+
+    def _llm_call(
+        self,
+        state: EngineState,
+        assistant: str,
+        model: str,
+        system_prompt: str,
+        user_message: str,
+        history: ConversationHistory,
+        *,
+        temperature: float | None,
+        stream: bool,
+    ) -> dict[str, Any]:
+        """Keyword arguments shared by ``invoke_llm_step`` and ``ainvoke_llm_step``."""
+        assert state.logger is not None
+        return {
+            "assistant_name": assistant,
+            "assistant_cfg": self.ctx.assistants[assistant],
+            "model": model,
+            "system_prompt": system_prompt,
+            "user_message": user_message,
+            "history": history,
+            "temperature": temperature,
+            "stream": stream,
+            "costs": state.logger.costs,
+            "rate_limits": self.ctx.studio_config.get("rate_limits"),
+            "response_cache": state.response_cache,
+            "tracer": state.tracer,
+        }
+
+    def _step_prompts(
+        self,
+        state: EngineState,
+        talent: dict[str, Any],
+        talent_id: str,
+        user_text: str,
+        action: str,
+        prior_responses: list[tuple[str, str]] | None,
+    ) -> tuple[str, str]:
         system_prompt = self._build_system_prompt(talent, talent_id, state)
+        attachment_context = state.attachment_context
+        if attachment_context and state.attachment_index is not None:
+            attachment_context = self._turn_excerpt(state, state.attachment_index, user_text)
+        # 添付は system prompt の最後のブロック。抜粋もターン内では変わらないので全ステップでキャッシュに乗る（5.1.2 節）
+        system_prompt = with_attachment_block(system_prompt, attachment_context)
         user_message = build_user_message(
             user_text,
             action=action,
-            attachment_context=state.attachment_context,
             prior_responses=prior_responses,
         )
-        history = state.histories.for_talent(talent_id)
+        return system_prompt, user_message
 
-        if assistant == "mock":
-            result = invoke_mock_step(
-                talent_id,
-                step_number,
-                stream=False,
-                history=history,
-                user_message=user_message,
-                action=action,
-            )
-        else:
-            model = mapping.get("model", "")
-            assistant_cfg = self.ctx.assistants[assistant]
-            result = invoke_llm_step(
-                assistant_name=assistant,
-                assistant_cfg=assistant_cfg,
-                model=model,
-                system_prompt=system_prompt,
-                user_message=user_message,
-                history=history,
-                temperature=state.temperature,
-                stream=False,
-                costs=state.logger.costs,
-            )
+    def _human_prompts(
+        self,
+        state: EngineState,
+        talent_id: str,
+        user_text: str,
+        action: str,
+        prior_responses: list[tuple[str, str]] | None,
+    ) -> tuple[str, str]:
+        """Return ``(briefing, user_message)`` for a step answered by a human.
+
+        The briefing is printed / posted to the chat, so it leaves out the attachment block.
+        """
+        talent = self.ctx.talents.get(talent_id, {})
+        briefing = self._build_system_prompt(talent, talent_id, state)
+        user_message = build_user_message(
+            user_text,
+            action=action,
+            prior_responses=prior_responses,
+        )
+        return briefing, user_message
 
+    @staticmethod
+    def _record_human_reply(
+        state: EngineState,
+        talent_id: str,
+        user_message: str,
+        response: Any,
+    ) -> InvokeResultShim:
+        text = str(response).strip()
+        history = state.histories.for_talent(talent_id)
+        history.add_message(HumanMessage(content=user_message))
+        history.add_message(AIMessage(content=text))
+        return InvokeResultShim(text, stream=False)
+
+    @staticmethod
+    def _turn_excerpt(state: EngineState, index: AttachmentIndex, user_text: str) -> str:
+        """Rank attachment chunks once per turn (user input only, not the step action)."""
+        cached = state.attachment_excerpt
+        if cached is not None and cached[0] is index and cached[1] == user_text:
+            return cached[2]
+        excerpt = index.excerpt(user_text)
+        state.attachment_excerpt = (index, user_text, excerpt)
+        return excerpt
+
+    def _record_step(
+        self,
+        state: EngineState,
+        talent_id: str,
+        action: str,
+        result: Any,
+        *,
+        stream: bool,
+        phase_type: str | None = None,
+        queue_wait: float = 0.0,
+    ) -> StepOutcome:
+        """Log the step's metrics and return its outcome."""
+        mapping = self.ctx.model_mapping.get(talent_id, {})
+        assistant = mapping.get("assistant", "")
+        timing = getattr(result, "timing", None)
+        if queue_wait > 0 and timing is not None:
+            timing = replace(timing, queue_wait=queue_wait)
         metrics = StepMetrics(
             talent_id=talent_id,
             assistant=assistant,
             model=mapping.get("model"),
             action=action,
             text=result.text,
-            stream=False,
+            stream=stream,
             elapsed=result.elapsed,
             tokens_in=result.tokens_in,
             tokens_out=result.tokens_out,
             tokens_source=result.tokens_source,
             cost=result.cost,
             phase_type=phase_type,
+            rate_limit_wait=getattr(result, "rate_limit_wait", 0.0),
+            cache=getattr(result, "cache", None),
+            timing=timing,
+            tokens_cached=getattr(result, "tokens_cached", 0),
+            tokens_cache_write=getattr(result, "tokens_cache_write", 0),
         )
+        assert state.logger is not None
         state.logger.log_step(metrics)
         return StepOutcome(
             talent_id=talent_id,
@@ -758,14 +1221,64 @@ class SessionEngine:
             model=mapping.get("model"),
             action=action,
             text=result.text,
-            stream=False,
+            stream=stream,
             elapsed=result.elapsed,
             tokens_in=result.tokens_in,
             tokens_out=result.tokens_out,
             tokens_source=result.tokens_source,
             cost=result.cost,
+            rate_limit_wait=metrics.rate_limit_wait,
+            cache=metrics.cache,
+            timing=timing,
+            tokens_cached=metrics.tokens_cached,
+            tokens_cache_write=metrics.tokens_cache_write,
         )
 
+    def _stream_on_worker(
+        self,
+        talent_id: str,
+        call: Callable[[Callable[[str], None]], Any],
+        tracer: Tracer = NULL_TRACER,
+    ) -> Generator[EngineEvent, None, Any]:
+        """Run a streaming provider call on a worker thread and yield chunks as they arrive.
+
+        Values passed in via ``send()`` while a chunk is pending are ignored, so callers
+        driving ``await_text`` / ``await_choice`` keep working unchanged. If the consumer
+        closes the generator mid-stream, the worker's next chunk raises ``StreamCancelled``
+        so the provider call stops instead of running to the end.
+        """
+        chunks: queue.Queue[Any] = queue.Queue()
+        outcome: dict[str, Any] = {}
+        cancelled = threading.Event()
+
+        def on_chunk(text: str) -> None:
+            if cancelled.is_set():
+                raise StreamCancelled(talent_id)
+            chunks.put(text)
+
+        def worker() -> None:
+            try:
+                outcome["result"] = call(on_chunk)
+            except BaseException as exc:
+                outcome["error"] = exc
+            finally:
+                chunks.put(_STREAM_END)
+
+        threading.Thread(target=carry(tracer.wrap(worker)), name=f"studio-stream-{talent_id}", daemon=True).start()
+        try:
+            while True:
+                item = chunks.get()
+                if item is _STREAM_END:
+                    break
+                yield EngineEvent("chunk", {"talent_id": talent_id, "text": item})
+        finally:
+            # 消費側が途中で close した（GeneratorExit）ときもワーカーを止める
+            cancelled.set()
+
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
     def _execute_step(
         self,
         state: EngineState,
@@ -776,142 +1289,47 @@ class SessionEngine:
         prior_responses: list[tuple[str, str]] | None,
         stream: bool,
         phase_type: str | None = None,
-    ) -> Iterator[EngineEvent, None, StepOutcome | None]:
-        talent = self.ctx.talents.get(talent_id, {})
-        mapping = self.ctx.model_mapping.get(talent_id, {})
-        assistant = mapping.get("assistant", "")
-        display_name = talent.get("name", talent_id)
+    ) -> Generator[EngineEvent, None, StepOutcome | None]:
+        assistant = self.ctx.model_mapping.get(talent_id, {}).get("assistant", "")
+        display_name = self._speaker_label(talent_id)
 
         state.step_number += 1
-        yield EngineEvent(
-            "step_start",
-            {"talent_id": talent_id, "display_name": display_name, "action": action},
-        )
-
-        system_prompt = self._build_system_prompt(talent, talent_id, state)
-        user_message = build_user_message(
-            user_text,
-            action=action,
-            attachment_context=state.attachment_context,
-            prior_responses=prior_responses,
-        )
-        history = state.histories.for_talent(talent_id)
-        chunk_buffer: list[str] = []
-
-        def on_chunk(text: str) -> None:
-            chunk_buffer.append(text)
-
-        try:
-            if assistant == "mock":
-                result = invoke_mock_step(
-                    talent_id,
-                    state.step_number,
-                    stream=stream,
-                    history=history,
-                    user_message=user_message,
-                    on_chunk=on_chunk if stream else None,
-                    action=action,
-                )
-                if stream:
-                    for chunk in chunk_buffer:
-                        yield EngineEvent("chunk", {"talent_id": talent_id, "text": chunk})
-            elif assistant == "human":
-                briefing = system_prompt
-                response = yield EngineEvent(
-                    "await_text",
-                    {
-                        "talent_id": talent_id,
-                        "display_name": display_name,
-                        "action": action,
-                        "briefing": briefing,
-                    },
-                )
-                while not (response and str(response).strip()):
-                    response = yield EngineEvent(
-                        "await_text",
-                        {
-                            "talent_id": talent_id,
-                            "display_name": display_name,
-                            "action": action,
-                            "briefing": briefing,
-                            "reprompt": True,
-                        },
+        with state.tracer.span(
+            "step", talent_id=talent_id, assistant=assistant, step=state.step_number, phase_type=phase_type
+        ):
+            yield self._step_start_event(talent_id, display_name, action)
+            try:
+                if assistant == "human":
+                    briefing, user_message = self._human_prompts(
+                        state, talent_id, user_text, action, prior_responses
                     )
-                text = str(response).strip()
-                history.add_message(HumanMessage(content=user_message))
-                history.add_message(AIMessage(content=text))
-                result = InvokeResultShim(text, stream=False)
-            else:
-                model = mapping.get("model", "")
-                assistant_cfg = self.ctx.assistants[assistant]
-                result = invoke_llm_step(
-                    assistant_name=assistant,
-                    assistant_cfg=assistant_cfg,
-                    model=model,
-                    system_prompt=system_prompt,
-                    user_message=user_message,
-                    history=history,
-                    temperature=state.temperature,
-                    stream=stream,
-                    costs=state.logger.costs,
-                    on_chunk=on_chunk if stream else None,
-                )
-                if stream:
-                    for chunk in chunk_buffer:
-                        yield EngineEvent("chunk", {"talent_id": talent_id, "text": chunk})
-        except Exception as exc:
-            yield EngineEvent(
-                "step_error",
-                {"talent_id": talent_id, "error": str(exc), "retry": False},
+                    response = yield self._await_text_event(talent_id, display_name, action, briefing)
+                    while not (response and str(response).strip()):
+                        response = yield self._await_text_event(
+                            talent_id, display_name, action, briefing, reprompt=True
+                        )
+                    result = self._record_human_reply(state, talent_id, user_message, response)
+                else:
+                    is_mock, call = self._step_call(
+                        state, user_text, talent_id, action, state.step_number, prior_responses, stream=stream
+                    )
+                    invoke = invoke_mock_step if is_mock else invoke_llm_step
+                    if stream:
+                        result = yield from self._stream_on_worker(
+                            talent_id, lambda on_chunk: invoke(**call, on_chunk=on_chunk), state.tracer
+                        )
+                    else:
+                        result = invoke(**call)
+            except Exception as exc:
+                yield self._step_error_event(talent_id, exc)
+                return None
+
+            step_stream = getattr(result, "stream", False) if assistant != "human" else False
+            outcome = self._record_step(
+                state, talent_id, action, result, stream=step_stream, phase_type=phase_type
             )
-            return None
-
-        step_stream = getattr(result, "stream", False) if assistant != "human" else False
-        metrics = StepMetrics(
-            talent_id=talent_id,
-            assistant=assistant,
-            model=mapping.get("model"),
-            action=action,
-            text=result.text,
-            stream=step_stream,
-            elapsed=result.elapsed,
-            tokens_in=result.tokens_in,
-            tokens_out=result.tokens_out,
-            tokens_source=result.tokens_source,
-            cost=result.cost,
-            phase_type=phase_type,
-        )
-        state.logger.log_step(metrics)
-        yield EngineEvent(
-            "step_done",
-            {
-                "talent_id": talent_id,
-                "assistant": assistant,
-                "model": mapping.get("model"),
-                "text": result.text,
-                "elapsed": result.elapsed,
-                "tokens": {
-                    "in": result.tokens_in,
-                    "out": result.tokens_out,
-                    "source": result.tokens_source,
-                },
-                "cost": result.cost,
-                "stream": step_stream,
-            },
-        )
-        return StepOutcome(
-            talent_id=talent_id,
-            assistant=assistant,
-            model=mapping.get("model"),
-            action=action,
-            text=result.text,
-            stream=step_stream,
-            elapsed=result.elapsed,
-            tokens_in=result.tokens_in,
-            tokens_out=result.tokens_out,
-            tokens_source=result.tokens_source,
-            cost=result.cost,
-        )
+            yield EngineEvent("step_done", self._step_done_payload(outcome))
+            return outcome
 
     def finish(self) -> EngineEvent:
         if self.state is None:
@@ -919,17 +1337,28 @@ class SessionEngine:
         from studio.artifacts import save_session_artifacts
 
         self.state.logger.total_elapsed = time.perf_counter() - self.state.session_wall_start
+        self.state.logger.flush()
+        self._export_trace(self.state)
         artifact_dir = save_session_artifacts(
             self.state.ctx.root,
             self.state.logger.session_id,
             log_path=self.state.logger.log_path,
         )
-        end_record = self.state.logger.finish()
+        end_record = self.state.logger.finish(artifact_dir=artifact_dir)
         if artifact_dir:
             end_record["artifact_dir"] = str(artifact_dir)
         return EngineEvent("session_done", end_record)
 
 
+def create_engine(ctx: SessionContext) -> SessionEngine:
+    """Build the engine selected by studio_config ``engine`` (thread | asyncio)."""
+    if ctx.studio_config.get("engine", "thread") == "asyncio":
+        from studio.async_engine import AsyncSessionEngine
+
+        return AsyncSessionEngine(ctx)
+    return SessionEngine(ctx)
+
+
 def collect_events(
     engine: SessionEngine,
     user_text: str,
@@ -938,17 +1367,25 @@ def collect_events(
     stream: bool | None = None,
     no_user_context: bool = False,
     responder: Callable[[EngineEvent], str | None] | None = None,
+    on_event: Callable[[EngineEvent], None] | None = None,
+    cache: str | None = None,
+    large_files: list[Path] | None = None,
 ) -> list[EngineEvent]:
+    """Drive one turn to completion; on_event sees each event as it is yielded."""
     events: list[EngineEvent] = []
     gen = engine.run_turn(
         user_text,
         attachment_context=attachment_context,
         stream=stream,
         no_user_context=no_user_context,
+        cache=cache,
+        large_files=large_files,
     )
     event = next(gen)
     while True:
         events.append(event)
+        if on_event:
+            on_event(event)
         if event.type in ("await_text", "await_choice"):
             reply = responder(event) if responder else ""
             if event.type == "await_choice" and not reply:
@@ -962,5 +1399,8 @@ def collect_events(
             event = next(gen)
         except StopIteration:
             break
-    events.append(engine.finish())
+    done = engine.finish()
+    events.append(done)
+    if on_event:
+        on_event(done)
     return events
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import asyncio
+import re
 import time
 from typing import Any
 
@@ -31,6 +33,33 @@ def detect_api_error(error_str: str) -> str | None:
     return None
 
 
+_RETRY_IN_PATTERN = re.compile(
+    r"(?:try again|retry) in\s+(?:(\d+)m)?\s*(\d+(?:\.\d+)?)\s*(ms|s)\b",
+    re.IGNORECASE,
+)
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """Read the server's requested wait from a provider exception (headers, then message text)."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for name, factor in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name) if hasattr(headers, "get") else None
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * factor)
+        except (TypeError, ValueError):
+            continue
+
+    match = _RETRY_IN_PATTERN.search(str(exc))
+    if not match:
+        return None
+    minutes, amount, unit = match.groups()
+    seconds = float(amount) / 1000 if unit.lower() == "ms" else float(amount)
+    return seconds + 60 * int(minutes or 0)
+
+
 def is_temperature_unsupported_error(exc: Exception) -> bool:
     text = str(exc).lower()
     return "temperature" in text and any(
@@ -46,23 +75,59 @@ def is_temperature_unsupported_error(exc: Exception) -> bool:
     )
 
 
-def handle_api_error(
+def retry_wait_seconds(
     error_code: str | None,
     attempt: int,
     max_retries: int,
     retry_delay: float,
     *,
     reduce_history: Any | None = None,
-) -> bool:
-    """Return True if caller should retry."""
+) -> float | None:
+    """Return the wait before retrying (0 for an immediate retry), or None to give up."""
     if error_code == "413" and reduce_history is not None and attempt < max_retries - 1:
         if reduce_history():
-            return True
-        return False
+            return 0.0
+        return None
 
     if error_code in ("429", "503", "504") and attempt < max_retries - 1:
-        wait_time = retry_delay * (2**attempt) if error_code == "429" else retry_delay
+        return retry_delay * (2**attempt) if error_code == "429" else retry_delay
+
+    return None
+
+
+def handle_api_error(
+    error_code: str | None,
+    attempt: int,
+    max_retries: int,
+    retry_delay: float,
+    *,
+    reduce_history: Any | None = None,
+) -> bool:
+    """Return True if caller should retry."""
+    wait_time = retry_wait_seconds(
+        error_code, attempt, max_retries, retry_delay, reduce_history=reduce_history
+    )
+    if wait_time is None:
+        return False
+    if wait_time:
         time.sleep(wait_time)
-        return True
+    return True
 
-    return False
+
+async def ahandle_api_error(
+    error_code: str | None,
+    attempt: int,
+    max_retries: int,
+    retry_delay: float,
+    *,
+    reduce_history: Any | None = None,
+) -> bool:
+    """Async twin of handle_api_error; waits without blocking the event loop."""
+    wait_time = retry_wait_seconds(
+        error_code, attempt, max_retries, retry_delay, reduce_history=reduce_history
+    )
+    if wait_time is None:
+        return False
+    if wait_time:
+        await asyncio.sleep(wait_time)
+    return True
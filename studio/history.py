@@ -2,32 +2,71 @@
 
 from __future__ import annotations
 
-from langchain_core.messages import BaseMessage
+from collections import deque
+from typing import TYPE_CHECKING
+
+from studio.logging import estimate_tokens
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
 
 
 class ConversationHistory:
+    """Deque of messages with a token estimate cached per message (design.md §6.4)."""
+
     def __init__(self, max_length: int = 10) -> None:
         self.max_length = max_length
-        self.messages: list[BaseMessage] = []
+        self._messages: deque[BaseMessage] = deque()
+        self._tokens: deque[int] = deque()
+        self._token_total = 0
+
+    @property
+    def messages(self) -> list[BaseMessage]:
+        return list(self._messages)
 
     def add_message(self, message: BaseMessage) -> None:
-        self.messages.append(message)
-        if len(self.messages) > self.max_length * 2:
-            self.messages = self.messages[-self.max_length * 2 :]
+        tokens = estimate_tokens(str(getattr(message, "content", "")))
+        self._messages.append(message)
+        self._tokens.append(tokens)
+        self._token_total += tokens
+        while len(self._messages) > self.max_length * 2:
+            self._drop_oldest()
 
     def get_messages(self) -> list[BaseMessage]:
-        return self.messages
+        return list(self._messages)
+
+    def _drop_oldest(self) -> None:
+        self._messages.popleft()
+        self._token_total -= self._tokens.popleft()
+
+    def token_estimate(self) -> int:
+        return self._token_total
+
+    def trim_to_tokens(self, budget: int) -> int:
+        """Drop the oldest messages until the estimate fits ``budget``; returns how many were dropped."""
+        from langchain_core.messages import AIMessage
+
+        dropped = 0
+        while self._messages and self._token_total > budget:
+            self._drop_oldest()
+            dropped += 1
+        # User / Assistant の対を崩さない（先頭に応答だけ残さない）
+        while self._messages and isinstance(self._messages[0], AIMessage):
+            self._drop_oldest()
+            dropped += 1
+        return dropped
 
     def reduce_history(self, reduction_factor: float = 0.5) -> bool:
-        if len(self.messages) > 2:
-            new_length = max(2, int(len(self.messages) * reduction_factor))
-            self.messages = self.messages[-new_length:]
+        if len(self._messages) > 2:
+            new_length = max(2, int(len(self._messages) * reduction_factor))
+            while len(self._messages) > new_length:
+                self._drop_oldest()
             return True
         return False
 
     def get_history_size_estimate(self) -> int:
         total = 0
-        for message in self.messages:
+        for message in self._messages:
             if hasattr(message, "content"):
                 total += len(str(message.content))
         return total
@@ -0,0 +1,297 @@
+"""Map-reduce digests for attachments over upload_limits (design.md 5.1.3).
+
+With ``--files-large`` (Web: 「大きな添付を要約して取り込む」) files that
+would fail ``upload_limits`` with E402 are summarised instead. Each file is
+read through ``mmap`` in newline-aligned windows of ``chunk_bytes``; the
+windows are summarised on a bounded thread pool and the summaries merged
+``fan_in`` at a time until the digest fits ``max_digest_chars``. Digests are
+cached under ``cache_dir`` by content hash, so re-attaching the same log or
+spec costs one hashing pass.
+
+Without a summarising model (``large_attachments.assistant``), or when a
+call fails, an extractive digest (headings and error-looking lines) is used.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from studio.profiling import carry
+
+DEFAULT_CACHE_DIR = "cache/large_attachments"
+HASH_BLOCK = 1 << 20
+
+# (system_prompt, user_message) → 要約。None のときは抽出で代替する
+Summarise = Callable[[str, str], str]
+Progress = Callable[[dict[str, Any]], None]
+
+_NOTABLE = re.compile(r"^#{1,6} |error|exception|fail|fatal|warn|traceback|エラー|失敗|警告|例外", re.IGNORECASE)
+
+MAP_SYSTEM_PROMPT = (
+    "あなたは大きな添付ファイルの要約係です。渡された区画から、後で質問に答えるのに必要な事実"
+    "（見出し・定義・数値・エラーとその発生箇所・時刻）を残し、繰り返しや定型行は件数だけ書いてください。"
+)
+REDUCE_SYSTEM_PROMPT = (
+    "あなたは大きな添付ファイルの要約係です。区画ごとの要約を、順序と行番号の手がかりを保ったまま統合してください。"
+)
+
+
+@dataclass(frozen=True)
+class LargeAttachmentConfig:
+    assistant: str = ""
+    model: str = ""
+    chunk_bytes: int = 16384
+    max_workers: int = 4
+    fan_in: int = 8
+    summary_chars: int = 800
+    max_digest_chars: int = 8000
+    cache_dir: str = DEFAULT_CACHE_DIR
+
+    @classmethod
+    def from_config(cls, studio_config: dict[str, Any] | None) -> LargeAttachmentConfig:
+        cfg = (studio_config or {}).get("large_attachments") or {}
+        default = cls()
+        return cls(
+            assistant=str(cfg.get("assistant") or ""),
+            model=str(cfg.get("model") or ""),
+            chunk_bytes=int(cfg.get("chunk_bytes", default.chunk_bytes)),
+            max_workers=max(1, int(cfg.get("max_workers", default.max_workers))),
+            fan_in=max(2, int(cfg.get("fan_in", default.fan_in))),
+            summary_chars=int(cfg.get("summary_chars", default.summary_chars)),
+            max_digest_chars=int(cfg.get("max_digest_chars", default.max_digest_chars)),
+            cache_dir=str(cfg.get("cache_dir") or default.cache_dir),
+        )
+
+    def fingerprint(self) -> str:
+        # 要約結果を変える設定だけ。max_workers / cache_dir は含めない
+        return json.dumps(
+            [self.assistant, self.model, self.chunk_bytes, self.fan_in, self.summary_chars, self.max_digest_chars]
+        )
+
+
+@dataclass(frozen=True)
+class FileChunk:
+    index: int
+    start_line: int
+    end_line: int
+    text: str
+
+
+@dataclass(frozen=True)
+class AttachmentDigest:
+    label: str
+    sha256: str
+    size: int
+    chunks: int
+    text: str
+    cached: bool = False
+
+    def to_context(self) -> str:
+        """The attachment block; the ``### path`` heading keeps 5.1.1 excerpts working."""
+        return (
+            f"### {self.label}\n"
+            f"（大きな添付の要約: {self.size / 1024:.0f}KB / {self.chunks} 区画。原文は送っていません）\n"
+            f"{self.text}"
+        )
+
+
+def content_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_file_chunks(path: Path, chunk_bytes: int) -> Iterator[FileChunk]:
+    """Newline-aligned windows of about ``chunk_bytes``, read through ``mmap`` (never the whole file)."""
+    with path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            pos, line, index = 0, 1, 0
+            while pos < size:
+                end = min(size, pos + chunk_bytes)
+                if end < size:
+                    newline = mm.find(b"\n", end)
+                    end = size if newline < 0 else newline + 1
+                raw = mm[pos:end]
+                lines = raw.count(b"\n")
+                last = line + lines - (1 if raw.endswith(b"\n") else 0)
+                yield FileChunk(index, line, max(line, last), raw.decode("utf-8", errors="replace"))
+                pos, line, index = end, line + lines, index + 1
+
+
+def check_text_file(path: Path, sample_bytes: int = 65536) -> None:
+    """Raise ``ValueError`` for files that are not UTF-8 text (checked on the first window)."""
+    with path.open("rb") as f:
+        sample = f.read(sample_bytes)
+    if b"\x00" in sample:
+        raise ValueError("バイナリファイルは要約できません")
+    try:
+        # 末尾は多バイト文字の途中で切れうるので最後の改行まで
+        sample[: sample.rfind(b"\n") + 1 or len(sample)].decode("utf-8")
+    except UnicodeDecodeError as exc:
+        raise ValueError("UTF-8 テキストとして読み込めません") from exc
+
+
+def extractive_digest(text: str, max_chars: int) -> str:
+    """Headings and error-looking lines (first lines when there are none), up to ``max_chars``."""
+    lines = [line.rstrip() for line in text.splitlines() if line.strip()]
+    notable = [line for line in lines if _NOTABLE.search(line)] or lines[:5]
+    kept: list[str] = []
+    total = 0
+    for line in notable:
+        line = line if len(line) <= 200 else line[:200] + "…"
+        total += len(line) + 1
+        if total > max_chars:
+            kept.append(f"…（他 {len(notable) - len(kept)} 行）")
+            break
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def _summarise(summarise: Summarise | None, system_prompt: str, user_message: str, fallback: str, max_chars: int) -> str:
+    if summarise is not None:
+        try:
+            text = summarise(system_prompt, user_message).strip()
+            if text:
+                return text
+        except Exception:
+            # 要約に失敗しても取り込みは止めない（抽出で代替。compaction と同じ扱い）
+            pass
+    return extractive_digest(fallback, max_chars)
+
+
+def _map_chunk(chunk: FileChunk, config: LargeAttachmentConfig, summarise: Summarise | None) -> str:
+    user_message = (
+        f"次の区画（{chunk.start_line}-{chunk.end_line} 行）を{config.summary_chars}文字以内で要約してください。\n\n"
+        f"{chunk.text}"
+    )
+    summary = _summarise(summarise, MAP_SYSTEM_PROMPT, user_message, chunk.text, config.summary_chars)
+    return f"[{chunk.start_line}-{chunk.end_line} 行] {summary}"
+
+
+def _reduce_group(group: list[str], config: LargeAttachmentConfig, summarise: Summarise | None) -> str:
+    joined = "\n".join(group)
+    user_message = f"次の要約を{config.summary_chars * 2}文字以内に統合してください。\n\n{joined}"
+    return _summarise(summarise, REDUCE_SYSTEM_PROMPT, user_message, joined, config.summary_chars * 2)
+
+
+class LargeAttachmentDigester:
+    """Summarise files over the upload limits; one instance per turn."""
+
+    def __init__(
+        self,
+        root: Path,
+        config: LargeAttachmentConfig,
+        summarise: Summarise | None = None,
+        progress: Progress | None = None,
+    ) -> None:
+        self.root = Path(root)
+        self.config = config
+        self.summarise = summarise
+        self.progress = progress or (lambda payload: None)
+
+    # --- cache -------------------------------------------------------------
+
+    def _cache_path(self, sha256: str) -> Path:
+        key = hashlib.sha256(f"{sha256}:{self.config.fingerprint()}".encode()).hexdigest()
+        return self.root / self.config.cache_dir / f"{key}.json"
+
+    def _load_cached(self, sha256: str) -> dict[str, Any] | None:
+        try:
+            data = json.loads(self._cache_path(sha256).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return data if isinstance(data, dict) and data.get("sha256") == sha256 else None
+
+    def _store(self, sha256: str, chunks: int, text: str) -> None:
+        path = self._cache_path(sha256)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_text(json.dumps({"sha256": sha256, "chunks": chunks, "text": text}, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            # キャッシュは再計算できる。書けなくても今回の要約は使う
+            pass
+
+    # --- map / reduce ------------------------------------------------------
+
+    def _map(self, pool: ThreadPoolExecutor, path: Path, label: str, total: int) -> list[str]:
+        """Summarise windows in order, keeping at most ``2 * max_workers`` windows in memory."""
+        summaries: dict[int, str] = {}
+        pending: set[Future[tuple[int, str]]] = set()
+        limit = 2 * self.config.max_workers
+
+        def run(chunk: FileChunk) -> tuple[int, str]:
+            return chunk.index, _map_chunk(chunk, self.config, self.summarise)
+
+        def drain(block_until: int) -> None:
+            nonlocal pending
+            while len(pending) > block_until:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, summary = future.result()
+                    summaries[index] = summary
+                    self.progress({"file": label, "stage": "map", "done": len(summaries), "total": total})
+
+        for chunk in iter_file_chunks(path, self.config.chunk_bytes):
+            pending.add(pool.submit(carry(run), chunk))
+            drain(limit - 1)
+        drain(0)
+        return [summaries[i] for i in sorted(summaries)]
+
+    def _reduce(self, pool: ThreadPoolExecutor, summaries: list[str], label: str) -> str:
+        level = 0
+        while len(summaries) > 1 and sum(len(s) + 1 for s in summaries) > self.config.max_digest_chars:
+            level += 1
+            groups = [summaries[i : i + self.config.fan_in] for i in range(0, len(summaries), self.config.fan_in)]
+            self.progress({"file": label, "stage": "reduce", "level": level, "done": 0, "total": len(groups)})
+            summaries = list(pool.map(carry(lambda group: _reduce_group(group, self.config, self.summarise)), groups))
+            self.progress({"file": label, "stage": "reduce", "level": level, "done": len(groups), "total": len(groups)})
+        text = "\n".join(summaries)
+        if len(text) > self.config.max_digest_chars:
+            text = text[: self.config.max_digest_chars].rstrip() + "\n…（要約を切り詰めました）"
+        return text
+
+    def digest(self, path: Path, label: str | None = None) -> AttachmentDigest:
+        label = label or path.as_posix()
+        check_text_file(path)
+        size = path.stat().st_size
+        sha256 = content_hash(path)
+        cached = self._load_cached(sha256)
+        if cached is not None:
+            self.progress({"file": label, "stage": "done", "cached": True})
+            return AttachmentDigest(label, sha256, size, int(cached.get("chunks", 0)), str(cached.get("text", "")), True)
+
+        total = max(1, -(-size // self.config.chunk_bytes))
+        with ThreadPoolExecutor(max_workers=self.config.max_workers, thread_name_prefix="studio-digest") as pool:
+            summaries = self._map(pool, path, label, total)
+            text = self._reduce(pool, summaries, label)
+        self._store(sha256, len(summaries), text)
+        self.progress({"file": label, "stage": "done", "cached": False})
+        return AttachmentDigest(label, sha256, size, len(summaries), text)
+
+    def digest_all(self, paths: list[Path]) -> tuple[list[AttachmentDigest], list[tuple[str, str]]]:
+        """Digests in order, plus ``(label, message)`` for files that could not be read."""
+        digests: list[AttachmentDigest] = []
+        errors: list[tuple[str, str]] = []
+        for path in paths:
+            label = path.as_posix()
+            try:
+                digests.append(self.digest(path, label))
+            except (OSError, ValueError) as exc:
+                errors.append((label, str(exc)))
+                self.progress({"file": label, "stage": "error", "error": str(exc)})
+        return digests, errors
@@ -7,9 +7,11 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
+from studio.attachment_cache import AttachmentCache, FileText, read_files
 from studio.bindings import validate_workflow_binding_talent_refs, validate_workflow_bindings
-from studio.schema_validate import load_json_file, validate_schema_document
+from studio.config_registry import REGISTRY, file_signature
 from studio.validation import StudioError, StudioValidationError, ValidationReport
+from studio.workflow_plan import WorkflowPlan, compile_workflow_plan
 from studio.workflow_validate import validate_workflow_structure
 from web_input_utils import SUPPORTED_TEXT_EXTENSIONS
 
@@ -31,6 +33,8 @@ class SessionContext:
     workflow_id: str | None = None
     workflow: dict[str, Any] | None = None
     slot_bindings: dict[str, list[str]] | None = None
+    # 検証済みワークフローを一度だけ展開した実行計画（design.md §6.4）
+    plan: WorkflowPlan | None = field(default=None, repr=False, compare=False)
 
 
 @dataclass
@@ -69,7 +73,7 @@ def load_ai_assistants(root: Path, report: ValidationReport) -> dict[str, dict[s
             )
         )
         return {}
-    data = load_json_file(path, report)
+    data = REGISTRY.load_document(path, report)
     if data is None or not isinstance(data, dict):
         return {}
     return data
@@ -83,10 +87,9 @@ def scan_talents(root: Path, report: ValidationReport) -> dict[str, dict[str, An
 
     for path in sorted(talents_dir.glob("*.json")):
         talent_id = path.stem
-        data = load_json_file(path, report)
+        data = REGISTRY.load_document(path, report, schema="talent", target=f"talents/{path.name}")
         if data is None:
             continue
-        validate_schema_document(data, "talent", f"talents/{path.name}", report)
         talents[talent_id] = data
     return talents
 
@@ -102,11 +105,9 @@ def load_organization_config(org_id: str, root: Path, report: ValidationReport)
             )
         )
         return None
-    data = load_json_file(path, report)
-    if data is None:
-        return None
-    validate_schema_document(data, "organization", f"organizations/{org_id}/config.json", report)
-    return data
+    return REGISTRY.load_document(
+        path, report, schema="organization", target=f"organizations/{org_id}/config.json"
+    )
 
 
 def load_model_mapping(org_id: str, root: Path, report: ValidationReport) -> dict[str, dict[str, str]]:
@@ -122,10 +123,9 @@ def load_model_mapping(org_id: str, root: Path, report: ValidationReport) -> dic
             )
         )
         return {}
-    data = load_json_file(path, report)
-    if data is None:
-        return {}
-    validate_schema_document(data, "model_mapping", f"organizations/{org_id}/model_mapping.json", report)
+    data = REGISTRY.load_document(
+        path, report, schema="model_mapping", target=f"organizations/{org_id}/model_mapping.json"
+    )
     if isinstance(data, dict):
         return data
     return {}
@@ -138,10 +138,9 @@ def load_studio_config(root: Path) -> dict[str, Any]:
     if not path.exists():
         return {"stream": True, "temperature": 0.7, "max_parallel_calls": 8}
     report = ValidationReport()
-    data = load_json_file(path, report)
+    data = REGISTRY.load_document(path, report, schema="studio_config", target=path.name)
     if data is None:
         return {"stream": True, "temperature": 0.7, "max_parallel_calls": 8}
-    validate_schema_document(data, "studio_config", path.name, report)
     if not report.ok:
         raise StudioValidationError(report.errors)
     return data
@@ -230,15 +229,30 @@ def load_workflow(workflow_id: str, root: Path, report: ValidationReport) -> dic
             )
         )
         return None
-    data = load_json_file(path, report)
-    if data is None:
-        return None
-    validate_schema_document(data, "workflow", f"workflows/{workflow_id}.json", report)
+    data = REGISTRY.load_document(path, report, schema="workflow", target=f"workflows/{workflow_id}.json")
     if data is not None:
         validate_workflow_structure(workflow_id, data, report)
     return data
 
 
+def context_source_paths(org_id: str, root: Path, workflow_id: str | None = None) -> list[Path]:
+    """Every file (and the talents directory) a SessionContext is built from."""
+    talents_dir = root / "talents"
+    org_dir = root / "organizations" / org_id
+    paths = [
+        talents_dir,
+        *sorted(talents_dir.glob("*.json")),
+        org_dir / "config.json",
+        org_dir / "model_mapping.json",
+        root / AI_ASSISTANTS_FILE,
+        root / STUDIO_CONFIG_FILE,
+        root / STUDIO_CONFIG_EXAMPLE,
+    ]
+    if workflow_id:
+        paths.append(root / "workflows" / f"{workflow_id}.json")
+    return paths
+
+
 def load_session_context(
     org_id: str,
     root: Path | str = ".",
@@ -246,6 +260,12 @@ def load_session_context(
     workflow_id: str | None = None,
 ) -> SessionContext:
     root_path = Path(root)
+    cached = REGISTRY.get_context(root_path, org_id, workflow_id)
+    if cached is not None:
+        return cached
+    # 読み込む前の状態を記録する（読み込み中の書き換えは次回の不一致で拾う）
+    sources = context_source_paths(org_id, root_path, workflow_id)
+    signatures = [file_signature(p) for p in sources]
     report = ValidationReport()
 
     talents = scan_talents(root_path, report)
@@ -276,7 +296,7 @@ def load_session_context(
 
     studio_config = load_studio_config(root_path)
 
-    return SessionContext(
+    ctx = SessionContext(
         root=root_path,
         org_id=org_id,
         org=org or {},
@@ -288,9 +308,12 @@ def load_session_context(
         workflow=workflow if workflow_id else None,
         slot_bindings=slot_bindings,
     )
+    ctx.plan = compile_workflow_plan(ctx)
+    REGISTRY.put_context(root_path, org_id, workflow_id, ctx, sources, signatures)
+    return ctx
 
 
-def _expand_attachment_path(path: Path) -> list[Path]:
+def _expand_attachment_path(path: Path, cache: AttachmentCache | None = None) -> list[Path]:
     """ファイルまたはディレクトリを添付読込用のファイル一覧に展開する。"""
     if not path.exists():
         return [path]
@@ -298,6 +321,8 @@ def _expand_attachment_path(path: Path) -> list[Path]:
         return [path]
     if not path.is_dir():
         return [path]
+    if cache is not None:
+        return cache.expand_directory(path, ("__pycache__",), SUPPORTED_TEXT_EXTENSIONS)
 
     files: list[Path] = []
     for child in sorted(path.rglob("*")):
@@ -316,7 +341,18 @@ def _expand_attachment_path(path: Path) -> list[Path]:
 def read_attachment_files(
     paths: list[Path],
     limits: dict[str, int],
+    *,
+    overflow: list[Path] | None = None,
+    cache: AttachmentCache | None = None,
 ) -> tuple[str, ValidationReport]:
+    """Read attachments within ``upload_limits``.
+
+    With ``overflow`` (``--files-large``), files over ``max_file_size_kb`` or
+    that would push the total over ``max_total_chars`` are appended to it for
+    map-reduce summarising (5.1.3) instead of failing with E402. Files are read
+    in parallel; with ``cache`` unchanged files and directories are served from
+    the attachment cache (5.1.4).
+    """
     report = ValidationReport()
     max_files = limits.get("max_files", 5)
     max_file_size_kb = limits.get("max_file_size_kb", 256)
@@ -332,10 +368,19 @@ def read_attachment_files(
         )
         return "", report
 
+    expanded_paths = [(path, _expand_attachment_path(path, cache)) for path in paths]
+    all_files = [file_path for _, expanded in expanded_paths for file_path in expanded]
+    max_size = int(max_file_size_kb * 1024)
+    if cache is not None:
+        results = cache.read_many(all_files, max_size=max_size)
+    else:
+        results = read_files(all_files, max_size=max_size)
+
+    # 結果は all_files と同じ順。ファイルの出現順に一つずつ取り出す
+    pending = iter(results)
     chunks: list[str] = []
     total_chars = 0
-    for path in paths:
-        expanded = _expand_attachment_path(path)
+    for path, expanded in expanded_paths:
         if path.is_dir() and path.exists() and not expanded:
             report.add(
                 StudioError(
@@ -347,7 +392,10 @@ def read_attachment_files(
             continue
 
         for file_path in expanded:
-            if not file_path.exists():
+            result = next(pending)
+            if type(result) is FileText and result.text is not None:
+                text = result.text
+            elif isinstance(result, FileNotFoundError):
                 report.add(
                     StudioError(
                         code="E101",
@@ -356,7 +404,7 @@ def read_attachment_files(
                     )
                 )
                 continue
-            if not file_path.is_file():
+            elif isinstance(result, IsADirectoryError):
                 report.add(
                     StudioError(
                         code="E101",
@@ -365,8 +413,11 @@ def read_attachment_files(
                     )
                 )
                 continue
-            size_kb = file_path.stat().st_size / 1024
-            if size_kb > max_file_size_kb:
+            elif isinstance(result, FileText) and overflow is not None:
+                overflow.append(file_path)
+                continue
+            elif isinstance(result, FileText):
+                # max_file_size_kb を超えたので読んでいない
                 report.add(
                     StudioError(
                         code="E402",
@@ -375,9 +426,7 @@ def read_attachment_files(
                     )
                 )
                 continue
-            try:
-                text = file_path.read_text(encoding="utf-8")
-            except UnicodeDecodeError:
+            elif isinstance(result, UnicodeDecodeError):
                 report.add(
                     StudioError(
                         code="E101",
@@ -386,15 +435,18 @@ def read_attachment_files(
                     )
                 )
                 continue
-            except OSError as e:
+            else:
                 report.add(
                     StudioError(
                         code="E101",
                         target=str(file_path),
-                        message=f"読み込みに失敗しました: {e}",
+                        message=f"読み込みに失敗しました: {result}",
                     )
                 )
                 continue
+            if overflow is not None and total_chars + len(text) > max_total_chars:
+                overflow.append(file_path)
+                continue
             total_chars += len(text)
             if total_chars > max_total_chars:
                 report.add(
@@ -0,0 +1,200 @@
+"""Background writer for session JSONL logs (design.md 7.1).
+
+Each SessionLogger hands its records to one ``SessionLogWriter``: a bounded
+queue drained by a daemon thread that keeps the log file open and writes
+whole lines in batches. Parallel steps therefore never open or append to the
+same file concurrently, and the engine does not wait on disk I/O per record.
+A trailing half-written line (crash / kill) is skipped by the log readers.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import queue
+import threading
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # 任意依存。未導入なら標準 json
+    orjson = None
+
+FLUSH_POLICIES = ("record", "step", "turn")
+JSON_ENCODERS = ("auto", "json", "orjson")
+DEFAULT_QUEUE_SIZE = 1024
+# 書き込みがない間はスレッドを止めファイルを閉じる（放置された Web セッション対策）
+IDLE_CLOSE_SECONDS = 30.0
+# 1回の write にまとめる最大行数
+MAX_BATCH_LINES = 256
+
+# 各方針でファイルを flush するレコード種別（それ以外は次の flush まで OS へ渡さず溜める）
+_FLUSH_TYPES = {
+    "record": None,
+    "step": frozenset({"step", "user_interrupt", "state_snapshot", "session_end"}),
+    "turn": frozenset({"state_snapshot", "session_end"}),
+}
+
+_BARRIER = object()
+_STOP = object()
+
+
+@dataclass(frozen=True)
+class LogWriterConfig:
+    flush: str = "step"
+    fsync: bool = False
+    queue_size: int = DEFAULT_QUEUE_SIZE
+    encoder: str = "auto"
+
+    @classmethod
+    def from_config(cls, studio_config: dict[str, Any] | None) -> LogWriterConfig:
+        cfg = (studio_config or {}).get("session_log") or {}
+        flush = cfg.get("flush", "step")
+        encoder = cfg.get("json", "auto")
+        return cls(
+            flush=flush if flush in FLUSH_POLICIES else "step",
+            fsync=bool(cfg.get("fsync", False)),
+            queue_size=max(1, int(cfg.get("queue_size", DEFAULT_QUEUE_SIZE))),
+            encoder=encoder if encoder in JSON_ENCODERS else "auto",
+        )
+
+
+def encode_record(record: dict[str, Any], encoder: str = "auto") -> str:
+    """One JSONL line (without newline); orjson when requested and installed."""
+    if encoder != "json" and orjson is not None:
+        try:
+            return orjson.dumps(record).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(record, ensure_ascii=False)
+
+
+class SessionLogWriter:
+    """Single writer thread per log file; ``flush()`` blocks until queued lines are on disk."""
+
+    def __init__(self, path: Path, config: LogWriterConfig | None = None) -> None:
+        self.path = path
+        self.config = config or LogWriterConfig()
+        self._queue: queue.Queue[tuple[Any, Any]] = queue.Queue(maxsize=self.config.queue_size)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._error: OSError | None = None
+        _live_writers.add(self)
+
+    def write(self, record: dict[str, Any]) -> None:
+        line = encode_record(record, self.config.encoder) + "\n"
+        self._put((line, record.get("type")))
+
+    def flush(self) -> None:
+        """Wait until every line queued so far is written and flushed (fsync per config)."""
+        with self._lock:
+            if self._thread is None:
+                self._raise_pending_error()
+                return
+        done = threading.Event()
+        self._put((_BARRIER, done))
+        done.wait()
+        self._raise_pending_error()
+
+    def close(self) -> None:
+        """Flush and stop the thread; a later ``write`` reopens the file."""
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            self._raise_pending_error()
+            return
+        self._put((_STOP, None))
+        thread.join()
+        self._raise_pending_error()
+
+    def _put(self, item: tuple[Any, Any]) -> None:
+        # 起動確認と投入を同じロック内で行い、アイドル終了したスレッドへ積み残さない
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name=f"session-log-{self.path.stem}",
+                    daemon=True,
+                )
+                self._thread.start()
+            self._queue.put(item)
+
+    def _raise_pending_error(self) -> None:
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _should_flush(self, record_type: str | None) -> bool:
+        types = _FLUSH_TYPES[self.config.flush]
+        return types is None or record_type in types
+
+    def _run(self) -> None:
+        handle = None
+        stopping = False
+        try:
+            while True:
+                try:
+                    batch = [self._queue.get(timeout=0 if stopping else IDLE_CLOSE_SECONDS)]
+                except queue.Empty:
+                    # 満杯の queue へ put 中の producer がロックを持っていることがあるので待たない
+                    if not self._lock.acquire(blocking=False):
+                        continue
+                    try:
+                        if self._queue.empty():
+                            self._thread = None
+                            return
+                    finally:
+                        self._lock.release()
+                    continue
+                while len(batch) < MAX_BATCH_LINES:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                lines: list[str] = []
+                waiters: list[threading.Event] = []
+                need_flush = False
+                for line, arg in batch:
+                    if line is _BARRIER:
+                        waiters.append(arg)
+                        need_flush = True
+                    elif line is _STOP:
+                        need_flush = stopping = True
+                    else:
+                        lines.append(line)
+                        need_flush = need_flush or self._should_flush(arg)
+
+                try:
+                    if lines:
+                        if handle is None:
+                            self.path.parent.mkdir(parents=True, exist_ok=True)
+                            handle = self.path.open("a", encoding="utf-8")
+                        handle.write("".join(lines))
+                    if need_flush and handle is not None:
+                        handle.flush()
+                        if self.config.fsync:
+                            os.fsync(handle.fileno())
+                except OSError as exc:
+                    self._error = exc
+                for waiter in waiters:
+                    waiter.set()
+        finally:
+            if handle is not None:
+                handle.close()
+
+
+_live_writers: weakref.WeakSet[SessionLogWriter] = weakref.WeakSet()
+
+
+@atexit.register
+def _close_all_writers() -> None:
+    for writer in list(_live_writers):
+        try:
+            writer.close()
+        except OSError:
+            pass
@@ -4,12 +4,27 @@ from __future__ import annotations
 
 import csv
 import json
+import math
+import re
+import sqlite3
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
+from studio.log_writer import LogWriterConfig, SessionLogWriter
+from studio.session_archive import iter_log_lines
+from studio.session_catalog import SessionCatalog, model_label
+from studio.tracing import NULL_TRACER, Tracer
+
 MODEL_COSTS_FILE = "model_costs.csv"
+# by_model の latency で出す分位点
+LATENCY_PERCENTILES = (50, 95, 99)
+# プロンプトキャッシュ（design.md 5.1.2）。読み出しは入力単価の 1/10、書き込みは 1.25 倍（Anthropic）
+CACHE_READ_RATIO = 0.1
+CACHE_WRITE_RATIO = 1.25
+# notes 列の "(with prompt caching: $0.125/$10.0)" から読み出し単価を取る
+_CACHED_PRICE_NOTE = re.compile(r"prompt caching: \$([0-9.]+)")
 
 
 def load_model_costs(root: Path) -> dict[str, dict[str, float]]:
@@ -24,10 +39,17 @@ def load_model_costs(root: Path) -> dict[str, dict[str, float]]:
             reader = csv.DictReader(f)
             for row in reader:
                 model_name = row["model"]
-                costs[model_name] = {
+                previous = costs.get(model_name) or {}
+                entry = costs[model_name] = {
                     "input": float(row["input_cost_per_1k_tokens"]) / 1000,
                     "output": float(row["output_cost_per_1k_tokens"]) / 1000,
                 }
+                cached = _CACHED_PRICE_NOTE.search(row.get("notes") or "")
+                if cached:
+                    entry["cached_input"] = float(cached.group(1)) / 1000
+                elif "cached_input" in previous and previous["input"] == entry["input"]:
+                    # 後の行（API 巡回の更新）は notes に記載がないので、単価が同じなら引き継ぐ
+                    entry["cached_input"] = previous["cached_input"]
     except (OSError, KeyError, ValueError):
         pass
     return costs
@@ -42,11 +64,82 @@ def estimate_tokens(text: str) -> int:
     return max(1, int(estimated))
 
 
-def compute_cost(model: str | None, tokens_in: int, tokens_out: int, costs: dict[str, dict[str, float]]) -> float:
+def compute_cost(
+    model: str | None,
+    tokens_in: int,
+    tokens_out: int,
+    costs: dict[str, dict[str, float]],
+    *,
+    tokens_cached: int = 0,
+    tokens_cache_write: int = 0,
+) -> float:
+    """Cost of one call; ``tokens_in`` includes the cached and cache-written input tokens."""
     if not model:
         return 0.0
     model_cost = costs.get(model, costs["default"])
-    return tokens_in * model_cost["input"] + tokens_out * model_cost["output"]
+    input_price = model_cost["input"]
+    cached_price = model_cost.get("cached_input", input_price * CACHE_READ_RATIO)
+    uncached = max(0, tokens_in - tokens_cached - tokens_cache_write)
+    return (
+        uncached * input_price
+        + tokens_cached * cached_price
+        + tokens_cache_write * input_price * CACHE_WRITE_RATIO
+        + tokens_out * model_cost["output"]
+    )
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile (``q`` in 0..100) of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def latency_summary(values: list[float]) -> dict[str, float]:
+    return {f"p{q}": round(percentile(values, q), 3) for q in LATENCY_PERCENTILES}
+
+
+@dataclass(frozen=True)
+class StepTiming:
+    """Latency breakdown of one provider call (design.md 7.1.1)."""
+
+    ttft: float | None = None
+    queue_wait: float = 0.0
+    network: float = 0.0
+    local: float = 0.0
+    chunks: int = 0
+    gap_p50: float | None = None
+    gap_max: float | None = None
+
+    def to_record(self) -> dict[str, Any]:
+        record: dict[str, Any] = {}
+        if self.ttft is not None:
+            record["ttft"] = round(self.ttft, 3)
+        if self.queue_wait > 0:
+            record["queue_wait"] = round(self.queue_wait, 3)
+        if self.network > 0 or self.local > 0:
+            record["network"] = round(self.network, 3)
+            record["local"] = round(self.local, 3)
+        if self.chunks:
+            record["chunks"] = self.chunks
+        if self.gap_p50 is not None:
+            record["gap_p50"] = round(self.gap_p50, 3)
+            record["gap_max"] = round(self.gap_max or 0.0, 3)
+        return record
+
+    @classmethod
+    def from_record(cls, record: dict[str, Any] | None) -> StepTiming | None:
+        if not record:
+            return None
+        return cls(
+            ttft=record.get("ttft"),
+            queue_wait=float(record.get("queue_wait") or 0.0),
+            network=float(record.get("network") or 0.0),
+            local=float(record.get("local") or 0.0),
+            chunks=int(record.get("chunks") or 0),
+            gap_p50=record.get("gap_p50"),
+            gap_max=record.get("gap_max"),
+        )
 
 
 @dataclass
@@ -63,6 +156,12 @@ class StepMetrics:
     tokens_source: str
     cost: float
     phase_type: str | None = None
+    rate_limit_wait: float = 0.0
+    cache: str | None = None
+    timing: StepTiming | None = None
+    # プロバイダのプロンプトキャッシュから読んだ / 書いた入力トークン（tokens_in の内数）
+    tokens_cached: int = 0
+    tokens_cache_write: int = 0
 
     def to_log_record(self) -> dict[str, Any]:
         record: dict[str, Any] = {
@@ -80,8 +179,19 @@ class StepMetrics:
             },
             "cost": round(self.cost, 6),
         }
+        if self.tokens_cached:
+            record["tokens"]["cached"] = self.tokens_cached
+        if self.tokens_cache_write:
+            record["tokens"]["cache_write"] = self.tokens_cache_write
         if self.phase_type:
             record["phase_type"] = self.phase_type
+        if self.rate_limit_wait > 0:
+            record["rate_limit_wait"] = round(self.rate_limit_wait, 3)
+        if self.cache:
+            record["cache"] = self.cache
+        timing = self.timing.to_record() if self.timing else {}
+        if timing:
+            record["timing"] = timing
         if self.model:
             record["model"] = self.model
             if self.elapsed > 0 and self.tokens_out > 0:
@@ -104,7 +214,14 @@ class SessionLogger:
     steps: list[StepMetrics] = field(default_factory=list)
     total_elapsed: float = 0.0
     parent_session_id: str | None = None
+    parent_checkpoint: str | None = None
+    compaction_tokens_saved: int = 0
+    compaction_cost: float = 0.0
+    attachment_digest_cost: float = 0.0
+    log_config: LogWriterConfig = field(default_factory=LogWriterConfig)
+    tracer: Tracer = field(default=NULL_TRACER, repr=False)
     _started: bool = False
+    _writer: SessionLogWriter | None = field(default=None, repr=False)
 
     @classmethod
     def create(
@@ -115,6 +232,7 @@ class SessionLogger:
         talents: dict[str, dict[str, Any]],
         model_mapping: dict[str, dict[str, str]],
         generation: dict[str, Any],
+        log_config: LogWriterConfig | None = None,
     ) -> SessionLogger:
         base_id = datetime.now().strftime("%Y%m%d_%H%M%S")
         session_id = base_id
@@ -138,6 +256,7 @@ class SessionLogger:
             models=models,
             generation=generation,
             costs=load_model_costs(root),
+            log_config=log_config or LogWriterConfig(),
         )
 
     @classmethod
@@ -150,6 +269,8 @@ class SessionLogger:
         talents: dict[str, dict[str, Any]],
         model_mapping: dict[str, dict[str, str]],
         generation: dict[str, Any],
+        log_config: LogWriterConfig | None = None,
+        parent_checkpoint: str | None = None,
     ) -> SessionLogger:
         logger = cls.create(
             root,
@@ -158,19 +279,27 @@ class SessionLogger:
             talents,
             model_mapping,
             generation,
+            log_config,
         )
         logger.parent_session_id = parent_session_id
+        logger.parent_checkpoint = parent_checkpoint
         return logger
 
     @property
     def log_path(self) -> Path:
-        sessions_dir = self.root / "sessions"
-        sessions_dir.mkdir(parents=True, exist_ok=True)
-        return sessions_dir / f"{self.session_id}.jsonl"
+        return self.root / "sessions" / f"{self.session_id}.jsonl"
 
     def write_line(self, record: dict[str, Any]) -> None:
-        with self.log_path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        """Queue one record for the session's writer thread (sessions/ is created on first write)."""
+        if self._writer is None:
+            self._writer = SessionLogWriter(self.log_path, self.log_config)
+        self._writer.write(record)
+
+    def flush(self) -> None:
+        """Block until every record written so far is in the log file."""
+        if self._writer is not None:
+            with self.tracer.span("log_flush"):
+                self._writer.flush()
 
     def start(self) -> None:
         if self._started:
@@ -181,17 +310,36 @@ class SessionLogger:
                 "organization": self.org_id,
                 "workflow": self.workflow,
                 "parent_session_id": self.parent_session_id,
+                **({"parent_checkpoint": self.parent_checkpoint} if self.parent_checkpoint else {}),
                 "talents": self.talents,
                 "models": self.models,
                 "generation": self.generation,
             }
         )
         self._started = True
+        try:
+            SessionCatalog(self.root).record_start(
+                self.session_id,
+                self.org_id,
+                self.workflow,
+                self.parent_session_id,
+            )
+        except sqlite3.Error:
+            # 一覧用の派生データ。失敗しても sync / rebuild でログから復元できる
+            pass
 
-    def log_user_input(self, text: str, attachments: list[str] | None = None) -> None:
+    def log_user_input(
+        self,
+        text: str,
+        attachments: list[str] | None = None,
+        context_chunks: list[dict[str, Any]] | None = None,
+    ) -> None:
         record: dict[str, Any] = {"type": "user_input", "text": text}
         if attachments:
             record["attachments"] = attachments
+        if context_chunks:
+            # 付録D.10：このターンの user_context_rag に使った chunk id / score
+            record["context_chunks"] = context_chunks
         self.write_line(record)
 
     def log_user_interrupt(
@@ -216,11 +364,75 @@ class SessionLogger:
         self.steps.append(metrics)
         self.write_line(metrics.to_log_record())
 
+    def log_compaction(
+        self,
+        *,
+        iteration: int,
+        strategy: str,
+        entries: int,
+        tokens_before: int,
+        tokens_after: int,
+        talent_id: str | None = None,
+        cost: float = 0.0,
+    ) -> None:
+        """Record one turn_prior compaction; tokens_saved is per later step that receives the prior block."""
+        saved = tokens_before - tokens_after
+        self.compaction_tokens_saved += saved
+        self.compaction_cost += cost
+        record: dict[str, Any] = {
+            "type": "compaction",
+            "iteration": iteration,
+            "strategy": strategy,
+            "entries": entries,
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": saved,
+        }
+        if talent_id:
+            record["talent_id"] = talent_id
+            record["cost"] = round(cost, 6)
+        self.write_line(record)
+
+    def log_attachment_digest(
+        self,
+        *,
+        file: str,
+        size: int,
+        chunks: int,
+        sha256: str,
+        cached: bool,
+        chars: int,
+        calls: int = 0,
+        cost: float = 0.0,
+    ) -> None:
+        """Record one large-attachment digest (design.md 5.1.3); its model calls count toward total_cost."""
+        self.attachment_digest_cost += cost
+        self.write_line(
+            {
+                "type": "attachment_digest",
+                "file": file,
+                "size": size,
+                "chunks": chunks,
+                "sha256": sha256,
+                "cached": cached,
+                "chars": chars,
+                "calls": calls,
+                "cost": round(cost, 6),
+            }
+        )
+
+    def log_profile(self, summary: dict[str, Any]) -> None:
+        """Record one turn's profile summary (design.md 7.1.3)."""
+        self.write_line({"type": "profile", **summary})
+
     def log_state_snapshot(self, state: dict[str, Any]) -> None:
+        # ターン末尾。再開・議事録など同一プロセス内の読み手がここまでを読めるようにする
         self.write_line({"type": "state_snapshot", "state": state})
+        self.flush()
 
     def build_by_model(self) -> dict[str, dict[str, Any]]:
         rollup: dict[str, dict[str, Any]] = {}
+        samples: dict[str, dict[str, list[float]]] = {}
         for step in self.steps:
             if step.assistant in ("human", "mock"):
                 continue
@@ -242,17 +454,41 @@ class SessionLogger:
             bucket["tokens_in"] += step.tokens_in
             bucket["tokens_out"] += step.tokens_out
             bucket["cost"] += step.cost
+            if step.tokens_cached:
+                bucket["tokens_cached"] = bucket.get("tokens_cached", 0) + step.tokens_cached
             if step.stream:
                 bucket["stream_on"] += 1
             else:
                 bucket["stream_off"] += 1
+            if step.rate_limit_wait > 0:
+                bucket["rate_limit_wait"] = bucket.get("rate_limit_wait", 0.0) + step.rate_limit_wait
+            if step.cache == "hit":
+                bucket["cache_hits"] = bucket.get("cache_hits", 0) + 1
+            elif step.cache == "miss":
+                bucket["cache_misses"] = bucket.get("cache_misses", 0) + 1
+            if step.cache == "hit":
+                continue
+            # キャッシュヒットは通信していないので遅延分布に入れない
+            series = samples.setdefault(key, {"elapsed": [], "ttft": [], "queue_wait": [], "gap": []})
+            series["elapsed"].append(step.elapsed)
+            if step.timing is not None:
+                if step.timing.ttft is not None:
+                    series["ttft"].append(step.timing.ttft)
+                if step.timing.queue_wait > 0:
+                    series["queue_wait"].append(step.timing.queue_wait)
+                if step.timing.gap_p50 is not None:
+                    series["gap"].append(step.timing.gap_p50)
+        for key, series in samples.items():
+            rollup[key]["latency"] = {name: latency_summary(values) for name, values in series.items() if values}
         for bucket in rollup.values():
             bucket["elapsed_sum"] = round(bucket["elapsed_sum"], 3)
+            if "rate_limit_wait" in bucket:
+                bucket["rate_limit_wait"] = round(bucket["rate_limit_wait"], 3)
             bucket["cost"] = round(bucket["cost"], 6)
         return rollup
 
-    def finish(self) -> dict[str, Any]:
-        total_cost = sum(s.cost for s in self.steps)
+    def finish(self, *, artifact_dir: Path | None = None) -> dict[str, Any]:
+        total_cost = sum(s.cost for s in self.steps) + self.compaction_cost + self.attachment_digest_cost
         end_record = {
             "type": "session_end",
             "total_elapsed": round(self.total_elapsed, 3),
@@ -260,38 +496,61 @@ class SessionLogger:
             "by_model": self.build_by_model(),
             "log_path": str(self.log_path),
         }
+        if self.compaction_tokens_saved:
+            end_record["compaction_tokens_saved"] = self.compaction_tokens_saved
         self.write_line(end_record)
+        if self._writer is not None:
+            self._writer.close()
+        try:
+            SessionCatalog(self.root).record_end(
+                self.session_id,
+                total_cost=total_cost,
+                tokens_in=sum(s.tokens_in for s in self.steps),
+                tokens_out=sum(s.tokens_out for s in self.steps),
+                step_count=len(self.steps),
+                models=[model_label(s.assistant, s.model) for s in self.steps if s.assistant != "human"],
+                artifact_dir=str(artifact_dir) if artifact_dir else None,
+            )
+        except sqlite3.Error:
+            pass
         return end_record
 
 
 def steps_from_jsonl(log_path: Path) -> list[StepMetrics]:
     """Rebuild step metrics from a session JSONL log (design.md 7.5(3))."""
     steps: list[StepMetrics] = []
-    if not log_path.exists():
-        return steps
-    with log_path.open(encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
+    for raw in iter_log_lines(log_path):
+        line = raw.strip()
+        if not line:
+            continue
+        try:
             record = json.loads(line)
-            if record.get("type") != "step":
-                continue
-            tokens = record.get("tokens", {})
-            steps.append(
-                StepMetrics(
-                    talent_id=record["talent_id"],
-                    assistant=record.get("assistant", ""),
-                    model=record.get("model"),
-                    action=record.get("action", ""),
-                    text=record.get("text", ""),
-                    stream=record.get("stream", False),
-                    elapsed=record.get("elapsed", 0.0),
-                    tokens_in=tokens.get("in", 0),
-                    tokens_out=tokens.get("out", 0),
-                    tokens_source=tokens.get("source", "estimate"),
-                    cost=record.get("cost", 0.0),
-                    phase_type=record.get("phase_type"),
-                )
+        except json.JSONDecodeError:
+            if raw.endswith("\n"):
+                raise
+            continue
+        if record.get("type") != "step":
+            continue
+        tokens = record.get("tokens", {})
+        steps.append(
+            StepMetrics(
+                talent_id=record["talent_id"],
+                assistant=record.get("assistant", ""),
+                model=record.get("model"),
+                action=record.get("action", ""),
+                text=record.get("text", ""),
+                stream=record.get("stream", False),
+                elapsed=record.get("elapsed", 0.0),
+                tokens_in=tokens.get("in", 0),
+                tokens_out=tokens.get("out", 0),
+                tokens_source=tokens.get("source", "estimate"),
+                cost=record.get("cost", 0.0),
+                phase_type=record.get("phase_type"),
+                rate_limit_wait=record.get("rate_limit_wait", 0.0),
+                cache=record.get("cache"),
+                timing=StepTiming.from_record(record.get("timing")),
+                tokens_cached=tokens.get("cached", 0),
+                tokens_cache_write=tokens.get("cache_write", 0),
             )
+        )
     return steps
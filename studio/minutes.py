@@ -12,6 +12,7 @@ from typing import Any
 from studio.history import ConversationHistory
 from studio.loader import load_session_context
 from studio.logging import load_model_costs
+from studio.session_archive import log_exists
 from studio.session_report import read_jsonl, session_log_path
 from studio.session_resume import load_effective_records
 from studio.vcs import GitResult, commit_paths
@@ -257,6 +258,7 @@ def generate_minutes_document(
         )
 
     from studio.assistants import invoke_llm_step
+    from studio.response_cache import ResponseCache
 
     transcript = build_transcript(records, meta=meta)
     existing_json = json.dumps(existing, ensure_ascii=False, indent=2) if existing else "{}"
@@ -295,6 +297,8 @@ def generate_minutes_document(
         temperature=0.3,
         stream=False,
         costs=load_model_costs(root),
+        rate_limits=ctx.studio_config.get("rate_limits"),
+        response_cache=ResponseCache.from_config(root, ctx.studio_config),
     )
     parsed = _parse_minutes_json(result.text)
     if parsed and parsed.get("minutes"):
@@ -364,7 +368,7 @@ def save_minutes_from_session(
         return MinutesSaveResult(False, "session_id が未指定です")
 
     log_path = session_log_path(root, session_id)
-    if not log_path.is_file():
+    if not log_exists(log_path):
         return MinutesSaveResult(False, f"セッション `{session_id}` が見つかりません")
 
     records = load_effective_records(root, session_id)
@@ -0,0 +1,383 @@
+"""Per-turn CPU profiling (design.md 7.1.3).
+
+``--profile`` on the CLI, or ``STUDIO_PROFILE`` / studio_config ``profile``
+for the Web UI, profiles each turn. The results go under
+``sessions/<id>.profile/`` and a summary splits the turn's time into engine
+work (prompt building, logging, event rendering, artifact extraction) and
+time blocked on providers or other threads.
+
+- ``cprofile``: deterministic, but it covers only the threads that drive the
+  turn. Work done on worker threads shows up as thread waits. It writes
+  ``<label>.prof`` (pstats).
+- ``sample``: a background thread snapshots the stacks of the unit's threads
+  every ``SAMPLE_INTERVAL`` seconds. Those are the threads inside
+  ``Profiler.section`` plus the workers they start through ``carry``, so
+  other sessions in the same process stay out of the result. It writes
+  collapsed stacks to ``<label>.folded`` (flamegraph.pl / speedscope).
+
+Only one cProfile can be active per process (Python 3.12+ rejects a second
+``enable()``), so a unit that starts while another Profiler holds it, such as
+a second Web session, is sampled instead.
+
+Time is attributed to the outermost matching category on the stack, so
+logging done inside a provider call counts as provider time.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import CodeType
+from typing import Any, TypeVar
+
+PROFILE_MODES = ("cprofile", "sample")
+PROFILE_ENV = "STUDIO_PROFILE"
+SAMPLE_INTERVAL = 0.005
+
+T = TypeVar("T")
+
+# (カテゴリ, ((ファイル末尾, 関数名 or None=ファイル内すべて), ...))。上から順に判定する
+PROFILE_CATEGORIES: tuple[tuple[str, tuple[tuple[str, tuple[str, ...] | None], ...]], ...] = (
+    (
+        "provider",
+        (
+            ("studio/assistants.py", ("_run_chain", "_arun_chain", "invoke_mock_step", "ainvoke_mock_step")),
+            ("studio/ratelimit.py", ("acquire", "aacquire")),
+            ("studio/errors.py", ("handle_api_error", "ahandle_api_error")),
+        ),
+    ),
+    ("user", (("MultiRoleStudio.py", ("drive_interactive_responder",)),)),
+    ("prompt", (("studio/prompts.py", None), ("studio/engine.py", ("_step_prompts", "_build_system_prompt")))),
+    (
+        "logging",
+        (
+            ("studio/logging.py", None),
+            ("studio/log_writer.py", None),
+            ("studio/session_resume.py", ("write_checkpoint",)),
+            ("studio/tracing.py", ("export",)),
+        ),
+    ),
+    (
+        "render",
+        (
+            ("studio/display.py", None),
+            ("MultiRoleStudio.py", ("print_event",)),
+            ("studio/web_ui.py", ("apply", "copy_messages", "_status_from_event")),
+        ),
+    ),
+    ("artifacts", (("studio/artifacts.py", None),)),
+    (
+        "wait",
+        (
+            ("threading.py", ("wait", "join")),
+            ("queue.py", ("get",)),
+            ("concurrent/futures/_base.py", ("result", "as_completed")),
+            ("selectors.py", ("select",)),
+        ),
+    ),
+)
+ENGINE_CATEGORY = "engine"
+_WAIT_FILES = ("threading.py", "queue.py", "concurrent/futures/_base.py", "selectors.py")
+_STUDIO_DIR = Path(__file__).resolve().parent
+# プロセスで同時に動かせる cProfile は1つ。begin で取り、end で返す（別スレッドから返してよい）
+_CPROFILE_SLOT = threading.Lock()
+# section() 内で起動したワーカーを同じ区切りのスレッドとして数えるための受け渡し
+_ACTIVE: ContextVar[Profiler | None] = ContextVar("studio_profiler", default=None)
+
+
+def resolve_profile_mode(cli_value: str | None = None, studio_config: dict[str, Any] | None = None) -> str | None:
+    """CLI flag, then ``STUDIO_PROFILE``, then studio_config ``profile``; None when off."""
+    for value in (cli_value, os.environ.get(PROFILE_ENV), (studio_config or {}).get("profile")):
+        if value:
+            return value if value in PROFILE_MODES else None
+    return None
+
+
+def category_of(filename: str, funcname: str) -> str | None:
+    path = filename.replace("\\", "/")
+    for category, rules in PROFILE_CATEGORIES:
+        for suffix, names in rules:
+            if path.endswith(suffix) and (names is None or funcname in names):
+                return category
+    return None
+
+
+def _is_project_file(filename: str) -> bool:
+    path = Path(filename)
+    return path.parent == _STUDIO_DIR or path.name.startswith("MultiRoleStudio")
+
+
+@dataclass(frozen=True)
+class ProfileSummary:
+    label: str
+    mode: str
+    wall: float
+    categories: dict[str, float]
+    path: Path
+
+    @property
+    def engine_time(self) -> float:
+        """Local engine work: everything except provider calls, thread waits and user input."""
+        return sum(v for k, v in self.categories.items() if k not in ("provider", "wait", "user"))
+
+    def to_record(self) -> dict[str, Any]:
+        return {
+            "label": self.label,
+            "mode": self.mode,
+            "wall": round(self.wall, 6),
+            "engine": round(self.engine_time, 6),
+            "categories": {k: round(v, 6) for k, v in self.categories.items()},
+            "path": self.path.name,
+        }
+
+
+def carry(fn: Callable[..., T]) -> Callable[..., T]:
+    """Count the worker thread running ``fn`` as part of the caller's profiled unit.
+
+    Wrap worker targets at submit time, from inside ``Profiler.section``;
+    outside a profiled unit ``fn`` is returned unchanged.
+    """
+    profiler = _ACTIVE.get()
+    if profiler is None:
+        return fn
+
+    def carried(*args: Any, **kwargs: Any) -> T:
+        token = _ACTIVE.set(profiler)
+        try:
+            with profiler._track():
+                return fn(*args, **kwargs)
+        finally:
+            _ACTIVE.reset(token)
+
+    return carried
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, interval: float, threads: Callable[[], set[int]]) -> None:
+        super().__init__(name="studio-profiler", daemon=True)
+        self.interval = interval
+        self.threads = threads
+        self.samples: Counter[tuple[str, tuple[CodeType, ...]]] = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            threads = self.threads()
+            if not threads:
+                continue
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident not in threads:
+                    continue
+                stack: list[CodeType] = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[(names.get(ident, str(ident)), tuple(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+@dataclass
+class Profiler:
+    """Collects one profile per ``begin`` / ``end`` unit (a turn, or the closing ``finish``)."""
+
+    mode: str | None = None
+    interval: float = SAMPLE_INTERVAL
+    summaries: list[ProfileSummary] = field(default_factory=list)
+    _profile: cProfile.Profile | None = field(default=None, repr=False)
+    _sampler: _Sampler | None = field(default=None, repr=False)
+    _unit_mode: str = ""
+    _started: float = 0.0
+    _sections: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    # 区切りに属するスレッド（ident → 入れ子の数）。sample はこのスレッドだけを採る
+    _threads: Counter[int] = field(default_factory=Counter, repr=False)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode is not None
+
+    def begin(self) -> None:
+        if not self.enabled:
+            return
+        # 前の区切りが end されずに終わった（Web でターン途中にリセットした等）
+        self._discard()
+        self._started = time.perf_counter()
+        self._sections = 0.0
+        if self.mode == "cprofile" and _CPROFILE_SLOT.acquire(blocking=False):
+            self._unit_mode = "cprofile"
+            self._profile = cProfile.Profile()
+        else:
+            # 別のセッションが cProfile を使っている間はサンプリングに切り替える
+            self._unit_mode = "sample"
+            self._sampler = _Sampler(self.interval, self._tracked_threads)
+            self._sampler.start()
+
+    def _discard(self) -> None:
+        if self._sampler is not None:
+            sampler, self._sampler = self._sampler, None
+            sampler.stop()
+        if self._profile is not None:
+            self._profile = None
+            _CPROFILE_SLOT.release()
+
+    @contextmanager
+    def section(self) -> Iterator[None]:
+        """Profile the calling thread for the duration of the block.
+
+        The Web UI resumes a turn from whichever Gradio worker handles the
+        callback, so each resume is its own section.
+        """
+        if self._sampler is not None:
+            token = _ACTIVE.set(self)
+            try:
+                with self._track():
+                    yield
+            finally:
+                _ACTIVE.reset(token)
+            return
+        profile = self._profile
+        if profile is None:
+            yield
+            return
+        started = time.perf_counter()
+        token = _ACTIVE.set(self)
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            _ACTIVE.reset(token)
+            with self._lock:
+                self._sections += time.perf_counter() - started
+
+    @contextmanager
+    def _track(self) -> Iterator[None]:
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._threads[ident] -= 1
+                if not self._threads[ident]:
+                    del self._threads[ident]
+
+    def _tracked_threads(self) -> set[int]:
+        with self._lock:
+            return set(self._threads)
+
+    def end(self, root: Path, session_id: str, label: str) -> ProfileSummary | None:
+        """Stop collecting and write ``sessions/<id>.profile/<label>.*``."""
+        if self._sampler is None and self._profile is None:
+            return None
+        wall = time.perf_counter() - self._started
+        out_dir = Path(root) / "sessions" / f"{session_id}.profile"
+        out_dir.mkdir(parents=True, exist_ok=True)
+        if self._sampler is not None:
+            sampler, self._sampler = self._sampler, None
+            sampler.stop()
+            path = out_dir / f"{label}.folded"
+            categories = _write_samples(sampler.samples, path, sampler.interval)
+        else:
+            profile, self._profile = self._profile, None
+            _CPROFILE_SLOT.release()
+            path = out_dir / f"{label}.prof"
+            stats = pstats.Stats(profile)
+            stats.dump_stats(path)
+            wall = self._sections
+            categories = _stats_categories(stats)
+            categories[ENGINE_CATEGORY] = max(0.0, wall - sum(categories.values()))
+        summary = ProfileSummary(label, self._unit_mode, wall, categories, path)
+        (out_dir / f"{label}.summary.json").write_text(
+            json.dumps(summary.to_record(), ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        self.summaries.append(summary)
+        return summary
+
+
+def _stats_categories(stats: pstats.Stats) -> dict[str, float]:
+    """Cumulative time per category, counting only calls not already inside a categorized caller."""
+    raw: dict[tuple[str, int, str], tuple[Any, ...]] = stats.stats  # type: ignore[attr-defined]
+    categories = {func: category_of(func[0], func[2]) for func in raw}
+    covered: dict[tuple[str, int, str], bool] = {}
+
+    def inside_category(func: tuple[str, int, str]) -> bool:
+        # 呼び出し元を遡って、どこかにカテゴリ付きの関数があるか（再帰は辿らない）。
+        # next() などの組み込み関数は無関係な呼び出し元をまとめてしまうので、そこで止める
+        pending = [func]
+        seen: set[tuple[str, int, str]] = set()
+        while pending:
+            current = pending.pop()
+            if current in covered:
+                if covered[current]:
+                    covered[func] = True
+                    return True
+                continue
+            if current in seen or current[0] == "~":
+                continue
+            seen.add(current)
+            if categories.get(current):
+                covered[func] = True
+                return True
+            entry = raw.get(current)
+            if entry is not None:
+                pending.extend(entry[4])
+        covered[func] = False
+        return False
+
+    totals: dict[str, float] = {}
+    for func, (_cc, _nc, _tt, ct, callers) in raw.items():
+        category = categories[func]
+        if category is None:
+            continue
+        if not callers:
+            totals[category] = totals.get(category, 0.0) + ct
+            continue
+        for caller, edge in callers.items():
+            if not inside_category(caller):
+                totals[category] = totals.get(category, 0.0) + edge[3]
+    return totals
+
+
+def _classify_stack(stack: tuple[CodeType, ...]) -> str | None:
+    if not any(_is_project_file(code.co_filename) for code in stack):
+        return None
+    category = next(
+        (c for code in stack if (c := category_of(code.co_filename, code.co_name)) and c != "wait"),
+        None,
+    )
+    innermost = stack[-1].co_filename.replace("\\", "/") if stack else ""
+    if category not in ("provider", "user") and innermost.endswith(_WAIT_FILES):
+        return "wait"
+    return category or ENGINE_CATEGORY
+
+
+def _write_samples(samples: Counter[tuple[str, tuple[CodeType, ...]]], path: Path, interval: float) -> dict[str, float]:
+    totals: dict[str, float] = {}
+    lines: list[str] = []
+    for (thread, stack), count in samples.most_common():
+        category = _classify_stack(stack)
+        if category is None:
+            continue
+        totals[category] = totals.get(category, 0.0) + count * interval
+        frames = ";".join(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})" for code in stack)
+        lines.append(f"{thread};{frames} {count}\n")
+    path.write_text("".join(lines), encoding="utf-8")
+    return totals
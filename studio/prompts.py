@@ -1,8 +1,46 @@
-"""Prompt assembly (design.md 5.1)."""
+"""Prompt assembly (design.md 5.1).
+
+Blocks are ordered from most to least stable so provider prefix caches
+(design.md 5.1.2) hit across steps: talent and organization, then user
+context, then attachments in the system prompt; the per-step parts go in
+the user message.
+"""
 
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Iterable
+
+
+class SystemPrompt(str):
+    """System prompt text that keeps its blocks (stable first).
+
+    Used as a plain string everywhere; providers with explicit cache
+    breakpoints (Anthropic ``cache_control``) mark the end of each block.
+    """
+
+    blocks: tuple[str, ...]
+
+    def __new__(cls, blocks: Iterable[str]) -> SystemPrompt:
+        kept = tuple(block for block in blocks if block)
+        prompt = super().__new__(cls, "\n\n".join(kept))
+        prompt.blocks = kept
+        return prompt
+
+    def __getnewargs__(self) -> tuple[tuple[str, ...]]:  # type: ignore[override]
+        # pickle / deepcopy は文字列ではなくブロックから作り直す
+        return (self.blocks,)
+
+
+def system_prompt_blocks(system_prompt: str) -> tuple[str, ...]:
+    blocks = getattr(system_prompt, "blocks", None)
+    return blocks if blocks is not None else ((system_prompt,) if system_prompt else ())
+
+
+def with_attachment_block(system_prompt: str, attachment_context: str) -> str:
+    """Append the attachment block as the last (least stable) system block."""
+    if not attachment_context:
+        return system_prompt
+    return SystemPrompt([*system_prompt_blocks(system_prompt), f"--- 添付ファイル ---\n{attachment_context}"])
 
 
 def build_org_context(org: dict[str, Any], org_id: str) -> str:
@@ -25,7 +63,8 @@ def build_system_prompt(
     talent_id: str,
     *,
     user_context_text: str | None = None,
-) -> str:
+    user_context_rag_text: str | None = None,
+) -> SystemPrompt:
     parts: list[str] = []
     if talent.get("personality"):
         parts.append(talent["personality"])
@@ -35,9 +74,6 @@ def build_system_prompt(
     if mission_or_culture:
         parts.append(build_org_context(org, org_id))
 
-    if user_context_text:
-        parts.append(f"【ユーザーコンテキスト】\n{user_context_text}")
-
     common = org.get("common_directives") or []
     if common:
         parts.append("【共通指示】")
@@ -48,7 +84,14 @@ def build_system_prompt(
         parts.append("【個別指示】")
         parts.extend(f"- {item}" for item in role_directives)
 
-    return "\n\n".join(parts)
+    # タレント・組織の定義はセッションをまたいで変わらない。ユーザーコンテキストは後ろの別ブロック
+    context: list[str] = []
+    if user_context_text:
+        context.append(f"【ユーザーコンテキスト】\n{user_context_text}")
+    if user_context_rag_text:
+        context.append(user_context_rag_text)
+
+    return SystemPrompt(["\n\n".join(parts), "\n\n".join(context)])
 
 
 def format_prior_responses(prior_responses: list[tuple[str, str]] | None) -> str:
@@ -64,9 +107,9 @@ def build_user_message(
     user_text: str,
     *,
     action: str = "",
-    attachment_context: str = "",
     prior_responses: list[tuple[str, str]] | None = None,
 ) -> str:
+    # 添付は system prompt 側（with_attachment_block）。ここはステップごとに変わる部分だけ
     parts: list[str] = [user_text]
 
     prior_block = format_prior_responses(prior_responses)
@@ -76,8 +119,4 @@ def build_user_message(
     if action:
         parts.append(f"\nあなたへの指示: {action}")
 
-    if attachment_context:
-        parts.append("\n--- 添付ファイル ---")
-        parts.append(attachment_context)
-
     return "\n".join(parts)
@@ -0,0 +1,215 @@
+"""Process-wide provider rate limiter (design.md §6.4).
+
+One ``ProviderLimiter`` per (assistant, model) is shared by every engine call in
+the process, sync or asyncio. It combines a requests-per-minute bucket, a
+tokens-per-minute bucket and a max in-flight cap, and tightens itself after 429
+responses (Retry-After cooldown plus a temporary rate cut that recovers on success,
+and relaxes back toward the configured limit after a quiet period without 429s).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+# 同時実行数上限に達しているときの再確認間隔（秒）
+_IN_FLIGHT_POLL = 0.05
+# 429 後のレート縮小率と、成功ごとの回復幅
+_BACKOFF_SCALE = 0.5
+_MIN_SCALE = 0.1
+_RECOVER_STEP = 0.05
+_MIN_LEARN_SAMPLES = 4
+# 429 が来ないまま過ぎるとレート縮小を1段戻す間隔（秒）。推定上限は 429 直前の実績に届いたら解除する
+_QUIET_PERIOD = 60.0
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    rpm: float | None = None
+    tpm: float | None = None
+    max_in_flight: int | None = None
+
+
+def resolve_rate_limit(
+    assistant_name: str,
+    model: str,
+    assistant_cfg: dict[str, Any] | None = None,
+    rate_limits: dict[str, Any] | None = None,
+) -> RateLimit:
+    """Merge limits: ai_assistants_config < studio_config; per-model entries override the assistant entry."""
+    merged: dict[str, Any] = {}
+    for source in ((assistant_cfg or {}).get("rate_limits"), (rate_limits or {}).get(assistant_name)):
+        if not source:
+            continue
+        merged.update({k: v for k, v in source.items() if k != "models"})
+        merged.update((source.get("models") or {}).get(model) or {})
+    return RateLimit(
+        rpm=merged.get("rpm"),
+        tpm=merged.get("tpm"),
+        max_in_flight=merged.get("max_in_flight"),
+    )
+
+
+class _Bucket:
+    """Token bucket refilled continuously at ``per_minute / 60`` per second."""
+
+    def __init__(self, per_minute: float, now: float) -> None:
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = now
+
+    def refill(self, now: float, scale: float) -> None:
+        rate = self.capacity * scale / 60.0
+        self.level = min(self.capacity, self.level + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_for(self, amount: float, scale: float) -> float:
+        need = min(amount, self.capacity) - self.level
+        if need <= 0:
+            return 0.0
+        return need / (self.capacity * scale / 60.0)
+
+
+class ProviderLimiter:
+    def __init__(self, limit: RateLimit) -> None:
+        self._lock = threading.Lock()
+        self.limit = limit
+        self._requests: _Bucket | None = None
+        self._tokens: _Bucket | None = None
+        self._in_flight = 0
+        self._cooldown_until = 0.0
+        self._scale = 1.0
+        self._learned_rpm: float | None = None
+        self._learned_ceiling = 0.0
+        self._last_limited = 0.0
+        self._recent: deque[float] = deque()
+        self._configure(limit, time.monotonic())
+
+    def _configure(self, limit: RateLimit, now: float) -> None:
+        self.limit = limit
+        self._requests = _Bucket(limit.rpm, now) if limit.rpm else None
+        self._tokens = _Bucket(limit.tpm, now) if limit.tpm else None
+
+    def update_limit(self, limit: RateLimit) -> None:
+        with self._lock:
+            if limit != self.limit:
+                self._configure(limit, time.monotonic())
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Reserve a slot and return 0, or return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._cooldown_until:
+                return self._cooldown_until - now
+            if self.limit.max_in_flight and self._in_flight >= self.limit.max_in_flight:
+                return _IN_FLIGHT_POLL
+
+            while self._recent and now - self._recent[0] > 60.0:
+                self._recent.popleft()
+            self._relax(now)
+            if self._learned_rpm is not None and len(self._recent) >= self._learned_rpm:
+                return 60.0 - (now - self._recent[0])
+
+            wait = 0.0
+            for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                if bucket is not None:
+                    bucket.refill(now, self._scale)
+                    wait = max(wait, bucket.wait_for(amount, self._scale))
+            if wait > 0:
+                return wait
+
+            if self._requests is not None:
+                self._requests.level -= 1
+            if self._tokens is not None:
+                self._tokens.level -= min(tokens, self._tokens.capacity)
+            self._in_flight += 1
+            self._recent.append(now)
+            return 0.0
+
+    def _relax(self, now: float) -> None:
+        """Undo one backoff step per quiet period since the last 429 (caller holds the lock)."""
+        if self._learned_rpm is None and self._scale >= 1.0:
+            return
+        periods = int((now - self._last_limited) // _QUIET_PERIOD)
+        if periods <= 0:
+            return
+        self._last_limited += periods * _QUIET_PERIOD
+        factor = (1.0 / _BACKOFF_SCALE) ** periods
+        self._scale = min(1.0, self._scale * factor)
+        if self._learned_rpm is not None:
+            self._learned_rpm *= factor
+            if self._learned_rpm >= self._learned_ceiling:
+                # 設定上の rpm（未設定なら上限なし）へ戻す
+                self._learned_rpm = None
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until the call may start; returns seconds waited."""
+        start = time.perf_counter()
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return time.perf_counter() - start
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        start = time.perf_counter()
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return time.perf_counter() - start
+            await asyncio.sleep(wait)
+
+    def release(self, *, reserved_tokens: int = 0, used_tokens: int | None = None) -> None:
+        """Free the in-flight slot and settle the token bucket with actual usage."""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if self._tokens is not None and used_tokens is not None:
+                self._tokens.level -= max(0, used_tokens - reserved_tokens)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._scale = min(1.0, self._scale + _RECOVER_STEP)
+            if self._learned_rpm is not None:
+                self._learned_rpm += 1
+
+    def record_rate_limited(self, retry_after: float | None) -> None:
+        """Apply a 429: honour Retry-After and cut the effective rate until calls succeed again."""
+        with self._lock:
+            now = time.monotonic()
+            self._last_limited = now
+            self._scale = max(_MIN_SCALE, self._scale * _BACKOFF_SCALE)
+            if self._requests is not None:
+                self._requests.level = min(self._requests.level, 0.0)
+            if retry_after:
+                self._cooldown_until = max(self._cooldown_until, now + retry_after)
+                return
+            # Retry-After が無く rpm も未設定なら、直近1分の実績から上限を推定する
+            while self._recent and now - self._recent[0] > 60.0:
+                self._recent.popleft()
+            if self.limit.rpm is None and len(self._recent) >= _MIN_LEARN_SAMPLES:
+                self._learned_ceiling = float(len(self._recent))
+                self._learned_rpm = len(self._recent) * _BACKOFF_SCALE
+
+
+_LIMITERS: dict[tuple[str, str], ProviderLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def limiter_for(assistant_name: str, model: str, limit: RateLimit) -> ProviderLimiter:
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get((assistant_name, model))
+        if limiter is None:
+            limiter = ProviderLimiter(limit)
+            _LIMITERS[(assistant_name, model)] = limiter
+            return limiter
+    limiter.update_limit(limit)
+    return limiter
+
+
+def reset_limiters() -> None:
+    with _LIMITERS_LOCK:
+        _LIMITERS.clear()
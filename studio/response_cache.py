@@ -0,0 +1,184 @@
+"""Deterministic LLM response cache (design.md §6.4).
+
+Responses are stored in SQLite under the project root, keyed by a hash of
+(assistant, model, temperature, system_prompt, history, user_message).
+Modes: ``read`` uses a stored response when present and stores misses,
+``write`` always calls the provider and refreshes the entry, ``off`` bypasses
+the cache. Entries are evicted by age, by count and by total stored bytes
+(least recently used first).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+CACHE_MODES = ("read", "write", "off")
+DEFAULT_CACHE_PATH = "cache/responses.sqlite3"
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_MB = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    assistant TEXT NOT NULL,
+    model TEXT NOT NULL,
+    text TEXT NOT NULL,
+    tokens_in INTEGER NOT NULL,
+    tokens_out INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used);
+"""
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    text: str
+    tokens_in: int
+    tokens_out: int
+
+
+def cache_key(
+    assistant_name: str,
+    model: str,
+    temperature: float | None,
+    system_prompt: str,
+    history: list[Any],
+    user_message: str,
+) -> str:
+    messages = [[getattr(m, "type", type(m).__name__), str(getattr(m, "content", m))] for m in history]
+    material = json.dumps(
+        [assistant_name, model, temperature, system_prompt, messages, user_message],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def resolve_cache_mode(studio_config: dict[str, Any], override: str | None = None) -> str:
+    """CLI / UI override > studio_config ``response_cache.mode`` > ``off``."""
+    if override:
+        return override
+    return str((studio_config.get("response_cache") or {}).get("mode", "off"))
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: Path,
+        *,
+        mode: str = "read",
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+        max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+    ) -> None:
+        if mode not in CACHE_MODES:
+            raise ValueError(f"unknown cache mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @classmethod
+    def from_config(
+        cls,
+        root: Path,
+        studio_config: dict[str, Any],
+        mode: str | None = None,
+    ) -> ResponseCache | None:
+        """Build the session cache, or None when the resolved mode is ``off``."""
+        resolved = resolve_cache_mode(studio_config, mode)
+        if resolved == "off":
+            return None
+        cfg = studio_config.get("response_cache") or {}
+        return cls(
+            Path(root) / cfg.get("path", DEFAULT_CACHE_PATH),
+            mode=resolved,
+            max_entries=int(cfg.get("max_entries", DEFAULT_MAX_ENTRIES)),
+            max_age_days=float(cfg.get("max_age_days", DEFAULT_MAX_AGE_DAYS)),
+            max_bytes=int(float(cfg.get("max_mb", DEFAULT_MAX_MB)) * 1024 * 1024),
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._ready:
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+            if "bytes" not in columns:
+                # bytes 列より前に作られたキャッシュは本文の長さで埋める
+                with conn:
+                    conn.execute("ALTER TABLE responses ADD COLUMN bytes INTEGER NOT NULL DEFAULT 0")
+                    conn.execute("UPDATE responses SET bytes = length(CAST(text AS BLOB))")
+            self._ready = True
+        return conn
+
+    def get(self, key: str) -> CachedResponse | None:
+        if self.mode != "read":
+            return None
+        cutoff = time.time() - self.max_age_days * 86400
+        with self._lock, closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT text, tokens_in, tokens_out FROM responses WHERE key = ? AND created_at >= ?",
+                (key, cutoff),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return CachedResponse(text=row[0], tokens_in=row[1], tokens_out=row[2])
+
+    def put(
+        self,
+        key: str,
+        *,
+        assistant_name: str,
+        model: str,
+        text: str,
+        tokens_in: int,
+        tokens_out: int,
+    ) -> None:
+        if self.mode == "off":
+            return
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, assistant, model, text, tokens_in, tokens_out, created_at, last_used, bytes)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, assistant_name, model, text, tokens_in, tokens_out, now, now, len(text.encode("utf-8"))),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age_days * 86400,))
+        conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM ("
+            "  SELECT key, SUM(bytes) OVER (ORDER BY last_used DESC, key) AS running FROM responses"
+            " ) WHERE running > ?)",
+            (self.max_bytes,),
+        )
+
+    def total_bytes(self) -> int:
+        with self._lock, closing(self._connect()) as conn:
+            return int(conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM responses").fetchone()[0])
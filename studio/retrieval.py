@@ -0,0 +1,82 @@
+"""Local BM25 ranking over text chunks (design.md 5.1.1).
+
+Pure Python, no network. ASCII words are lower-cased and matched whole;
+runs of Japanese characters (kana / kanji) become overlapping bigrams, so
+queries match without a morphological analyser.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORD = re.compile(r"[A-Za-z0-9_]+|[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff\uff66-\uff9f]+")
+_ASCII = re.compile(r"[A-Za-z0-9_]+")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens: list[str] = []
+    for match in _WORD.finditer(text):
+        word = match.group()
+        if _ASCII.fullmatch(word):
+            tokens.append(word.lower())
+        elif len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i : i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+@dataclass
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents."""
+
+    term_freqs: list[Counter[str]] = field(default_factory=list)
+    lengths: list[int] = field(default_factory=list)
+    idf: dict[str, float] = field(default_factory=dict)
+    avg_length: float = 0.0
+
+    @classmethod
+    def build(cls, documents: list[str]) -> BM25Index:
+        return cls.from_term_freqs([Counter(tokenize(doc)) for doc in documents])
+
+    @classmethod
+    def from_term_freqs(cls, term_freqs: list[Counter[str]]) -> BM25Index:
+        """Build from per-document term counts (e.g. loaded from a persisted index)."""
+        lengths = [sum(tf.values()) for tf in term_freqs]
+        df: Counter[str] = Counter()
+        for tf in term_freqs:
+            df.update(tf.keys())
+        n = len(term_freqs)
+        idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+        avg = sum(lengths) / n if n else 0.0
+        return cls(term_freqs, lengths, idf, avg)
+
+    def __len__(self) -> int:
+        return len(self.term_freqs)
+
+    def scores(self, query: str) -> list[float]:
+        terms = [t for t in set(tokenize(query)) if t in self.idf]
+        out = [0.0] * len(self.term_freqs)
+        if not terms or not self.avg_length:
+            return out
+        for i, tf in enumerate(self.term_freqs):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / self.avg_length)
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (BM25_K1 + 1) / (freq + norm)
+            out[i] = score
+        return out
+
+    def top(self, query: str, k: int) -> list[tuple[int, float]]:
+        """Up to ``k`` (document index, score) pairs with a positive score, best first."""
+        ranked = heapq.nlargest(k, enumerate(self.scores(query)), key=lambda item: item[1])
+        return [(i, s) for i, s in ranked if s > 0]
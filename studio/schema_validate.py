@@ -6,13 +6,12 @@ import json
 from pathlib import Path
 from typing import Any
 
-from jsonschema import Draft202012Validator
-from jsonschema.exceptions import SchemaError
-
 from studio.validation import StudioError, ValidationReport
 
 SCHEMA_DIR = Path(__file__).resolve().parent.parent / "schemas"
 _SCHEMA_CACHE: dict[str, dict[str, Any]] = {}
+# スキーマごとに一度だけ構築した Draft202012Validator（参照解決の結果も使い回す）
+_VALIDATOR_CACHE: dict[str, Any] = {}
 
 
 def schema_path(name: str) -> Path:
@@ -27,15 +26,28 @@ def load_schema(name: str) -> dict[str, Any]:
     return _SCHEMA_CACHE[name]
 
 
+def get_validator(name: str) -> Any:
+    """Precompiled validator for ``schemas/<name>.schema.json``, shared process-wide."""
+    validator = _VALIDATOR_CACHE.get(name)
+    if validator is None:
+        from jsonschema import Draft202012Validator
+
+        validator = _VALIDATOR_CACHE.setdefault(name, Draft202012Validator(load_schema(name)))
+    return validator
+
+
 def validate_schema_document(
     data: Any,
     schema_name: str,
     target: str,
     report: ValidationReport | None = None,
 ) -> ValidationReport:
+    # jsonschema は検証するときだけ読み込む（CLI の --version 等を軽く保つ）
+    from jsonschema.exceptions import SchemaError
+
     result = report or ValidationReport()
     try:
-        schema = load_schema(schema_name)
+        validator = get_validator(schema_name)
     except (OSError, json.JSONDecodeError, SchemaError) as exc:
         result.add(
             StudioError(
@@ -46,7 +58,6 @@ def validate_schema_document(
         )
         return result
 
-    validator = Draft202012Validator(schema)
     for error in sorted(validator.iter_errors(data), key=lambda e: list(e.path)):
         path_parts = [str(p) for p in error.absolute_path]
         field = ".".join(path_parts) if path_parts else "(root)"
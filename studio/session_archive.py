@@ -0,0 +1,237 @@
+"""Compressed pack files for old session logs (design.md §7.1).
+
+``archive_sessions`` moves ``sessions/<id>.jsonl`` files older than N days into
+``sessions/archive/pack_<timestamp>.jsonl.zst`` (``.gz`` when zstandard is not
+installed). Each log is compressed as its own zstd frame / gzip member, and the
+``pack_<timestamp>.index.json`` next to the pack records
+``session_id -> [offset, length, size, mtime]``. That lets one log be read by
+seeking into the pack without inflating the rest. The log readers use
+``iter_log_lines`` / ``read_log_bytes``, so archived sessions read the same
+way as live ones. A live file always takes precedence over an archived copy.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # 任意依存。未導入なら標準ライブラリの gzip
+    zstandard = None
+
+ARCHIVE_DIR = "archive"
+INDEX_VERSION = 1
+CODECS = ("auto", "zstd", "gzip")
+_PACK_SUFFIX = {"zstd": ".jsonl.zst", "gzip": ".jsonl.gz"}
+
+
+@dataclass(frozen=True)
+class ArchivedLog:
+    session_id: str
+    pack: Path
+    codec: str
+    offset: int
+    length: int
+    size: int
+    mtime: float
+
+
+@dataclass
+class ArchiveResult:
+    pack: Path | None = None
+    archived: list[str] = field(default_factory=list)
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+
+def resolve_codec(codec: str = "auto") -> str:
+    if codec == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if codec not in _PACK_SUFFIX:
+        raise ValueError(f"unknown archive codec: {codec}")
+    if codec == "zstd" and zstandard is None:
+        raise RuntimeError("zstd で圧縮するには zstandard パッケージが必要です")
+    return codec
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd 圧縮のアーカイブを読むには zstandard パッケージが必要です")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+_index_cache: dict[Path, tuple[tuple[tuple[str, int], ...], dict[str, ArchivedLog]]] = {}
+_index_lock = threading.Lock()
+
+
+def archived_logs(sessions_dir: Path) -> dict[str, ArchivedLog]:
+    """Every archived log under ``sessions_dir/archive`` (index files re-read only when they change)."""
+    archive_dir = Path(sessions_dir) / ARCHIVE_DIR
+    try:
+        index_files = sorted(archive_dir.glob("*.index.json"))
+        signature = tuple((p.name, p.stat().st_mtime_ns) for p in index_files)
+    except OSError:
+        return {}
+    key = archive_dir.resolve()
+    with _index_lock:
+        cached = _index_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    logs: dict[str, ArchivedLog] = {}
+    for index_file in index_files:
+        try:
+            index = json.loads(index_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if index.get("version") != INDEX_VERSION:
+            continue
+        pack = archive_dir / str(index.get("pack") or "")
+        codec = str(index.get("codec") or "gzip")
+        for session_id, (offset, length, size, mtime) in (index.get("sessions") or {}).items():
+            logs[session_id] = ArchivedLog(session_id, pack, codec, int(offset), int(length), int(size), float(mtime))
+    with _index_lock:
+        _index_cache[key] = (signature, logs)
+    return logs
+
+
+def archived_log(path: Path) -> ArchivedLog | None:
+    """Archive entry for the log path ``sessions/<id>.jsonl``, if it was packed."""
+    return archived_logs(Path(path).parent).get(Path(path).stem)
+
+
+def read_archived_bytes(entry: ArchivedLog) -> bytes:
+    with entry.pack.open("rb") as handle:
+        handle.seek(entry.offset)
+        return _decompress(handle.read(entry.length), entry.codec)
+
+
+def log_exists(path: Path) -> bool:
+    return Path(path).is_file() or archived_log(path) is not None
+
+
+def log_signature(path: Path) -> tuple[str, int, int] | None:
+    """(location, mtime_ns, size) of a live or archived log; None when neither exists."""
+    path = Path(path)
+    try:
+        stat = path.stat()
+        return str(path.resolve()), stat.st_mtime_ns, stat.st_size
+    except OSError:
+        pass
+    entry = archived_log(path)
+    if entry is None:
+        return None
+    return f"{entry.pack.resolve()}#{entry.offset}", int(entry.mtime * 1e9), entry.size
+
+
+def read_log_bytes(path: Path) -> bytes | None:
+    """Raw log content from the live file or its pack; None when the session does not exist."""
+    path = Path(path)
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        pass
+    entry = archived_log(path)
+    return read_archived_bytes(entry) if entry is not None else None
+
+
+def iter_log_lines(path: Path) -> Iterator[str]:
+    """Lines (with their newline) of a live or archived log; live files are streamed."""
+    path = Path(path)
+    try:
+        handle = path.open(encoding="utf-8")
+    except FileNotFoundError:
+        entry = archived_log(path)
+        if entry is not None:
+            yield from read_archived_bytes(entry).decode("utf-8").splitlines(keepends=True)
+        return
+    with handle:
+        yield from handle
+
+
+def archive_sessions(
+    root: Path,
+    *,
+    older_than_days: float,
+    codec: str = "auto",
+    now: float | None = None,
+) -> ArchiveResult:
+    """Pack logs not modified for ``older_than_days`` into one new pack and remove the originals.
+
+    The pack and index are written under temporary names and renamed (index
+    last) before any log is deleted, so an interrupted run leaves every
+    session readable. Checkpoint sidecars of packed sessions are removed;
+    resume falls back to rebuilding from the archived log.
+    """
+    codec = resolve_codec(codec)
+    sessions_dir = Path(root) / "sessions"
+    cutoff = (time.time() if now is None else now) - older_than_days * 86400
+    already = archived_logs(sessions_dir)
+    candidates: list[tuple[Path, os.stat_result]] = []
+    for path in sorted(sessions_dir.glob("*.jsonl")) if sessions_dir.is_dir() else []:
+        stat = path.stat()
+        if stat.st_mtime >= cutoff:
+            continue
+        packed = already.get(path.stem)
+        if packed is not None and packed.size == stat.st_size:
+            # 前回の実行が索引まで書いて中断した分: 元ファイルを消すだけ
+            path.unlink()
+            continue
+        candidates.append((path, stat))
+
+    result = ArchiveResult()
+    if not candidates:
+        return result
+
+    archive_dir = sessions_dir / ARCHIVE_DIR
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    base = f"pack_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    name, suffix = base, 2
+    while (archive_dir / f"{name}{_PACK_SUFFIX[codec]}").exists():
+        name, suffix = f"{base}_{suffix}", suffix + 1
+    pack = archive_dir / f"{name}{_PACK_SUFFIX[codec]}"
+    index_path = archive_dir / f"{name}.index.json"
+
+    entries: dict[str, list[float]] = {}
+    tmp_pack = pack.with_name(pack.name + ".tmp")
+    with tmp_pack.open("wb") as out:
+        for path, stat in candidates:
+            data = path.read_bytes()
+            blob = _compress(data, codec)
+            entries[path.stem] = [out.tell(), len(blob), len(data), stat.st_mtime]
+            out.write(blob)
+            result.bytes_in += len(data)
+            result.bytes_out += len(blob)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_pack, pack)
+
+    tmp_index = index_path.with_name(index_path.name + ".tmp")
+    tmp_index.write_text(
+        json.dumps({"version": INDEX_VERSION, "pack": pack.name, "codec": codec, "sessions": entries}),
+        encoding="utf-8",
+    )
+    os.replace(tmp_index, index_path)
+
+    for path, _stat in candidates:
+        path.unlink()
+        path.with_name(f"{path.stem}.checkpoint.json").unlink(missing_ok=True)
+    result.pack = pack
+    result.archived = list(entries)
+    return result
@@ -0,0 +1,397 @@
+"""SQLite catalog of session logs (design.md §7.1, §8.5).
+
+``sessions/catalog.sqlite3`` holds one row per ``sessions/<id>.jsonl`` so the
+session list does not open every log. SessionLogger updates its row at
+``start()`` / ``finish()``; ``sync`` re-indexes logs whose size or mtime
+changed (copied in, crashed before finish) and runs once per process on first
+read and on every Sessions-tab refresh and ``rebuild`` re-reads all of
+them in parallel. Logs packed by ``session_archive`` keep their rows and are
+re-read from the pack on rebuild. The JSONL files stay the source of truth.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable
+
+from studio.session_archive import archived_log, archived_logs, iter_log_lines
+
+CATALOG_FILE = "catalog.sqlite3"
+SORT_COLUMNS = {
+    "started": "session_id",
+    "ended": "ended_at",
+    "cost": "total_cost",
+    "tokens": "tokens_in + tokens_out",
+    "steps": "step_count",
+}
+# これ未満のログ数ならプロセスを起こさず直列で読む
+PARALLEL_MIN_LOGS = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    organization TEXT NOT NULL,
+    workflow TEXT,
+    parent_session_id TEXT,
+    started_at TEXT NOT NULL,
+    ended_at TEXT,
+    total_cost REAL NOT NULL DEFAULT 0,
+    tokens_in INTEGER NOT NULL DEFAULT 0,
+    tokens_out INTEGER NOT NULL DEFAULT 0,
+    step_count INTEGER NOT NULL DEFAULT 0,
+    models TEXT NOT NULL DEFAULT '[]',
+    artifact_dir TEXT,
+    log_size INTEGER NOT NULL DEFAULT -1,
+    log_mtime REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_org ON sessions(organization, session_id);
+CREATE INDEX IF NOT EXISTS sessions_workflow ON sessions(workflow, session_id);
+"""
+
+_COLUMNS = (
+    "session_id, organization, workflow, parent_session_id, started_at, ended_at,"
+    " total_cost, tokens_in, tokens_out, step_count, models, artifact_dir"
+)
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    session_id: str
+    organization: str
+    workflow: str | None
+    parent_session_id: str | None
+    started_at: str
+    ended_at: str | None = None
+    total_cost: float = 0.0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    step_count: int = 0
+    models: tuple[str, ...] = ()
+    artifact_dir: str | None = None
+
+
+def started_at_from_id(session_id: str) -> str:
+    """``YYYYMMDD_HHMMSS[_n]`` → ``YYYY-MM-DD HH:MM:SS`` (unparseable ids are returned as-is)."""
+    try:
+        return datetime.strptime(session_id[:15], "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return session_id
+
+
+def model_label(assistant: str, model: str | None) -> str:
+    return f"{assistant}/{model}" if model else assistant
+
+
+def _read_records(path: Path) -> list[dict[str, Any]]:
+    records: list[dict[str, Any]] = []
+    for raw in iter_log_lines(path):
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            # 壊れた行があっても一覧からは落とさない（本文の検証はレポート生成側）
+            continue
+    return records
+
+
+def _log_stat(path: Path) -> tuple[int, float] | None:
+    """(size, mtime) of the live log, or of its original when it was archived."""
+    try:
+        stat = path.stat()
+        return stat.st_size, stat.st_mtime
+    except OSError:
+        entry = archived_log(path)
+        return (entry.size, entry.mtime) if entry is not None else None
+
+
+def entry_from_log(path: Path) -> tuple[CatalogEntry, int, float] | None:
+    """Summarise one JSONL log; returns (entry, size, mtime) or None when it has no session_meta."""
+    try:
+        stat = _log_stat(path)
+        records = _read_records(path) if stat is not None else []
+    except OSError:
+        return None
+    if not records or records[0].get("type") != "session_meta":
+        return None
+    meta = records[0]
+    session_id = path.stem
+    steps = [r for r in records if r.get("type") == "step"]
+    end = next((r for r in reversed(records) if r.get("type") == "session_end"), None)
+    models = sorted(
+        {
+            model_label(str(s.get("assistant") or ""), s.get("model"))
+            for s in steps
+            if s.get("assistant") and s.get("assistant") != "human"
+        }
+    )
+    if end is not None:
+        cost = float(end.get("total_cost") or 0.0)
+    else:
+        cost = sum(float(s.get("cost") or 0.0) for s in steps)
+    artifact_dir = path.parent.parent / "sandbox" / f"session_{session_id}"
+    entry = CatalogEntry(
+        session_id=session_id,
+        organization=str(meta.get("organization") or ""),
+        workflow=meta.get("workflow") or None,
+        parent_session_id=meta.get("parent_session_id") or None,
+        started_at=started_at_from_id(session_id),
+        ended_at=datetime.fromtimestamp(stat[1]).strftime("%Y-%m-%d %H:%M:%S") if end else None,
+        total_cost=round(cost, 6),
+        tokens_in=sum(int((s.get("tokens") or {}).get("in", 0)) for s in steps),
+        tokens_out=sum(int((s.get("tokens") or {}).get("out", 0)) for s in steps),
+        step_count=len(steps),
+        models=tuple(models),
+        artifact_dir=str(artifact_dir) if artifact_dir.is_dir() else None,
+    )
+    return entry, stat[0], stat[1]
+
+
+_SYNCED_ROOTS: set[Path] = set()
+_SYNCED_LOCK = threading.Lock()
+
+
+class SessionCatalog:
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self.sessions_dir = self.root / "sessions"
+        self.path = self.sessions_dir / CATALOG_FILE
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def exists(self) -> bool:
+        return self.path.is_file()
+
+    def ensure_synced(self) -> None:
+        """Stat-only ``sync`` the first time this process reads the catalog of ``root``."""
+        key = self.root.resolve()
+        with _SYNCED_LOCK:
+            if key in _SYNCED_ROOTS:
+                return
+            _SYNCED_ROOTS.add(key)
+        self.sync()
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._ready:
+            conn.executescript(_SCHEMA)
+            self._ready = True
+        return conn
+
+    def _upsert(
+        self,
+        conn: sqlite3.Connection,
+        entry: CatalogEntry,
+        size: int = -1,
+        mtime: float = 0.0,
+    ) -> None:
+        conn.execute(
+            f"INSERT OR REPLACE INTO sessions ({_COLUMNS}, log_size, log_mtime)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry.session_id,
+                entry.organization,
+                entry.workflow,
+                entry.parent_session_id,
+                entry.started_at,
+                entry.ended_at,
+                entry.total_cost,
+                entry.tokens_in,
+                entry.tokens_out,
+                entry.step_count,
+                json.dumps(list(entry.models), ensure_ascii=False),
+                entry.artifact_dir,
+                size,
+                mtime,
+            ),
+        )
+
+    def record_start(
+        self,
+        session_id: str,
+        organization: str,
+        workflow: str | None,
+        parent_session_id: str | None = None,
+    ) -> None:
+        """Insert the row at session start (size -1 marks it stale for ``sync`` until finish)."""
+        entry = CatalogEntry(
+            session_id=session_id,
+            organization=organization,
+            workflow=workflow or None,
+            parent_session_id=parent_session_id or None,
+            started_at=started_at_from_id(session_id),
+        )
+        # 既存ログの取り込みは一覧を開いたとき（ensure_synced / sync）に回し、初回ターンを待たせない
+        with self._lock, closing(self._connect()) as conn, conn:
+            self._upsert(conn, entry)
+
+    def record_end(
+        self,
+        session_id: str,
+        *,
+        total_cost: float,
+        tokens_in: int,
+        tokens_out: int,
+        step_count: int,
+        models: Iterable[str],
+        artifact_dir: str | None = None,
+    ) -> None:
+        log_path = self.sessions_dir / f"{session_id}.jsonl"
+        try:
+            stat = log_path.stat()
+            size, mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            size, mtime = -1, 0.0
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE sessions SET ended_at = ?, total_cost = ?, tokens_in = ?, tokens_out = ?,"
+                " step_count = ?, models = ?, artifact_dir = ?, log_size = ?, log_mtime = ?"
+                " WHERE session_id = ?",
+                (
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    round(total_cost, 6),
+                    tokens_in,
+                    tokens_out,
+                    step_count,
+                    json.dumps(sorted(set(models)), ensure_ascii=False),
+                    artifact_dir,
+                    size,
+                    mtime,
+                    session_id,
+                ),
+            )
+
+    def query(
+        self,
+        *,
+        organization: str | None = None,
+        workflow: str | None = None,
+        search: str | None = None,
+        sort: str = "started",
+        descending: bool = True,
+        limit: int | None = None,
+        offset: int = 0,
+    ) -> list[CatalogEntry]:
+        """Filtered, sorted page of sessions (``workflow=""`` selects direct-send sessions)."""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"unknown sort key: {sort}")
+        where, params = self._where(organization, workflow, search)
+        order = f"{SORT_COLUMNS[sort]} {'DESC' if descending else 'ASC'}, session_id DESC"
+        sql = f"SELECT {_COLUMNS} FROM sessions{where} ORDER BY {order} LIMIT ? OFFSET ?"
+        with self._lock, closing(self._connect()) as conn:
+            rows = conn.execute(sql, (*params, -1 if limit is None else limit, offset)).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def count(
+        self,
+        *,
+        organization: str | None = None,
+        workflow: str | None = None,
+        search: str | None = None,
+    ) -> int:
+        where, params = self._where(organization, workflow, search)
+        with self._lock, closing(self._connect()) as conn:
+            return int(conn.execute(f"SELECT COUNT(*) FROM sessions{where}", params).fetchone()[0])
+
+    def organizations(self) -> list[str]:
+        with self._lock, closing(self._connect()) as conn:
+            rows = conn.execute("SELECT DISTINCT organization FROM sessions ORDER BY organization").fetchall()
+        return [row[0] for row in rows]
+
+    def sync(self, *, workers: int | None = None) -> int:
+        """Re-index new / changed logs and drop rows whose log is gone; returns rows written."""
+        logs = self._log_paths()
+        with self._lock, closing(self._connect()) as conn:
+            known = {
+                row[0]: (row[1], row[2])
+                for row in conn.execute("SELECT session_id, log_size, log_mtime FROM sessions")
+            }
+        stale: list[Path] = []
+        for session_id, path in logs.items():
+            stat = _log_stat(path)
+            if stat is not None and known.get(session_id) != stat:
+                stale.append(path)
+        gone = [session_id for session_id in known if session_id not in logs]
+        return self._index(stale, gone, workers=workers)
+
+    def rebuild(self, *, workers: int | None = None) -> int:
+        """Drop every row and re-read all logs (parallel for large trees)."""
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM sessions")
+        logs = [path for _session_id, path in sorted(self._log_paths().items())]
+        return self._index(logs, [], workers=workers)
+
+    def _log_paths(self) -> dict[str, Path]:
+        """session_id -> log path for live logs and logs packed under sessions/archive."""
+        if not self.sessions_dir.is_dir():
+            return {}
+        logs = {session_id: self.sessions_dir / f"{session_id}.jsonl" for session_id in archived_logs(self.sessions_dir)}
+        logs.update({p.stem: p for p in self.sessions_dir.glob("*.jsonl")})
+        return logs
+
+    def _index(self, paths: list[Path], gone: list[str], *, workers: int | None) -> int:
+        if len(paths) >= PARALLEL_MIN_LOGS and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as pool:
+                results = list(pool.map(entry_from_log, paths, chunksize=32))
+        else:
+            results = [entry_from_log(path) for path in paths]
+        written = 0
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.executemany("DELETE FROM sessions WHERE session_id = ?", [(s,) for s in gone])
+            for path, result in zip(paths, results):
+                if result is None:
+                    conn.execute("DELETE FROM sessions WHERE session_id = ?", (path.stem,))
+                    continue
+                self._upsert(conn, *result)
+                written += 1
+        return written
+
+    @staticmethod
+    def _where(
+        organization: str | None,
+        workflow: str | None,
+        search: str | None,
+    ) -> tuple[str, tuple[Any, ...]]:
+        clauses: list[str] = []
+        params: list[Any] = []
+        if organization:
+            clauses.append("organization = ?")
+            params.append(organization)
+        if workflow is not None:
+            if workflow:
+                clauses.append("workflow = ?")
+                params.append(workflow)
+            else:
+                clauses.append("workflow IS NULL")
+        if search:
+            clauses.append("(session_id LIKE ? OR models LIKE ?)")
+            params.extend([f"%{search}%"] * 2)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), tuple(params)
+
+    @staticmethod
+    def _entry(row: tuple[Any, ...]) -> CatalogEntry:
+        return CatalogEntry(
+            session_id=row[0],
+            organization=row[1],
+            workflow=row[2],
+            parent_session_id=row[3],
+            started_at=row[4],
+            ended_at=row[5],
+            total_cost=row[6],
+            tokens_in=row[7],
+            tokens_out=row[8],
+            step_count=row[9],
+            models=tuple(json.loads(row[10] or "[]")),
+            artifact_dir=row[11],
+        )
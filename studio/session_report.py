@@ -3,14 +3,20 @@
 from __future__ import annotations
 
 import json
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Literal
 
 from studio.display import format_by_model_markdown_table, format_step_metrics_line
+from studio.session_archive import iter_log_lines, log_exists, log_signature
+from studio.session_catalog import CatalogEntry, SessionCatalog
 
 DIRECT_WORKFLOW_LABEL = "直接送信"
+# パース済みログを保持する件数（分岐チェーンの祖先ログを再読込しない）
+LOG_CACHE_SIZE = 64
 
 FlowTheme = Literal["light", "dark"]
 
@@ -58,6 +64,13 @@ class SessionSummary:
     parent_session_id: str | None
     started_at: str
     label: str
+    ended_at: str | None = None
+    total_cost: float = 0.0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    step_count: int = 0
+    models: tuple[str, ...] = ()
+    artifact_dir: str | None = None
 
 
 def parse_session_timestamp(session_id: str) -> str:
@@ -69,30 +82,59 @@ def parse_session_timestamp(session_id: str) -> str:
 
 
 def read_jsonl(path: Path) -> list[dict[str, Any]]:
-    if not path.is_file():
-        return []
+    """Records of a live or archived session log ([] when it does not exist)."""
     records: list[dict[str, Any]] = []
-    with path.open(encoding="utf-8") as handle:
-        for line in handle:
-            line = line.strip()
-            if not line:
-                continue
+    for raw in iter_log_lines(path):
+        line = raw.strip()
+        if not line:
+            continue
+        try:
             records.append(json.loads(line))
+        except json.JSONDecodeError:
+            # 書き込み途中で落ちたログの末尾行（改行なし）は読み飛ばす
+            if raw.endswith("\n"):
+                raise
     return records
 
 
+_log_cache: OrderedDict[tuple[str, int, int], tuple[dict[str, Any], ...]] = OrderedDict()
+_log_cache_lock = threading.Lock()
+
+
+def read_log_records(path: Path) -> tuple[dict[str, Any], ...]:
+    """Parsed records of one (live or archived) log, cached by (path, mtime, size); treat them as read-only."""
+    key = log_signature(path)
+    if key is None:
+        return ()
+    with _log_cache_lock:
+        records = _log_cache.get(key)
+        if records is not None:
+            _log_cache.move_to_end(key)
+            return records
+
+    records = tuple(read_jsonl(path))
+    with _log_cache_lock:
+        _log_cache[key] = records
+        _log_cache.move_to_end(key)
+        while len(_log_cache) > LOG_CACHE_SIZE:
+            _log_cache.popitem(last=False)
+    return records
+
+
+def clear_log_cache() -> None:
+    with _log_cache_lock:
+        _log_cache.clear()
+
+
 def read_session_meta(path: Path) -> dict[str, Any] | None:
-    if not path.is_file():
+    for line in iter_log_lines(path):
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if record.get("type") == "session_meta":
+            return record
         return None
-    with path.open(encoding="utf-8") as handle:
-        for line in handle:
-            line = line.strip()
-            if not line:
-                continue
-            record = json.loads(line)
-            if record.get("type") == "session_meta":
-                return record
-            return None
     return None
 
 
@@ -106,11 +148,18 @@ def format_session_label(
     workflow: str | None,
     *,
     parent_session_id: str | None = None,
+    step_count: int | None = None,
+    total_cost: float | None = None,
 ) -> str:
     started = parse_session_timestamp(session_id)
     wf = workflow or DIRECT_WORKFLOW_LABEL
     branch = f" ← {parent_session_id}" if parent_session_id else ""
-    return f"{started} | {organization} | {wf} | {session_id}{branch}"
+    stats = ""
+    if step_count is not None:
+        stats = f" | {step_count} steps"
+        if total_cost:
+            stats += f" ${total_cost:.4f}"
+    return f"{started} | {organization} | {wf} | {session_id}{branch}{stats}"
 
 
 def summarize_session(path: Path) -> SessionSummary | None:
@@ -131,20 +180,90 @@ def summarize_session(path: Path) -> SessionSummary | None:
     )
 
 
-def list_sessions(root: Path) -> list[SessionSummary]:
-    sessions_dir = Path(root) / "sessions"
-    if not sessions_dir.is_dir():
+def _summary_from_entry(entry: CatalogEntry) -> SessionSummary:
+    return SessionSummary(
+        session_id=entry.session_id,
+        organization=entry.organization,
+        workflow=entry.workflow,
+        parent_session_id=entry.parent_session_id,
+        started_at=entry.started_at,
+        label=format_session_label(
+            entry.session_id,
+            entry.organization,
+            entry.workflow,
+            parent_session_id=entry.parent_session_id,
+            step_count=entry.step_count,
+            total_cost=entry.total_cost,
+        ),
+        ended_at=entry.ended_at,
+        total_cost=entry.total_cost,
+        tokens_in=entry.tokens_in,
+        tokens_out=entry.tokens_out,
+        step_count=entry.step_count,
+        models=entry.models,
+        artifact_dir=entry.artifact_dir,
+    )
+
+
+def list_sessions(
+    root: Path,
+    *,
+    organization: str | None = None,
+    workflow: str | None = None,
+    search: str | None = None,
+    sort: str = "started",
+    descending: bool = True,
+    limit: int | None = None,
+    offset: int = 0,
+) -> list[SessionSummary]:
+    """Sessions from the catalog (newest first by default); the catalog is synced once per process."""
+    if not (Path(root) / "sessions").is_dir():
+        return []
+    catalog = SessionCatalog(root)
+    catalog.ensure_synced()
+    entries = catalog.query(
+        organization=organization,
+        workflow=workflow,
+        search=search,
+        sort=sort,
+        descending=descending,
+        limit=limit,
+        offset=offset,
+    )
+    return [_summary_from_entry(entry) for entry in entries]
+
+
+def count_sessions(
+    root: Path,
+    *,
+    organization: str | None = None,
+    workflow: str | None = None,
+    search: str | None = None,
+) -> int:
+    if not (Path(root) / "sessions").is_dir():
+        return 0
+    catalog = SessionCatalog(root)
+    catalog.ensure_synced()
+    return catalog.count(organization=organization, workflow=workflow, search=search)
+
+
+def refresh_sessions(root: Path) -> int:
+    """Pick up new, changed and deleted logs (stat-only for unchanged ones); returns rows written."""
+    if not (Path(root) / "sessions").is_dir():
+        return 0
+    return SessionCatalog(root).sync()
+
+
+def session_organizations(root: Path) -> list[str]:
+    if not (Path(root) / "sessions").is_dir():
         return []
-    summaries: list[SessionSummary] = []
-    for path in sessions_dir.glob("*.jsonl"):
-        summary = summarize_session(path)
-        if summary is not None:
-            summaries.append(summary)
-    return sorted(summaries, key=lambda item: item.session_id, reverse=True)
+    catalog = SessionCatalog(root)
+    catalog.ensure_synced()
+    return catalog.organizations()
 
 
-def session_dropdown_choices(root: Path) -> list[tuple[str, str]]:
-    return [(item.label, item.session_id) for item in list_sessions(root)]
+def session_dropdown_choices(root: Path, **filters: Any) -> list[tuple[str, str]]:
+    return [(item.label, item.session_id) for item in list_sessions(root, **filters)]
 
 
 def _workflow_label(workflow: str | None) -> str:
@@ -375,10 +494,10 @@ def load_session_markdown(
     if not session_id:
         return "_セッションを選択してください_"
     path = session_log_path(root, session_id)
-    if not path.is_file():
+    if not log_exists(path):
         return f"_ログが見つかりません: `{path}`_"
     return generate_session_markdown(
-        read_jsonl(path),
+        list(read_log_records(path)),
         session_id=session_id,
         flow_theme=flow_theme,
     )
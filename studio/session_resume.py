@@ -2,17 +2,22 @@
 
 from __future__ import annotations
 
+import json
+import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
-
-from langchain_core.messages import AIMessage, HumanMessage
+from typing import Any, Iterator
 
 from studio.history import RoleHistories
 from studio.prompts import build_user_message
-from studio.session_report import read_jsonl, session_log_path
+from studio.session_archive import log_exists, log_signature, read_log_bytes
+from studio.session_report import read_log_records, read_session_meta, session_log_path
 from studio.validation import StudioError, StudioValidationError, ValidationReport
 
+CHECKPOINT_VERSION = 1
+# チェックポイントに残すチャット再現メッセージの上限（古い方から落とす）
+REPLAY_LIMIT = 200
+
 
 @dataclass(frozen=True)
 class ResumedSession:
@@ -22,24 +27,42 @@ class ResumedSession:
     step_number: int
     histories: RoleHistories
     replay_messages: list[dict[str, str]]
+    checkpoint: dict[str, Any] | None = None
+
+
+def iter_effective_records(root: Path, session_id: str) -> Iterator[dict[str, Any]]:
+    """Yield the parent chain + branch records in order, oldest ancestor first.
+
+    The chain is resolved iteratively (deep branch trees need no recursion) and
+    each log comes from the shared parse cache, so ancestors are read once.
+    The root's session_meta and the branch's own session_end are kept.
+    """
+    chain: list[tuple[dict[str, Any], ...]] = []
+    seen: set[str] = set()
+    current: str | None = session_id
+    while current and current not in seen:
+        seen.add(current)
+        records = read_log_records(session_log_path(root, current))
+        chain.append(records)
+        if not records:
+            break
+        meta = next((r for r in records if r.get("type") == "session_meta"), None)
+        current = (meta or {}).get("parent_session_id")
+
+    last = len(chain) - 1
+    for depth, records in enumerate(reversed(chain)):
+        for record in records:
+            record_type = record.get("type")
+            if depth and record_type == "session_meta":
+                continue
+            if depth != last and record_type == "session_end":
+                continue
+            yield record
 
 
 def load_effective_records(root: Path, session_id: str) -> list[dict[str, Any]]:
     """Merge parent chain + branch jsonl into chronological records."""
-    path = session_log_path(root, session_id)
-    records = read_jsonl(path)
-    if not records:
-        return []
-
-    meta = next((r for r in records if r.get("type") == "session_meta"), None)
-    parent_id = (meta or {}).get("parent_session_id")
-    if not parent_id:
-        return records
-
-    parent_records = load_effective_records(root, parent_id)
-    parent_body = [r for r in parent_records if r.get("type") != "session_end"]
-    child_body = [r for r in records if r.get("type") != "session_meta"]
-    return parent_body + child_body
+    return list(iter_effective_records(root, session_id))
 
 
 def last_state_snapshot(records: list[dict[str, Any]]) -> dict[str, Any] | None:
@@ -50,8 +73,14 @@ def last_state_snapshot(records: list[dict[str, Any]]) -> dict[str, Any] | None:
     return snapshot
 
 
-def rebuild_histories(records: list[dict[str, Any]]) -> RoleHistories:
-    histories = RoleHistories()
+def rebuild_histories(
+    records: list[dict[str, Any]],
+    histories: RoleHistories | None = None,
+) -> RoleHistories:
+    """Approximate role histories from step records, appended to ``histories`` when given."""
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    histories = histories if histories is not None else RoleHistories()
     pending_user_text = ""
 
     for record in records:
@@ -79,12 +108,15 @@ def build_replay_messages(
     records: list[dict[str, Any]],
     *,
     talent_names: dict[str, str],
+    emojis: dict[str, str] | None = None,
+    header: bool = True,
 ) -> list[dict[str, str]]:
+    """Chat messages for ``records``; ``emojis`` carries speaker icons across checkpoints (updated in place)."""
     from studio.display import SPEAKER_EMOJIS, format_step_metrics_line
 
     messages: list[dict[str, str]] = []
-    emoji_index = 0
-    talent_emoji: dict[str, str] = {}
+    talent_emoji: dict[str, str] = emojis if emojis is not None else {}
+    emoji_index = len(talent_emoji)
 
     def emoji_for(talent_id: str) -> str:
         nonlocal emoji_index
@@ -93,7 +125,7 @@ def build_replay_messages(
             emoji_index += 1
         return talent_emoji[talent_id]
 
-    meta = next((r for r in records if r.get("type") == "session_meta"), None)
+    meta = next((r for r in records if r.get("type") == "session_meta"), None) if header else None
     if meta:
         org = meta.get("organization", "?")
         wf = meta.get("workflow") or "直接送信（全ロール）"
@@ -137,6 +169,167 @@ def build_replay_messages(
     return messages
 
 
+def checkpoint_path(root: Path, session_id: str) -> Path:
+    return Path(root) / "sessions" / f"{session_id}.checkpoint.json"
+
+
+def read_checkpoint(root: Path, session_id: str) -> dict[str, Any] | None:
+    """The session's history checkpoint, or None when missing / unreadable / another format."""
+    try:
+        data = json.loads(checkpoint_path(root, session_id).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != CHECKPOINT_VERSION:
+        return None
+    return data
+
+
+def read_records_from(path: Path, offset: int) -> list[dict[str, Any]]:
+    """Records written after byte ``offset`` (session_meta and a truncated last line skipped)."""
+    records: list[dict[str, Any]] = []
+    data = read_log_bytes(path)
+    if data is None:
+        return records
+    for raw in data[offset:].decode("utf-8", errors="replace").splitlines(keepends=True):
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            if raw.endswith("\n"):
+                raise
+            continue
+        if record.get("type") != "session_meta":
+            records.append(record)
+    return records
+
+
+def dump_histories(histories: RoleHistories) -> dict[str, list[list[str]]]:
+    return {
+        talent_id: [[message.type, str(message.content)] for message in history.get_messages()]
+        for talent_id, history in histories._histories.items()
+    }
+
+
+def _make_checkpoint(
+    root: Path,
+    session_id: str,
+    *,
+    step_number: int,
+    histories: RoleHistories,
+    emojis: dict[str, str],
+    replay: list[dict[str, str]],
+) -> dict[str, Any]:
+    signature = log_signature(session_log_path(root, session_id))
+    return {
+        "version": CHECKPOINT_VERSION,
+        "session_id": session_id,
+        "log_offset": signature[2] if signature else 0,
+        "step_number": step_number,
+        "max_length": histories.max_length,
+        "histories": dump_histories(histories),
+        "emojis": emojis,
+        "replay": replay[-REPLAY_LIMIT:],
+    }
+
+
+def load_histories(data: dict[str, list[list[str]]], max_length: int) -> RoleHistories:
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    histories = RoleHistories(max_length)
+    for talent_id, messages in data.items():
+        history = histories.for_talent(talent_id)
+        for role, content in messages:
+            history.add_message(AIMessage(content=content) if role == "ai" else HumanMessage(content=content))
+    return histories
+
+
+def write_checkpoint(
+    root: Path,
+    session_id: str,
+    *,
+    previous: dict[str, Any] | None,
+    histories: RoleHistories,
+    step_number: int,
+    talent_names: dict[str, str],
+) -> dict[str, Any]:
+    """Persist the turn-end checkpoint (design.md §7.2) and return it for the next turn.
+
+    Only the records written since ``previous`` are read back (the session's own
+    log from the start when ``previous`` belongs to the parent session).
+    """
+    path = session_log_path(root, session_id)
+    own = previous is not None and previous.get("session_id") == session_id
+    records = read_records_from(path, int(previous.get("log_offset", 0)) if own else 0)
+    emojis = dict(previous.get("emojis") or {}) if previous else {}
+    replay = list(previous.get("replay") or []) if previous else []
+    if previous is None:
+        meta = read_session_meta(path)
+        records = ([meta] if meta else []) + records
+    replay += build_replay_messages(records, talent_names=talent_names, emojis=emojis, header=previous is None)
+    checkpoint = _make_checkpoint(
+        root,
+        session_id,
+        step_number=step_number,
+        histories=histories,
+        emojis=emojis,
+        replay=replay,
+    )
+    target = checkpoint_path(root, session_id)
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_text(json.dumps(checkpoint, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, target)
+    return checkpoint
+
+
+def _resume_from_checkpoint(
+    root: Path,
+    session_id: str,
+    meta: dict[str, Any],
+    talent_names: dict[str, str],
+) -> ResumedSession | None:
+    """Latest checkpoint + trailing records; a branch without its own checkpoint starts from the parent's."""
+    checkpoint = read_checkpoint(root, session_id)
+    offset = int(checkpoint.get("log_offset", 0)) if checkpoint else 0
+    if checkpoint is None:
+        parent_id = meta.get("parent_session_id")
+        if not parent_id or not meta.get("parent_checkpoint"):
+            return None
+        checkpoint = load_resumed_session(root, parent_id).checkpoint
+        if checkpoint is None:
+            return None
+
+    trailing = read_records_from(session_log_path(root, session_id), offset)
+    histories = rebuild_histories(
+        trailing,
+        load_histories(checkpoint.get("histories") or {}, int(checkpoint.get("max_length") or 10)),
+    )
+    emojis = dict(checkpoint.get("emojis") or {})
+    replay = list(checkpoint.get("replay") or [])
+    replay += build_replay_messages(trailing, talent_names=talent_names, emojis=emojis, header=False)
+    step_number = int(checkpoint.get("step_number") or 0)
+    snapshot = last_state_snapshot(trailing)
+    if snapshot:
+        step_number = max(step_number, int(snapshot.get("step_number") or 0))
+    return ResumedSession(
+        parent_session_id=session_id,
+        org_id=str(meta.get("organization") or ""),
+        workflow_id=str(meta["workflow"]).strip() if meta.get("workflow") else None,
+        step_number=step_number,
+        histories=histories,
+        replay_messages=replay,
+        checkpoint=_make_checkpoint(
+            root,
+            session_id,
+            step_number=step_number,
+            histories=histories,
+            emojis=emojis,
+            replay=replay,
+        ),
+    )
+
+
 def load_resumed_session(root: Path, session_id: str) -> ResumedSession:
     report = ValidationReport()
     session_id = (session_id or "").strip()
@@ -151,7 +344,7 @@ def load_resumed_session(root: Path, session_id: str) -> ResumedSession:
         raise StudioValidationError(report.errors)
 
     path = session_log_path(root, session_id)
-    if not path.is_file():
+    if not log_exists(path):
         report.add(
             StudioError(
                 code="E502",
@@ -161,6 +354,14 @@ def load_resumed_session(root: Path, session_id: str) -> ResumedSession:
         )
         raise StudioValidationError(report.errors)
 
+    own_meta = read_session_meta(path)
+    if own_meta is not None:
+        names = {tid: str(name) for tid, name in (own_meta.get("talents") or {}).items()}
+        resumed = _resume_from_checkpoint(root, session_id, own_meta, names)
+        if resumed is not None:
+            return resumed
+
+    # チェックポイントのない旧ログ: 親チェーンを含む全レコードから再構築する
     records = load_effective_records(root, session_id)
     meta = next((r for r in records if r.get("type") == "session_meta"), None)
     if meta is None:
@@ -188,7 +389,8 @@ def load_resumed_session(root: Path, session_id: str) -> ResumedSession:
         for tid, name in (meta.get("talents") or {}).items()
     }
     histories = rebuild_histories(records)
-    replay_messages = build_replay_messages(records, talent_names=talent_names)
+    emojis: dict[str, str] = {}
+    replay_messages = build_replay_messages(records, talent_names=talent_names, emojis=emojis)
 
     return ResumedSession(
         parent_session_id=session_id,
@@ -197,4 +399,12 @@ def load_resumed_session(root: Path, session_id: str) -> ResumedSession:
         step_number=step_number,
         histories=histories,
         replay_messages=replay_messages,
+        checkpoint=_make_checkpoint(
+            root,
+            session_id,
+            step_number=step_number,
+            histories=histories,
+            emojis=emojis,
+            replay=replay_messages,
+        ),
     )
@@ -12,9 +12,12 @@ from studio.artifacts import apply_session_artifacts
 from studio.minutes import save_minutes_from_session
 from studio.session_report import (
     FlowTheme,
+    count_sessions,
     export_session_markdown,
     load_session_markdown,
+    refresh_sessions,
     session_dropdown_choices,
+    session_organizations,
 )
 from studio.user_context_update import (
     apply_context_draft,
@@ -27,6 +30,9 @@ from studio.web_ui import apply_session_resume
 _ACTION_BTN = dict(variant="primary", size="sm", elem_classes=["studio-action-btn"])
 _SAVE_BTN = dict(variant="primary", elem_classes=["studio-save-btn"])
 _DEFAULT_FLOW_THEME = "ダーク"
+# セッション一覧の1ページあたり件数（catalog から LIMIT / OFFSET で取得）
+SESSION_PAGE_SIZE = 100
+_SORT_CHOICES = [("新しい順", "started"), ("費用の高い順", "cost"), ("step 数の多い順", "steps")]
 
 _JS_AFTER_RESUME = """
 () => {
@@ -76,8 +82,28 @@ def _flow_theme_key(label: str) -> FlowTheme:
     return "dark" if label == "ダーク" else "light"
 
 
+def session_page(
+    root: Path,
+    organization: str | None,
+    sort: str,
+    page: int,
+) -> tuple[list[tuple[str, str]], int, str]:
+    """(choices, clamped page, page note) for one page of the session list."""
+    total = count_sessions(root, organization=organization or None)
+    pages = max(1, -(-total // SESSION_PAGE_SIZE))
+    page = min(max(1, int(page or 1)), pages)
+    choices = session_dropdown_choices(
+        root,
+        organization=organization or None,
+        sort=sort,
+        limit=SESSION_PAGE_SIZE,
+        offset=(page - 1) * SESSION_PAGE_SIZE,
+    )
+    return choices, page, f"全 {total} 件（{page} / {pages} ページ）"
+
+
 def build_sessions_tab(root: Path, handles: SessionsHandles, _demo: gr.Blocks) -> None:
-    initial_choices = session_dropdown_choices(root)
+    initial_choices, _page, initial_note = session_page(root, None, "started", 1)
     initial_session_id = initial_choices[0][1] if initial_choices else None
     initial_flow_theme = _flow_theme_key(_DEFAULT_FLOW_THEME)
     initial_report = (
@@ -111,6 +137,16 @@ def build_sessions_tab(root: Path, handles: SessionsHandles, _demo: gr.Blocks) -
                     scale=1,
                 )
                 refresh_btn = gr.Button("一覧更新", **_ACTION_BTN)
+            with gr.Row():
+                org_filter_dd = gr.Dropdown(
+                    label="組織で絞り込み",
+                    choices=[("すべて", "")] + [(org, org) for org in session_organizations(root)],
+                    value="",
+                    scale=2,
+                )
+                sort_dd = gr.Dropdown(label="並び順", choices=_SORT_CHOICES, value="started", scale=2)
+                page_num = gr.Number(label="ページ", value=1, precision=0, minimum=1, scale=1)
+                page_note_md = gr.Markdown(initial_note)
             with gr.Column(elem_classes=["studio-session-report-wrap"]):
                 report_md = gr.Markdown(initial_report, elem_classes=["studio-session-report"])
             with gr.Row(elem_id="studio-session-actions"):
@@ -130,11 +166,16 @@ def build_sessions_tab(root: Path, handles: SessionsHandles, _demo: gr.Blocks) -
     def _show_export(path: str) -> dict:
         return gr.update(value=path, visible=True)
 
-    def refresh_session_list(current: str | None) -> tuple[list[tuple[str, str]], str | None]:
-        choices = session_dropdown_choices(root)
+    def refresh_session_list(
+        current: str | None,
+        organization: str | None = None,
+        sort: str = "started",
+        page: int = 1,
+    ) -> tuple[list[tuple[str, str]], str | None, int, str]:
+        choices, page, note = session_page(root, organization, sort, page)
         values = [session_id for _label, session_id in choices]
         value = current if current in values else (values[0] if values else None)
-        return choices, value
+        return choices, value, page, note
 
     def on_session_select(session_id: str | None, theme_label: str):
         if not session_id:
@@ -149,10 +190,28 @@ def build_sessions_tab(root: Path, handles: SessionsHandles, _demo: gr.Blocks) -
             "",
         )
 
-    def on_refresh(current: str | None, theme_label: str):
-        choices, session_id = refresh_session_list(current)
+    def on_list_change(current: str | None, theme_label: str, organization: str, sort: str, page: float):
+        # 絞り込み・並び順・ページはカタログを引くだけ（ログの stat は「一覧更新」のときだけ）
+        choices, session_id, page, note = refresh_session_list(current, organization, sort, int(page or 1))
         report, file_upd, _msg = on_session_select(session_id, theme_label)
-        return gr.update(choices=choices, value=session_id), report, file_upd, ""
+        return (
+            gr.update(choices=choices, value=session_id),
+            report,
+            file_upd,
+            "",
+            gr.update(),
+            page,
+            note,
+        )
+
+    def on_refresh(current: str | None, theme_label: str, organization: str, sort: str, page: float):
+        # 別プロセスで増えた・消えた・途中で落ちたログを一覧へ反映する
+        refresh_sessions(root)
+        orgs = [("すべて", "")] + [(org, org) for org in session_organizations(root)]
+        session_upd, report, file_upd, msg, _orgs, page, note = on_list_change(
+            current, theme_label, organization, sort, page
+        )
+        return session_upd, report, file_upd, msg, gr.update(choices=orgs), page, note
 
     def on_export(session_id: str | None, theme_label: str):
         if not session_id:
@@ -271,11 +330,12 @@ def build_sessions_tab(root: Path, handles: SessionsHandles, _demo: gr.Blocks) -
             return result.message
         return f"**ユーザーコンテキスト採用** — {result.message}"
 
-    refresh_btn.click(
-        on_refresh,
-        inputs=[session_dd, flow_theme_radio],
-        outputs=[session_dd, report_md, export_file, session_msg],
-    )
+    list_inputs = [session_dd, flow_theme_radio, org_filter_dd, sort_dd, page_num]
+    list_outputs = [session_dd, report_md, export_file, session_msg, org_filter_dd, page_num, page_note_md]
+    refresh_btn.click(on_refresh, inputs=list_inputs, outputs=list_outputs)
+    org_filter_dd.change(on_list_change, inputs=list_inputs, outputs=list_outputs)
+    sort_dd.change(on_list_change, inputs=list_inputs, outputs=list_outputs)
+    page_num.submit(on_list_change, inputs=list_inputs, outputs=list_outputs)
     session_dd.change(
         on_session_select,
         inputs=[session_dd, flow_theme_radio],
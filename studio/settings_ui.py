@@ -16,6 +16,7 @@ from studio.assistant_availability import (
     model_dropdown_choices,
     unavailable_reason,
 )
+from studio.config_index import config_index
 from studio.config_store import (
     create_organization,
     create_talent,
@@ -85,14 +86,9 @@ def _resolve_settings_workflow_id(
     """Map chat workflow dropdown value to workflows/<id> editor selection."""
     if chat_workflow and chat_workflow in wf_ids:
         return chat_workflow
-    if org_id:
-        try:
-            org = load_config("organization", org_id, root)
-            default = str(org.get("default_workflow") or "").strip()
-            if default in wf_ids:
-                return default
-        except (ValueError, OSError, KeyError):
-            pass
+    refs = config_index(root).org(org_id) if org_id else None
+    if refs and refs.default_workflow in wf_ids:
+        return refs.default_workflow
     return wf_ids[0] if wf_ids else None
 
 
@@ -0,0 +1,230 @@
+"""Span tracing for session turns (design.md 7.1.2).
+
+With ``tracing.enabled`` in studio_config the engine records nested spans:
+turn → phase → loop iteration → step → provider call, plus rate-limit
+waits, retry back-off sleeps and log flushes. Times are monotonic
+(``perf_counter_ns``) and exported with a wall-clock offset as either Chrome
+trace-event JSON (chrome://tracing, Perfetto) or OTLP/JSON
+(``resourceSpans``). The file is written next to the session log.
+
+The engine's sequential flow keeps its span stack on the tracer itself, so a
+generator turn can be resumed from any thread. Work handed to worker threads
+goes through ``wrap``, and asyncio tasks go through ``bind``. Both carry
+their parent span in a context variable, so parallel steps nest under their
+phase.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, TypeVar
+
+TRACE_FORMATS = ("chrome", "otlp")
+TRACE_SUFFIX = {"chrome": ".trace.json", "otlp": ".otlp.json"}
+SERVICE_NAME = "MultiRoleStudio"
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class TraceConfig:
+    enabled: bool = False
+    format: str = "chrome"
+
+    @classmethod
+    def from_config(cls, studio_config: dict[str, Any] | None) -> TraceConfig:
+        cfg = (studio_config or {}).get("tracing") or {}
+        fmt = cfg.get("format", "chrome")
+        return cls(enabled=bool(cfg.get("enabled", False)), format=fmt if fmt in TRACE_FORMATS else "chrome")
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: int
+    parent_id: int | None
+    start_ns: int
+    thread: str
+    attrs: dict[str, Any] = field(default_factory=dict)
+    end_ns: int | None = None
+
+    @property
+    def duration_ns(self) -> int:
+        return (self.end_ns or self.start_ns) - self.start_ns
+
+
+# wrap / bind で束縛した (tracer, 親 span)。未束縛ならトレーサ自身のスタックを使う
+_bound: ContextVar[tuple[Tracer, Span | None] | None] = ContextVar("studio_trace_bound", default=None)
+
+
+class Tracer:
+    """Collects finished spans; a disabled tracer costs one attribute check per span."""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.trace_id = os.urandom(16).hex()
+        self.spans: list[Span] = []
+        self._stack: list[Span] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._wall_offset_ns = time.time_ns() - time.perf_counter_ns()
+
+    def current(self) -> Span | None:
+        bound = _bound.get()
+        if bound is not None and bound[0] is self:
+            return bound[1]
+        with self._lock:
+            return self._stack[-1] if self._stack else None
+
+    def span(self, name: str, **attrs: Any) -> AbstractContextManager[Span | None]:
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name, attrs)
+
+    @contextmanager
+    def _span(self, name: str, attrs: dict[str, Any]) -> Iterator[Span]:
+        parent = self.current()
+        span = Span(
+            name=name,
+            span_id=next(self._ids),
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.perf_counter_ns(),
+            thread=threading.current_thread().name,
+            attrs={k: v for k, v in attrs.items() if v is not None},
+        )
+        bound = _bound.get()
+        if bound is not None and bound[0] is self:
+            token = _bound.set((self, span))
+            try:
+                yield span
+            finally:
+                _bound.reset(token)
+                self._finish(span)
+        else:
+            with self._lock:
+                self._stack.append(span)
+            try:
+                yield span
+            finally:
+                with self._lock:
+                    self._stack.remove(span)
+                self._finish(span)
+
+    def _finish(self, span: Span) -> None:
+        span.end_ns = time.perf_counter_ns()
+        with self._lock:
+            self.spans.append(span)
+
+    def wrap(self, fn: Callable[..., T]) -> Callable[..., T]:
+        """Bind ``fn`` to the current span so spans it opens on a worker thread nest here."""
+        if not self.enabled:
+            return fn
+        parent = self.current()
+
+        def bound(*args: Any, **kwargs: Any) -> T:
+            token = _bound.set((self, parent))
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _bound.reset(token)
+
+        return bound
+
+    @contextmanager
+    def bind(self) -> Iterator[None]:
+        """Track spans in the context (per asyncio task) instead of the tracer's stack."""
+        if not self.enabled:
+            yield
+            return
+        token = _bound.set((self, self.current()))
+        try:
+            yield
+        finally:
+            _bound.reset(token)
+
+    def finished(self) -> list[Span]:
+        with self._lock:
+            return sorted(self.spans, key=lambda s: (s.start_ns, s.span_id))
+
+    def to_chrome(self) -> dict[str, Any]:
+        """Chrome trace-event format: one complete ("X") event per span, one row per thread."""
+        threads: dict[str, int] = {}
+        events: list[dict[str, Any]] = []
+        for span in self.finished():
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.name,
+                    "ph": "X",
+                    "ts": (span.start_ns + self._wall_offset_ns) / 1000,
+                    "dur": span.duration_ns / 1000,
+                    "pid": 1,
+                    "tid": tid,
+                    "args": {**span.attrs, "span_id": span.span_id, "parent_id": span.parent_id},
+                }
+            )
+        for name, tid in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def to_otlp(self, resource: dict[str, Any] | None = None) -> dict[str, Any]:
+        """OTLP/JSON export request (``resourceSpans``) as accepted by collectors' file receivers."""
+        spans = [
+            {
+                "traceId": self.trace_id,
+                "spanId": f"{span.span_id:016x}",
+                **({"parentSpanId": f"{span.parent_id:016x}"} if span.parent_id else {}),
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns + self._wall_offset_ns),
+                "endTimeUnixNano": str((span.end_ns or span.start_ns) + self._wall_offset_ns),
+                "attributes": _otlp_attributes({**span.attrs, "thread.name": span.thread}),
+            }
+            for span in self.finished()
+        ]
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME, **(resource or {})})},
+                    "scopeSpans": [{"scope": {"name": "studio.tracing"}, "spans": spans}],
+                }
+            ]
+        }
+
+    def export(self, log_path: Path, fmt: str = "chrome", *, resource: dict[str, Any] | None = None) -> Path:
+        """Write every finished span next to ``log_path`` (``<id>.trace.json`` / ``<id>.otlp.json``)."""
+        path = log_path.with_name(log_path.stem + TRACE_SUFFIX[fmt])
+        data = self.to_otlp(resource) if fmt == "otlp" else self.to_chrome()
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+
+NULL_TRACER = Tracer(enabled=False)
+
+
+def _otlp_attributes(attrs: dict[str, Any]) -> list[dict[str, Any]]:
+    out: list[dict[str, Any]] = []
+    for key, value in attrs.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        out.append({"key": key, "value": typed})
+    return out
@@ -40,6 +40,11 @@ def global_user_context_enabled(studio_config: dict[str, Any]) -> bool:
     return bool(uc.get("enabled", True))
 
 
+def user_context_rag_enabled(studio_config: dict[str, Any]) -> bool:
+    uc = studio_config.get("user_context") or {}
+    return bool((uc.get("rag") or {}).get("enabled", False))
+
+
 def session_user_context_enabled(
     studio_config: dict[str, Any],
     *,
@@ -74,6 +79,10 @@ def load_user_context_text(root: Path, studio_config: dict[str, Any]) -> str | N
         if summary:
             return summary
 
+    if user_context_rag_enabled(studio_config):
+        # 切り詰めず、話題に関連する節だけを索引から注入する（付録D.10）
+        return None
+
     return text[:max_chars].rstrip() + "\n\n…（全文は my_context.md。要約は --user-context-summarize）"
 
 
@@ -0,0 +1,308 @@
+"""User-context retrieval over my_context.md and corpus/ (design.md Appendix D.10).
+
+Every Markdown file under ``user_context.rag.corpus_dir`` (and
+``my_context.md`` once it outgrows ``max_chars``) is split into heading
+sections and ranked with BM25 against the current user input. Only the best
+sections within ``rag.max_tokens`` are injected into the system prompt.
+
+The chunked index is persisted to ``<index_dir>/index.json``. A refresh
+re-stats each file, re-reads only files whose ``(mtime_ns, size)`` changed
+and re-chunks only those whose SHA-1 changed, so an unchanged corpus costs
+one ``stat`` per file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from studio.config_registry import file_signature, is_settled
+from studio.logging import estimate_tokens
+from studio.retrieval import BM25Index, tokenize
+from studio.user_context import user_context_max_chars, user_context_path
+
+INDEX_VERSION = 1
+INDEX_FILE = "index.json"
+RAG_HEADER = "【ユーザーコンテキスト（関連する過去の思考）】"
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+@dataclass(frozen=True)
+class RagConfig:
+    enabled: bool = False
+    corpus_dir: str = "user_context/corpus"
+    index_dir: str = "user_context/index"
+    top_k: int = 5
+    max_tokens: int = 2000
+    chunk_chars: int = 1500
+
+    @classmethod
+    def from_config(cls, studio_config: dict[str, Any] | None) -> RagConfig:
+        cfg = ((studio_config or {}).get("user_context") or {}).get("rag") or {}
+        default = cls()
+        return cls(
+            enabled=bool(cfg.get("enabled", default.enabled)),
+            corpus_dir=str(cfg.get("corpus_dir") or default.corpus_dir),
+            index_dir=str(cfg.get("index_dir") or default.index_dir),
+            top_k=int(cfg.get("top_k", default.top_k)),
+            max_tokens=int(cfg.get("max_tokens", default.max_tokens)),
+            chunk_chars=int(cfg.get("chunk_chars", default.chunk_chars)),
+        )
+
+
+@dataclass(frozen=True)
+class ContextChunk:
+    # user_context/ からの相対パス（例: corpus/design_summary.md）
+    source: str
+    ordinal: int
+    heading: str
+    text: str
+    tokens: int
+
+    @property
+    def chunk_id(self) -> str:
+        return f"{self.source}#{self.ordinal}"
+
+
+def split_sections(text: str, chunk_chars: int) -> list[tuple[str, str]]:
+    """``(heading path, body)`` per Markdown section; long sections are split on blank lines."""
+    sections: list[tuple[str, str]] = []
+    path: list[tuple[int, str]] = []
+    buf: list[str] = []
+    size = 0
+    in_fence = False
+
+    def heading_label() -> str:
+        return " > ".join(title for _, title in path)
+
+    def flush() -> None:
+        nonlocal buf, size
+        body = "\n".join(buf).strip("\n")
+        # 見出し行だけの区画（直後に下位見出しが続く等）は捨てる
+        if any(line.strip() and not _HEADING.match(line) for line in buf):
+            sections.append((heading_label(), body))
+        buf, size = [], 0
+
+    for line in text.split("\n"):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        heading = None if in_fence else _HEADING.match(line)
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            path = [(lv, title) for lv, title in path if lv < level] + [(level, heading.group(2))]
+            buf, size = [line], len(line) + 1
+            continue
+        blank = not line.strip()
+        if blank and not in_fence and size >= chunk_chars:
+            flush()
+            continue
+        if not buf and blank:
+            continue
+        buf.append(line)
+        size += len(line) + 1
+    flush()
+    return sections
+
+
+def _chunk_file(source: str, text: str, chunk_chars: int) -> list[dict[str, Any]]:
+    chunks = []
+    for heading, body in split_sections(text, chunk_chars):
+        doc = f"{source}\n{body}"
+        chunks.append(
+            {
+                "heading": heading,
+                "text": body,
+                "tokens": estimate_tokens(body),
+                "tf": dict(Counter(tokenize(doc))),
+            }
+        )
+    return chunks
+
+
+@dataclass
+class UserContextIndex:
+    """Persisted section index for one ``user_context`` directory."""
+
+    base: Path
+    config: RagConfig
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    # source → {"mtime_ns", "size", "settled", "sha1", "chunks"}
+    _files: dict[str, dict[str, Any]] = field(default_factory=dict)
+    _loaded: bool = False
+    _built: bool = False
+    chunks: list[ContextChunk] = field(default_factory=list)
+    bm25: BM25Index = field(default_factory=BM25Index)
+    # 診断用：読み直したファイル数 / 分割し直したファイル数（累計）
+    reads: int = 0
+    rechunks: int = 0
+
+    @property
+    def index_path(self) -> Path:
+        return self.base / self.config.index_dir / INDEX_FILE
+
+    def _load(self) -> None:
+        self._loaded = True
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if (
+            isinstance(data, dict)
+            and data.get("version") == INDEX_VERSION
+            and data.get("chunk_chars") == self.config.chunk_chars
+            and isinstance(data.get("files"), dict)
+        ):
+            self._files = data["files"]
+
+    def _save(self) -> None:
+        path = self.index_path
+        payload = {"version": INDEX_VERSION, "chunk_chars": self.config.chunk_chars, "files": self._files}
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            # 索引は再生成できる。書けなくても今回の検索はメモリ上の索引で行う
+            pass
+
+    def refresh(self, sources: dict[str, Path]) -> None:
+        """Bring the index in line with ``sources`` (source name → file)."""
+        with self.lock:
+            if not self._loaded:
+                self._load()
+            changed = False
+            present: set[str] = set()
+            for source, path in sources.items():
+                sig = file_signature(path)
+                if sig is None:
+                    continue
+                present.add(source)
+                entry = self._files.get(source)
+                if entry is not None and entry.get("settled") and (entry.get("mtime_ns"), entry.get("size")) == sig:
+                    continue
+                try:
+                    raw = path.read_bytes()
+                except OSError:
+                    continue
+                self.reads += 1
+                digest = hashlib.sha1(raw).hexdigest()
+                if entry is None or entry.get("sha1") != digest:
+                    self.rechunks += 1
+                    text = raw.decode("utf-8", "replace")
+                    entry = {"sha1": digest, "chunks": _chunk_file(source, text, self.config.chunk_chars)}
+                # mtime の粒度内に書かれたファイルは次回も読み直す（config_registry と同じ扱い）
+                entry.update({"mtime_ns": sig[0], "size": sig[1], "settled": is_settled(sig)})
+                self._files[source] = entry
+                changed = True
+            for source in set(self._files) - present:
+                del self._files[source]
+                changed = True
+            if changed:
+                self._save()
+            if changed or not self._built:
+                self._rebuild()
+
+    def _rebuild(self) -> None:
+        chunks: list[ContextChunk] = []
+        term_freqs: list[Counter[str]] = []
+        for source in sorted(self._files):
+            for ordinal, item in enumerate(self._files[source]["chunks"]):
+                chunks.append(ContextChunk(source, ordinal, item["heading"], item["text"], item["tokens"]))
+                term_freqs.append(Counter(item["tf"]))
+        self.chunks = chunks
+        self.bm25 = BM25Index.from_term_freqs(term_freqs)
+        self._built = True
+
+    def search(self, query: str) -> list[tuple[ContextChunk, float]]:
+        """The best chunks for ``query`` that fit in ``max_tokens``, best first."""
+        with self.lock:
+            hits: list[tuple[ContextChunk, float]] = []
+            budget = self.config.max_tokens
+            for i, score in self.bm25.top(query, len(self.chunks)):
+                chunk = self.chunks[i]
+                if chunk.tokens <= budget:
+                    hits.append((chunk, score))
+                    budget -= chunk.tokens
+                if len(hits) >= self.config.top_k:
+                    break
+            return hits
+
+
+def rag_sources(root: Path, studio_config: dict[str, Any], config: RagConfig) -> dict[str, Path]:
+    """Files to index: every ``*.md`` under corpus_dir, plus my_context.md when over ``max_chars``."""
+    base = root.resolve()
+    sources: dict[str, Path] = {}
+    corpus = base / config.corpus_dir
+    if corpus.is_dir():
+        for path in sorted(corpus.rglob("*.md")):
+            sources[path.relative_to(corpus.parent).as_posix()] = path
+    main = user_context_path(root, studio_config)
+    try:
+        main_chars = len(main.read_text(encoding="utf-8").strip()) if main.is_file() else 0
+    except OSError:
+        main_chars = 0
+    # 短い my_context.md は従来どおり全文注入する（コア定義は検索ミスの影響を受けない。D.10 注意点1）
+    if main_chars > user_context_max_chars(studio_config):
+        sources[main.name] = main
+    return sources
+
+
+def format_rag_context(hits: list[tuple[ContextChunk, float]]) -> str:
+    if not hits:
+        return ""
+    lines = [RAG_HEADER]
+    for chunk, score in hits:
+        label = f"{chunk.source} § {chunk.heading}" if chunk.heading else chunk.source
+        lines.append(f"--- chunk: {label} (score: {score:.2f}) ---\n{chunk.text}")
+    return "\n".join(lines)
+
+
+_INDEXES: dict[tuple[Path, RagConfig], UserContextIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def user_context_index(root: Path, config: RagConfig) -> UserContextIndex:
+    """The process-wide index for ``root`` (loaded from disk on first use)."""
+    key = (root.resolve(), config)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = _INDEXES[key] = UserContextIndex(key[0], config)
+        return index
+
+
+def retrieve_user_context(
+    root: Path,
+    studio_config: dict[str, Any],
+    query: str,
+    config: RagConfig | None = None,
+) -> tuple[str, list[dict[str, Any]]]:
+    """The injected RAG block for ``query`` and its ``context_chunks`` log entries."""
+    config = config or RagConfig.from_config(studio_config)
+    if not config.enabled:
+        return "", []
+    index = user_context_index(root, config)
+    index.refresh(rag_sources(root, studio_config, config))
+    hits = index.search(query)
+    return format_rag_context(hits), [
+        {"id": chunk.chunk_id, "score": round(score, 4)} for chunk, score in hits
+    ]
+
+
+def reindex_user_context(root: Path, studio_config: dict[str, Any]) -> UserContextIndex:
+    """Refresh the persisted index now (``--user-context-reindex``)."""
+    config = RagConfig.from_config(studio_config)
+    index = user_context_index(root, config)
+    index.refresh(rag_sources(root, studio_config, config))
+    return index
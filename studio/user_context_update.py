@@ -11,6 +11,7 @@ from studio.history import ConversationHistory
 from studio.loader import load_session_context
 from studio.logging import load_model_costs
 from studio.minutes import build_transcript
+from studio.session_archive import log_exists
 from studio.session_report import session_log_path
 from studio.session_resume import load_effective_records
 from studio.user_context import summary_path, user_context_max_chars, user_context_path
@@ -116,6 +117,7 @@ def generate_context_draft_text(
         return mock_context_draft(session_id=session_id, records=records)
 
     from studio.assistants import invoke_llm_step
+    from studio.response_cache import ResponseCache
 
     transcript = build_transcript(records, meta=meta)
     current = (current_context or "").strip() or "（未作成）"
@@ -148,6 +150,8 @@ def generate_context_draft_text(
         temperature=0.3,
         stream=False,
         costs=load_model_costs(root),
+        rate_limits=ctx.studio_config.get("rate_limits"),
+        response_cache=ResponseCache.from_config(root, ctx.studio_config),
     )
     text = (result.text or "").strip()
     if not text or DRAFT_PROPOSAL_SECTION not in text:
@@ -162,7 +166,7 @@ def save_context_draft_from_session(root: Path, session_id: str) -> ContextUpdat
         return ContextUpdateResult(False, "session_id が未指定です")
 
     log_path = session_log_path(root, session_id)
-    if not log_path.is_file():
+    if not log_exists(log_path):
         return ContextUpdateResult(False, f"セッション `{session_id}` が見つかりません")
 
     from studio.loader import load_studio_config
@@ -259,6 +263,7 @@ def generate_summary_draft_text(
         return mock_summary_text(source_text, max_chars=max_chars)
 
     from studio.assistants import invoke_llm_step
+    from studio.response_cache import ResponseCache
 
     system_prompt = (
         "あなたはユーザーコンテキストの要約者です。"
@@ -281,6 +286,8 @@ def generate_summary_draft_text(
         temperature=0.2,
         stream=False,
         costs=load_model_costs(root),
+        rate_limits=ctx.studio_config.get("rate_limits"),
+        response_cache=ResponseCache.from_config(root, ctx.studio_config),
     )
     text = (result.text or "").strip()
     if not text:
@@ -9,9 +9,17 @@ from typing import Generator, Iterator
 import gradio as gr
 
 from studio.assistants import MockAssistant
-from studio.display import format_session_end_lines, format_step_metrics_line, SPEAKER_EMOJIS
-from studio.engine import EngineEvent, SessionEngine
-from studio.loader import SessionContext, load_session_context, read_attachment_files
+from studio.attachment_cache import AttachmentCache
+from studio.config_index import config_index
+from studio.display import (
+    SPEAKER_EMOJIS,
+    format_attachment_progress,
+    format_session_end_lines,
+    format_step_metrics_line,
+)
+from studio.engine import EngineEvent, SessionEngine, create_engine
+from studio.loader import SessionContext, load_session_context, load_studio_config, read_attachment_files
+from studio.profiling import Profiler, resolve_profile_mode
 from studio.validation import StudioValidationError
 from web_input_utils import normalize_uploaded_files
 
@@ -26,21 +34,11 @@ FILE_ONLY_DEFAULT = "添付ファイルの内容を要約してください。"
 
 
 def list_organizations(root: Path) -> list[str]:
-    org_dir = root / "organizations"
-    if not org_dir.is_dir():
-        return []
-    return sorted(
-        name.name
-        for name in org_dir.iterdir()
-        if name.is_dir() and (name / "config.json").is_file()
-    )
+    return config_index(root).org_ids()
 
 
 def list_workflows(root: Path) -> list[str]:
-    wf_dir = root / "workflows"
-    if not wf_dir.is_dir():
-        return []
-    return sorted(path.stem for path in wf_dir.glob("*.json"))
+    return config_index(root).workflow_ids()
 
 
 def workflow_dropdown_choices(root: Path) -> list[tuple[str, str]]:
@@ -60,11 +58,11 @@ def workflow_available_for_org(root: Path, org_id: str, workflow_id: str | None)
 
 
 def organizations_with_workflow(root: Path, workflow_id: str) -> list[str]:
-    return [
-        org_id
-        for org_id in list_organizations(root)
-        if workflow_available_for_org(root, org_id, workflow_id)
-    ]
+    index = config_index(root)
+    refs = index.workflow(workflow_id)
+    # 複数スロットのワークフローは workflow_bindings がある組織でしか使えない（5.2 節）
+    candidates = index.orgs_binding_workflow(workflow_id) if refs and refs.slot_count > 1 else index.org_ids()
+    return [org_id for org_id in candidates if workflow_available_for_org(root, org_id, workflow_id)]
 
 
 def workflow_unavailable_hint(root: Path, org_id: str, workflow_id: str) -> str:
@@ -108,15 +106,8 @@ def resolve_workflow_value_for_org(
     elif workflow_available_for_org(root, org_id, None):
         return DIRECT_WORKFLOW_VALUE
 
-    default_wf = ""
-    if org_id:
-        try:
-            from studio.config_store import load_config
-
-            org = load_config("organization", org_id, root)
-            default_wf = str(org.get("default_workflow") or "").strip()
-        except (ValueError, OSError, KeyError):
-            default_wf = ""
+    refs = config_index(root).org(org_id) if org_id else None
+    default_wf = refs.default_workflow if refs else ""
     if default_wf and workflow_available_for_org(root, org_id, default_wf):
         return default_wf
     return DIRECT_WORKFLOW_VALUE
@@ -150,15 +141,21 @@ def resolve_user_input_with_attachments(
     user_text: str,
     files,
     limits: dict[str, int],
+    *,
+    overflow: list[Path] | None = None,
+    cache: AttachmentCache | None = None,
 ) -> tuple[str, str, str, list[str]]:
-    """Resolve prompt text, chat display text, attachment context, and file names."""
+    """Resolve prompt text, chat display text, attachment context, and file names.
+
+    ``overflow`` collects files over ``upload_limits`` for summarising (design.md 5.1.3).
+    """
     text = (user_text or "").strip()
     paths = gradio_file_paths(files)
     attachment_context = ""
     attachment_names: list[str] = []
 
     if paths:
-        attachment_context, report = read_attachment_files(paths, limits)
+        attachment_context, report = read_attachment_files(paths, limits, overflow=overflow, cache=cache)
         if not report.ok:
             raise StudioValidationError(report.errors)
         attachment_names = [path.name for path in paths]
@@ -204,7 +201,8 @@ class ChatEventRenderer:
 
     messages: list[dict[str, str]] = field(default_factory=list)
     _emoji_map: dict[str, str] = field(default_factory=dict)
-    _active_idx: int | None = None
+    _active: dict[str, int] = field(default_factory=dict)
+    _last_talent_id: str | None = None
     _last_display_name: dict[str, str] = field(default_factory=dict)
 
     def copy_messages(self) -> list[dict[str, str]]:
@@ -226,12 +224,26 @@ class ChatEventRenderer:
         header = self._assistant_header(display_name, talent_id)
         body = f"\n\n{placeholder}" if placeholder else ""
         self.messages.append({"role": "assistant", "content": f"{header}{body}"})
-        self._active_idx = len(self.messages) - 1
+        self._active[talent_id] = len(self.messages) - 1
+        self._last_talent_id = talent_id
+
+    def _active_key(self, talent_id: str | None) -> str | None:
+        """Parallel as_completed phases keep one active bubble per talent.
+
+        Events that name a talent only ever touch that talent's bubble; the
+        most recent bubble is used only for events without a ``talent_id``.
+        """
+        if talent_id:
+            return talent_id if talent_id in self._active else None
+        if self._last_talent_id in self._active:
+            return self._last_talent_id
+        return None
 
-    def _append_active(self, text: str) -> None:
-        if self._active_idx is None:
+    def _append_active(self, text: str, talent_id: str | None = None) -> None:
+        key = self._active_key(talent_id)
+        if key is None:
             return
-        self.messages[self._active_idx]["content"] += text
+        self.messages[self._active[key]]["content"] += text
 
     def _set_active_body(
         self,
@@ -242,11 +254,11 @@ class ChatEventRenderer:
     ) -> None:
         header = self._assistant_header(display_name, talent_id)
         footer = f"\n\n_{metrics}_" if metrics else ""
-        if self._active_idx is not None:
-            self.messages[self._active_idx]["content"] = f"{header}\n\n{text}{footer}"
+        key = self._active_key(talent_id)
+        if key is not None:
+            self.messages[self._active.pop(key)]["content"] = f"{header}\n\n{text}{footer}"
         else:
             self.messages.append({"role": "assistant", "content": f"{header}\n\n{text}{footer}"})
-        self._active_idx = None
 
     def _add_system_note(self, text: str) -> None:
         self.messages.append({"role": "assistant", "content": f"_{text}_"})
@@ -270,6 +282,11 @@ class ChatEventRenderer:
             self._add_system_note(f"phase: {phase_type}{suffix}")
             return None
 
+        if event.type == "attachment_progress":
+            if event.payload.get("stage") in ("done", "error"):
+                self._add_system_note(format_attachment_progress(event.payload))
+            return None
+
         if event.type == "loop_check":
             payload = event.payload
             self._add_system_note(
@@ -288,7 +305,7 @@ class ChatEventRenderer:
             return None
 
         if event.type == "chunk":
-            self._append_active(event.payload.get("text", ""))
+            self._append_active(event.payload.get("text", ""), event.payload.get("talent_id"))
             return None
 
         if event.type == "step_done":
@@ -302,7 +319,7 @@ class ChatEventRenderer:
         if event.type == "step_error":
             payload = event.payload
             self._add_system_note(f"❌ {payload.get('talent_id')}: {payload.get('error')}")
-            self._active_idx = None
+            self._active.pop(payload.get("talent_id"), None)
             return None
 
         if event.type == "session_done":
@@ -348,11 +365,33 @@ class WebSession:
     engine: SessionEngine | None = None
     pending: PendingInteraction | None = None
     renderer: ChatEventRenderer = field(default_factory=ChatEventRenderer)
+    profiler: Profiler = field(default_factory=Profiler)
+    profile_turns: int = 0
+
+    def start_profiler(self, ctx: SessionContext) -> None:
+        """STUDIO_PROFILE / studio_config ``profile`` (design.md 7.1.3)."""
+        self.profiler = Profiler(resolve_profile_mode(None, ctx.studio_config))
+        self.profile_turns = 0
+
+    def end_profile(self, label: str | None = None) -> None:
+        if self.engine is None or self.engine.state is None or self.engine.state.logger is None:
+            return
+        if label is None:
+            self.profile_turns += 1
+            label = f"turn_{self.profile_turns:03d}"
+        logger = self.engine.state.logger
+        summary = self.profiler.end(self.root, logger.session_id, label)
+        if summary is not None and label != "finish":
+            # 他のターン記録と同じくセッションログへ残す（finish 分はログを閉じた後なので summary.json のみ）
+            logger.log_profile(summary.to_record())
 
     def close_engine(self) -> str:
         if self.engine is None or self.engine.state is None or not self.engine.state.started:
             return ""
-        end_event = self.engine.finish()
+        self.profiler.begin()
+        with self.profiler.section():
+            end_event = self.engine.finish()
+        self.end_profile("finish")
         lines = format_session_end_lines(end_event.payload)
         return "\n".join(line.strip() for line in lines if line.strip())
 
@@ -384,7 +423,8 @@ class WebSession:
         self.reset_chat()
         ctx = self.load_context(org_id, workflow_value)
         MockAssistant.reset()
-        self.engine = SessionEngine(ctx)
+        self.engine = create_engine(ctx)
+        self.start_profiler(ctx)
         self.org_id = org_id
         self.workflow_id = workflow_id
         self.stream = stream
@@ -401,7 +441,7 @@ class WebSession:
     ) -> None:
         import time
 
-        from studio.engine import EngineState, SessionEngine
+        from studio.engine import EngineState
         from studio.session_resume import ResumedSession
         from studio.user_context import resolve_user_context
 
@@ -428,7 +468,8 @@ class WebSession:
                 ),
             }
         )
-        self.engine = SessionEngine(ctx)
+        self.engine = create_engine(ctx)
+        self.start_profiler(ctx)
         self.engine.state = EngineState(
             ctx=ctx,
             logger=None,
@@ -439,6 +480,7 @@ class WebSession:
             user_context_enabled=uc_resolution.enabled,
             user_context_text=uc_resolution.text,
             parent_session_id=resumed.parent_session_id,
+            checkpoint=resumed.checkpoint,
             session_wall_start=time.perf_counter(),
         )
 
@@ -502,6 +544,8 @@ def _status_from_event(event: EngineEvent) -> str:
         return "応答完了"
     if event.type == "step_error":
         return "エラーが発生しました"
+    if event.type == "attachment_progress":
+        return format_attachment_progress(event.payload) or "添付を要約中…"
     if event.type == "loop_check":
         payload = event.payload
         if payload.get("result") == "exit":
@@ -554,9 +598,15 @@ def process_events(
     generator: Iterator[EngineEvent],
     first_event: EngineEvent | None = None,
 ) -> Generator[UIUpdate, None, None]:
-    event = first_event if first_event is not None else next(generator)
+    profiler = session.profiler
+    # Gradio はコールバックごとに別スレッドで再開するので、区間ごとにプロファイルする
+    if first_event is None:
+        with profiler.section():
+            first_event = next(generator)
+    event = first_event
     while True:
-        pending_kind = session.renderer.apply(event)
+        with profiler.section():
+            pending_kind = session.renderer.apply(event)
         if pending_kind:
             session.pending = PendingInteraction(pending_kind, event, generator)
             yield _pending_ui(session, pending_kind, event)
@@ -571,10 +621,12 @@ def process_events(
         )
 
         try:
-            event = next(generator)
+            with profiler.section():
+                event = next(generator)
         except StopIteration:
             break
 
+    session.end_profile()
     yield _idle_ui(session)
 
 
@@ -584,8 +636,10 @@ def resume_after_reply(session: WebSession, reply: str) -> Generator[UIUpdate, N
         return
     session.pending = None
     try:
-        event = pending.generator.send(reply)
+        with session.profiler.section():
+            event = pending.generator.send(reply)
     except StopIteration:
+        session.end_profile()
         yield _idle_ui(session)
         return
     yield from process_events(session, pending.generator, first_event=event)
@@ -603,6 +657,7 @@ def run_user_message(
     user_context: bool = True,
     attachment_context: str = "",
     attachment_names: list[str] | None = None,
+    large_files: list[Path] | None = None,
 ) -> Generator[UIUpdate, None, None]:
     session.ensure_engine(org_id, workflow_value, stream, temperature)
     session.stream = stream
@@ -618,6 +673,7 @@ def run_user_message(
         True,
     )
 
+    session.profiler.begin()
     generator = session.engine.run_turn(
         prompt_text,
         attachment_context=attachment_context,
@@ -625,6 +681,7 @@ def run_user_message(
         stream=stream,
         temperature=temperature,
         no_user_context=not user_context,
+        large_files=large_files,
     )
     yield from process_events(session, generator)
 
@@ -640,6 +697,7 @@ def handle_chat_submit(
     user_context: bool = True,
     files=None,
     upload_limits: dict[str, int] | None = None,
+    large_files: bool = False,
 ) -> Generator[UIUpdate, None, None] | UIUpdate:
     text = (user_text or "").strip()
 
@@ -673,9 +731,16 @@ def handle_chat_submit(
         return
 
     limits = upload_limits or {}
+    overflow: list[Path] | None = [] if large_files else None
     try:
         prompt_text, display_text, attachment_context, attachment_names = (
-            resolve_user_input_with_attachments(text, files, limits)
+            resolve_user_input_with_attachments(
+                text,
+                files,
+                limits,
+                overflow=overflow,
+                cache=AttachmentCache.from_config(session.root, load_studio_config(session.root)) if files else None,
+            )
         )
     except StudioValidationError as exc:
         return (
@@ -706,6 +771,7 @@ def handle_chat_submit(
         user_context=user_context,
         attachment_context=attachment_context,
         attachment_names=attachment_names or None,
+        large_files=overflow or None,
     )
 
 
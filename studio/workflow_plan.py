@@ -0,0 +1,251 @@
+"""Compiled workflow execution plan (design.md §4.3 / §6.4).
+
+``compile_workflow_plan`` resolves a SessionContext once into an immutable
+tree: slots expanded to talents, final action text (exit / interrupt
+instructions injected), loop exit evaluators and per-talent system prompts.
+The engines walk this plan instead of re-expanding the workflow JSON on every
+step, and tooling (dry-run, cost estimates, diagrams) can read it directly.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Iterator, Mapping
+
+from studio.bindings import build_direct_bindings, build_direct_workflow, expand_step_to_talents
+from studio.compaction import CompactionConfig
+from studio.interrupt import resolve_interrupt_markers
+from studio.prompts import build_system_prompt
+
+if TYPE_CHECKING:
+    from studio.loader import SessionContext
+
+# exit.type "user" は max_iterations 省略可（実質無制限）
+USER_EXIT_MAX_ITERATIONS = 999999
+
+
+def judge_action(criteria: str) -> str:
+    return (
+        f"終了条件: {criteria}\n\n"
+        "出力は必ず「【判定】継続」または「【判定】終了」で始め、理由を続けてください。"
+    )
+
+
+def interrupt_action(action: str, markers: tuple[str, ...] | list[str]) -> str:
+    if not markers:
+        return action
+    marker = markers[0]
+    if marker in action and "割り込み" in action:
+        return action
+    return (
+        f"{action}\n\n"
+        f"（割り込み）ユーザーへ確認・質問するときは、"
+        f"応答の末尾に必ず「{marker}」を付けてください。"
+    )
+
+
+def marker_action(action: str, marker: str) -> str:
+    return (
+        f"{action}\n\n"
+        f"（終了条件）合意・結論に至った場合は応答に「{marker}」を含めてください。"
+    )
+
+
+@dataclass(frozen=True)
+class PlannedStep:
+    talent_id: str
+    action: str
+    speaker: str
+    assistant: str
+    model: str | None = None
+
+
+@dataclass(frozen=True)
+class LoopExit:
+    type: str | None = None
+    marker: str = ""
+    judge: PlannedStep | None = None
+    prompt: str = "続けますか？"
+
+
+@dataclass(frozen=True)
+class PlannedPhase:
+    type: str
+    steps: tuple[PlannedStep, ...] = ()
+    phases: tuple[PlannedPhase, ...] = ()
+    max_iterations: int = 1
+    exit: LoopExit = field(default_factory=LoopExit)
+    compaction: CompactionConfig | None = None
+    compaction_step: PlannedStep | None = None
+
+
+@dataclass(frozen=True)
+class WorkflowPlan:
+    workflow_id: str | None
+    name: str
+    phases: tuple[PlannedPhase, ...]
+    interrupt_markers: tuple[str, ...] = ()
+    system_prompts: Mapping[str, str] = field(default_factory=lambda: MappingProxyType({}))
+
+    def iter_steps(self) -> Iterator[PlannedStep]:
+        """Every step once, in declaration order (loop bodies and judges included)."""
+
+        def walk(phases: tuple[PlannedPhase, ...]) -> Iterator[PlannedStep]:
+            for phase in phases:
+                yield from phase.steps
+                yield from walk(phase.phases)
+                if phase.exit.judge is not None:
+                    yield phase.exit.judge
+
+        return walk(self.phases)
+
+    def to_dict(self) -> dict[str, Any]:
+        def step_dict(step: PlannedStep) -> dict[str, Any]:
+            out = {"talent_id": step.talent_id, "assistant": step.assistant, "action": step.action}
+            if step.model:
+                out["model"] = step.model
+            return out
+
+        def phase_dict(phase: PlannedPhase) -> dict[str, Any]:
+            out: dict[str, Any] = {"type": phase.type}
+            if phase.type != "loop":
+                out["steps"] = [step_dict(s) for s in phase.steps]
+                return out
+            out["max_iterations"] = phase.max_iterations
+            out["exit"] = {"type": phase.exit.type or "max_iterations"}
+            if phase.exit.marker:
+                out["exit"]["marker"] = phase.exit.marker
+            if phase.exit.judge is not None:
+                out["exit"]["judge"] = step_dict(phase.exit.judge)
+            if phase.compaction is not None:
+                out["compaction"] = {
+                    "keep_last": phase.compaction.keep_last,
+                    "strategy": "model" if phase.compaction_step else "extractive",
+                }
+            out["phases"] = [phase_dict(p) for p in phase.phases]
+            return out
+
+        return {
+            "workflow": self.workflow_id,
+            "name": self.name,
+            "interrupt_markers": list(self.interrupt_markers),
+            "phases": [phase_dict(p) for p in self.phases],
+        }
+
+
+def resolve_workflow(ctx: SessionContext) -> tuple[dict[str, Any], dict[str, list[str]]]:
+    """The context's workflow and bindings, or the direct-send pseudo workflow (§4.4)."""
+    if ctx.workflow_id and ctx.workflow and ctx.slot_bindings:
+        return ctx.workflow, ctx.slot_bindings
+    talent_ids = list(ctx.org.get("talent_ids") or [])
+    return build_direct_workflow(talent_ids), build_direct_bindings(talent_ids)
+
+
+class _Compiler:
+    def __init__(self, ctx: SessionContext, bindings: dict[str, list[str]], markers: tuple[str, ...]) -> None:
+        self.ctx = ctx
+        self.bindings = bindings
+        self.markers = markers
+
+    def step(self, talent_id: str, action: str) -> PlannedStep:
+        mapping = self.ctx.model_mapping.get(talent_id, {})
+        return PlannedStep(
+            talent_id=talent_id,
+            action=action,
+            speaker=self.ctx.talents.get(talent_id, {}).get("name", talent_id),
+            assistant=mapping.get("assistant", ""),
+            model=mapping.get("model"),
+        )
+
+    def phases(
+        self,
+        phases: list[dict[str, Any]],
+        marker: tuple[tuple[str, str], str] | None = None,
+    ) -> tuple[PlannedPhase, ...]:
+        return tuple(self.phase(phase, marker) for phase in phases)
+
+    def phase(self, phase: dict[str, Any], marker: tuple[tuple[str, str], str] | None) -> PlannedPhase:
+        phase_type = phase.get("type") or ""
+        if phase_type == "loop":
+            return self.loop(phase)
+        steps: list[PlannedStep] = []
+        for raw in phase.get("steps") or []:
+            for talent_id, action in expand_step_to_talents(raw, self.bindings):
+                if phase_type == "serial" and marker and (talent_id, action) == marker[0]:
+                    action = marker_action(action, marker[1])
+                steps.append(self.step(talent_id, interrupt_action(action, self.markers)))
+        return PlannedPhase(type=phase_type, steps=tuple(steps))
+
+    def loop(self, phase: dict[str, Any]) -> PlannedPhase:
+        exit_cfg = phase.get("exit") or {}
+        exit_type = exit_cfg.get("type")
+        default_max = USER_EXIT_MAX_ITERATIONS if exit_type == "user" else 1
+        inner = phase.get("phases") or []
+
+        marker = None
+        judge = None
+        if exit_type == "marker":
+            target = self._marker_target(inner)
+            if target and exit_cfg.get("marker"):
+                marker = (target, exit_cfg["marker"])
+        elif exit_type == "judge":
+            talent_ids = self.bindings.get(exit_cfg.get("slot", ""), [])
+            if talent_ids:
+                judge = self.step(talent_ids[0], judge_action(exit_cfg.get("criteria", "")))
+
+        compaction = CompactionConfig.from_phase(phase)
+        return PlannedPhase(
+            type="loop",
+            phases=self.phases(inner, marker),
+            max_iterations=phase.get("max_iterations", default_max),
+            exit=LoopExit(
+                type=exit_type,
+                marker=exit_cfg.get("marker", ""),
+                judge=judge,
+                prompt=exit_cfg.get("prompt", "続けますか？"),
+            ),
+            compaction=compaction,
+            compaction_step=self._compaction_step(compaction),
+        )
+
+    def _marker_target(self, inner: list[dict[str, Any]]) -> tuple[str, str] | None:
+        """Last expanded (talent_id, action) of the loop's final serial phase (§4.1 rule 5)."""
+        if not inner or inner[-1].get("type") != "serial":
+            return None
+        steps = inner[-1].get("steps") or []
+        if not steps:
+            return None
+        expanded = expand_step_to_talents(steps[-1], self.bindings)
+        return expanded[-1] if expanded else None
+
+    def _compaction_step(self, config: CompactionConfig | None) -> PlannedStep | None:
+        """The talent that writes ``model`` summaries; None means extractive."""
+        if config is None or config.strategy != "model":
+            return None
+        talent_ids = self.bindings.get(config.slot or "", [])
+        if not talent_ids:
+            return None
+        step = self.step(talent_ids[0], "")
+        if step.assistant in ("", "human", "mock") or step.assistant not in self.ctx.assistants:
+            return None
+        return step
+
+
+def compile_workflow_plan(ctx: SessionContext) -> WorkflowPlan:
+    """Expand ``ctx``'s workflow (or direct send) into a WorkflowPlan; the context is not modified."""
+    workflow, bindings = resolve_workflow(ctx)
+    markers = tuple(resolve_interrupt_markers(workflow, ctx.org))
+    plan = WorkflowPlan(
+        workflow_id=ctx.workflow_id,
+        name=workflow.get("name", ""),
+        phases=_Compiler(ctx, bindings, markers).phases(workflow.get("phases") or []),
+        interrupt_markers=markers,
+    )
+    # ユーザーコンテキストなしの基本 system prompt。注入ありのセッションは engine 側で組み立てる
+    prompts: dict[str, str] = {}
+    for step in plan.iter_steps():
+        talent = ctx.talents.get(step.talent_id)
+        if talent is not None and step.talent_id not in prompts:
+            prompts[step.talent_id] = build_system_prompt(talent, ctx.org, ctx.org_id, step.talent_id)
+    return replace(plan, system_prompts=MappingProxyType(prompts))
@@ -1,4 +1,4 @@
-"""Workflow structure validation (design.md 4.1 / 5.3 E303–E305)."""
+"""Workflow structure validation (design.md 4.1 / 5.3 E303–E306)."""
 
 from __future__ import annotations
 
@@ -71,5 +71,17 @@ def _validate_phase(
                         message='exit.type "marker" ではループ最終 phase を parallel にできません',
                     )
                 )
+        compaction = phase.get("compaction") or {}
+        if compaction.get("strategy") == "model":
+            slot = compaction.get("slot") or exit_cfg.get("slot", "")
+            if slot not in slots:
+                report.add(
+                    StudioError(
+                        code="E306",
+                        target=f"workflow '{workflow_id}'",
+                        message=f"compaction の slot '{slot}' が slots に宣言されていません",
+                        hint='strategy "model" では要約担当の slot が必要（judge ループは exit.slot を流用）',
+                    )
+                )
         for inner in phase.get("phases") or []:
             _validate_phase(workflow_id, workflow, slots, inner, report)
@@ -0,0 +1,57 @@
+"""LLM client cache tests (design.md §6.5)."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from studio import assistants
+from studio.assistants import build_chain, build_llm, clear_llm_cache
+from studio.config_store import save_config
+
+NAMESPACE_CFG = {"module": "types", "class": "SimpleNamespace"}
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    clear_llm_cache()
+    yield
+    clear_llm_cache()
+
+
+def test_build_llm_reuses_client_per_model_and_temperature() -> None:
+    first = build_llm(NAMESPACE_CFG, "m1", 0.7)
+    assert build_llm(NAMESPACE_CFG, "m1", 0.7) is first
+    assert build_llm(NAMESPACE_CFG, "m1", None) is not first
+    assert build_llm(NAMESPACE_CFG, "m2", 0.7) is not first
+    assert first.model == "m1" and first.temperature == 0.7
+
+
+def test_build_llm_cache_is_bounded_lru(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(assistants, "LLM_CACHE_SIZE", 2)
+    a = build_llm(NAMESPACE_CFG, "a", None)
+    build_llm(NAMESPACE_CFG, "b", None)
+    assert build_llm(NAMESPACE_CFG, "a", None) is a
+    build_llm(NAMESPACE_CFG, "c", None)  # evicts b (least recently used)
+    assert build_llm(NAMESPACE_CFG, "a", None) is a
+    assert len(assistants._llm_cache) == 2
+    assert ("types", "SimpleNamespace", "b", None) not in assistants._llm_cache
+
+
+def test_build_chain_shares_compiled_prompt() -> None:
+    llm = RunnableLambda(lambda prompt: "ok")
+    first = build_chain(llm)
+    second = build_chain(RunnableLambda(lambda prompt: "other"))
+    assert first.first is second.first
+
+
+def test_saving_model_mapping_keeps_cached_clients(studio_root: Path) -> None:
+    cached = build_llm(NAMESPACE_CFG, "m", None)
+    result = save_config(
+        "model_mapping", "", {"solo_bot": {"assistant": "mock"}}, studio_root, org_id="solo"
+    )
+    assert result.ok, result.message
+    # mapping は呼び出し時にキーを選ぶだけで、既存クライアントは古くならない
+    assert build_llm(NAMESPACE_CFG, "m", None) is cached
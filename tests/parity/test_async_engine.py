@@ -0,0 +1,146 @@
+"""AsyncSessionEngine parity tests (design.md §6.4)."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from studio.assistants import MockAssistant, ainvoke_llm_step
+from studio.async_engine import AsyncSessionEngine
+from studio.engine import SessionEngine, collect_events, create_engine
+from studio.history import ConversationHistory
+from studio.loader import load_session_context
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+@pytest.fixture
+def trio_root(studio_root: Path) -> Path:
+    for name in ("workflows", "organizations/trio", "talents"):
+        src = REPO_ROOT / name
+        dest = studio_root / name
+        dest.mkdir(parents=True, exist_ok=True)
+        for p in src.glob("*.json"):
+            shutil.copy2(p, dest / p.name)
+
+    mapping = {tid: {"assistant": "mock"} for tid in ("alpha", "beta", "gamma")}
+    (studio_root / "organizations" / "trio" / "model_mapping.json").write_text(
+        json.dumps(mapping, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+    return studio_root
+
+
+def _trace(events) -> list[tuple[str, str | None, str | None]]:
+    return [
+        (e.type, e.payload.get("talent_id"), e.payload.get("text"))
+        for e in events
+        if e.type not in ("session_start", "session_done")
+    ]
+
+
+@pytest.mark.parametrize("workflow_id", ["discussion", "quiz"])
+@pytest.mark.parametrize("stream", [False, True])
+def test_async_engine_matches_thread_engine(trio_root: Path, workflow_id: str, stream: bool) -> None:
+    MockAssistant.reset()
+    ctx = load_session_context("trio", trio_root, workflow_id=workflow_id)
+    expected = collect_events(SessionEngine(ctx), "議題", stream=stream)
+
+    MockAssistant.reset()
+    ctx = load_session_context("trio", trio_root, workflow_id=workflow_id)
+    actual = collect_events(AsyncSessionEngine(ctx), "議題", stream=stream)
+
+    assert _trace(actual) == _trace(expected)
+    assert actual[-1].type == "session_done"
+    assert actual[-1].payload["by_model"] == expected[-1].payload["by_model"]
+
+
+def test_create_engine_follows_studio_config(trio_root: Path) -> None:
+    ctx = load_session_context("trio", trio_root, workflow_id="quiz")
+    assert type(create_engine(ctx)) is SessionEngine
+
+    (trio_root / "studio_config.json").write_text(
+        json.dumps({"engine": "asyncio", "parallel_events": "as_completed"}),
+        encoding="utf-8",
+    )
+    MockAssistant.reset()
+    ctx = load_session_context("trio", trio_root, workflow_id="quiz")
+    engine = create_engine(ctx)
+    assert isinstance(engine, AsyncSessionEngine)
+
+    events = collect_events(engine, "クイズ", stream=True)
+    parallel_done = [
+        e.payload["talent_id"]
+        for e in events
+        if e.type == "step_done" and e.payload.get("phase_type") == "parallel"
+    ]
+    assert sorted(parallel_done) == ["beta", "gamma"]
+    assert events[-1].type == "session_done"
+
+
+def test_arun_turn_async_generator_accepts_replies(trio_root: Path) -> None:
+    mapping = {"alpha": {"assistant": "mock"}, "beta": {"assistant": "human"}, "gamma": {"assistant": "mock"}}
+    (trio_root / "organizations" / "trio" / "model_mapping.json").write_text(
+        json.dumps(mapping), encoding="utf-8"
+    )
+    MockAssistant.reset()
+    ctx = load_session_context("trio", trio_root, workflow_id="discussion")
+    engine = AsyncSessionEngine(ctx)
+
+    async def drive() -> list:
+        seen = []
+        agen = engine.arun_turn("議題", stream=False)
+        reply = None
+        while True:
+            try:
+                event = await agen.asend(reply)
+            except StopAsyncIteration:
+                break
+            seen.append(event)
+            reply = "人間の意見" if event.type == "await_text" else None
+        return seen
+
+    events = asyncio.run(drive())
+    engine.finish()
+
+    await_events = [e for e in events if e.type == "await_text"]
+    assert [e.payload["talent_id"] for e in await_events] == ["beta"]
+    human_done = [e for e in events if e.type == "step_done" and e.payload["talent_id"] == "beta"]
+    assert human_done[0].payload["text"] == "人間の意見"
+
+
+def test_ainvoke_llm_step_streams_with_astream(monkeypatch: pytest.MonkeyPatch) -> None:
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    monkeypatch.setattr(
+        "studio.assistants.build_llm",
+        lambda *args, **kwargs: FakeListChatModel(responses=["こんにちは"]),
+    )
+    history = ConversationHistory()
+    chunks: list[str] = []
+
+    async def on_chunk(text: str) -> None:
+        chunks.append(text)
+
+    result = asyncio.run(
+        ainvoke_llm_step(
+            assistant_name="fake",
+            assistant_cfg={},
+            model="fake",
+            system_prompt="sys",
+            user_message="hi",
+            history=history,
+            temperature=None,
+            stream=True,
+            costs={"default": {"input": 0.0, "output": 0.0}},
+            on_chunk=on_chunk,
+        )
+    )
+    assert result.text == "こんにちは"
+    assert "".join(chunks) == "こんにちは"
+    assert result.stream is True
+    assert len(history.get_messages()) == 2
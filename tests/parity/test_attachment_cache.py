@@ -0,0 +1,146 @@
+"""Persistent attachment cache tests (design.md 5.1.4)."""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+from studio.attachment_cache import AttachmentCache, FileText
+from studio.loader import read_attachment_files
+
+LIMITS = {"max_files": 5, "max_file_size_kb": 4, "max_total_chars": 10**6}
+
+
+def _age(root: Path) -> None:
+    """Push mtimes out of the racy window so the cache trusts them."""
+    past = time.time() - 60
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            os.utime(os.path.join(dirpath, name), (past, past))
+        os.utime(dirpath, (past, past))
+
+
+def _tree(root: Path) -> Path:
+    files = {
+        "a.md": "# A\n",
+        "a/b.py": "print('b')\n",
+        "a/c/d.txt": "d\r\nwindows\r\n",
+        "a-b.txt": "dash\n",
+        "Z.json": "{}\n",
+        "noext": "plain\n",
+        "image.png": "not text",
+        ".git/config": "hidden\n",
+        "pkg/__pycache__/x.py": "cached\n",
+    }
+    for rel, text in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(text.encode("utf-8"))
+    _age(root)
+    return root
+
+
+def test_cached_walk_matches_rglob_and_skips_unchanged(tmp_path: Path) -> None:
+    repo = _tree(tmp_path / "repo")
+    expected, report = read_attachment_files([repo], LIMITS)
+    assert report.ok and "d\nwindows\n" in expected and "hidden" not in expected and "not text" not in expected
+
+    cache = AttachmentCache(tmp_path / "cache.sqlite3")
+    first, _ = read_attachment_files([repo], LIMITS, cache=cache)
+    assert first == expected and cache.reads == 6
+
+    # 別プロセス相当：SQLite から一覧と本文を引き、ディレクトリもファイルも開かない
+    again = AttachmentCache(tmp_path / "cache.sqlite3")
+    second, _ = read_attachment_files([repo], LIMITS, cache=again)
+    assert second == expected and (again.scans, again.reads) == (0, 0)
+
+    (repo / "a" / "c" / "d.txt").write_text("changed\n", encoding="utf-8")
+    (repo / "a" / "new.md").write_text("new\n", encoding="utf-8")
+    past = time.time() - 30
+    for path in (repo / "a" / "c" / "d.txt", repo / "a" / "new.md", repo / "a"):
+        os.utime(path, (past, past))
+    third, _ = read_attachment_files([repo], LIMITS, cache=again)
+    assert third == read_attachment_files([repo], LIMITS)[0]
+    # 変わったのは a/ の一覧と 2 ファイルだけ
+    assert (again.scans, again.reads) == (1, 2)
+
+
+def test_recent_writes_are_not_trusted(tmp_path: Path) -> None:
+    note = tmp_path / "note.md"
+    note.write_text("v1\n", encoding="utf-8")
+    cache = AttachmentCache(tmp_path / "cache.sqlite3")
+    assert cache.read_many([note], max_size=4096)[0].text == "v1\n"
+    # 同じ大きさ・mtime の粒度内の書き換えでも読み直す
+    note.write_text("v2\n", encoding="utf-8")
+    assert cache.read_many([note], max_size=4096)[0].text == "v2\n" and cache.reads == 2
+
+
+def test_limits_and_errors_match_uncached(tmp_path: Path) -> None:
+    big = tmp_path / "big.log"
+    big.write_text("x" * 8192, encoding="utf-8")
+    latin = tmp_path / "latin.txt"
+    latin.write_bytes("café".encode("latin-1"))
+    _age(tmp_path)
+    cache = AttachmentCache(tmp_path / "cache.sqlite3")
+    (result,) = cache.read_many([big], max_size=4096)
+    assert result == FileText(None, 0, 8192) and cache.reads == 0
+
+    for paths in ([big], [latin], [tmp_path / "missing.md"]):
+        _, plain = read_attachment_files(paths, LIMITS)
+        _, cached = read_attachment_files(paths, LIMITS, cache=cache)
+        assert [e.format() for e in cached.errors] == [e.format() for e in plain.errors]
+
+    overflow: list[Path] = []
+    read_attachment_files([big], LIMITS, cache=cache, overflow=overflow)
+    assert overflow == [big]
+
+
+def test_contents_are_shared_by_hash_and_evicted_by_bytes(tmp_path: Path) -> None:
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for i in range(6):
+        (docs / f"{i}.md").write_text(f"{i}" * 1000, encoding="utf-8")
+    (docs / "copy.md").write_text("0" * 1000, encoding="utf-8")
+    _age(docs)
+
+    cache = AttachmentCache(tmp_path / "cache.sqlite3", max_bytes=3500)
+    results = cache.read_many(sorted(docs.iterdir()), max_size=4096)
+    assert all(isinstance(r, FileText) and r.tokens == 250 for r in results)
+    assert cache.total_bytes() <= 3500
+
+    # 追い出された内容は読み直して同じ本文を返す
+    fresh = AttachmentCache(tmp_path / "cache.sqlite3", max_bytes=3500)
+    again = fresh.read_many(sorted(docs.iterdir()), max_size=4096)
+    assert [r.text for r in again] == [r.text for r in results] and 0 < fresh.reads < len(results)
+
+
+def test_skip_is_applied_after_loading_and_removed_paths_are_pruned(tmp_path: Path) -> None:
+    repo = _tree(tmp_path / "repo")
+    cache = AttachmentCache(tmp_path / "cache.sqlite3")
+    extensions = {".md", ".py", ".txt", ".json"}
+    with_skip = cache.expand_directory(repo, ("__pycache__",), extensions)
+    assert repo / "pkg" / "__pycache__" / "x.py" not in with_skip
+
+    # 除外の設定が変わっても保存済みの一覧から反映され、読むのは初めて入る __pycache__ だけ
+    again = AttachmentCache(tmp_path / "cache.sqlite3")
+    without_skip = again.expand_directory(repo, (), extensions)
+    assert repo / "pkg" / "__pycache__" / "x.py" in without_skip and again.scans == 1
+    cache.read_many(without_skip, max_size=4096)
+
+    for path in sorted((repo / "a").rglob("*"), reverse=True):
+        path.rmdir() if path.is_dir() else path.unlink()
+    (repo / "a").rmdir()
+    (repo / "a.md").unlink()
+    past = time.time() - 30
+    os.utime(repo, (past, past))
+    fresh = AttachmentCache(tmp_path / "cache.sqlite3")
+    assert repo / "a" / "b.py" not in fresh.expand_directory(repo, (), extensions)
+    assert isinstance(fresh.read_many([repo / "a.md"], max_size=4096)[0], FileNotFoundError)
+
+    with closing(sqlite3.connect(tmp_path / "cache.sqlite3")) as conn:
+        paths = [row[0] for table in ("files", "listings") for row in conn.execute(f"SELECT path FROM {table}")]
+    removed = {repo / "a.md", repo / "a"}
+    assert paths and not any(Path(p) in removed or repo / "a" in Path(p).parents for p in paths)
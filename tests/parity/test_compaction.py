@@ -0,0 +1,154 @@
+"""turn_prior compaction tests (design.md §4.3)."""
+
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from studio import engine as engine_module
+from studio.assistants import MockAssistant
+from studio.async_engine import AsyncSessionEngine
+from studio.compaction import (
+    COMPACTION_LABEL,
+    CompactionConfig,
+    apply_summary,
+    extractive_summary,
+    split_for_compaction,
+)
+from studio.engine import SessionEngine, collect_events
+from studio.loader import load_session_context
+from studio.validation import ValidationReport
+from studio.workflow_validate import validate_workflow_structure
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+@pytest.fixture
+def meeting_root(studio_root: Path) -> Path:
+    shutil.copytree(REPO_ROOT / "workflows", studio_root / "workflows", dirs_exist_ok=True)
+    shutil.copytree(REPO_ROOT / "organizations" / "nokuru", studio_root / "organizations" / "nokuru")
+    for tid in ("hinata", "satsuki", "kaede"):
+        shutil.copy2(REPO_ROOT / "talents" / f"{tid}.json", studio_root / "talents" / f"{tid}.json")
+    # 同梱の meeting は圧縮しないので、loop に compaction を足して使う
+    workflow_path = studio_root / "workflows" / "meeting.json"
+    workflow = json.loads(workflow_path.read_text(encoding="utf-8"))
+    workflow["phases"][1]["compaction"] = {"keep_last": 4}
+    workflow_path.write_text(json.dumps(workflow, ensure_ascii=False, indent=2), encoding="utf-8")
+    mapping = {tid: {"assistant": "mock"} for tid in ("hinata", "satsuki", "kaede")}
+    (studio_root / "organizations" / "nokuru" / "model_mapping.json").write_text(
+        json.dumps(mapping, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+    return studio_root
+
+
+def _log_records(events, record_type: str) -> list[dict]:
+    log_path = Path(events[-1].payload["log_path"])
+    records = [json.loads(line) for line in log_path.read_text(encoding="utf-8").splitlines()]
+    return [r for r in records if r.get("type") == record_type]
+
+
+def test_split_and_apply_keep_last_entries_verbatim() -> None:
+    prior = [("A", "一。二"), ("B", "b"), ("C", "c"), ("D", "d")]
+    older = split_for_compaction(prior, 2)
+    assert older == [("A", "一。二"), ("B", "b")]
+
+    apply_summary(prior, len(older), extractive_summary(older))
+    assert prior[0] == (COMPACTION_LABEL, "- A: 一。\n- B: b")
+    assert prior[1:] == [("C", "c"), ("D", "d")]
+
+    # 要約1件だけが古い側に残る場合は何もしない
+    assert split_for_compaction(prior, 2) is None
+
+
+def test_extractive_summary_elides_code_and_caps_length() -> None:
+    older = [
+        (COMPACTION_LABEL, "- A: 前回"),
+        ("B", "```python\nprint('x')\n```\n実装しました。詳細は以下"),
+    ]
+    assert extractive_summary(older) == "- A: 前回\n- B: （コード省略）"
+
+    many = [(f"S{i}", "あ" * 50) for i in range(10)]
+    summary = extractive_summary(many, max_chars=120)
+    assert len(summary) <= 120
+    assert summary.endswith("S9: " + "あ" * 50)
+
+
+def test_meeting_loop_compacts_turn_prior(meeting_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    seen: list[list[tuple[str, str]]] = []
+    original = engine_module.build_user_message
+
+    def spy(user_text, **kwargs):
+        seen.append(list(kwargs.get("prior_responses") or []))
+        return original(user_text, **kwargs)
+
+    monkeypatch.setattr(engine_module, "build_user_message", spy)
+    monkeypatch.setenv("STUDIO_MOCK_EMIT_CODE", "1")
+    MockAssistant.reset()
+    ctx = load_session_context("nokuru", meeting_root, workflow_id="meeting")
+    events = collect_events(SessionEngine(ctx), "キャンプ議題", stream=False)
+
+    compactions = _log_records(events, "compaction")
+    # 反復1の後は 4 件で keep_last 以内。最終反復の後は次がないので畳まない
+    assert [c["iteration"] for c in compactions] == [2]
+    assert all(c["strategy"] == "extractive" and c["tokens_saved"] > 0 for c in compactions)
+    assert max(len(prior) for prior in seen) <= 4 + 1 + 2
+    assert seen[-1][0][0] == COMPACTION_LABEL
+    end = _log_records(events, "session_end")[0]
+    assert end["compaction_tokens_saved"] == sum(c["tokens_saved"] for c in compactions)
+
+
+def test_async_engine_compacts_like_thread_engine(meeting_root: Path) -> None:
+    MockAssistant.reset()
+    ctx = load_session_context("nokuru", meeting_root, workflow_id="meeting")
+    expected = _log_records(collect_events(SessionEngine(ctx), "議題", stream=False), "compaction")
+
+    MockAssistant.reset()
+    ctx = load_session_context("nokuru", meeting_root, workflow_id="meeting")
+    actual = _log_records(collect_events(AsyncSessionEngine(ctx), "議題", stream=False), "compaction")
+    assert actual == expected
+
+
+def test_model_strategy_requires_declared_slot() -> None:
+    phase = {
+        "type": "loop",
+        "max_iterations": 2,
+        "compaction": {"strategy": "model", "slot": "scribe"},
+        "phases": [{"type": "serial", "steps": [{"slot": "member"}]}],
+    }
+    report = ValidationReport()
+    validate_workflow_structure("w", {"slots": {"member": {}}, "phases": [phase]}, report)
+    assert [e.code for e in report.errors] == ["E306"]
+
+    judge_phase = {**phase, "compaction": {"strategy": "model"}, "exit": {"type": "judge", "slot": "member"}}
+    assert CompactionConfig.from_phase(judge_phase).slot == "member"
+
+
+def test_model_strategy_summarises_with_slot_model(meeting_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from langchain_core.runnables import RunnableLambda
+
+    workflow_path = meeting_root / "workflows" / "meeting.json"
+    workflow = json.loads(workflow_path.read_text(encoding="utf-8"))
+    workflow["phases"][1]["compaction"] = {"keep_last": 2, "strategy": "model", "slot": "moderator"}
+    workflow_path.write_text(json.dumps(workflow, ensure_ascii=False), encoding="utf-8")
+    mapping_path = meeting_root / "organizations" / "nokuru" / "model_mapping.json"
+    mapping = json.loads(mapping_path.read_text(encoding="utf-8"))
+    mapping["hinata"] = {"assistant": "Groq", "model": "m"}
+    mapping_path.write_text(json.dumps(mapping), encoding="utf-8")
+
+    def reply(prompt):
+        if "記録係" in prompt.to_messages()[0].content:
+            return "要約"
+        return "司会の発言です。" * 20
+
+    monkeypatch.setattr("studio.assistants.build_llm", lambda *args, **kwargs: RunnableLambda(reply))
+    MockAssistant.reset()
+    ctx = load_session_context("nokuru", meeting_root, workflow_id="meeting")
+    events = collect_events(SessionEngine(ctx), "議題", stream=False)
+
+    compactions = _log_records(events, "compaction")
+    assert compactions
+    assert all(c["strategy"] == "model" and c["talent_id"] == "hinata" for c in compactions)
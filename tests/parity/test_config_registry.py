@@ -0,0 +1,62 @@
+"""Config registry cache tests (design.md 5.2.1)."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from studio.config_registry import REGISTRY
+from studio.config_store import load_config, save_config
+from studio.loader import load_session_context
+from studio.schema_validate import get_validator
+from studio.validation import StudioValidationError
+
+
+def _age(root: Path, seconds: float = 60) -> None:
+    """Backdate every file so the registry treats them as settled."""
+    stamp = time.time() - seconds
+    for path in [root, *root.rglob("*")]:
+        os.utime(path, (stamp, stamp))
+
+
+def test_cached_context_reuses_documents_until_a_file_changes(studio_root: Path) -> None:
+    _age(studio_root)
+    first = load_session_context("solo", studio_root)
+    hits = REGISTRY.hits
+    second = load_session_context("solo", studio_root)
+    assert REGISTRY.hits == hits + 1
+    assert second is not first and second.org is first.org and second.talents is first.talents
+
+    talent_path = studio_root / "talents" / "solo_bot.json"
+    talent = json.loads(talent_path.read_text(encoding="utf-8"))
+    talent["name"] = "書き換え後の名前"
+    talent_path.write_text(json.dumps(talent, ensure_ascii=False), encoding="utf-8")
+    third = load_session_context("solo", studio_root)
+    assert third.talents["solo_bot"]["name"] == "書き換え後の名前"
+    # 直前に書き換えたファイルは mtime の粒度内なのでキャッシュしない
+    assert REGISTRY.get_context(studio_root, "solo", None) is None
+
+
+def test_save_config_invalidates_and_errors_are_replayed(studio_root: Path) -> None:
+    _age(studio_root)
+    load_session_context("solo", studio_root)
+    assert REGISTRY.get_context(studio_root, "solo", None) is not None
+    org = load_config("organization", "solo", studio_root)
+    assert save_config("organization", "solo", {**org, "name": "改名"}, studio_root).ok
+    assert REGISTRY.get_context(studio_root, "solo", None) is None
+    assert load_session_context("solo", studio_root).org["name"] == "改名"
+
+    (studio_root / "talents" / "broken.json").write_text(json.dumps({"name": 1}), encoding="utf-8")
+    _age(studio_root)
+    for _ in range(2):
+        with pytest.raises(StudioValidationError) as exc:
+            load_session_context("solo", studio_root)
+        assert any(e.target == "talents/broken.json" for e in exc.value.errors)
+
+
+def test_validators_are_compiled_once() -> None:
+    assert get_validator("talent") is get_validator("talent")
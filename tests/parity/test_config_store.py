@@ -2,9 +2,16 @@
 
 from __future__ import annotations
 
+import json
+import os
+import time
 from pathlib import Path
 
+import pytest
+
+from studio.config_registry import REGISTRY
 from studio.config_store import (
+    create_organization,
     create_talent,
     create_workflow,
     delete_config,
@@ -12,6 +19,8 @@ from studio.config_store import (
     load_config,
     save_config,
     talent_referenced_by_orgs,
+    talents_using_assistant,
+    workflow_bound_by_orgs,
 )
 from studio.loader import load_session_context
 
@@ -83,3 +92,32 @@ def test_save_model_mapping_uses_org_id_not_item_id(studio_root: Path) -> None:
     assert result.ok
     loaded = load_config("model_mapping", "", studio_root, org_id="solo")
     assert loaded["solo_bot"]["assistant"] == "mock"
+
+
+def test_reference_index_tracks_writes_and_hand_edits(studio_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    assert create_organization("team", studio_root, initial_talent_id="solo_bot").ok
+    org = load_config("organization", "team", studio_root)
+    org["workflow_bindings"] = {"review": {"reviewer": ["solo_bot"]}}
+    assert save_config("organization", "team", org, studio_root).ok
+
+    assert talent_referenced_by_orgs("solo_bot", studio_root) == ["solo", "team"]
+    assert workflow_bound_by_orgs("review", studio_root) == ["team"]
+    assert talents_using_assistant("mock", studio_root) == [("solo", "solo_bot"), ("team", "solo_bot")]
+
+    # 手編集は stat の変化で拾う
+    mapping_path = studio_root / "organizations" / "solo" / "model_mapping.json"
+    mapping_path.write_text(json.dumps({"solo_bot": {"assistant": "human"}}), encoding="utf-8")
+    assert talents_using_assistant("human", studio_root) == [("solo", "solo_bot")]
+
+    assert delete_config("organization", "team", studio_root).ok
+    assert talent_referenced_by_orgs("solo_bot", studio_root) == ["solo"]
+    assert workflow_bound_by_orgs("review", studio_root) == []
+
+    # ファイルが落ち着いた後の問い合わせは JSON を読まない
+    stamp = time.time() - 60
+    for path in [studio_root, *studio_root.rglob("*")]:
+        os.utime(path, (stamp, stamp))
+    list_configs("organization", studio_root)
+    monkeypatch.setattr(REGISTRY, "load_document", lambda *a, **k: pytest.fail("unexpected read"))
+    assert list_configs("organization", studio_root) == ["solo"]
+    assert talent_referenced_by_orgs("solo_bot", studio_root) == ["solo"]
@@ -0,0 +1,95 @@
+"""Token-budgeted conversation history tests (design.md §6.4)."""
+
+from __future__ import annotations
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from studio.assistants import context_window_for, fit_history_to_context, invoke_llm_step
+from studio.history import ConversationHistory
+from studio.logging import estimate_tokens
+from studio.ratelimit import RateLimit, reset_limiters
+
+COSTS = {"default": {"input": 0.0, "output": 0.0}}
+
+
+def _filled(pairs: int, text: str = "あ" * 200) -> ConversationHistory:
+    history = ConversationHistory(max_length=100)
+    for i in range(pairs):
+        history.add_message(HumanMessage(content=f"{i}{text}"))
+        history.add_message(AIMessage(content=f"{i}{text}"))
+    return history
+
+
+def test_token_estimate_is_cached_and_tracks_drops() -> None:
+    history = ConversationHistory(max_length=2)
+    for i in range(3):
+        history.add_message(HumanMessage(content=f"q{i}"))
+        history.add_message(AIMessage(content=f"a{i}"))
+    messages = history.get_messages()
+    assert [m.content for m in messages] == ["q1", "a1", "q2", "a2"]
+    assert history.token_estimate() == sum(estimate_tokens(m.content) for m in messages)
+
+    assert history.reduce_history()
+    assert history.token_estimate() == sum(estimate_tokens(m.content) for m in history.get_messages())
+
+
+def test_trim_to_tokens_keeps_newest_pairs() -> None:
+    history = _filled(5)
+    per_pair = history.token_estimate() // 5
+    dropped = history.trim_to_tokens(per_pair * 2 + 1)
+    assert dropped == 6
+    messages = history.get_messages()
+    assert isinstance(messages[0], HumanMessage)
+    assert messages[0].content.startswith("3")
+
+    # 1メッセージ分だけ超過しても応答単独では残さない
+    history = _filled(2)
+    history.trim_to_tokens(history.token_estimate() - 1)
+    assert isinstance(history.get_messages()[0], HumanMessage)
+    assert len(history.get_messages()) == 2
+
+
+def test_context_window_resolution() -> None:
+    cfg = {"context_windows": {"default": 8192, "big": 131072}}
+    assert context_window_for(cfg, "big") == 131072
+    assert context_window_for(cfg, "other") == 8192
+    assert context_window_for(cfg, "big", RateLimit(tpm=6000)) == 6000
+    assert context_window_for({}, "m", RateLimit(tpm=6000)) == 6000
+    assert context_window_for({}, "m") is None
+    assert fit_history_to_context(_filled(3), None, "x") == 0
+
+
+@pytest.fixture
+def _fresh_limiters():
+    reset_limiters()
+    yield
+    reset_limiters()
+
+
+def test_invoke_trims_history_before_sending(monkeypatch: pytest.MonkeyPatch, _fresh_limiters) -> None:
+    sent: list[int] = []
+
+    def reply(prompt):
+        sent.append(len(prompt.to_messages()))
+        return "ok"
+
+    monkeypatch.setattr("studio.assistants.build_llm", lambda *args, **kwargs: RunnableLambda(reply))
+    history = _filled(20)
+    before = history.token_estimate()
+    invoke_llm_step(
+        assistant_name="Groq",
+        assistant_cfg={"context_windows": {"default": 2000}},
+        model="small",
+        system_prompt="sys",
+        user_message="hi",
+        history=history,
+        temperature=None,
+        stream=False,
+        costs=COSTS,
+    )
+    assert before > 2000
+    # system + 縮約後の履歴 + 入力。縮約後の履歴は 2000 - 予約 500 に収まる
+    assert sent[0] < 2 + 40
+    assert history.token_estimate() <= 1500 + estimate_tokens("hi") + estimate_tokens("ok")
@@ -0,0 +1,37 @@
+"""Startup import cost tests (design.md 8.1)."""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+from util.importtime_report import parse_importtime
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      1500 |       2000 |     langchain_core.messages.base
+import time:       500 |       2500 |   langchain_core.messages
+import time:        30 |         30 | studio
+"""
+
+
+def test_parse_importtime_groups_by_top_level_package() -> None:
+    assert parse_importtime(SAMPLE) == {"_io": 0.12, "langchain_core": 2.0, "studio": 0.03}
+
+
+def test_cli_fast_paths_skip_heavy_dependencies(tmp_path: Path) -> None:
+    for args in (["--version"], ["--user-context-apply", "missing", "--root", str(tmp_path)]):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "MultiRoleStudio.py", *args],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+        )
+        packages = parse_importtime(proc.stderr)
+        assert "studio" in packages
+        assert not {"langchain_core", "jsonschema", "gradio", "matplotlib"} & packages.keys(), args
@@ -0,0 +1,143 @@
+"""Large-attachment map-reduce digest tests (design.md 5.1.3)."""
+
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+import studio.engine as engine_module
+from studio.assistants import MockAssistant
+from studio.async_engine import AsyncSessionEngine
+from studio.engine import SessionEngine, collect_events
+from studio.large_attachments import (
+    LargeAttachmentConfig,
+    LargeAttachmentDigester,
+    extractive_digest,
+    iter_file_chunks,
+)
+from studio.loader import load_session_context, read_attachment_files
+
+
+def _write_log(path: Path, lines: int) -> Path:
+    body = [f"2026-01-01 00:00:{i % 60:02d} INFO request {i} ok" for i in range(lines)]
+    body[lines // 2] = "2026-01-01 00:30:00 ERROR database timeout on shard-7"
+    path.write_text("\n".join(body) + "\n", encoding="utf-8")
+    return path
+
+
+def test_chunks_are_line_aligned_and_cover_the_file(tmp_path: Path) -> None:
+    path = _write_log(tmp_path / "app.log", 500)
+    chunks = list(iter_file_chunks(path, chunk_bytes=1024))
+    assert len(chunks) > 5 and [c.index for c in chunks] == list(range(len(chunks)))
+    assert "".join(c.text for c in chunks) == path.read_text(encoding="utf-8")
+    assert all(c.text.endswith("\n") for c in chunks)
+    assert chunks[0].start_line == 1 and chunks[-1].end_line == 500
+    assert all(b.start_line == a.end_line + 1 for a, b in zip(chunks, chunks[1:]))
+
+    (tmp_path / "empty.log").write_bytes(b"")
+    assert list(iter_file_chunks(tmp_path / "empty.log", 1024)) == []
+
+
+def test_map_reduce_is_bounded_and_cached(tmp_path: Path) -> None:
+    path = _write_log(tmp_path / "app.log", 2000)
+    config = LargeAttachmentConfig(assistant="fast", chunk_bytes=2048, max_workers=3, fan_in=4, max_digest_chars=600)
+    lock = threading.Lock()
+    active = {"now": 0, "peak": 0, "calls": 0}
+
+    def summarise(system_prompt: str, user_message: str) -> str:
+        with lock:
+            active["now"] += 1
+            active["calls"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        try:
+            return "ERROR shard-7" if "ERROR" in user_message else "INFO のみ"
+        finally:
+            with lock:
+                active["now"] -= 1
+
+    progress: list[dict] = []
+    digest = LargeAttachmentDigester(tmp_path, config, summarise, progress.append).digest(path, "app.log")
+    assert digest.chunks > 20 and not digest.cached
+    assert len(digest.text) <= config.max_digest_chars and "ERROR shard-7" in digest.text
+    assert active["peak"] <= config.max_workers
+    stages = [p["stage"] for p in progress]
+    assert stages.count("map") == digest.chunks and "reduce" in stages and stages[-1] == "done"
+
+    calls = active["calls"]
+    again = LargeAttachmentDigester(tmp_path, config, summarise).digest(path, "app.log")
+    assert again.cached and again.text == digest.text and active["calls"] == calls
+    # 要約設定が変わればキャッシュは使わない
+    other = LargeAttachmentConfig(assistant="fast", chunk_bytes=4096, max_workers=3, fan_in=4, max_digest_chars=600)
+    assert not LargeAttachmentDigester(tmp_path, other, summarise).digest(path).cached
+
+
+def test_extractive_fallback_and_binary_files(tmp_path: Path) -> None:
+    assert extractive_digest("# 見出し\nふつうの行\nWARN disk 90%\n", 100) == "# 見出し\nWARN disk 90%"
+
+    def broken(system_prompt: str, user_message: str) -> str:
+        raise RuntimeError("rate limited")
+
+    path = _write_log(tmp_path / "app.log", 300)
+    digest = LargeAttachmentDigester(tmp_path, LargeAttachmentConfig(chunk_bytes=2048), broken).digest(path)
+    assert "database timeout on shard-7" in digest.text
+
+    (tmp_path / "blob.bin").write_bytes(b"\x00\x01" * 1000)
+    digests, errors = LargeAttachmentDigester(tmp_path, LargeAttachmentConfig()).digest_all([tmp_path / "blob.bin"])
+    assert digests == [] and errors[0][1] == "バイナリファイルは要約できません"
+
+
+def test_loader_routes_oversized_files_to_overflow(tmp_path: Path) -> None:
+    small = tmp_path / "small.txt"
+    small.write_text("小さな添付", encoding="utf-8")
+    big = _write_log(tmp_path / "big.log", 3000)
+    limits = {"max_file_size_kb": 8}
+
+    _, report = read_attachment_files([small, big], limits)
+    assert not report.ok and report.errors[0].code == "E402"
+
+    overflow: list[Path] = []
+    context, report = read_attachment_files([small, big], limits, overflow=overflow)
+    assert report.ok and overflow == [big] and "小さな添付" in context and "shard-7" not in context
+
+
+@pytest.mark.parametrize("engine_cls", [SessionEngine, AsyncSessionEngine])
+def test_engine_streams_progress_and_attaches_digest(
+    studio_root: Path, monkeypatch: pytest.MonkeyPatch, engine_cls: type[SessionEngine]
+) -> None:
+    config = {"large_attachments": {"assistant": "Groq", "model": "fast", "chunk_bytes": 2048}}
+    (studio_root / "studio_config.json").write_text(json.dumps(config), encoding="utf-8")
+    big = _write_log(studio_root / "big.log", 1000)
+    calls: list[str] = []
+
+    def fake_invoke(**kwargs):
+        calls.append(kwargs["assistant_name"])
+        text = "ERROR shard-7 のタイムアウト" if "ERROR" in kwargs["user_message"] else "正常"
+        return engine_module.InvokeResultShim(text=text, cost=0.001)
+
+    monkeypatch.setattr(engine_module, "invoke_llm_step", fake_invoke)
+    seen: list[str] = []
+    original = engine_module.with_attachment_block
+
+    def spy(system_prompt, attachment_context):
+        seen.append(attachment_context)
+        return original(system_prompt, attachment_context)
+
+    monkeypatch.setattr(engine_module, "with_attachment_block", spy)
+    MockAssistant.reset()
+    engine = engine_cls(load_session_context("solo", studio_root))
+    events = collect_events(engine, "エラーの原因は？", stream=False, large_files=[big])
+
+    types = [e.type for e in events]
+    progress = [e.payload for e in events if e.type == "attachment_progress"]
+    assert types.index("attachment_progress") < types.index("step_start")
+    assert progress[-1]["stage"] == "done" and calls and set(calls) == {"Groq"}
+    assert seen[0].startswith(f"### {big.as_posix()}") and "ERROR shard-7 のタイムアウト" in seen[0]
+
+    records = [json.loads(line) for line in engine.state.logger.log_path.read_text(encoding="utf-8").splitlines()]
+    (record,) = [r for r in records if r.get("type") == "attachment_digest"]
+    assert record["calls"] == len(calls) and record["cost"] == pytest.approx(0.001 * len(calls))
+    end = next(r for r in records if r.get("type") == "session_end")
+    assert end["total_cost"] == pytest.approx(record["cost"])
@@ -0,0 +1,113 @@
+"""Background session log writer tests (design.md 7.1)."""
+
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from studio.assistants import MockAssistant
+from studio.engine import SessionEngine, collect_events
+from studio.loader import load_session_context
+from studio.log_writer import LogWriterConfig, SessionLogWriter, encode_record
+from studio.logging import SessionLogger, StepMetrics, steps_from_jsonl
+from studio.schema_validate import validate_schema_document
+from studio.session_resume import load_effective_records
+from studio.validation import ValidationReport
+
+
+def _lines(path: Path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_config_from_studio_config() -> None:
+    assert LogWriterConfig.from_config({}) == LogWriterConfig()
+    cfg = LogWriterConfig.from_config({"session_log": {"flush": "turn", "fsync": True, "queue_size": 4, "json": "json"}})
+    assert (cfg.flush, cfg.fsync, cfg.queue_size, cfg.encoder) == ("turn", True, 4, "json")
+    assert LogWriterConfig.from_config({"session_log": {"flush": "bogus"}}).flush == "step"
+
+    report = ValidationReport()
+    validate_schema_document({"session_log": {"flush": "record", "fsync": False}}, "studio_config", "t", report)
+    assert report.ok
+    report = ValidationReport()
+    validate_schema_document({"session_log": {"flush": "never"}}, "studio_config", "t", report)
+    assert not report.ok
+
+
+def test_encode_record_matches_stdlib_when_forced() -> None:
+    record = {"type": "step", "text": "こんにちは"}
+    assert encode_record(record, "json") == json.dumps(record, ensure_ascii=False)
+    assert json.loads(encode_record(record)) == record
+
+
+@pytest.mark.parametrize("policy", ["record", "step", "turn"])
+def test_concurrent_writers_keep_whole_lines(tmp_path: Path, policy: str) -> None:
+    writer = SessionLogWriter(tmp_path / "sessions" / "x.jsonl", LogWriterConfig(flush=policy, queue_size=8))
+
+    def produce(worker: int) -> None:
+        for i in range(200):
+            writer.write({"type": "step", "worker": worker, "i": i, "text": "あ" * 50})
+
+    threads = [threading.Thread(target=produce, args=(w,)) for w in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    records = _lines(tmp_path / "sessions" / "x.jsonl")
+    assert len(records) == 800
+    for worker in range(4):
+        assert [r["i"] for r in records if r["worker"] == worker] == list(range(200))
+
+    # close 後の書き込みはスレッドを立て直して追記する
+    writer.write({"type": "session_end"})
+    writer.flush()
+    assert _lines(tmp_path / "sessions" / "x.jsonl")[-1] == {"type": "session_end"}
+    writer.close()
+
+
+def test_snapshot_and_finish_make_log_readable(tmp_path: Path) -> None:
+    logger = SessionLogger.create(tmp_path, "org", None, {}, {}, {}, LogWriterConfig(flush="turn"))
+    logger.start()
+    logger.log_user_input("やあ")
+    logger.log_step(StepMetrics("a", "mock", None, "act", "text", False, 0.1, 1, 1, "estimate", 0.0))
+    logger.log_state_snapshot({"step_number": 1})
+    records = load_effective_records(tmp_path, logger.session_id)
+    assert [r["type"] for r in records] == ["session_meta", "user_input", "step", "state_snapshot"]
+
+    end = logger.finish()
+    assert _lines(Path(end["log_path"]))[-1]["type"] == "session_end"
+
+
+def test_readers_skip_truncated_last_line(tmp_path: Path) -> None:
+    path = tmp_path / "sessions" / "s.jsonl"
+    path.parent.mkdir()
+    step = {"type": "step", "talent_id": "a", "text": "ok"}
+    path.write_text(
+        json.dumps({"type": "session_meta"}) + "\n" + json.dumps(step) + "\n" + '{"type": "step", "tal',
+        encoding="utf-8",
+    )
+    assert [r["type"] for r in load_effective_records(tmp_path, "s")] == ["session_meta", "step"]
+    assert [s.text for s in steps_from_jsonl(path)] == ["ok"]
+
+    # 改行まで書かれた壊れ行は従来どおりエラー
+    path.write_text('{"type": "step", "tal\n', encoding="utf-8")
+    with pytest.raises(json.JSONDecodeError):
+        load_effective_records(tmp_path, "s")
+
+
+def test_engine_session_log_is_complete(studio_root: Path) -> None:
+    (studio_root / "studio_config.json").write_text(
+        json.dumps({"session_log": {"flush": "turn"}}),
+        encoding="utf-8",
+    )
+    MockAssistant.reset()
+    ctx = load_session_context("solo", studio_root)
+    events = collect_events(SessionEngine(ctx), "こんにちは", stream=False)
+    types = [r["type"] for r in _lines(Path(events[-1].payload["log_path"]))]
+    assert types[0] == "session_meta"
+    assert types[-2:] == ["state_snapshot", "session_end"]
+    assert "step" in types
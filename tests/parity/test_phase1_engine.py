@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import json
 import os
+import time
 from pathlib import Path
 
 import pytest
@@ -87,3 +88,82 @@ def test_mock_temperature_fallback(studio_root: Path, monkeypatch: pytest.Monkey
     step_done = next(e for e in events if e.type == "step_done")
     assert step_done.payload["text"] == "MOCK:solo_bot:step1"
     assert not any(e.type == "step_error" for e in events)
+
+
+def test_streaming_chunks_arrive_before_step_returns(
+    studio_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    import threading
+
+    from studio.assistants import invoke_mock_step as orig_mock
+
+    first_chunk_seen = threading.Event()
+    observed: list[bool] = []
+
+    def slow_mock(*args, **kwargs):
+        on_chunk = kwargs.get("on_chunk")
+        if on_chunk:
+            on_chunk("先頭")
+            observed.append(first_chunk_seen.wait(timeout=5))
+        return orig_mock(*args, **kwargs)
+
+    monkeypatch.setattr("studio.engine.invoke_mock_step", slow_mock)
+    MockAssistant.reset()
+    ctx = load_session_context("solo", studio_root)
+    engine = SessionEngine(ctx)
+    gen = engine.run_turn("stream", stream=True)
+    events = []
+    for event in gen:
+        events.append(event)
+        if event.type == "chunk" and event.payload["text"] == "先頭":
+            first_chunk_seen.set()
+    engine.finish()
+
+    assert observed == [True]
+    chunks = [e.payload["text"] for e in events if e.type == "chunk"]
+    assert chunks[0] == "先頭"
+    assert any(e.type == "step_done" for e in events)
+
+
+def test_collect_events_on_event_sees_every_event(studio_root: Path) -> None:
+    MockAssistant.reset()
+    seen: list[str] = []
+    ctx = load_session_context("solo", studio_root)
+    events = collect_events(
+        SessionEngine(ctx), "こんにちは", stream=True, on_event=lambda e: seen.append(e.type)
+    )
+    assert seen == _event_types(events)
+
+
+def test_closing_the_stream_stops_the_worker(studio_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    import threading
+
+    from studio.assistants import StreamCancelled
+
+    finished = threading.Event()
+    sent: list[int] = []
+    stopped: list[BaseException] = []
+
+    def endless_mock(*args, **kwargs):
+        on_chunk = kwargs["on_chunk"]
+        try:
+            for i in range(500):
+                on_chunk(f"{i} ")
+                sent.append(i)
+                time.sleep(0.01)
+        except StreamCancelled as exc:
+            stopped.append(exc)
+            raise
+        finally:
+            finished.set()
+
+    monkeypatch.setattr("studio.engine.invoke_mock_step", endless_mock)
+    MockAssistant.reset()
+    gen = SessionEngine(load_session_context("solo", studio_root)).run_turn("stream", stream=True)
+    for event in gen:
+        if event.type == "chunk":
+            gen.close()
+            break
+
+    assert finished.wait(timeout=5)
+    assert stopped and len(sent) < 500
@@ -8,7 +8,7 @@ from pathlib import Path
 import pytest
 
 from studio.assistants import MockAssistant, invoke_mock_step
-from studio.engine import SessionEngine, collect_events
+from studio.engine import EngineEvent, SessionEngine, collect_events
 from studio.loader import load_session_context
 from studio.prompts import format_prior_responses
 from studio.validation import StudioValidationError
@@ -165,3 +165,71 @@ def test_org_mission_in_prompt(trio_root: Path) -> None:
     prompt = build_system_prompt(ctx.talents["alpha"], ctx.org, ctx.org_id, "alpha")
     assert "【ミッション】" in prompt
     assert "多様な視点" in prompt
+
+
+def test_quiz_parallel_as_completed_emits_in_finish_order(
+    trio_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    import time
+
+    captured: list[tuple[str, str]] = []
+
+    def staggered_invoke(talent_id: str, step_number: int, **kwargs: object) -> object:
+        if talent_id == "beta":
+            time.sleep(0.2)
+        captured.append((talent_id, str(kwargs.get("user_message", ""))))
+        return invoke_mock_step(talent_id, step_number, **kwargs)
+
+    monkeypatch.setattr("studio.engine.invoke_mock_step", staggered_invoke)
+    (trio_root / "studio_config.json").write_text(
+        json.dumps({"stream": True, "parallel_events": "as_completed"}),
+        encoding="utf-8",
+    )
+
+    MockAssistant.reset()
+    ctx = load_session_context("trio", trio_root, workflow_id="quiz")
+    events = collect_events(SessionEngine(ctx), "クイズ", stream=True)
+
+    done_ids = [e.payload["talent_id"] for e in events if e.type == "step_done"]
+    assert done_ids == ["alpha", "gamma", "beta", "alpha"]
+
+    parallel_chunks = [e for e in events if e.type == "chunk" and e.payload.get("phase_type") == "parallel"]
+    assert {e.payload["talent_id"] for e in parallel_chunks} == {"beta", "gamma"}
+    gamma_text = "".join(e.payload["text"] for e in parallel_chunks if e.payload["talent_id"] == "gamma")
+    assert gamma_text == "MOCK:gamma:step3"
+
+    grader_msg = captured[-1][1]
+    assert grader_msg.index("Beta:") < grader_msg.index("Gamma:")
+
+
+@pytest.mark.parametrize("engine_name", ["thread", "asyncio"])
+@pytest.mark.parametrize("parallel_events", ["ordered", "as_completed"])
+def test_parallel_step_failure_propagates_in_every_mode(
+    trio_root: Path, monkeypatch: pytest.MonkeyPatch, engine_name: str, parallel_events: str
+) -> None:
+    from studio.assistants import ainvoke_mock_step
+    from studio.engine import create_engine
+
+    def failing(talent_id: str, step_number: int, **kwargs: object) -> object:
+        if talent_id == "beta":
+            raise RuntimeError("provider down")
+        return invoke_mock_step(talent_id, step_number, **kwargs)
+
+    async def afailing(talent_id: str, step_number: int, **kwargs: object) -> object:
+        if talent_id == "beta":
+            raise RuntimeError("provider down")
+        return await ainvoke_mock_step(talent_id, step_number, **kwargs)
+
+    monkeypatch.setattr("studio.engine.invoke_mock_step", failing)
+    monkeypatch.setattr("studio.async_engine.ainvoke_mock_step", afailing)
+    (trio_root / "studio_config.json").write_text(
+        json.dumps({"engine": engine_name, "parallel_events": parallel_events}), encoding="utf-8"
+    )
+    MockAssistant.reset()
+    ctx = load_session_context("trio", trio_root, workflow_id="quiz")
+    seen: list[EngineEvent] = []
+    # 既定の ordered と同じく、as_completed でも parallel step の失敗はターンを止める
+    with pytest.raises(RuntimeError, match="provider down"):
+        collect_events(create_engine(ctx), "クイズ", stream=False, on_event=seen.append)
+    assert not any(e.type == "step_error" for e in seen)
+    assert "step_done" not in [e.type for e in seen if e.payload.get("talent_id") == "beta"]
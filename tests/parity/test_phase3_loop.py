@@ -9,6 +9,7 @@ from pathlib import Path
 import pytest
 
 from studio.assistants import MockAssistant
+from studio.async_engine import AsyncSessionEngine
 from studio.artifacts import (
     extract_artifacts_from_log,
     extract_code_artifacts,
@@ -131,6 +132,38 @@ def test_dev_judge_loop_and_artifacts(nokuru_root: Path, monkeypatch: pytest.Mon
     assert "print('hello')" in (artifact_dir / "hello.py").read_text(encoding="utf-8")
 
 
+@pytest.mark.parametrize(
+    ("workflow_id", "env"),
+    [
+        ("meeting", {}),
+        ("dev", {"STUDIO_MOCK_JUDGE_EXIT": "1"}),
+        ("discussion_sourced", {"STUDIO_MOCK_MARKER": "【確認完了】"}),
+    ],
+)
+def test_loop_phases_match_across_engines(
+    nokuru_root: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    workflow_id: str,
+    env: dict[str, str],
+) -> None:
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+
+    def trace(engine_cls: type[SessionEngine]) -> list[tuple]:
+        MockAssistant.reset()
+        ctx = load_session_context("nokuru", nokuru_root, workflow_id=workflow_id)
+        events = collect_events(engine_cls(ctx), "キャンプ議題", stream=False)
+        return [
+            (e.type, e.payload.get("talent_id"), e.payload.get("text"), e.payload.get("result"))
+            for e in events
+            if e.type not in ("session_start", "session_done")
+        ]
+
+    expected = trace(SessionEngine)
+    assert any(kind == "loop_check" for kind, *_ in expected)
+    assert trace(AsyncSessionEngine) == expected
+
+
 def test_extract_code_artifacts_from_steps() -> None:
     steps = [
         StepMetrics(
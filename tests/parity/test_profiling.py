@@ -0,0 +1,131 @@
+"""Per-turn profiling tests (design.md 7.1.3)."""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from studio.assistants import MockAssistant
+from studio.logging import percentile
+from studio.profiling import PROFILE_ENV, Profiler, carry, category_of, resolve_profile_mode
+from studio.web_ui import WebSession, handle_chat_submit
+
+
+def _summary(root: Path, label: str) -> dict:
+    (profile_dir,) = (root / "sessions").glob("*.profile")
+    return json.loads((profile_dir / f"{label}.summary.json").read_text(encoding="utf-8"))
+
+
+def test_cli_batch_writes_turn_profile(studio_root: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    from MultiRoleStudio import main
+
+    assert main(["--root", str(studio_root), "--topic", "議題", "--stream", "off", "--profile"]) == 0
+    out = capsys.readouterr().out
+    assert "[profile cprofile] turn_001" in out and "エンジン" in out
+
+    summary = _summary(studio_root, "turn_001")
+    assert list((studio_root / "sessions").glob("*.profile/turn_001.prof"))
+    categories = summary["categories"]
+    assert categories["logging"] > 0 and categories["render"] > 0 and categories["artifacts"] > 0
+    assert summary["engine"] <= summary["wall"] + 1e-3
+    assert sum(categories.values()) == pytest.approx(summary["wall"], abs=2e-3)
+
+
+def test_sampling_mode_writes_folded_stacks(tmp_path: Path) -> None:
+    values = [float((i * 7919) % 5000) for i in range(5000)]
+    profiler = Profiler("sample", interval=0.001)
+    profiler.begin()
+    with profiler.section():
+        deadline = time.perf_counter() + 0.2
+        while time.perf_counter() < deadline:
+            percentile(values, 95)
+    summary = profiler.end(tmp_path, "s1", "turn_001")
+    assert summary is not None and summary.path.suffix == ".folded"
+    assert summary.categories.get("logging", 0) > 0
+    assert "percentile (logging.py:" in summary.path.read_text(encoding="utf-8")
+
+
+def test_sampling_covers_only_the_units_threads(tmp_path: Path) -> None:
+    values = [float((i * 7919) % 5000) for i in range(5000)]
+    stop = threading.Event()
+
+    def busy() -> None:
+        while not stop.is_set():
+            percentile(values, 95)
+
+    # 同じプロセスで別のセッションが動いている
+    other = threading.Thread(target=busy, name="other-session", daemon=True)
+    other.start()
+    profiler = Profiler("sample", interval=0.001)
+    try:
+        profiler.begin()
+        with profiler.section():
+            deadline = time.perf_counter() + 0.2
+
+            def spin() -> None:
+                while time.perf_counter() < deadline:
+                    percentile(values, 95)
+
+            worker = threading.Thread(target=carry(spin), name="studio-worker")
+            worker.start()
+            worker.join()
+        summary = profiler.end(tmp_path, "s1", "turn_001")
+    finally:
+        stop.set()
+        other.join()
+
+    assert summary is not None
+    folded = summary.path.read_text(encoding="utf-8")
+    assert "studio-worker;" in folded
+    assert "other-session" not in folded
+
+
+def test_profile_mode_resolution(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv(PROFILE_ENV, raising=False)
+    assert resolve_profile_mode(None, {}) is None
+    assert resolve_profile_mode(None, {"profile": "off"}) is None
+    assert resolve_profile_mode(None, {"profile": "sample"}) == "sample"
+    monkeypatch.setenv(PROFILE_ENV, "cprofile")
+    assert resolve_profile_mode(None, {"profile": "sample"}) == "cprofile"
+    assert resolve_profile_mode("sample", {}) == "sample"
+    assert category_of("C:\\repo\\studio\\prompts.py", "build_user_message") == "prompt"
+    assert category_of("/repo/studio/engine.py", "_run_phases") is None
+
+
+def test_web_session_profiles_each_turn(studio_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(PROFILE_ENV, "cprofile")
+    MockAssistant.reset()
+    session = WebSession(root=studio_root)
+    for text in ("こんにちは", "続き"):
+        list(
+            handle_chat_submit(
+                session, text, org_id="solo", workflow_value="", stream=False, temperature=0.7
+            )
+        )
+    session.close_engine()
+    (profile_dir,) = (studio_root / "sessions").glob("*.profile")
+    assert sorted(p.name for p in profile_dir.glob("*.prof")) == ["finish.prof", "turn_001.prof", "turn_002.prof"]
+    assert _summary(studio_root, "turn_002")["categories"]["render"] > 0
+    (log,) = (studio_root / "sessions").glob("*.jsonl")
+    records = [json.loads(line) for line in log.read_text(encoding="utf-8").splitlines()]
+    assert [r["label"] for r in records if r["type"] == "profile"] == ["turn_001", "turn_002"]
+
+
+def test_second_cprofile_falls_back_to_sampling(tmp_path: Path) -> None:
+    first, second = Profiler("cprofile"), Profiler("cprofile")
+    first.begin()
+    second.begin()
+    with first.section(), second.section():
+        percentile([1.0, 2.0, 3.0], 50)
+    assert second.end(tmp_path, "s2", "turn_001").mode == "sample"
+    assert first.end(tmp_path, "s1", "turn_001").mode == "cprofile"
+
+    # 返した枠は次のターンで使える
+    second.begin()
+    with second.section():
+        percentile([1.0, 2.0, 3.0], 50)
+    assert second.end(tmp_path, "s2", "turn_002").mode == "cprofile"
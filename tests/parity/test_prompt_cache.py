@@ -0,0 +1,145 @@
+"""Prompt-cache friendly prompts and cached-token accounting (design.md 5.1.2)."""
+
+from __future__ import annotations
+
+import pickle
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from studio.assistants import build_prompt_messages, extract_usage, invoke_llm_step
+from studio.history import ConversationHistory
+from studio.logging import StepMetrics, compute_cost
+from studio.prompts import SystemPrompt, build_system_prompt, build_user_message, with_attachment_block
+from studio.ratelimit import reset_limiters
+
+COSTS = {"default": {"input": 0.001, "output": 0.002}, "gpt-4o": {"input": 0.01, "output": 0.02, "cached_input": 0.005}}
+
+
+def test_system_prompt_orders_stable_blocks_first() -> None:
+    talent = {"personality": "P", "system_prompt": "SP"}
+    org = {"mission": "M", "common_directives": ["共通"], "role_directives": {"bot": ["個別"]}}
+    prompt = build_system_prompt(talent, org, "solo", "bot", user_context_text="UC", user_context_rag_text="RAG")
+    assert prompt.index("【個別指示】") < prompt.index("【ユーザーコンテキスト】") < prompt.index("RAG")
+    assert len(prompt.blocks) == 2 and prompt.blocks[1].startswith("【ユーザーコンテキスト】")
+
+    full = with_attachment_block(prompt, "### a.py\nprint(1)")
+    assert full.blocks[:2] == prompt.blocks and full.endswith("### a.py\nprint(1)")
+    assert pickle.loads(pickle.dumps(full)).blocks == full.blocks
+    assert "添付" not in build_user_message("質問", action="答えて", prior_responses=[("A", "前")])
+
+
+def test_breakpoints_mark_system_blocks_and_last_history_message() -> None:
+    history = [HumanMessage(content="q1"), AIMessage(content="a1")]
+    system, messages = build_prompt_messages(SystemPrompt(["core", "context", "files"]), history, breakpoints=True)
+    assert [part["text"] for part in system[0].content] == ["core", "context", "files"]
+    assert all(part["cache_control"] == {"type": "ephemeral"} for part in system[0].content)
+    assert messages[0] is history[0] and messages[1].content[-1]["cache_control"] == {"type": "ephemeral"}
+
+    plain, same = build_prompt_messages(SystemPrompt(["core", "context"]), history, breakpoints=False)
+    assert plain[0].content == "core\n\ncontext" and same is history
+
+
+@pytest.mark.parametrize(
+    ("response", "expected"),
+    [
+        # LangChain usage_metadata（input_tokens はキャッシュ分込み）
+        (
+            AIMessage(
+                content="x",
+                usage_metadata={
+                    "input_tokens": 1000,
+                    "output_tokens": 10,
+                    "total_tokens": 1010,
+                    "input_token_details": {"cache_read": 800, "cache_creation": 100},
+                },
+            ),
+            (1000, 800, 100),
+        ),
+        # Anthropic の生 usage（input_tokens はキャッシュ分を含まない）
+        (
+            AIMessage(
+                content="x",
+                response_metadata={
+                    "usage": {
+                        "input_tokens": 100,
+                        "output_tokens": 10,
+                        "cache_read_input_tokens": 800,
+                        "cache_creation_input_tokens": 100,
+                    }
+                },
+            ),
+            (1000, 800, 100),
+        ),
+        # OpenAI の token_usage（prompt_tokens は cached_tokens 込み）
+        (
+            AIMessage(
+                content="x",
+                response_metadata={
+                    "token_usage": {
+                        "prompt_tokens": 1000,
+                        "completion_tokens": 10,
+                        "prompt_tokens_details": {"cached_tokens": 768},
+                    }
+                },
+            ),
+            (1000, 768, 0),
+        ),
+    ],
+)
+def test_extract_usage_reads_cached_tokens(response: AIMessage, expected: tuple[int, int, int]) -> None:
+    usage = extract_usage(response, "in", "out")
+    assert (usage.tokens_in, usage.cached, usage.cache_write) == expected and usage.source == "api"
+
+
+def test_compute_cost_prices_cached_input() -> None:
+    assert compute_cost("gpt-4o", 1000, 0, COSTS) == pytest.approx(10.0)
+    assert compute_cost("gpt-4o", 1000, 0, COSTS, tokens_cached=800) == pytest.approx(200 * 0.01 + 800 * 0.005)
+    # 単価表に読み出し単価がなければ入力の 1/10。書き込みは 1.25 倍
+    assert compute_cost("other", 1000, 0, COSTS, tokens_cached=800, tokens_cache_write=100) == pytest.approx(
+        100 * 0.001 + 800 * 0.0001 + 100 * 0.00125
+    )
+    record = StepMetrics("bot", "Anthropic", "m", "", "", False, 1.0, 1000, 5, "api", 0.0, tokens_cached=800)
+    assert record.to_log_record()["tokens"]["cached"] == 800
+
+
+def test_invoke_sends_cache_marks_and_records_cached_tokens(monkeypatch: pytest.MonkeyPatch) -> None:
+    reset_limiters()
+    sent = []
+
+    def reply(prompt):
+        sent.append(prompt.to_messages())
+        return AIMessage(
+            content="ok",
+            usage_metadata={
+                "input_tokens": 2000,
+                "output_tokens": 5,
+                "total_tokens": 2005,
+                "input_token_details": {"cache_read": 1500},
+            },
+        )
+
+    monkeypatch.setattr("studio.assistants.build_llm", lambda *args, **kwargs: RunnableLambda(reply))
+    history = ConversationHistory()
+    history.add_message(HumanMessage(content="前の質問"))
+    history.add_message(AIMessage(content="前の回答"))
+    result = invoke_llm_step(
+        assistant_name="Anthropic",
+        assistant_cfg={"module": "langchain_anthropic"},
+        model="gpt-4o",
+        system_prompt=SystemPrompt(["core", "context"]),
+        user_message="今の質問",
+        history=history,
+        temperature=None,
+        stream=False,
+        costs=COSTS,
+    )
+    system, *rest = sent[0]
+    assert [part["text"] for part in system.content] == ["core", "context"]
+    assert rest[-2].content[-1]["cache_control"] == {"type": "ephemeral"} and rest[-1].content == "今の質問"
+    assert (result.tokens_in, result.tokens_cached) == (2000, 1500)
+    assert result.cost == pytest.approx(500 * 0.01 + 1500 * 0.005 + 5 * 0.02)
+    # 履歴に残すのは印なしの元メッセージ
+    assert history.get_messages()[1].content == "前の回答"
+    reset_limiters()
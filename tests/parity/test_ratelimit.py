@@ -0,0 +1,140 @@
+"""Provider rate limiter tests (design.md §6.4)."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from studio.assistants import invoke_llm_step
+from studio.display import format_step_metrics_line
+from studio.errors import retry_after_seconds
+from studio.history import ConversationHistory
+from studio.logging import StepMetrics
+from studio.ratelimit import ProviderLimiter, RateLimit, limiter_for, reset_limiters, resolve_rate_limit
+
+COSTS = {"default": {"input": 0.0, "output": 0.0}}
+
+
+@pytest.fixture(autouse=True)
+def _fresh_limiters():
+    reset_limiters()
+    yield
+    reset_limiters()
+
+
+def test_resolve_rate_limit_merges_assistant_config_and_studio_config() -> None:
+    assistant_cfg = {"rate_limits": {"rpm": 30, "max_in_flight": 2}}
+    studio_limits = {"Groq": {"tpm": 6000, "models": {"llama-3.1-8b-instant": {"rpm": 10}}}}
+
+    limit = resolve_rate_limit("Groq", "llama-3.1-8b-instant", assistant_cfg, studio_limits)
+    assert limit == RateLimit(rpm=10, tpm=6000, max_in_flight=2)
+    assert resolve_rate_limit("Groq", "other", assistant_cfg, studio_limits).rpm == 30
+    assert resolve_rate_limit("Gemini", "x") == RateLimit()
+
+
+def test_limiter_enforces_rpm_tpm_and_in_flight() -> None:
+    limiter = ProviderLimiter(RateLimit(rpm=2, tpm=100, max_in_flight=2))
+    assert limiter._try_acquire(10) == 0
+    assert limiter._try_acquire(10) == 0
+    assert limiter._try_acquire(10) > 0  # in-flight cap
+
+    limiter.release(reserved_tokens=10, used_tokens=10)
+    assert limiter._try_acquire(10) > 20  # rpm bucket empty: ~30s until one request refills
+
+    tpm = ProviderLimiter(RateLimit(tpm=100))
+    assert tpm._try_acquire(80) == 0
+    tpm.release(reserved_tokens=80, used_tokens=80)
+    assert tpm._try_acquire(80) > 0
+
+
+def test_retry_after_sets_cooldown() -> None:
+    limiter = ProviderLimiter(RateLimit())
+    limiter.record_rate_limited(5.0)
+    assert 4.0 < limiter._try_acquire(0) <= 5.0
+
+
+def test_429_without_retry_after_learns_rate_from_recent_requests() -> None:
+    limiter = ProviderLimiter(RateLimit())
+    for _ in range(4):
+        assert limiter._try_acquire(0) == 0
+        limiter.release()
+    limiter.record_rate_limited(None)
+    assert limiter._try_acquire(0) > 0  # ceiling: half the observed per-minute rate
+
+
+def test_learned_rate_recovers_after_quiet_period(monkeypatch: pytest.MonkeyPatch) -> None:
+    clock = {"now": 1000.0}
+    monkeypatch.setattr("studio.ratelimit.time.monotonic", lambda: clock["now"])
+    limiter = ProviderLimiter(RateLimit())
+    for _ in range(8):
+        assert limiter._try_acquire(0) == 0
+        limiter.release()
+    limiter.record_rate_limited(None)
+    assert limiter._learned_rpm == 4 and limiter._scale == 0.5
+
+    clock["now"] += 30  # 静かな期間がまだ短い
+    assert limiter._try_acquire(0) > 0 and limiter._learned_rpm == 4
+
+    # 1分経てば古い実績は窓から外れ、推定上限は 429 直前の実績（8）まで戻って解除される
+    clock["now"] += 31
+    assert limiter._try_acquire(0) == 0
+    assert limiter._learned_rpm is None and limiter._scale == 1.0
+
+
+def test_retry_after_seconds_from_headers_and_message() -> None:
+    exc = RuntimeError("429")
+    exc.response = SimpleNamespace(headers={"retry-after": "3"})
+    assert retry_after_seconds(exc) == 3.0
+    assert retry_after_seconds(RuntimeError("Please try again in 1m2.5s.")) == 62.5
+    assert retry_after_seconds(RuntimeError("boom")) is None
+
+
+def test_invoke_llm_step_records_rate_limit_wait(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = {"n": 0}
+
+    def flaky(_prompt):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise RuntimeError("429 Rate limit reached. Please try again in 50ms.")
+        return "ok"
+
+    monkeypatch.setattr("studio.assistants.build_llm", lambda *args, **kwargs: RunnableLambda(flaky))
+    result = invoke_llm_step(
+        assistant_name="Groq",
+        assistant_cfg={},
+        model="m",
+        system_prompt="sys",
+        user_message="hi",
+        history=ConversationHistory(),
+        temperature=None,
+        stream=False,
+        costs=COSTS,
+        retry_delay=0.0,
+        rate_limits={"Groq": {"max_in_flight": 1}},
+    )
+    assert result.text == "ok"
+    assert calls["n"] == 2
+    assert result.rate_limit_wait > 0
+    assert limiter_for("Groq", "m", RateLimit(max_in_flight=1))._in_flight == 0
+
+
+def test_step_metrics_log_and_display_rate_limit_wait() -> None:
+    metrics = StepMetrics(
+        talent_id="a",
+        assistant="Groq",
+        model="m",
+        action="",
+        text="t",
+        stream=False,
+        elapsed=1.0,
+        tokens_in=1,
+        tokens_out=1,
+        tokens_source="api",
+        cost=0.0,
+        rate_limit_wait=1.25,
+    )
+    assert metrics.to_log_record()["rate_limit_wait"] == 1.25
+    line = format_step_metrics_line({"assistant": "Groq", "model": "m", "rate_limit_wait": 1.25})
+    assert "待機 1.2s" in line
@@ -0,0 +1,151 @@
+"""LLM response cache tests (design.md §6.4)."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from studio.assistants import invoke_llm_step
+from studio.history import ConversationHistory
+from studio.logging import SessionLogger, StepMetrics
+from studio.response_cache import ResponseCache, cache_key, resolve_cache_mode
+from studio.schema_validate import validate_schema_document
+
+COSTS = {"default": {"input": 0.0, "output": 0.0}}
+
+
+def _invoke(cache: ResponseCache | None, history: ConversationHistory, *, stream: bool = False, on_chunk=None):
+    return invoke_llm_step(
+        assistant_name="Groq",
+        assistant_cfg={},
+        model="m",
+        system_prompt="sys",
+        user_message="hi",
+        history=history,
+        temperature=0.0,
+        stream=stream,
+        costs=COSTS,
+        on_chunk=on_chunk,
+        response_cache=cache,
+    )
+
+
+@pytest.fixture
+def counting_llm(monkeypatch: pytest.MonkeyPatch) -> dict[str, int]:
+    calls = {"n": 0}
+
+    def reply(_prompt):
+        calls["n"] += 1
+        return f"応答{calls['n']}"
+
+    monkeypatch.setattr("studio.assistants.build_llm", lambda *args, **kwargs: RunnableLambda(reply))
+    return calls
+
+
+def test_read_mode_reuses_identical_request(tmp_path: Path, counting_llm: dict[str, int]) -> None:
+    cache = ResponseCache(tmp_path / "r.sqlite3", mode="read")
+
+    first = _invoke(cache, ConversationHistory())
+    assert first.cache == "miss"
+
+    chunks: list[str] = []
+    history = ConversationHistory()
+    second = _invoke(cache, history, stream=True, on_chunk=chunks.append)
+    assert counting_llm["n"] == 1
+    assert second.cache == "hit"
+    assert second.text == first.text == "応答1"
+    assert chunks == ["応答1"]
+    assert (second.cost, second.tokens_source) == (0.0, "cache")
+    assert len(history.get_messages()) == 2
+
+    # 履歴が変われば別キー
+    third = _invoke(cache, history)
+    assert third.cache == "miss"
+    assert counting_llm["n"] == 2
+
+
+def test_write_mode_refreshes_and_off_bypasses(tmp_path: Path, counting_llm: dict[str, int]) -> None:
+    path = tmp_path / "r.sqlite3"
+    _invoke(ResponseCache(path, mode="write"), ConversationHistory())
+    _invoke(ResponseCache(path, mode="write"), ConversationHistory())
+    assert counting_llm["n"] == 2
+
+    hit = _invoke(ResponseCache(path, mode="read"), ConversationHistory())
+    assert hit.text == "応答2"
+
+    assert _invoke(None, ConversationHistory()).cache is None
+    assert counting_llm["n"] == 3
+
+
+def test_eviction_by_count_and_age(tmp_path: Path) -> None:
+    cache = ResponseCache(tmp_path / "r.sqlite3", mode="read", max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, assistant_name="x", model="m", text=key, tokens_in=1, tokens_out=1)
+    assert cache.get("a") is None
+    assert cache.get("c").text == "c"
+
+    stale = ResponseCache(tmp_path / "r.sqlite3", mode="read", max_age_days=1e-9)
+    assert stale.get("c") is None
+
+
+def test_eviction_by_bytes(tmp_path: Path) -> None:
+    cache = ResponseCache(tmp_path / "r.sqlite3", mode="read", max_bytes=2500)
+    for key in ("a", "b", "c"):
+        cache.put(key, assistant_name="x", model="m", text=key * 1000, tokens_in=1, tokens_out=1)
+    assert cache.get("a") is None
+    assert cache.get("c").text == "c" * 1000
+    assert cache.total_bytes() <= 2500
+
+
+def test_from_config_creates_cache_dir(tmp_path: Path) -> None:
+    cache = ResponseCache.from_config(tmp_path, {"response_cache": {"mode": "read", "max_mb": 1}})
+    assert cache is not None and not (tmp_path / "cache").exists()
+    assert cache.get("k") is None
+    cache.put("k", assistant_name="x", model="m", text="応答", tokens_in=1, tokens_out=1)
+    assert cache.get("k").text == "応答"
+    assert (tmp_path / "cache" / "responses.sqlite3").is_file()
+
+
+def test_cache_key_and_mode_resolution() -> None:
+    base = cache_key("Groq", "m", 0.0, "sys", [], "hi")
+    assert base == cache_key("Groq", "m", 0.0, "sys", [], "hi")
+    assert base != cache_key("Groq", "m", 0.7, "sys", [], "hi")
+
+    cfg = {"response_cache": {"mode": "read"}}
+    assert resolve_cache_mode(cfg) == "read"
+    assert resolve_cache_mode(cfg, "off") == "off"
+    assert resolve_cache_mode({}) == "off"
+    assert ResponseCache.from_config(Path("."), {}) is None
+
+
+def test_studio_config_schema_accepts_response_cache() -> None:
+    ok = validate_schema_document({"response_cache": {"mode": "read", "max_entries": 10}}, "studio_config", "t")
+    assert ok.ok
+    bad = validate_schema_document({"response_cache": {"mode": "always"}}, "studio_config", "t")
+    assert not bad.ok
+
+
+def test_by_model_counts_cache_hits(tmp_path: Path) -> None:
+    def step(cache: str) -> StepMetrics:
+        return StepMetrics(
+            talent_id="a",
+            assistant="Groq",
+            model="m",
+            action="",
+            text="t",
+            stream=False,
+            elapsed=0.0,
+            tokens_in=1,
+            tokens_out=1,
+            tokens_source="cache" if cache == "hit" else "api",
+            cost=0.0,
+            cache=cache,
+        )
+
+    assert step("hit").to_log_record()["cache"] == "hit"
+    logger = SessionLogger.create(tmp_path, "org", None, {}, {}, {})
+    logger.steps = [step("hit"), step("hit"), step("miss")]
+    bucket = logger.build_by_model()["Groq/m"]
+    assert (bucket["cache_hits"], bucket["cache_misses"]) == (2, 1)
@@ -0,0 +1,121 @@
+"""Attachment retrieval tests (design.md 5.1.1)."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+import studio.engine as engine_module
+from studio.assistants import MockAssistant
+from studio.attachments import AttachmentIndex, AttachmentRetrievalConfig, split_attachment_chunks
+from studio.engine import collect_events, create_engine
+from studio.loader import load_session_context
+from studio.retrieval import BM25Index, tokenize
+
+FILLER = "\n".join(f"def helper_{i}(value):\n    return value + {i}\n" for i in range(80))
+ATTACHMENTS = (
+    f"### src/billing.py\n{FILLER}\ndef compute_invoice_total(lines):\n    return sum(lines)\n\n"
+    f"### docs/天気.md\n# 天気予報\n\n明日の天気は晴れです。\n\n"
+    f"### src/misc.py\n{FILLER}"
+)
+
+
+def test_tokenize_and_bm25_ranking() -> None:
+    assert tokenize("請求書の compute_Total") == ["請求", "求書", "書の", "compute_total"]
+    index = BM25Index.build(["請求書を計算する compute_total", "天気は晴れ", "ログを書き出す"])
+    assert [i for i, _ in index.top("請求書の合計 compute_total", 3)] == [0]
+    assert index.top("無関係な質問", 3) == []
+
+
+def test_chunks_follow_file_headings_and_lines() -> None:
+    chunks = split_attachment_chunks(ATTACHMENTS, chunk_chars=400)
+    assert all(len(c.text) <= 400 for c in chunks)
+    assert {c.label for c in chunks} == {"src/billing.py", "docs/天気.md", "src/misc.py"}
+    (weather,) = [c for c in chunks if c.label == "docs/天気.md"]
+    assert (weather.start_line, weather.end_line) == (1, 3) and weather.text.startswith("# 天気予報")
+
+
+def test_excerpt_keeps_relevant_chunks_within_budget() -> None:
+    config = AttachmentRetrievalConfig(top_k=2, max_tokens=300, chunk_chars=400)
+    index = AttachmentIndex.build(ATTACHMENTS, config)
+    excerpt = index.excerpt("compute_invoice_total の不具合を直して")
+    assert "def compute_invoice_total" in excerpt and "天気" not in excerpt.split("抜粋外")[0]
+    assert "抜粋外のファイル: docs/天気.md" in excerpt
+    assert "このターンの入力に関連する 1/" in excerpt
+    assert sum(c.tokens for c in index.chunks if c.text in excerpt) <= 300
+
+    small = AttachmentIndex.build("### a.txt\n短い添付", config)
+    assert small.excerpt("何か") == "### a.txt\n短い添付"
+    disabled = AttachmentIndex.build(ATTACHMENTS, AttachmentRetrievalConfig(enabled=False, max_tokens=300))
+    assert disabled.excerpt("compute_invoice_total") == ATTACHMENTS
+
+
+@pytest.mark.parametrize("files_full", [False, True])
+def test_engine_sends_excerpt_per_turn(
+    studio_root: Path, monkeypatch: pytest.MonkeyPatch, files_full: bool
+) -> None:
+    (studio_root / "studio_config.json").write_text(
+        json.dumps({"attachment_retrieval": {"max_tokens": 300, "chunk_chars": 400}}), encoding="utf-8"
+    )
+    seen: list[str] = []
+    original = engine_module.with_attachment_block
+
+    def spy(system_prompt, attachment_context):
+        seen.append(attachment_context)
+        return original(system_prompt, attachment_context)
+
+    monkeypatch.setattr(engine_module, "with_attachment_block", spy)
+    MockAssistant.reset()
+    engine = create_engine(load_session_context("solo", studio_root))
+    if files_full:
+        engine.attachment_retrieval = AttachmentRetrievalConfig(enabled=False)
+    collect_events(engine, "明日の天気を教えて", attachment_context=ATTACHMENTS, stream=False)
+    assert seen
+    if files_full:
+        assert seen == [ATTACHMENTS] * len(seen)
+    else:
+        assert all("明日の天気は晴れです" in text and "compute_invoice_total" not in text for text in seen)
+
+
+def test_steps_in_a_turn_share_the_system_prefix(studio_root: Path) -> None:
+    (studio_root / "studio_config.json").write_text(
+        json.dumps({"attachment_retrieval": {"max_tokens": 300, "chunk_chars": 400}}), encoding="utf-8"
+    )
+    MockAssistant.reset()
+    engine = create_engine(load_session_context("solo", studio_root))
+    collect_events(engine, "compute_invoice_total を直して", attachment_context=ATTACHMENTS, stream=False)
+    state = engine.state
+    talent_id = next(iter(engine.ctx.talents))
+    talent = engine.ctx.talents[talent_id]
+
+    prompts = [
+        engine._step_prompts(state, talent, talent_id, "compute_invoice_total を直して", action, None)
+        for action in ("明日の天気を調べて", "テストを書いて")
+    ]
+    (first_system, first_user), (second_system, second_user) = prompts
+    # 抜粋はユーザー入力だけで引く（step の action は順位に影響しない）
+    assert first_system == second_system and first_system.blocks == second_system.blocks
+    assert "このターンの入力に関連する" in first_system.blocks[-1]
+    assert "compute_invoice_total" in first_system.blocks[-1] and "明日の天気は晴れです" not in first_system
+    assert first_user != second_user
+
+
+@pytest.mark.parametrize("engine_kind", ["thread", "asyncio"])
+def test_human_briefing_leaves_out_attachments(studio_root: Path, engine_kind: str) -> None:
+    (studio_root / "studio_config.json").write_text(json.dumps({"engine": engine_kind}), encoding="utf-8")
+    (studio_root / "organizations" / "solo" / "model_mapping.json").write_text(
+        json.dumps({"solo_bot": {"assistant": "human"}}), encoding="utf-8"
+    )
+    engine = create_engine(load_session_context("solo", studio_root))
+    events = collect_events(
+        engine,
+        "添付を確認して",
+        attachment_context="### secret.txt\nSECRET_ATTACHMENT_BODY",
+        stream=False,
+        responder=lambda event: "確認しました",
+    )
+    (prompt,) = [e for e in events if e.type == "await_text"]
+    assert prompt.payload["briefing"] and "SECRET_ATTACHMENT_BODY" not in prompt.payload["briefing"]
+    assert [e.payload["text"] for e in events if e.type == "step_done"] == ["確認しました"]
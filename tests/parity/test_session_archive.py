@@ -0,0 +1,113 @@
+"""Session archive pack tests (design.md §7.1)."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from studio import session_archive
+from studio.logging import steps_from_jsonl
+from studio.session_archive import archive_sessions, archived_logs, log_exists, read_archived_bytes
+from studio.session_catalog import SessionCatalog
+from studio.session_report import list_sessions, read_jsonl, read_session_meta, session_log_path
+from studio.session_resume import load_effective_records, load_resumed_session
+
+DAY = 86400
+
+
+def _write_log(root: Path, session_id: str, *, parent: str | None = None, age_days: float = 30) -> Path:
+    path = session_log_path(root, session_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    records = [
+        {"type": "session_meta", "organization": "solo", "workflow": None, "parent_session_id": parent},
+        {"type": "user_input", "text": f"{session_id} の議題"},
+        {"type": "step", "talent_id": "a", "assistant": "mock", "action": "", "text": "```python\nprint(1)\n```"},
+        {"type": "session_end", "total_cost": 0.0},
+    ]
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8")
+    mtime = time.time() - age_days * DAY
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_old_logs_move_into_pack_and_stay_readable(tmp_path: Path) -> None:
+    old = _write_log(tmp_path, "20260101_120000")
+    child = _write_log(tmp_path, "20260102_120000", parent="20260101_120000")
+    recent = _write_log(tmp_path, "20260301_120000", age_days=1)
+    before = {p.stem: read_jsonl(p) for p in (old, child)}
+    chain = load_effective_records(tmp_path, child.stem)
+
+    result = archive_sessions(tmp_path, older_than_days=7, codec="gzip")
+    assert sorted(result.archived) == [old.stem, child.stem]
+    assert result.pack is not None and result.pack.suffix == ".gz"
+    assert not old.exists() and not child.exists() and recent.exists()
+
+    for session_id, records in before.items():
+        path = session_log_path(tmp_path, session_id)
+        assert log_exists(path)
+        assert read_jsonl(path) == records
+        assert read_session_meta(path)["organization"] == "solo"
+        assert [s.text for s in steps_from_jsonl(path)] == ["```python\nprint(1)\n```"]
+    assert load_effective_records(tmp_path, child.stem) == chain
+    assert load_resumed_session(tmp_path, child.stem).replay_messages
+
+    # 2回目は対象なし
+    assert archive_sessions(tmp_path, older_than_days=7, codec="gzip").pack is None
+
+
+def test_index_gives_random_access(tmp_path: Path) -> None:
+    for i in range(5):
+        _write_log(tmp_path, f"2026010{i + 1}_120000")
+    archive_sessions(tmp_path, older_than_days=7, codec="gzip")
+    logs = archived_logs(tmp_path / "sessions")
+    entry = logs["20260103_120000"]
+    assert entry.offset > 0
+    assert b"20260103_120000" in read_archived_bytes(entry)
+    assert b"20260104_120000" not in read_archived_bytes(entry)
+
+
+def test_catalog_keeps_archived_sessions(tmp_path: Path) -> None:
+    _write_log(tmp_path, "20260101_120000")
+    _write_log(tmp_path, "20260102_120000")
+    catalog = SessionCatalog(tmp_path)
+    assert catalog.sync() == 2
+
+    archive_sessions(tmp_path, older_than_days=7, codec="gzip")
+    assert catalog.sync() == 0
+    assert catalog.rebuild(workers=1) == 2
+    assert [s.session_id for s in list_sessions(tmp_path)] == ["20260102_120000", "20260101_120000"]
+
+
+def test_live_file_wins_and_interrupted_run_is_finished(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = _write_log(tmp_path, "20260101_120000")
+    original = path.read_bytes()
+    # 索引まで書いて元ファイルを消す前に止まった状態
+    monkeypatch.setattr(Path, "unlink", lambda self, missing_ok=False: None)
+    archive_sessions(tmp_path, older_than_days=7, codec="gzip")
+    monkeypatch.undo()
+    assert path.exists() and read_archived_bytes(archived_logs(tmp_path / "sessions")[path.stem]) == original
+
+    result = archive_sessions(tmp_path, older_than_days=7, codec="gzip")
+    assert result.pack is None and not path.exists()
+    assert len(list((tmp_path / "sessions" / "archive").glob("*.index.json"))) == 1
+
+
+def test_zstd_requires_optional_package(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(session_archive, "zstandard", None)
+    assert session_archive.resolve_codec("auto") == "gzip"
+    with pytest.raises(RuntimeError):
+        session_archive.resolve_codec("zstd")
+
+
+def test_cli_archive_sessions(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    from MultiRoleStudio import main
+
+    _write_log(tmp_path, "20260101_120000")
+    assert main(["--root", str(tmp_path), "--archive-sessions", "7", "--archive-codec", "gzip"]) == 0
+    assert "1 件をアーカイブしました" in capsys.readouterr().out
+    assert main(["--root", str(tmp_path), "--archive-sessions", "7"]) == 0
+    assert "古いセッションはありません" in capsys.readouterr().out
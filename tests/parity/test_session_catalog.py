@@ -0,0 +1,131 @@
+"""Session catalog tests (design.md §7.1, §8.5)."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from studio import session_catalog
+from studio.assistants import MockAssistant
+from studio.engine import SessionEngine, collect_events
+from studio.loader import load_session_context
+from studio.session_catalog import SessionCatalog, entry_from_log
+from studio.session_report import count_sessions, list_sessions, refresh_sessions, session_organizations
+
+
+def _write_log(root: Path, session_id: str, org: str = "solo", *, workflow=None, cost=0.01, steps=1, end=True) -> Path:
+    path = root / "sessions" / f"{session_id}.jsonl"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    records = [{"type": "session_meta", "organization": org, "workflow": workflow, "parent_session_id": None}]
+    for i in range(steps):
+        records.append(
+            {
+                "type": "step",
+                "talent_id": "a",
+                "assistant": "Groq",
+                "model": "m",
+                "tokens": {"in": 10, "out": 5},
+                "cost": cost / steps,
+            }
+        )
+    if end:
+        records.append({"type": "session_end", "total_cost": cost, "by_model": {}})
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+    return path
+
+
+def test_entry_from_log_summarises_totals(tmp_path: Path) -> None:
+    path = _write_log(tmp_path, "20260101_120000", workflow="meeting", cost=0.03, steps=3)
+    (tmp_path / "sandbox" / "session_20260101_120000").mkdir(parents=True)
+    entry, size, _mtime = entry_from_log(path)
+    assert (entry.organization, entry.workflow, entry.step_count) == ("solo", "meeting", 3)
+    assert (entry.tokens_in, entry.tokens_out, entry.total_cost) == (30, 15, 0.03)
+    assert entry.models == ("Groq/m",)
+    assert entry.ended_at is not None and entry.artifact_dir
+    assert size == path.stat().st_size
+
+    crashed = _write_log(tmp_path, "20260101_130000", end=False)
+    assert entry_from_log(crashed)[0].ended_at is None
+
+
+def test_list_sessions_filters_sorts_and_pages(tmp_path: Path) -> None:
+    _write_log(tmp_path, "20260101_120000", "a", cost=0.05)
+    _write_log(tmp_path, "20260102_120000", "b", workflow="dev", cost=0.01)
+    _write_log(tmp_path, "20260103_120000", "a", cost=0.02, steps=4)
+
+    assert [s.session_id for s in list_sessions(tmp_path)] == [
+        "20260103_120000",
+        "20260102_120000",
+        "20260101_120000",
+    ]
+    assert [s.session_id for s in list_sessions(tmp_path, organization="a", sort="cost")] == [
+        "20260101_120000",
+        "20260103_120000",
+    ]
+    assert [s.session_id for s in list_sessions(tmp_path, workflow="")] == ["20260103_120000", "20260101_120000"]
+    page = list_sessions(tmp_path, limit=1, offset=1)
+    assert [s.session_id for s in page] == ["20260102_120000"]
+    assert "4 steps" in list_sessions(tmp_path, sort="steps")[0].label
+    assert count_sessions(tmp_path, organization="a") == 2
+    assert session_organizations(tmp_path) == ["a", "b"]
+
+
+def test_sync_picks_up_new_changed_and_removed_logs(tmp_path: Path) -> None:
+    first = _write_log(tmp_path, "20260101_120000")
+    _write_log(tmp_path, "20260102_120000")
+    catalog = SessionCatalog(tmp_path)
+    assert catalog.sync() == 2
+    assert catalog.sync() == 0
+
+    _write_log(tmp_path, "20260102_120000", steps=2)
+    _write_log(tmp_path, "20260103_120000")
+    first.unlink()
+    assert catalog.sync() == 2
+    assert [(e.session_id, e.step_count) for e in catalog.query()] == [
+        ("20260103_120000", 1),
+        ("20260102_120000", 2),
+    ]
+
+
+def test_rebuild_in_parallel(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    for i in range(6):
+        _write_log(tmp_path, f"2026010{i + 1}_120000")
+    (tmp_path / "sessions" / "broken.jsonl").write_text("{}\n", encoding="utf-8")
+    monkeypatch.setattr(session_catalog, "PARALLEL_MIN_LOGS", 2)
+    catalog = SessionCatalog(tmp_path)
+    assert catalog.rebuild(workers=2) == 6
+    assert catalog.count() == 6
+
+
+def test_engine_session_updates_catalog(studio_root: Path) -> None:
+    MockAssistant.reset()
+    ctx = load_session_context("solo", studio_root)
+    engine = SessionEngine(ctx)
+    events = collect_events(engine, "こんにちは", stream=False)
+    session_id = engine.state.logger.session_id
+
+    (entry,) = SessionCatalog(studio_root).query()
+    assert entry.session_id == session_id and entry.organization == "solo"
+    assert entry.step_count == len([e for e in events if e.type == "step_done"])
+    assert entry.ended_at is not None and entry.models == ("mock",)
+    # finish 時に記録したサイズ・時刻が一致するので sync は読み直さない
+    assert SessionCatalog(studio_root).sync() == 0
+
+
+def test_existing_catalog_is_synced_on_first_read_and_refresh(tmp_path: Path) -> None:
+    _write_log(tmp_path, "20260101_120000")
+    crashed = _write_log(tmp_path, "20260102_120000", end=False)
+    # 別プロセスのセッション開始でカタログだけ先にできた状態（既存ログは取り込まない）
+    SessionCatalog(tmp_path).record_start("20260103_120000", "solo", None)
+    assert SessionCatalog(tmp_path).count() == 1
+
+    assert count_sessions(tmp_path) == 2
+    assert [s.session_id for s in list_sessions(tmp_path)] == ["20260102_120000", "20260101_120000"]
+
+    _write_log(tmp_path, "20260104_120000")
+    crashed.unlink()
+    assert [s.session_id for s in list_sessions(tmp_path)] == ["20260102_120000", "20260101_120000"]
+    assert refresh_sessions(tmp_path) == 1
+    assert [s.session_id for s in list_sessions(tmp_path)] == ["20260104_120000", "20260101_120000"]
@@ -0,0 +1,125 @@
+"""Per-turn history checkpoint tests (design.md §7.2)."""
+
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from studio import session_resume
+from studio.assistants import MockAssistant
+from studio.engine import EngineState, SessionEngine, collect_events
+from studio.loader import load_session_context
+from studio.session_resume import (
+    checkpoint_path,
+    dump_histories,
+    load_resumed_session,
+    read_checkpoint,
+    read_records_from,
+)
+
+
+def _turn(engine: SessionEngine, text: str) -> None:
+    for _event in engine.run_turn(text, stream=False):
+        pass
+
+
+def _branch(ctx, resumed) -> SessionEngine:
+    engine = SessionEngine(ctx)
+    engine.state = EngineState(
+        ctx=ctx,
+        logger=None,
+        histories=resumed.histories,
+        step_number=resumed.step_number,
+        parent_session_id=resumed.parent_session_id,
+        checkpoint=resumed.checkpoint,
+        session_wall_start=time.perf_counter(),
+    )
+    return engine
+
+
+def _user_texts(messages: list[dict[str, str]]) -> list[str]:
+    return [m["content"] for m in messages if m["role"] == "user"]
+
+
+def test_each_turn_advances_checkpoint(studio_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    MockAssistant.reset()
+    ctx = load_session_context("solo", studio_root)
+    engine = SessionEngine(ctx)
+    _turn(engine, "one")
+    session_id = engine.state.logger.session_id
+    log_path = studio_root / "sessions" / f"{session_id}.jsonl"
+    first = read_checkpoint(studio_root, session_id)
+    assert first is not None and first["log_offset"] == log_path.stat().st_size
+
+    # 2ターン目は前回オフセット以降だけを読む
+    offsets: list[int] = []
+    original = session_resume.read_records_from
+    monkeypatch.setattr(
+        session_resume,
+        "read_records_from",
+        lambda path, offset: offsets.append(offset) or original(path, offset),
+    )
+    _turn(engine, "two")
+    assert offsets == [first["log_offset"]]
+    second = read_checkpoint(studio_root, session_id)
+    assert second["histories"] == dump_histories(engine.state.histories)
+    assert second["step_number"] == engine.state.step_number
+    assert _user_texts(second["replay"]) == ["one", "two"]
+    engine.finish()
+
+    # 再開はチェックポイント + 末尾 (session_end) だけで済む
+    monkeypatch.setattr(session_resume, "load_effective_records", None)
+    resumed = load_resumed_session(studio_root, session_id)
+    assert dump_histories(resumed.histories) == second["histories"]
+    assert resumed.step_number == second["step_number"]
+
+
+def test_branch_references_parent_checkpoint(studio_root: Path) -> None:
+    MockAssistant.reset()
+    ctx = load_session_context("solo", studio_root)
+    parent = SessionEngine(ctx)
+    collect_events(parent, "turn one", stream=False)
+    parent_id = parent.state.logger.session_id
+
+    child = _branch(ctx, load_resumed_session(studio_root, parent_id))
+    collect_events(child, "turn two", stream=False)
+    child_id = child.state.logger.session_id
+    meta = json.loads((studio_root / "sessions" / f"{child_id}.jsonl").read_text(encoding="utf-8").splitlines()[0])
+    assert meta["parent_checkpoint"] == f"sessions/{parent_id}.checkpoint.json"
+
+    resumed = load_resumed_session(studio_root, child_id)
+    assert _user_texts(resumed.replay_messages) == ["turn one", "turn two"]
+    assert resumed.replay_messages[0]["content"].startswith("_ログ再現: solo")
+
+    # 分岐自身のチェックポイントがなければ親のもの + 分岐ログ全体から復元する
+    checkpoint_path(studio_root, child_id).unlink()
+    fallback = load_resumed_session(studio_root, child_id)
+    assert _user_texts(fallback.replay_messages) == ["turn one", "turn two"]
+    assert len(fallback.histories.for_talent("solo_bot").get_messages()) == 4
+
+
+def test_legacy_log_without_checkpoint_matches(studio_root: Path) -> None:
+    MockAssistant.reset()
+    ctx = load_session_context("solo", studio_root)
+    engine = SessionEngine(ctx)
+    collect_events(engine, "hello", stream=False)
+    session_id = engine.state.logger.session_id
+
+    with_checkpoint = load_resumed_session(studio_root, session_id)
+    checkpoint_path(studio_root, session_id).write_text("{broken", encoding="utf-8")
+    legacy = load_resumed_session(studio_root, session_id)
+    assert legacy.replay_messages == with_checkpoint.replay_messages
+    assert legacy.step_number == with_checkpoint.step_number
+    assert legacy.checkpoint is not None and legacy.checkpoint["session_id"] == session_id
+
+
+def test_read_records_from_skips_meta_and_truncated_tail(tmp_path: Path) -> None:
+    path = tmp_path / "s.jsonl"
+    head = json.dumps({"type": "session_meta"}) + "\n"
+    path.write_text(head + json.dumps({"type": "step"}) + "\n" + '{"type": "st', encoding="utf-8")
+    assert read_records_from(path, 0) == [{"type": "step"}]
+    assert read_records_from(path, len(head.encode("utf-8"))) == [{"type": "step"}]
+    assert read_records_from(tmp_path / "missing.jsonl", 0) == []
@@ -6,10 +6,12 @@ import json
 import time
 from pathlib import Path
 
+from studio import session_report
 from studio.assistants import MockAssistant
 from studio.engine import EngineState, SessionEngine, collect_events
 from studio.loader import load_session_context
 from studio.session_resume import (
+    iter_effective_records,
     load_effective_records,
     load_resumed_session,
     rebuild_histories,
@@ -98,3 +100,45 @@ def test_rebuild_histories_has_messages(studio_root: Path) -> None:
     histories = rebuild_histories(records)
     history = histories.for_talent("solo_bot")
     assert len(history.get_messages()) >= 2
+
+
+def _write_chain(root: Path, depth: int) -> list[str]:
+    sessions = root / "sessions"
+    sessions.mkdir(parents=True, exist_ok=True)
+    ids = [f"20260101_{i:06d}" for i in range(depth)]
+    for i, sid in enumerate(ids):
+        records = [
+            {"type": "session_meta", "organization": "solo", "parent_session_id": ids[i - 1] if i else None},
+            {"type": "user_input", "text": f"turn {i}"},
+            {"type": "session_end", "total_cost": 0.0},
+        ]
+        (sessions / f"{sid}.jsonl").write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+    return ids
+
+
+def test_deep_branch_chain_without_recursion(tmp_path: Path) -> None:
+    ids = _write_chain(tmp_path, 1200)
+    records = load_effective_records(tmp_path, ids[-1])
+    assert [r["type"] for r in records[:2]] == ["session_meta", "user_input"]
+    assert [r["text"] for r in records if r["type"] == "user_input"] == [f"turn {i}" for i in range(1200)]
+    assert [r["type"] for r in records].count("session_end") == 1
+    assert records[-1]["type"] == "session_end"
+
+
+def test_ancestor_logs_are_parsed_once(tmp_path: Path, monkeypatch) -> None:
+    ids = _write_chain(tmp_path, 5)
+    session_report.clear_log_cache()
+    reads: list[Path] = []
+    original = session_report.read_jsonl
+    monkeypatch.setattr(session_report, "read_jsonl", lambda path: reads.append(path) or original(path))
+
+    first = load_effective_records(tmp_path, ids[-1])
+    assert load_effective_records(tmp_path, ids[-2]) == first[:-2] + [first[-1]]
+    assert len(reads) == 5
+
+    # 追記でサイズが変わったログだけ読み直す
+    with (tmp_path / "sessions" / f"{ids[-1]}.jsonl").open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps({"type": "user_input", "text": "more"}) + "\n")
+    texts = [r.get("text") for r in iter_effective_records(tmp_path, ids[-1])]
+    assert texts[-1] == "more"
+    assert len(reads) == 6
@@ -0,0 +1,99 @@
+"""Step latency breakdown tests (design.md 7.1.1)."""
+
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from studio.assistants import _run_chain
+from studio.display import format_by_model_markdown_table, format_step_metrics_line
+from studio.history import ConversationHistory
+from studio.logging import SessionLogger, StepMetrics, StepTiming, percentile, steps_from_jsonl
+
+
+class _FakeChain:
+    def __init__(self, delays: list[float]) -> None:
+        self.delays = delays
+
+    def stream(self, payload):
+        for i, delay in enumerate(self.delays):
+            time.sleep(delay)
+            yield AIMessageChunk(content=f"c{i}")
+        yield AIMessageChunk(content="", usage_metadata={"input_tokens": 12, "output_tokens": 3, "total_tokens": 15})
+
+    def invoke(self, payload):
+        time.sleep(self.delays[0])
+        return AIMessage(content="done")
+
+
+def _run(chain: _FakeChain, *, stream: bool, on_chunk=None):
+    return _run_chain(
+        chain,
+        {},
+        stream=stream,
+        on_chunk=on_chunk,
+        model="m",
+        user_message="q",
+        history=ConversationHistory(),
+        costs={"default": {"input": 0.0, "output": 0.0}},
+        input_bundle="q",
+    )
+
+
+def test_streamed_call_records_ttft_gaps_and_api_usage() -> None:
+    def slow_render(text: str) -> None:
+        time.sleep(0.02)
+
+    result = _run(_FakeChain([0.05, 0.01, 0.01]), stream=True, on_chunk=slow_render)
+    timing = result.timing
+    assert result.stream and result.text == "c0c1c2"
+    assert (result.tokens_in, result.tokens_out, result.tokens_source) == (12, 3, "api")
+    assert timing.chunks == 3 and timing.ttft >= 0.05
+    # 表示コールバックの時間はローカル側、チャンク間隔はそれを含む到着間隔
+    assert timing.local >= 0.06 and timing.network < result.elapsed
+    assert timing.gap_p50 >= 0.03 and timing.gap_max >= timing.gap_p50
+
+
+def test_non_streamed_call_is_all_network() -> None:
+    result = _run(_FakeChain([0.02]), stream=False)
+    assert not result.stream
+    assert result.timing.ttft is None and result.timing.chunks == 0
+    assert result.timing.network == result.elapsed >= 0.02
+
+
+def test_timing_round_trips_through_log(tmp_path: Path) -> None:
+    timing = StepTiming(ttft=0.4213, queue_wait=0.2, network=1.0, local=0.05, chunks=9, gap_p50=0.1, gap_max=0.3)
+    metrics = StepMetrics("a", "Groq", "m", "", "t", True, 1.05, 1, 2, "api", 0.0, timing=timing)
+    record = metrics.to_log_record()
+    assert record["timing"]["ttft"] == 0.421 and record["timing"]["chunks"] == 9
+
+    logger = SessionLogger.create(tmp_path, "org", None, {}, {}, {})
+    logger.start()
+    logger.log_step(metrics)
+    logger.flush()
+    (step,) = steps_from_jsonl(logger.log_path)
+    assert step.timing.queue_wait == 0.2 and step.timing.gap_max == 0.3
+    assert "TTFT 0.42s" in format_step_metrics_line(record)
+    assert "順番待ち 0.2s" in format_step_metrics_line(record)
+
+
+def test_by_model_latency_percentiles(tmp_path: Path) -> None:
+    def step(elapsed: float, ttft: float | None, cache: str | None = None) -> StepMetrics:
+        return StepMetrics(
+            "a", "Groq", "m", "", "t", ttft is not None, elapsed, 1, 1, "api", 0.0,
+            cache=cache,
+            timing=StepTiming(ttft=ttft, network=elapsed),
+        )
+
+    logger = SessionLogger.create(tmp_path, "org", None, {}, {}, {})
+    logger.steps = [step(float(i), i / 10) for i in range(1, 101)] + [step(0.0, None, cache="hit")]
+    latency = logger.build_by_model()["Groq/m"]["latency"]
+    assert latency["elapsed"] == {"p50": 50.0, "p95": 95.0, "p99": 99.0}
+    assert latency["ttft"]["p95"] == 9.5
+    assert "queue_wait" not in latency
+
+    table = format_by_model_markdown_table(logger.build_by_model())
+    assert "| Groq/m | 50.00 / 95.00 / 99.00 | 5.00 / 9.50 / 9.90 | - |" in table
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
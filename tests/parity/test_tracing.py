@@ -0,0 +1,130 @@
+"""Span tracing tests (design.md 7.1.2)."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from studio.assistants import MockAssistant
+from studio.engine import collect_events, create_engine
+from studio.loader import load_session_context
+from studio.tracing import TraceConfig, Tracer
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+@pytest.fixture
+def trio_root(studio_root: Path) -> Path:
+    for name in ("workflows", "organizations/trio", "talents"):
+        dest = studio_root / name
+        dest.mkdir(parents=True, exist_ok=True)
+        for p in (REPO_ROOT / name).glob("*.json"):
+            shutil.copy2(p, dest / p.name)
+    mapping = {tid: {"assistant": "mock"} for tid in ("alpha", "beta", "gamma")}
+    (studio_root / "organizations" / "trio" / "model_mapping.json").write_text(
+        json.dumps(mapping), encoding="utf-8"
+    )
+    return studio_root
+
+
+def _parents(events: list[dict]) -> dict[int, dict]:
+    return {e["args"]["span_id"]: e for e in events if e["ph"] == "X"}
+
+
+def test_worker_threads_and_tasks_nest_under_current_span() -> None:
+    tracer = Tracer()
+    with tracer.span("phase") as phase:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(tracer.wrap(_traced_step), tracer, i) for i in range(2)]
+            for future in futures:
+                future.result()
+    by_name = {}
+    for span in tracer.finished():
+        by_name.setdefault(span.name, []).append(span)
+    assert all(s.parent_id == phase.span_id for s in by_name["step"])
+    steps = {s.span_id for s in by_name["step"]}
+    assert {s.parent_id for s in by_name["provider_call"]} == steps
+
+    async def run():
+        async def step(i: int) -> None:
+            with tracer.span("async_step", i=i):
+                await asyncio.sleep(0)
+                with tracer.span("async_call"):
+                    await asyncio.sleep(0)
+
+        with tracer.bind(), tracer.span("async_phase") as parent:
+            await asyncio.gather(step(0), step(1))
+        assert tracer.current() is None
+        return parent
+
+    parent = asyncio.run(run())
+    async_steps = [s for s in tracer.finished() if s.name == "async_step"]
+    assert {s.parent_id for s in async_steps} == {parent.span_id}
+    assert {s.parent_id for s in tracer.finished() if s.name == "async_call"} == {s.span_id for s in async_steps}
+
+
+def _traced_step(tracer: Tracer, i: int) -> None:
+    with tracer.span("step", i=i), tracer.span("provider_call"):
+        pass
+
+
+def test_disabled_tracer_records_nothing() -> None:
+    tracer = Tracer(enabled=False)
+    with tracer.span("turn") as span:
+        assert span is None
+    assert tracer.finished() == [] and tracer.wrap(len) is len
+    assert TraceConfig.from_config({}) == TraceConfig(enabled=False, format="chrome")
+    assert TraceConfig.from_config({"tracing": {"enabled": True, "format": "otlp"}}).format == "otlp"
+
+
+@pytest.mark.parametrize("engine_kind", ["thread", "asyncio"])
+def test_engine_writes_chrome_trace(trio_root: Path, engine_kind: str) -> None:
+    (trio_root / "studio_config.json").write_text(
+        json.dumps({"engine": engine_kind, "tracing": {"enabled": True}}), encoding="utf-8"
+    )
+    MockAssistant.reset()
+    ctx = load_session_context("trio", trio_root, workflow_id="quiz")
+    engine = create_engine(ctx)
+    events = collect_events(engine, "クイズ", stream=True)
+    assert events[-1].type == "session_done"
+
+    trace_path = trio_root / "sessions" / f"{engine.state.logger.session_id}.trace.json"
+    spans = _parents(json.loads(trace_path.read_text(encoding="utf-8"))["traceEvents"])
+    (turn,) = [e for e in spans.values() if e["name"] == "turn"]
+    phases = [e for e in spans.values() if e["name"] == "phase"]
+    assert phases and all(p["args"]["parent_id"] == turn["args"]["span_id"] for p in phases)
+    parallel = {e["args"]["span_id"] for e in phases if e["args"]["phase_type"] == "parallel"}
+    parallel_steps = [e for e in spans.values() if e["name"] == "step" and e["args"].get("phase_type") == "parallel"]
+    assert len(parallel_steps) == 2 and {e["args"]["parent_id"] for e in parallel_steps} <= parallel
+    assert any(e["name"] == "log_flush" for e in spans.values())
+    assert all(e["dur"] >= 0 for e in spans.values())
+
+
+def test_otlp_export_and_default_off(trio_root: Path) -> None:
+    MockAssistant.reset()
+    ctx = load_session_context("trio", trio_root, workflow_id="quiz")
+    engine = create_engine(ctx)
+    collect_events(engine, "クイズ", stream=False)
+    assert not list((trio_root / "sessions").glob("*.trace.json"))
+
+    (trio_root / "studio_config.json").write_text(
+        json.dumps({"tracing": {"enabled": True, "format": "otlp"}}), encoding="utf-8"
+    )
+    ctx = load_session_context("trio", trio_root, workflow_id="quiz")
+    engine = create_engine(ctx)
+    collect_events(engine, "クイズ", stream=False)
+    session_id = engine.state.logger.session_id
+    data = json.loads((trio_root / "sessions" / f"{session_id}.otlp.json").read_text(encoding="utf-8"))
+    (resource,) = data["resourceSpans"]
+    attrs = {a["key"]: a["value"] for a in resource["resource"]["attributes"]}
+    assert attrs["session.id"] == {"stringValue": session_id}
+    spans = resource["scopeSpans"][0]["spans"]
+    ids = {s["spanId"] for s in spans}
+    assert len({s["traceId"] for s in spans}) == 1
+    assert all(s.get("parentSpanId", next(iter(ids))) in ids for s in spans)
+    assert all(int(s["endTimeUnixNano"]) >= int(s["startTimeUnixNano"]) for s in spans)
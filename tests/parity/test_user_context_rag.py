@@ -0,0 +1,125 @@
+"""User-context retrieval tests (design.md Appendix D.10)."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+import studio.engine as engine_module
+from studio.assistants import MockAssistant
+from studio.engine import collect_events, create_engine
+from studio.loader import load_session_context
+from studio.user_context import load_user_context_text
+from studio.user_context_rag import (
+    RAG_HEADER,
+    RagConfig,
+    UserContextIndex,
+    rag_sources,
+    retrieve_user_context,
+    split_sections,
+)
+
+BILLING = "# 請求\n\n## 締め処理\n\n請求書は月末に締めて翌月5日に送る。\n\n## 例外\n\n```\n# コード中の見出しではない\n```\n"
+WEATHER = "# 天気メモ\n\n晴れの日は散歩する。\n"
+
+
+def _write_old(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    past = time.time() - 60
+    os.utime(path, (past, past))
+
+
+def _rag_config(studio_root: Path, **rag: object) -> dict:
+    config = {"user_context": {"enabled": True, "max_chars": 200, "rag": {"enabled": True, **rag}}}
+    (studio_root / "studio_config.json").write_text(json.dumps(config), encoding="utf-8")
+    return config
+
+
+def test_split_sections_by_heading_path() -> None:
+    sections = split_sections(BILLING, chunk_chars=1500)
+    assert [heading for heading, _ in sections] == ["請求 > 締め処理", "請求 > 例外"]
+    assert sections[0][1].startswith("## 締め処理") and "# コード中の見出しではない" in sections[1][1]
+
+    long = "# 長文\n\n" + "\n\n".join("段落" * 40 for _ in range(6))
+    parts = split_sections(long, chunk_chars=200)
+    assert len(parts) > 1 and all(heading == "長文" for heading, _ in parts)
+
+
+def test_index_persists_and_rechunks_only_changed_files(studio_root: Path) -> None:
+    corpus = studio_root / "user_context" / "corpus"
+    _write_old(corpus / "billing.md", BILLING)
+    _write_old(corpus / "weather.md", WEATHER)
+    config = RagConfig(enabled=True)
+    sources = rag_sources(studio_root, {}, config)
+    assert sorted(sources) == ["corpus/billing.md", "corpus/weather.md"]
+
+    index = UserContextIndex(studio_root, config)
+    index.refresh(sources)
+    assert index.rechunks == 2 and (studio_root / "user_context" / "index" / "index.json").is_file()
+    (best, _), *_ = index.search("請求書はいつ送る？")
+    assert best.chunk_id == "corpus/billing.md#0"
+
+    # 別プロセス相当：保存済みの索引を読み、変更のないファイルは読み直さない
+    reloaded = UserContextIndex(studio_root, config)
+    reloaded.refresh(sources)
+    assert (reloaded.reads, reloaded.rechunks) == (0, 0) and len(reloaded.chunks) == len(index.chunks)
+
+    # mtime だけ変わったファイルはハッシュで判定して分割し直さない
+    os.utime(corpus / "weather.md")
+    reloaded.refresh(sources)
+    assert (reloaded.reads, reloaded.rechunks) == (1, 0)
+
+    _write_old(corpus / "weather.md", WEATHER + "\n## 雨\n\n雨の日は読書する。\n")
+    (corpus / "billing.md").unlink()
+    reloaded.refresh(rag_sources(studio_root, {}, config))
+    assert reloaded.rechunks == 1
+    assert {c.source for c in reloaded.chunks} == {"corpus/weather.md"}
+    assert reloaded.search("読書")[0][0].heading == "天気メモ > 雨"
+
+
+def test_long_my_context_is_retrieved_instead_of_truncated(studio_root: Path) -> None:
+    config = _rag_config(studio_root, max_tokens=80)
+    my_context = "# メモ\n\n## 用語\n\nparity は旧版機能の再現。\n\n## 蓄積\n\n" + "雑多な記録。" * 60
+    _write_old(studio_root / "user_context" / "my_context.md", my_context)
+
+    assert load_user_context_text(studio_root, config) is None
+    text, chunks = retrieve_user_context(studio_root, config, "parity とは？")
+    assert text.startswith(RAG_HEADER) and "parity は旧版機能の再現" in text
+    assert "雑多な記録" not in text
+    assert chunks[0]["id"] == "my_context.md#0"
+
+    # 短い my_context.md は従来どおり全文注入し、索引には入れない
+    short = _rag_config(studio_root, max_tokens=80)
+    short["user_context"]["max_chars"] = 8000
+    assert load_user_context_text(studio_root, short) == my_context.strip()
+    assert "my_context.md" not in rag_sources(studio_root, short, RagConfig.from_config(short))
+
+
+def test_engine_injects_sections_per_turn(studio_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    _rag_config(studio_root)
+    corpus = studio_root / "user_context" / "corpus"
+    _write_old(corpus / "billing.md", BILLING)
+    _write_old(corpus / "weather.md", WEATHER)
+    seen: list[str] = []
+    original = engine_module.build_system_prompt
+
+    def spy(*args, **kwargs):
+        seen.append(kwargs.get("user_context_rag_text") or "")
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(engine_module, "build_system_prompt", spy)
+    MockAssistant.reset()
+    engine = create_engine(load_session_context("solo", studio_root))
+    collect_events(engine, "請求書の締め処理", stream=False)
+    assert seen and "月末に締めて" in seen[-1] and "散歩" not in seen[-1]
+    collect_events(engine, "晴れたら散歩", stream=False)
+    assert "散歩" in seen[-1] and "月末に締めて" not in seen[-1]
+
+    records = [json.loads(line) for line in engine.state.logger.log_path.read_text(encoding="utf-8").splitlines()]
+    inputs = [r for r in records if r.get("type") == "user_input"]
+    assert [r["context_chunks"][0]["id"] for r in inputs] == ["corpus/billing.md#0", "corpus/weather.md#0"]
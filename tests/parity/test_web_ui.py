@@ -287,3 +287,59 @@ def test_web_session_file_only_submit_clears_upload(studio_root: Path) -> None:
         for m in messages
     )
     assert any(m["role"] == "assistant" for m in messages)
+
+
+def test_web_session_large_upload_is_summarised(studio_root: Path) -> None:
+    MockAssistant.reset()
+    sample = studio_root / "big.log"
+    sample.write_text("".join(f"line {i} ok\n" for i in range(2000)), encoding="utf-8")
+    updates = list(
+        handle_chat_submit(
+            WebSession(root=studio_root),
+            "要約して",
+            org_id="solo",
+            workflow_value="",
+            stream=False,
+            temperature=0.7,
+            files=[str(sample)],
+            upload_limits={"max_file_size_kb": 4},
+            large_files=True,
+        )
+    )
+    assert any(u[1].startswith("[添付要約] ") and "区画" in u[1] for u in updates)
+    notes = [m["content"] for m in updates[-1][0] if m["role"] != "user"]
+    assert any("完了" in note and "big.log" in note for note in notes)
+
+
+def test_renderer_keeps_parallel_bubbles_separate() -> None:
+    renderer = ChatEventRenderer()
+    for talent_id in ("beta", "gamma"):
+        renderer.apply(
+            EngineEvent(
+                "step_start",
+                {"talent_id": talent_id, "display_name": talent_id.title(), "phase_type": "parallel"},
+            )
+        )
+    renderer.apply(EngineEvent("chunk", {"talent_id": "gamma", "text": "G1"}))
+    renderer.apply(EngineEvent("chunk", {"talent_id": "beta", "text": "B1"}))
+    renderer.apply(
+        EngineEvent("step_done", {"talent_id": "gamma", "text": "G-final", "assistant": "mock"})
+    )
+    renderer.apply(EngineEvent("chunk", {"talent_id": "beta", "text": "B2"}))
+
+    beta_bubble, gamma_bubble = renderer.messages[0]["content"], renderer.messages[1]["content"]
+    assert beta_bubble.endswith("B1B2")
+    assert "G1" not in beta_bubble
+    assert "G-final" in gamma_bubble
+
+
+def test_renderer_finalises_only_the_named_talent() -> None:
+    renderer = ChatEventRenderer()
+    renderer.apply(EngineEvent("step_start", {"talent_id": "beta", "display_name": "Beta"}))
+    renderer.apply(EngineEvent("chunk", {"talent_id": "beta", "text": "B1"}))
+    # 開始イベントを持たない talent の完了は、直近の beta の吹き出しを閉じずに新しく足す
+    renderer.apply(EngineEvent("step_done", {"talent_id": "gamma", "text": "G-final", "assistant": "mock"}))
+    renderer.apply(EngineEvent("chunk", {"talent_id": "beta", "text": "B2"}))
+
+    assert renderer.messages[0]["content"].endswith("B1B2")
+    assert "G-final" in renderer.messages[1]["content"]
@@ -0,0 +1,106 @@
+"""Compiled workflow execution plan tests (design.md §6.4)."""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from studio import engine as engine_module
+from studio.assistants import MockAssistant
+from studio.engine import SessionEngine, collect_events
+from studio.interrupt import DEFAULT_INTERRUPT_MARKER
+from studio.loader import load_session_context
+from studio.workflow_plan import compile_workflow_plan, judge_action
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+@pytest.fixture
+def nokuru_root(studio_root: Path) -> Path:
+    shutil.copytree(REPO_ROOT / "workflows", studio_root / "workflows", dirs_exist_ok=True)
+    shutil.copytree(REPO_ROOT / "organizations" / "nokuru", studio_root / "organizations" / "nokuru")
+    for tid in ("hinata", "satsuki", "kaede"):
+        shutil.copy2(REPO_ROOT / "talents" / f"{tid}.json", studio_root / "talents" / f"{tid}.json")
+    mapping = {tid: {"assistant": "mock"} for tid in ("hinata", "satsuki", "kaede")}
+    (studio_root / "organizations" / "nokuru" / "model_mapping.json").write_text(
+        json.dumps(mapping, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+    return studio_root
+
+
+def test_meeting_plan_expands_slots_and_marker(nokuru_root: Path) -> None:
+    ctx = load_session_context("nokuru", nokuru_root, workflow_id="meeting")
+    plan = ctx.plan
+    assert plan is not None and plan.workflow_id == "meeting"
+
+    opening, loop = plan.phases
+    assert [s.talent_id for s in opening.steps] == ["hinata"]
+    assert loop.type == "loop" and loop.max_iterations == 3
+    assert loop.exit.type == "marker" and loop.exit.marker == "【結論】"
+    # 同梱ワークフローは圧縮しない（loop.compaction を書いたときだけ有効）
+    assert loop.compaction is None and loop.compaction_step is None
+
+    parallel, serial = loop.phases
+    assert [s.talent_id for s in parallel.steps] == ["satsuki", "kaede"]
+    # 終了マーカーの指示は最後の serial step だけに付く
+    assert "【結論】" in serial.steps[0].action
+    assert all("【結論】" not in s.action for s in parallel.steps + opening.steps)
+    assert set(plan.system_prompts) == {"hinata", "satsuki", "kaede"}
+
+
+def test_dev_plan_resolves_judge_step(nokuru_root: Path) -> None:
+    ctx = load_session_context("nokuru", nokuru_root, workflow_id="dev")
+    loop = ctx.plan.phases[0]
+    judge = loop.exit.judge
+    assert judge is not None
+    assert judge.talent_id == "satsuki" and judge.assistant == "mock"
+    assert judge.action == judge_action(ctx.workflow["phases"][0]["exit"]["criteria"])
+    assert [s.talent_id for s in ctx.plan.iter_steps()] == ["kaede", "satsuki", "satsuki"]
+    assert ctx.plan.to_dict()["phases"][0]["exit"]["judge"]["talent_id"] == "satsuki"
+
+
+def test_direct_and_interrupt_plans(nokuru_root: Path) -> None:
+    ctx = load_session_context("nokuru", nokuru_root)
+    (phase,) = ctx.plan.phases
+    assert phase.type == "serial"
+    assert [s.talent_id for s in phase.steps] == ["hinata", "satsuki", "kaede"] * 3
+    assert ctx.plan.interrupt_markers == ()
+
+    ctx = load_session_context("nokuru", nokuru_root, workflow_id="quiz")
+    assert ctx.plan.interrupt_markers[0] == DEFAULT_INTERRUPT_MARKER
+    assert all(DEFAULT_INTERRUPT_MARKER in s.action for s in ctx.plan.iter_steps())
+
+
+def test_plan_is_immutable_and_compiles_without_loader(nokuru_root: Path) -> None:
+    ctx = load_session_context("nokuru", nokuru_root, workflow_id="meeting")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        ctx.plan.phases[0].type = "parallel"  # type: ignore[misc]
+    with pytest.raises(TypeError):
+        ctx.plan.system_prompts["hinata"] = ""  # type: ignore[index]
+
+    bare = dataclasses.replace(ctx, plan=None)
+    assert compile_workflow_plan(bare) == ctx.plan
+    assert SessionEngine(bare).plan == ctx.plan
+
+
+def test_engine_walks_plan_without_reexpanding(nokuru_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[str] = []
+    original = engine_module.build_system_prompt
+
+    def spy(talent, org, org_id, talent_id, **kwargs):
+        calls.append(talent_id)
+        return original(talent, org, org_id, talent_id, **kwargs)
+
+    monkeypatch.setattr(engine_module, "build_system_prompt", spy)
+    MockAssistant.reset()
+    ctx = load_session_context("nokuru", nokuru_root, workflow_id="meeting")
+    events = collect_events(SessionEngine(ctx), "議題", stream=False, no_user_context=True)
+
+    steps = [e.payload["talent_id"] for e in events if e.type == "step_start"]
+    assert steps[:4] == ["hinata", "satsuki", "kaede", "hinata"]
+    assert calls == []
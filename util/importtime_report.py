@@ -0,0 +1,125 @@
+"""
+各エントリポイントのコールドスタート時間を計測するレポート（design.md 8.1 節）
+
+`python -X importtime` の出力（stderr）を解析し、エントリポイントごとに
+import の合計時間・実行時間と、重いトップレベルパッケージを表示する。
+
+    python util/importtime_report.py                 # 表で表示
+    python util/importtime_report.py --repeat 5      # 5 回計測して最小値
+    python util/importtime_report.py --json > now.json
+    python util/importtime_report.py --baseline now.json   # 前回との差分
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# (名前, python に渡す引数)。{root} は空の一時ディレクトリに置き換える
+ENTRY_POINTS: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("cli --version", ("MultiRoleStudio.py", "--version")),
+    ("cli --help", ("MultiRoleStudio.py", "--help")),
+    ("cli --apply", ("MultiRoleStudio.py", "--apply", "missing", "--root", "{root}")),
+    ("cli --user-context-apply", ("MultiRoleStudio.py", "--user-context-apply", "missing", "--root", "{root}")),
+    ("web import", ("-c", "import MultiRoleStudioWeb")),
+    ("model_costs_db import", ("-c", "import model_costs_db")),
+)
+
+
+@dataclass
+class ImportTimeResult:
+    name: str
+    wall_ms: float
+    import_ms: float
+    # トップレベルパッケージごとの self 時間の合計（ms）
+    packages: dict[str, float] = field(default_factory=dict)
+
+    def top(self, limit: int = 5) -> list[tuple[str, float]]:
+        return sorted(self.packages.items(), key=lambda kv: -kv[1])[:limit]
+
+    def to_record(self) -> dict:
+        return {
+            "name": self.name,
+            "wall_ms": round(self.wall_ms, 1),
+            "import_ms": round(self.import_ms, 1),
+            "packages": {k: round(v, 1) for k, v in self.top(limit=20)},
+        }
+
+
+def parse_importtime(text: str) -> dict[str, float]:
+    """`-X importtime` の出力をトップレベルパッケージごとの self 時間（ms）へ集計する"""
+    packages: dict[str, float] = {}
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0])
+        except ValueError:
+            continue  # 見出し行（self [us] | cumulative | imported package）
+        root = parts[2].strip().split(".")[0]
+        packages[root] = packages.get(root, 0.0) + self_us / 1000
+    return packages
+
+
+def measure(name: str, args: tuple[str, ...], repeat: int = 1) -> ImportTimeResult:
+    """エントリポイントを新しいプロセスで repeat 回起動し、import 時間が最小の回を返す"""
+    best: ImportTimeResult | None = None
+    for _ in range(max(1, repeat)):
+        with tempfile.TemporaryDirectory() as root:
+            cmd = [sys.executable, "-X", "importtime", *(a.replace("{root}", root) for a in args)]
+            started = time.perf_counter()
+            proc = subprocess.run(cmd, cwd=REPO_ROOT, capture_output=True, text=True, encoding="utf-8", errors="replace")
+            wall_ms = (time.perf_counter() - started) * 1000
+        packages = parse_importtime(proc.stderr)
+        result = ImportTimeResult(name, wall_ms, sum(packages.values()), packages)
+        if best is None or result.import_ms < best.import_ms:
+            best = result
+    assert best is not None
+    return best
+
+
+def format_report(results: list[ImportTimeResult], baseline: dict[str, dict] | None = None) -> str:
+    lines = [f"{'エントリポイント':<28}{'実行(ms)':>10}{'import(ms)':>12}{'差分':>10}  重いパッケージ"]
+    for r in results:
+        diff = ""
+        if baseline and r.name in baseline:
+            diff = f"{r.import_ms - baseline[r.name]['import_ms']:+.0f}"
+        heavy = ", ".join(f"{pkg} {ms:.0f}" for pkg, ms in r.top(4))
+        lines.append(f"{r.name:<28}{r.wall_ms:>10.0f}{r.import_ms:>12.0f}{diff:>10}  {heavy}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="エントリポイントごとの import 時間レポート")
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数（最小値を採用）")
+    parser.add_argument("--only", nargs="*", default=None, help="計測するエントリポイント名（部分一致）")
+    parser.add_argument("--json", action="store_true", help="JSON で出力（--baseline に渡せる）")
+    parser.add_argument("--baseline", default=None, help="以前の --json 出力と比較する")
+    args = parser.parse_args(argv)
+
+    entries = [e for e in ENTRY_POINTS if not args.only or any(o in e[0] for o in args.only)]
+    results = [measure(name, cmd, args.repeat) for name, cmd in entries]
+    if args.json:
+        print(json.dumps([r.to_record() for r in results], ensure_ascii=False, indent=2))
+        return 0
+    baseline = None
+    if args.baseline:
+        records = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        baseline = {rec["name"]: rec for rec in records}
+    print(format_report(results, baseline))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())